@@ -0,0 +1,198 @@
+import asyncio
+import mimetypes
+import os
+import shutil
+from typing import Any, AsyncIterator, Optional, Tuple
+
+from fastapi import HTTPException, status
+from fastapi.responses import RedirectResponse, Response, StreamingResponse
+
+from .config import get_settings
+
+# Almacenamiento de los audios generados, detrás de una interfaz común con dos implementaciones:
+# - "local": el volumen montado en AUDIO_STORAGE_PATH (como hasta ahora). Solo sirve para un único host.
+# - "s3": un bucket compatible con S3 (AWS S3, o MinIO en desarrollo), para ejecutar varias réplicas del servicio.
+# Los audios se producen siempre en AUDIO_STORAGE_PATH (pydub, la caché de audios y la combinación por escenas
+# trabajan con archivos locales); publicar un audio lo deja en el almacenamiento configurado. Con S3 la subida es
+# multiparte leyendo el archivo por partes (nunca entero en memoria), la copia local se borra cuando ya no hace falta
+# y la URL devuelta es prefirmada o de la CDN configurada. boto3 solo se importa con AUDIO_STORAGE_BACKEND="s3".
+
+_BLOQUE_LECTURA = 256 * 1024
+_TAMANO_MINIMO_PARTE = 5 * 1024 * 1024 # S3 exige partes de al menos 5 MB (salvo la última)
+
+
+def tipo_contenido(clave: str) -> str:
+    return mimetypes.guess_type(clave)[0] or "application/octet-stream"
+
+
+def _no_encontrado(clave: str) -> HTTPException:
+    return HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail={"tipo_error": "ARCHIVO_NO_ENCONTRADO", "mensaje": f"No existe el archivo '{clave}'."})
+
+
+def _es_clave_valida(clave: str) -> bool:
+    """Rechaza claves que salgan del almacenamiento o apunten a archivos internos (ej. la caché .cache_tts)."""
+    return bool(clave) and not clave.startswith("/") and all(p and not p.startswith(".") for p in clave.split("/"))
+
+
+class AlmacenamientoLocal:
+    """Los audios ya están en su sitio definitivo (AUDIO_STORAGE_PATH/<clave>): publicar no mueve nada."""
+    es_local = True
+
+    def __init__(self, directorio_base: str):
+        self.directorio_base = directorio_base
+
+    def ruta_local(self, clave: str) -> str:
+        return os.path.join(self.directorio_base, *clave.split("/"))
+
+    async def publicar_archivo(self, ruta_local: str, clave: str) -> None:
+        destino = self.ruta_local(clave)
+        if os.path.abspath(ruta_local) != os.path.abspath(destino):
+            os.makedirs(os.path.dirname(destino), exist_ok=True)
+            await asyncio.to_thread(shutil.copyfile, ruta_local, destino)
+
+    async def url_descarga(self, clave: str) -> Optional[str]:
+        return None # Se sirve desde el propio servicio (/media/audios)
+
+    async def tamano(self, clave: str) -> Optional[int]:
+        ruta = self.ruta_local(clave)
+        return os.path.getsize(ruta) if os.path.isfile(ruta) else None
+
+    async def leer_rango(self, clave: str, inicio: int, fin: int) -> AsyncIterator[bytes]:
+        """Bytes [inicio, fin] (ambos incluidos) del archivo, por bloques."""
+        with open(self.ruta_local(clave), "rb") as archivo:
+            archivo.seek(inicio)
+            pendientes = fin - inicio + 1
+            while pendientes > 0:
+                bloque = await asyncio.to_thread(archivo.read, min(_BLOQUE_LECTURA, pendientes))
+                if not bloque: break
+                pendientes -= len(bloque)
+                yield bloque
+
+
+class AlmacenamientoS3:
+    es_local = False
+
+    def __init__(self, prefijo: str, url_base_publica: Optional[str]):
+        import boto3 # Solo necesario con el backend S3
+        from boto3.s3.transfer import TransferConfig
+        from botocore.config import Config
+        from botocore.exceptions import ClientError
+        settings = get_settings()
+        if not settings.STORAGE_S3_BUCKET:
+            raise ValueError("STORAGE_S3_BUCKET es obligatorio con el almacenamiento S3.")
+        self._cliente = boto3.client(
+            "s3",
+            endpoint_url=settings.STORAGE_S3_ENDPOINT_URL, # MinIO: http://minio:9000
+            region_name=settings.STORAGE_S3_REGION,
+            aws_access_key_id=settings.STORAGE_S3_ACCESS_KEY_ID,
+            aws_secret_access_key=settings.STORAGE_S3_SECRET_ACCESS_KEY,
+            config=Config(signature_version="s3v4", s3={"addressing_style": "path" if settings.STORAGE_S3_ENDPOINT_URL else "auto"}),
+        )
+        self._error_cliente = ClientError
+        tamano_parte = max(settings.STORAGE_S3_PART_SIZE_MB * 1024 * 1024, _TAMANO_MINIMO_PARTE)
+        self._config_subida = TransferConfig(multipart_threshold=tamano_parte, multipart_chunksize=tamano_parte, max_concurrency=4)
+        self.bucket = settings.STORAGE_S3_BUCKET
+        self.prefijo = prefijo.strip("/")
+        self.url_base_publica = url_base_publica.rstrip("/") if url_base_publica else None
+        self.urls_prefirmadas = settings.STORAGE_S3_PRESIGNED_URLS
+        self.segundos_validez_url = settings.STORAGE_S3_PRESIGNED_URL_EXPIRY_SEG
+
+    def _clave_objeto(self, clave: str) -> str:
+        return f"{self.prefijo}/{clave}" if self.prefijo else clave
+
+    async def publicar_archivo(self, ruta_local: str, clave: str) -> None:
+        # upload_file lee el archivo por partes y, por encima del umbral, hace una subida multiparte.
+        await asyncio.to_thread(
+            self._cliente.upload_file, ruta_local, self.bucket, self._clave_objeto(clave),
+            ExtraArgs={"ContentType": tipo_contenido(clave)}, Config=self._config_subida
+        )
+
+    async def url_descarga(self, clave: str) -> Optional[str]:
+        if self.url_base_publica: return f"{self.url_base_publica}/{self._clave_objeto(clave)}" # CDN delante del bucket
+        if not self.urls_prefirmadas: return None # Se sirve a través del propio servicio
+        return self._cliente.generate_presigned_url( # Se firma en local, sin llamada de red
+            "get_object", Params={"Bucket": self.bucket, "Key": self._clave_objeto(clave)}, ExpiresIn=self.segundos_validez_url
+        )
+
+    async def tamano(self, clave: str) -> Optional[int]:
+        try:
+            cabecera = await asyncio.to_thread(self._cliente.head_object, Bucket=self.bucket, Key=self._clave_objeto(clave))
+        except self._error_cliente as e:
+            if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound"): return None
+            raise
+        return cabecera["ContentLength"]
+
+    async def leer_rango(self, clave: str, inicio: int, fin: int) -> AsyncIterator[bytes]:
+        respuesta = await asyncio.to_thread(
+            self._cliente.get_object, Bucket=self.bucket, Key=self._clave_objeto(clave), Range=f"bytes={inicio}-{fin}"
+        )
+        cuerpo = respuesta["Body"]
+        try:
+            while True:
+                bloque = await asyncio.to_thread(cuerpo.read, _BLOQUE_LECTURA)
+                if not bloque: break
+                yield bloque
+        finally:
+            cuerpo.close()
+
+
+_almacenamiento: Optional[Any] = None
+
+
+def get_almacenamiento() -> Any:
+    """Almacenamiento configurado (AUDIO_STORAGE_BACKEND). Se crea en la primera llamada."""
+    global _almacenamiento
+    if _almacenamiento is None:
+        settings = get_settings()
+        if settings.AUDIO_STORAGE_BACKEND == "s3":
+            _almacenamiento = AlmacenamientoS3(settings.AUDIO_STORAGE_S3_PREFIX, settings.AUDIO_STORAGE_PUBLIC_BASE_URL)
+            print(f"Servicio Audio: Almacenamiento S3 (bucket '{_almacenamiento.bucket}', prefijo '{_almacenamiento.prefijo}').")
+        else:
+            _almacenamiento = AlmacenamientoLocal(settings.AUDIO_STORAGE_PATH)
+            print(f"Servicio Audio: Almacenamiento local en {settings.AUDIO_STORAGE_PATH}.")
+    return _almacenamiento
+
+
+def interpretar_rango(cabecera_range: Optional[str], tamano: int) -> Optional[Tuple[int, int]]:
+    """
+    (inicio, fin) incluidos de una cabecera "Range: bytes=..." con un solo rango, o None para enviar el archivo completo
+    (sin cabecera, o con varios rangos, que se ignoran). Lanza ValueError si el rango no se puede satisfacer.
+    """
+    if not cabecera_range or not cabecera_range.startswith("bytes=") or "," in cabecera_range: return None
+    desde, _, hasta = cabecera_range[len("bytes="):].strip().partition("-")
+    try:
+        if desde == "": # Sufijo: los últimos N bytes
+            inicio, fin = max(tamano - int(hasta), 0), tamano - 1
+        else:
+            inicio = int(desde)
+            fin = min(int(hasta), tamano - 1) if hasta else tamano - 1
+    except ValueError:
+        return None # Cabecera mal formada: se ignora
+    if inicio >= tamano or inicio > fin:
+        raise ValueError(f"Rango no satisfacible para un archivo de {tamano} bytes: {cabecera_range}")
+    return inicio, fin
+
+
+async def respuesta_archivo(clave: str, cabecera_range: Optional[str], solo_cabeceras: bool = False) -> Response:
+    """
+    Respuesta HTTP para un archivo del almacenamiento, con soporte de peticiones parciales (Range, 206).
+    Si el almacenamiento da una URL directa (prefirmada o de CDN), redirige a ella y el rango lo atiende el bucket.
+    """
+    almacenamiento = get_almacenamiento()
+    if not _es_clave_valida(clave): raise _no_encontrado(clave)
+    url_directa = await almacenamiento.url_descarga(clave)
+    if url_directa:
+        return RedirectResponse(url_directa, status_code=status.HTTP_307_TEMPORARY_REDIRECT)
+    tamano = await almacenamiento.tamano(clave)
+    if tamano is None: raise _no_encontrado(clave)
+    try:
+        rango = interpretar_rango(cabecera_range, tamano)
+    except ValueError:
+        return Response(status_code=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE, headers={"Content-Range": f"bytes */{tamano}"})
+    inicio, fin = rango if rango is not None else (0, tamano - 1)
+    cabeceras = {"Accept-Ranges": "bytes", "Content-Length": str(fin - inicio + 1)}
+    if rango is not None: cabeceras["Content-Range"] = f"bytes {inicio}-{fin}/{tamano}"
+    codigo = status.HTTP_206_PARTIAL_CONTENT if rango is not None else status.HTTP_200_OK
+    if solo_cabeceras or tamano == 0:
+        return Response(status_code=codigo, headers=cabeceras, media_type=tipo_contenido(clave))
+    return StreamingResponse(almacenamiento.leer_rango(clave, inicio, fin), status_code=codigo, headers=cabeceras, media_type=tipo_contenido(clave))
@@ -1,6 +1,6 @@
 from pydantic_settings import BaseSettings, SettingsConfigDict
 from functools import lru_cache
-from typing import Optional
+from typing import Literal, Optional
 
 class Settings(BaseSettings):
     # --- Configuración de Google Cloud TTS ---
@@ -18,17 +18,89 @@ class Settings(BaseSettings):
     # --- Configuración de Salida de Audio ---
     AUDIO_OUTPUT_FORMAT: str = "MP3" # Formato por defecto (Google TTS soporta MP3, LINEAR16, OGG_OPUS)
     AUDIO_OUTPUT_MP3_BITRATE: int = 192000 # Tasa de bits para MP3 (ej. 192kbps)
+    # Si el proveedor ya entrega el formato de salida, escribir sus bytes sin decodificar ni recodificar (los fragmentos
+    # MP3 se unen a nivel de trama y los WAV por muestras). El audio conserva el bitrate del proveedor, así que
+    # AUDIO_OUTPUT_MP3_BITRATE solo se aplica cuando hay que recodificar (o con esta opción desactivada).
+    AUDIO_ZERO_TRANSCODE_ENABLED: bool = True
+    # Silencio por defecto entre segmentos (y entre escenas) en los audios combinados por escena y de proyecto.
+    AUDIO_MERGE_GAP_SEG: float = 0.4
+    # Normalización del audio al decodificar y recodificar: "ninguna", "pico" (lleva el pico al techo) o "lufs"
+    # (sonoridad integrada ITU-R BS.1770 al objetivo, sin superar el techo). Con "pico" o "lufs" el audio siempre se
+    # decodifica (no se usa la ruta sin transcodificar) y los audios combinados se normalizan con una sola ganancia.
+    AUDIO_NORMALIZATION_MODE: Literal["ninguna", "pico", "lufs"] = "ninguna"
+    AUDIO_NORMALIZATION_TARGET_LUFS: float = -16.0 # Habitual para voz en plataformas de vídeo y podcasts
+    AUDIO_NORMALIZATION_PEAK_DBFS: float = -1.0 # Techo de pico (muestra) tras la ganancia
 
     # --- Configuración para el Procesamiento de Texto ---
-    TTS_MAX_CHARS_PER_CHUNK: int = 4500 # Límite de caracteres por fragmento para enviar a la API de TTS
-                                        # Google Cloud TTS tiene un límite de 5000 bytes (~4800-4900 chars para UTF-8).
+    TTS_MAX_BYTES_PER_CHUNK: int = 4800 # Límite de bytes (UTF-8) por fragmento de texto enviado a la API de TTS
+                                        # Google Cloud TTS admite 5000 bytes por solicitud; las letras acentuadas ocupan 2.
                                         # Dejamos un margen.
+    # Normalización del texto antes del TTS (markdown, enlaces, emojis, notas "EDIT:", puntuación repetida, abreviaturas).
+    TTS_TEXT_NORMALIZATION_ENABLED: bool = True
+    TTS_TEXT_NORMALIZATION_EXPAND_NUMBERS: bool = True # "21 años" -> "veintiún años" (alarga el texto, pero evita lecturas erróneas)
+    # Lotes SSML: los segmentos consecutivos de una escena se sintetizan en una sola llamada con marcas <mark> y el audio
+    # se corta en los instantes devueltos (API v1beta1). El lote se pide en LINEAR16 y se corta a la muestra; con salida
+    # MP3 cada segmento se codifica una vez. Requiere salida MP3 o WAV con AUDIO_ZERO_TRANSCODE_ENABLED.
+    TTS_SSML_BATCHING_ENABLED: bool = False
+    TTS_SSML_BATCH_MAX_BYTES: int = 4800 # Tamaño máximo del SSML de un lote (Google admite 5000 bytes por solicitud)
+
+    # --- Concurrencia de la síntesis ---
+    # Llamadas de síntesis en vuelo a la vez, por proveedor y por proceso (compartido por todas las solicitudes).
+    # Los fragmentos de un texto y los segmentos de un guion se sintetizan en paralelo hasta este límite.
+    TTS_GOOGLE_MAX_CONCURRENT_CALLS: int = 8
+    # Reparto de esas llamadas entre proyectos: cuando se libera un turno, va al proyecto en espera con menos uso
+    # ponderado por su prioridad (round-robin con prioridades iguales). Si es False, por orden de llegada.
+    TTS_FAIR_SHARE_ENABLED: bool = True
+    # Pool de procesos para decodificar/concatenar/codificar con pydub/ffmpeg fuera del event loop.
+    AUDIO_PROCESS_POOL_WORKERS: int = 0 # Procesos del pool (0 = uno por núcleo)
+    AUDIO_PROCESS_POOL_MAX_PENDING: int = 16 # Trabajos enviados al pool a la vez; el resto espera sin bloquear el loop
+    # Keepalive del canal gRPC compartido con Google TTS (un cliente por proceso, creado al arrancar).
+    TTS_GOOGLE_KEEPALIVE_TIME_MS: int = 30000 # Intervalo de pings HTTP/2 para mantener viva la conexión
+    TTS_GOOGLE_KEEPALIVE_TIMEOUT_MS: int = 10000 # Sin respuesta al ping en este tiempo -> conexión caída
+
+    # --- Proveedor TTS local (espeak-ng, sin red ni cuota) ---
+    # Se elige con proveedor_tts="local" en la solicitud; entrega WAV y se recodifica al formato de salida si hace falta.
+    TTS_LOCAL_ESPEAK_BINARY: str = "espeak-ng" # Ejecutable (nombre en el PATH o ruta completa)
+    TTS_LOCAL_DEFAULT_VOICE: str = "es-419" # Voz de espeak-ng por defecto (español latinoamericano)
+    TTS_LOCAL_MAX_CONCURRENT: int = 0 # Procesos de espeak-ng a la vez (0 = uno por núcleo)
+    # Proveedor al que se pasa una síntesis cuando el pedido limita la tasa (ej. "local"). Vacío = sin respaldo (error 429).
+    TTS_FALLBACK_PROVIDER: Optional[str] = None
+
+    # --- Caché de audios TTS (direccionada por contenido, compartida entre proyectos) ---
+    TTS_CACHE_ENABLED: bool = True
+    # Debe estar en el mismo sistema de archivos que AUDIO_STORAGE_PATH para que los proyectos reciban enlaces duros
+    # en lugar de copias (por defecto, dentro del mismo volumen).
+    TTS_CACHE_PATH: str = "/app/generated_audios/.cache_tts"
+    TTS_CACHE_MAX_MB: int = 1024 # Al superarse, se expulsan los audios de acceso más antiguo (LRU)
 
     # --- Configuración de Almacenamiento de Audio (para desarrollo local con Docker) ---
     # Ruta DENTRO del contenedor donde se guardarán temporalmente/permanentemente los audios.
     # Esta ruta se mapeará a un volumen Docker para persistencia y acceso.
     AUDIO_STORAGE_PATH: str = "/app/generated_audios" 
     AUDIO_BASE_URL: str = "http://localhost:8002/media/audios"
+    # Dónde se publican los audios: "local" (AUDIO_STORAGE_PATH, un solo host) o "s3" (bucket compatible con S3, ej. MinIO).
+    # Con "s3", AUDIO_STORAGE_PATH solo guarda copias de trabajo (y la caché de audios).
+    AUDIO_STORAGE_BACKEND: Literal["local", "s3"] = "local"
+    AUDIO_STORAGE_S3_PREFIX: str = "audios" # Prefijo de las claves de los audios dentro del bucket
+    AUDIO_STORAGE_PUBLIC_BASE_URL: Optional[str] = None # CDN delante del bucket; si se define, se usa en lugar de URLs prefirmadas
+
+    # --- Bucket S3 compartido por los servicios (solo con *_STORAGE_BACKEND="s3") ---
+    STORAGE_S3_BUCKET: str = ""
+    STORAGE_S3_ENDPOINT_URL: Optional[str] = None # Vacío para AWS S3; para MinIO, ej. "http://minio:9000"
+    STORAGE_S3_REGION: Optional[str] = None
+    STORAGE_S3_ACCESS_KEY_ID: Optional[str] = None # Si no se definen, boto3 usa su cadena de credenciales habitual
+    STORAGE_S3_SECRET_ACCESS_KEY: Optional[str] = None
+    STORAGE_S3_PART_SIZE_MB: int = 8 # Tamaño de parte de las subidas multiparte (mínimo 5)
+    STORAGE_S3_PRESIGNED_URLS: bool = True # Si es False (y sin CDN), los audios se sirven a través de /media/audios
+    STORAGE_S3_PRESIGNED_URL_EXPIRY_SEG: int = 86400
+
+    # --- Trabajos asíncronos (POST .../jobs/... -> 202 Accepted + consulta de estado) ---
+    JOBS_MAX_CONCURRENT: int = 2 # Trabajos ejecutándose a la vez en este proceso; el resto espera en estado 'pendiente'
+    JOBS_RESULT_TTL_SEG: int = 3600 # Tiempo que se conserva el resultado de un trabajo terminado
+    JOBS_CALLBACK_TIMEOUT_SEG: float = 10.0 # Timeout del POST a la url_callback al terminar un trabajo
+    # Hosts a los que se permite enviar la url_callback, separados por comas (ej. "orquestador_api_service").
+    # Vacío = no se aceptan callbacks (la url_callback viene del cliente: evita peticiones a direcciones internas).
+    JOBS_CALLBACK_ALLOWED_HOSTS: str = ""
 
     # (Opcional) Si en el futuro usamos ElevenLabs como alternativa:
     # ELEVENLABS_API_KEY: Optional[str] = None
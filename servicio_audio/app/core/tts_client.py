@@ -0,0 +1,134 @@
+import time
+from typing import Any, Dict
+
+import grpc
+from google.api_core import exceptions as google_exceptions
+from google.cloud import texttospeech_v1 as tts
+from google.cloud import texttospeech_v1beta1 as tts_beta
+from google.cloud.texttospeech_v1.services.text_to_speech.transports import TextToSpeechGrpcAsyncIOTransport
+from google.cloud.texttospeech_v1beta1.services.text_to_speech.transports import TextToSpeechGrpcAsyncIOTransport as TransporteGrpcBeta
+
+from .config import get_settings
+
+# Cliente único de Google Cloud TTS por proceso. Se crea en el arranque de la app (lifespan en main.py) y se
+# reutiliza en todas las síntesis: el canal gRPC (HTTP/2) multiplexa las llamadas concurrentes y evita pagar
+# el establecimiento del canal y la carga de credenciales en cada segmento. Si el canal falla, se recrea.
+# La versión v1beta1 de la API (necesaria para pedir los instantes de las marcas <mark> del SSML) usa su propio
+# cliente, creado solo si se usa.
+_VERSIONES_API = {
+    "v1": (tts.TextToSpeechAsyncClient, TextToSpeechGrpcAsyncIOTransport),
+    "v1beta1": (tts_beta.TextToSpeechAsyncClient, TransporteGrpcBeta),
+}
+_clientes_tts: Dict[str, Any] = {}
+_metricas: Dict[str, Any] = {
+    "segundos_creacion_cliente": None, "recreaciones_cliente": 0,
+    "llamadas": 0, "llamadas_fallidas": 0, "latencia_total_seg": 0.0, "latencia_max_seg": 0.0
+}
+
+
+def _crear_cliente_tts(version: str = "v1") -> Any:
+    settings = get_settings()
+    clase_cliente, clase_transporte = _VERSIONES_API[version]
+    inicio = time.perf_counter()
+    canal = clase_transporte.create_channel(
+        options=[
+            ("grpc.max_send_message_length", -1),
+            ("grpc.max_receive_message_length", -1),
+            # Keepalive: detecta conexiones muertas (NAT, balanceadores) antes de que las use una síntesis.
+            ("grpc.keepalive_time_ms", settings.TTS_GOOGLE_KEEPALIVE_TIME_MS),
+            ("grpc.keepalive_timeout_ms", settings.TTS_GOOGLE_KEEPALIVE_TIMEOUT_MS),
+            ("grpc.keepalive_permit_without_calls", 1),
+            ("grpc.http2.max_pings_without_data", 0),
+            # Subcanales propios de este canal, no los del pool global del proceso: los clientes v1 y v1beta1 abren
+            # cada uno su conexión en lugar de compartir una, y un canal recreado tras un fallo no reutiliza la
+            # conexión del que se descartó. La concurrencia la limita TTS_GOOGLE_MAX_CONCURRENT_CALLS, muy por
+            # debajo del límite de streams por conexión que anuncia el servidor.
+            ("grpc.use_local_subchannel_pool", 1),
+        ]
+    )
+    cliente = clase_cliente(transport=clase_transporte(channel=canal))
+    _metricas["segundos_creacion_cliente"] = round(time.perf_counter() - inicio, 4)
+    return cliente
+
+
+async def iniciar_cliente_tts() -> tts.TextToSpeechAsyncClient:
+    """Crea el cliente compartido. Se llama una vez al arrancar la app."""
+    if "v1" not in _clientes_tts:
+        _clientes_tts["v1"] = _crear_cliente_tts()
+        print(f"Servicio Audio: Cliente de Google TTS creado en {_metricas['segundos_creacion_cliente']} s (keepalive={get_settings().TTS_GOOGLE_KEEPALIVE_TIME_MS} ms).")
+    return _clientes_tts["v1"]
+
+
+async def cerrar_cliente_tts() -> None:
+    """Cierra el canal gRPC de los clientes compartidos. Se llama al apagar la app."""
+    for version, cliente in list(_clientes_tts.items()):
+        await cliente.transport.close()
+        del _clientes_tts[version]
+        print(f"Servicio Audio: Cliente de Google TTS ({version}) cerrado.")
+
+
+def get_cliente_tts(version: str = "v1") -> Any:
+    """
+    Devuelve el cliente compartido de la versión de API indicada. Si la app no pasó por el lifespan
+    (ej. uso del servicio desde un script) o la versión no se había usado, lo crea en la primera llamada.
+    """
+    if version not in _clientes_tts:
+        _clientes_tts[version] = _crear_cliente_tts(version)
+    return _clientes_tts[version]
+
+
+def _es_fallo_de_canal(error: Exception) -> bool:
+    if isinstance(error, google_exceptions.ServiceUnavailable): return True
+    if isinstance(error, grpc.aio.UsageError): return True # Canal cerrado
+    return "channel" in str(error).lower() and "closed" in str(error).lower()
+
+
+async def _recrear_cliente_tts(version: str, cliente_fallido: Any) -> Any:
+    """Sustituye el cliente compartido si sigue siendo el que falló (otra llamada puede haberlo recreado ya)."""
+    if _clientes_tts.get(version) is cliente_fallido:
+        _clientes_tts[version] = _crear_cliente_tts(version)
+        _metricas["recreaciones_cliente"] += 1
+        print(f"Servicio Audio: ADVERTENCIA - Canal gRPC de Google TTS ({version}) caído; cliente recreado (recreaciones: {_metricas['recreaciones_cliente']}).")
+        try:
+            await cliente_fallido.transport.close()
+        except Exception:
+            pass # El canal viejo ya estaba roto; solo se intenta liberar sus recursos
+    return get_cliente_tts(version)
+
+
+async def sintetizar_google(request: Dict[str, Any], version: str = "v1") -> Any:
+    """
+    synthesize_speech con el cliente compartido. Si el fallo es del canal (UNAVAILABLE, canal cerrado),
+    se recrea el cliente y se reintenta una vez; cualquier otro error se propaga tal cual.
+    Con version="v1beta1" el request puede pedir los instantes de las marcas SSML (enable_time_pointing).
+    """
+    cliente = get_cliente_tts(version)
+    inicio = time.perf_counter()
+    try:
+        try:
+            return await cliente.synthesize_speech(request=request)
+        except Exception as e:
+            if not _es_fallo_de_canal(e): raise
+            cliente = await _recrear_cliente_tts(version, cliente)
+            return await cliente.synthesize_speech(request=request)
+    except Exception:
+        _metricas["llamadas_fallidas"] += 1
+        raise
+    finally:
+        latencia = time.perf_counter() - inicio
+        _metricas["llamadas"] += 1
+        _metricas["latencia_total_seg"] += latencia
+        _metricas["latencia_max_seg"] = max(_metricas["latencia_max_seg"], latencia)
+
+
+def resumen_metricas_cliente_tts() -> Dict[str, Any]:
+    llamadas = _metricas["llamadas"]
+    return {
+        "clientes_activos": sorted(_clientes_tts),
+        "segundos_creacion_cliente": _metricas["segundos_creacion_cliente"],
+        "recreaciones_cliente": _metricas["recreaciones_cliente"],
+        "llamadas": llamadas,
+        "llamadas_fallidas": _metricas["llamadas_fallidas"],
+        "latencia_media_seg": round(_metricas["latencia_total_seg"] / llamadas, 4) if llamadas else None,
+        "latencia_max_seg": round(_metricas["latencia_max_seg"], 4),
+    }
@@ -1,6 +1,6 @@
-from fastapi import FastAPI, HTTPException, status
-from fastapi.staticfiles import StaticFiles
-from typing import Dict, List
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException, Query, Request, Response, status
+from typing import Dict, List, Optional, Tuple
 import os
 
 # Importamos los modelos Pydantic
@@ -8,7 +8,9 @@ from .models_schemas import (
     BasicTTSRequest, 
     BasicTTSResponse,
     VideoScriptTTSRequest, 
-    VideoScriptTTSResponse
+    VideoScriptTTSResponse,
+    TrabajoAceptado,
+    EstadoTrabajoAudios
     # Los submodelos como TTSMetadataOutput, VoiceConfigInput, AudioGeneradoInfo
     # son utilizados por los modelos principales y FastAPI los manejará.
 )
@@ -21,10 +23,29 @@ from .services.audio_generation_service import (
     generar_audio_tts_basico,
     generar_audios_para_script_video
 )
+from .services.trabajos import crear_trabajo, validar_url_callback, obtener_trabajo, cancelar_trabajos_en_vuelo
+from .core.tts_client import iniciar_cliente_tts, cerrar_cliente_tts, resumen_metricas_cliente_tts
+from .services.cache_audios import get_cache_audios, cerrar_cache_audios
+from .services.procesamiento_audio import iniciar_pool_audio, cerrar_pool_audio, resumen_metricas_pool_audio
+from .services.planificador_tts import resumen_planificadores
+from .core.almacenamiento import get_almacenamiento, respuesta_archivo
 
 settings = get_settings() # Obtenemos la instancia de configuración
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await iniciar_cliente_tts() # Un único cliente (canal gRPC) de Google TTS para todas las solicitudes del proceso
+    get_cache_audios() # Abre (o crea) la caché de audios al arrancar
+    iniciar_pool_audio() # Procesos para el trabajo de CPU con pydub/ffmpeg (no bloquea el event loop)
+    get_almacenamiento() # Valida la configuración del almacenamiento (local o S3) al arrancar
+    yield
+    await cancelar_trabajos_en_vuelo() # Los trabajos asíncronos que sigan en curso no sobreviven al apagado
+    await cerrar_cliente_tts()
+    cerrar_cache_audios()
+    cerrar_pool_audio()
+
 app = FastAPI(
+    lifespan=lifespan,
     title="Servicio de Generación de Audio (TTS)",
     version="1.0.0",
     description="Microservicio para convertir texto a voz utilizando proveedores como Google Cloud TTS. Ofrece funcionalidades de TTS básico y para guiones de video completos.",
@@ -40,18 +61,24 @@ app = FastAPI(
     ]
 )
 
-# --- Configuración para Servir Archivos de Audio Estáticos ---
+# --- Configuración para Servir los Audios Generados ---
 # Asegurar que el directorio de almacenamiento exista al iniciar la app.
 if not os.path.exists(settings.AUDIO_STORAGE_PATH):
     os.makedirs(settings.AUDIO_STORAGE_PATH)
     print(f"Servicio Audio (main.py): Creado directorio de almacenamiento en {settings.AUDIO_STORAGE_PATH}")
 
-app.mount(
-    "/media/audios", 
-    StaticFiles(directory=settings.AUDIO_STORAGE_PATH),
-    name="generated_audios_static"
+# Los audios se sirven con una ruta propia (en lugar de StaticFiles) que funciona con cualquier backend de almacenamiento
+# y atiende peticiones parciales (Range -> 206) para que los reproductores puedan buscar sin descargar el audio entero.
+# Con S3 y URLs prefirmadas (o CDN) redirige a la URL directa y el rango lo atiende el bucket.
+@app.api_route(
+    "/media/audios/{clave:path}",
+    methods=["GET", "HEAD"],
+    summary="Descarga un audio generado (admite la cabecera Range).",
+    tags=["Utilities"]
 )
-print(f"Servicio Audio (main.py): Sirviendo archivos estáticos desde la ruta URL '/media/audios' mapeada al directorio '{settings.AUDIO_STORAGE_PATH}'")
+async def servir_audio_endpoint(clave: str, request: Request):
+    return await respuesta_archivo(clave, request.headers.get("range"), solo_cabeceras=request.method == "HEAD")
+print(f"Servicio Audio (main.py): Sirviendo los audios en la ruta URL '/media/audios' (almacenamiento '{settings.AUDIO_STORAGE_BACKEND}').")
 
 
 # --- Endpoint para la Generación de TTS Básico ---
@@ -130,9 +157,14 @@ async def generar_audios_para_video_endpoint(datos_script: VideoScriptTTSRequest
         resultado_audios_video = await generar_audios_para_script_video(datos_script=datos_script)
         print(f"API Audio: Audios de video generados para id_proyecto: {resultado_audios_video.id_proyecto}")
         return resultado_audios_video
-        
-    except ValueError as ve:
-        mensaje_error = str(ve)
+    except Exception as e:
+        codigo_http, detalle_error = _mapear_error_audios_video(e)
+        raise HTTPException(status_code=codigo_http, detail=detalle_error)
+
+def _mapear_error_audios_video(error: Exception) -> Tuple[int, Dict[str, str]]:
+    """Traduce una excepción de generar_audios_para_script_video a (código HTTP, detalle {tipo_error, mensaje})."""
+    if isinstance(error, ValueError):
+        mensaje_error = str(error)
         print(f"API Audio (TTS Video Script): Error - {mensaje_error}")
         # Un manejo de errores similar al anterior, adaptado si es necesario
         # para errores que puedan surgir de múltiples llamadas internas a TTS básico.
@@ -140,14 +172,55 @@ async def generar_audios_para_video_endpoint(datos_script: VideoScriptTTSRequest
         # Podrías querer distinguir si es un error de configuración, de proveedor, etc.
         # basándote en el mensaje de 've' si tu servicio 'generar_audios_para_script_video'
         # propaga esos detalles.
-        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail={"tipo_error": "ERROR_GENERACION_AUDIOS_VIDEO", "mensaje": mensaje_error})
-        
-    except Exception as e:
-        print(f"API Audio (TTS Video Script): Error inesperado del servidor - {type(e).__name__}: {e}")
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail={"tipo_error": "ERROR_INTERNO_INESPERADO_AUDIO_VIDEO", "mensaje": f"Ocurrió un error interno: {type(e).__name__}"}
-        )
+        return status.HTTP_400_BAD_REQUEST, {"tipo_error": "ERROR_GENERACION_AUDIOS_VIDEO", "mensaje": mensaje_error}
+
+    print(f"API Audio (TTS Video Script): Error inesperado del servidor - {type(error).__name__}: {error}")
+    return status.HTTP_500_INTERNAL_SERVER_ERROR, {"tipo_error": "ERROR_INTERNO_INESPERADO_AUDIO_VIDEO", "mensaje": f"Ocurrió un error interno: {type(error).__name__}"}
+
+# --- Variante Asíncrona (Trabajos) de la Generación de Audios para un Guion ---
+@app.post(
+    "/api/v1/audio/tts/jobs/for_video_script",
+    response_model=TrabajoAceptado,
+    status_code=status.HTTP_202_ACCEPTED,
+    summary="Encola la generación de los audios de un guion de video y devuelve de inmediato un id de trabajo.",
+    tags=["Text-to-Speech (TTS)"]
+)
+async def encolar_audios_para_video_endpoint(
+    datos_script: VideoScriptTTSRequest,
+    response: Response,
+    url_callback: Optional[str] = Query(default=None, description="Si se indica, al terminar el trabajo se envía un POST con su estado final (modelo `EstadoTrabajoAudios`) a esta URL.")
+):
+    """
+    Mismo proceso que `for_video_script`, sin mantener la conexión abierta: responde `202 Accepted` con el
+    `id_trabajo` (y la cabecera `Location`) y el resultado se consulta en `GET /api/v1/audio/tts/jobs/{id_trabajo}`.
+    """
+    print(f"API Audio: Recibida solicitud (trabajo asíncrono) de audios de video para id_proyecto: {datos_script.id_proyecto}")
+    try:
+        validar_url_callback(url_callback)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail={"tipo_error": "URL_CALLBACK_NO_PERMITIDA", "mensaje": str(e)})
+    trabajo = crear_trabajo(
+        "for_video_script",
+        lambda: generar_audios_para_script_video(datos_script=datos_script),
+        _mapear_error_audios_video,
+        url_callback
+    )
+    url_estado = f"/api/v1/audio/tts/jobs/{trabajo['id_trabajo']}"
+    response.headers["Location"] = url_estado
+    return TrabajoAceptado(id_trabajo=trabajo["id_trabajo"], estado=trabajo["estado"], url_estado=url_estado)
+
+@app.get(
+    "/api/v1/audio/tts/jobs/{id_trabajo}",
+    response_model=EstadoTrabajoAudios,
+    status_code=status.HTTP_200_OK,
+    summary="Devuelve el estado de un trabajo de audios y, si terminó, su resultado o su error.",
+    tags=["Text-to-Speech (TTS)"]
+)
+async def estado_trabajo_audios_endpoint(id_trabajo: str):
+    trabajo = obtener_trabajo(id_trabajo)
+    if trabajo is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail={"tipo_error": "TRABAJO_NO_ENCONTRADO", "mensaje": f"No existe el trabajo '{id_trabajo}' (o su resultado ya caducó)."})
+    return trabajo
 
 # --- Endpoint de Health Check (Buena Práctica) ---
 @app.get(
@@ -159,4 +232,47 @@ async def generar_audios_para_video_endpoint(datos_script: VideoScriptTTSRequest
 )
 async def health_check():
     """Endpoint simple para verificar que el servicio está operativo."""
-    return {"status": "ok"}
\ No newline at end of file
+    return {"status": "ok"}
+
+
+@app.get(
+    "/api/v1/audio/tts/client/stats",
+    status_code=status.HTTP_200_OK,
+    summary="Métricas del cliente de Google TTS compartido (creación, recreaciones, latencia por llamada).",
+    tags=["Utilities"]
+)
+async def estadisticas_cliente_tts_endpoint():
+    return resumen_metricas_cliente_tts()
+
+
+@app.get(
+    "/api/v1/audio/tts/cache/stats",
+    status_code=status.HTTP_200_OK,
+    summary="Estadísticas de la caché de audios TTS (aciertos, fallos, tamaño, expulsiones).",
+    tags=["Utilities"]
+)
+async def estadisticas_cache_audios_endpoint():
+    cache = get_cache_audios()
+    if cache is None:
+        return {"habilitada": False}
+    return {"habilitada": True, **cache.resumen()}
+
+
+@app.get(
+    "/api/v1/audio/processing_pool/stats",
+    status_code=status.HTTP_200_OK,
+    summary="Métricas del pool de procesos de audio (trabajos en vuelo y en espera, tiempo de codificación).",
+    tags=["Utilities"]
+)
+async def estadisticas_pool_audio_endpoint():
+    return resumen_metricas_pool_audio()
+
+
+@app.get(
+    "/api/v1/audio/tts/scheduler/stats",
+    status_code=status.HTTP_200_OK,
+    summary="Reparto de las llamadas de síntesis entre proyectos (por proveedor: turnos en vuelo y en cola de cada proyecto).",
+    tags=["Utilities"]
+)
+async def estadisticas_planificador_tts_endpoint():
+    return resumen_planificadores()
\ No newline at end of file
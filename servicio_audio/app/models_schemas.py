@@ -1,13 +1,14 @@
 # En servicio_audio/app/models_schemas.py
-from typing import List, Optional, Dict 
+from datetime import datetime
+from typing import List, Literal, Optional, Dict 
 from pydantic import BaseModel, Field, HttpUrl # HttpUrl podría no ser necesaria aquí
 
 class VoiceConfigInput(BaseModel):
     """Configuración opcional para la voz TTS."""
     id_voz: Optional[str] = Field(
         default=None, 
-        description="ID/Nombre de la voz específica del proveedor TTS. Si se omite, se usa una voz por defecto de Google TTS."
-        # Ejemplo para Google: "es-US-Wavenet-A" o "es-ES-Standard-A"
+        description="ID/Nombre de la voz específica del proveedor TTS. Si se omite, se usa la voz por defecto del proveedor."
+        # Ejemplo para Google: "es-US-Wavenet-A" o "es-ES-Standard-A"; para el proveedor "local" (espeak-ng): "es-419" o "es"
     )
     idioma_codigo: str = Field(
         default="es-MX", # Default a Español (México) u otra variante que prefieras
@@ -33,8 +34,9 @@ class BasicTTSRequest(BaseModel):
     texto_a_convertir: str = Field(..., min_length=1, description="Texto a convertir en audio.")
     id_solicitud: Optional[str] = Field(default=None, description="ID opcional para trazar la solicitud y nombrar el archivo.")
     id_proyecto: Optional[str] = Field(default=None, description="ID del proyecto para organizar los archivos en subcarpetas.") # <--- NUEVO CAMPO
-    proveedor_tts: str = Field(default="google", description="Proveedor de TTS a utilizar.")
+    proveedor_tts: str = Field(default="google", description="Proveedor de TTS a utilizar: 'google' o 'local' (espeak-ng, sin red).")
     configuracion_voz: Optional[VoiceConfigInput] = Field(default=None, description="Configuraciones opcionales para la voz.")
+    prioridad: Literal["baja", "normal", "alta"] = Field(default="normal", description="Prioridad frente a otros proyectos al repartir las llamadas al proveedor TTS ('alta' recibe el doble de turnos que 'normal' y 'baja' la mitad).")
 
     class Config:
         json_schema_extra = {
@@ -61,6 +63,9 @@ class TTSMetadataOutput(BaseModel):
         default=1, 
         description="Número de fragmentos en los que se dividió el texto si fue necesario (1 si no hubo división)."
     )
+    caracteres_texto_original: Optional[int] = Field(default=None, ge=0, description="Caracteres del texto recibido.")
+    caracteres_sintetizados: Optional[int] = Field(default=None, ge=0, description="Caracteres enviados al proveedor TTS tras la normalización (los que se facturan).")
+    audio_desde_cache: bool = Field(default=False, description="True si el audio se reutilizó de la caché de audios (sin llamar al proveedor).")
     
 # En servicio_audio/app/models_schemas.py (continuación)
 
@@ -123,6 +128,9 @@ class VideoScriptTTSRequest(BaseModel): # Modelo Actualizado para la entrada
     
     configuracion_voz_global: Optional[VoiceConfigInput] = Field(default=None, description="Configuración de voz a aplicar a todos los segmentos.")
     proveedor_tts_global: Optional[str] = Field(default=None, description="Proveedor TTS a usar para todos los segmentos.")
+    generar_audios_combinados: bool = Field(default=False, description="Si es True, además de un audio por segmento se genera un audio por escena, uno del proyecto completo y un manifiesto JSON con los tiempos de cada segmento.")
+    pausa_entre_segmentos_seg: Optional[float] = Field(default=None, ge=0, le=10, description="Silencio entre segmentos (y entre escenas) en los audios combinados. Si no se indica, se usa AUDIO_MERGE_GAP_SEG.")
+    prioridad: Literal["baja", "normal", "alta"] = Field(default="normal", description="Prioridad del proyecto frente a otros guiones en curso al repartir las llamadas al proveedor TTS ('alta' recibe el doble de turnos que 'normal' y 'baja' la mitad).")
 
     class Config:
         json_schema_extra = {
@@ -168,15 +176,48 @@ class SegmentoAudioInfo(BaseModel):
     ruta_audio_generado: str = Field(..., description="Ruta o identificador del archivo de audio generado para este segmento.")
     duracion_audio_seg: float = Field(..., ge=0, description="Duración del audio del segmento en segundos.")
     formato_audio: str = Field(..., description="Formato del audio del segmento (ej. 'mp3').")
+    inicio_en_escena_seg: Optional[float] = Field(default=None, ge=0, description="Instante en que empieza el segmento dentro del audio combinado de su escena.")
+    inicio_en_proyecto_seg: Optional[float] = Field(default=None, ge=0, description="Instante en que empieza el segmento dentro del audio combinado del proyecto.")
     # Podríamos añadir aquí la metadata_tts específica de este segmento si fuera necesario,
     # o asumir que es la misma globalmente para la solicitud.
 
+class AudioCombinadoInfo(BaseModel):
+    """Audio que combina varios segmentos (una escena o el proyecto completo)."""
+    ruta_audio_generado: str = Field(..., description="Ruta o URL del audio combinado.")
+    duracion_audio_seg: float = Field(..., ge=0, description="Duración del audio combinado en segundos.")
+    formato_audio: str = Field(..., description="Formato del audio (ej. 'mp3').")
+    inicio_en_proyecto_seg: float = Field(default=0.0, ge=0, description="Instante en que empieza dentro del audio del proyecto (0 para el propio proyecto).")
+
+class TiempoSegmentoManifiesto(BaseModel):
+    id_segmento_original: Optional[str] = None
+    tipo_segmento: Optional[str] = None
+    inicio_en_escena_seg: float
+    inicio_en_proyecto_seg: float
+    duracion_seg: float
+
+class TiemposEscenaManifiesto(BaseModel):
+    id_escena_original: str
+    ruta_audio_escena: str
+    inicio_en_proyecto_seg: float
+    duracion_seg: float
+    segmentos: List[TiempoSegmentoManifiesto]
+
+class ManifiestoTiemposAudio(BaseModel):
+    """Manifiesto de tiempos de los audios combinados (se guarda también como JSON junto a los audios)."""
+    id_proyecto: str
+    formato_audio: str
+    pausa_entre_segmentos_seg: float
+    ruta_audio_proyecto: str
+    duracion_total_seg: float
+    escenas: List[TiemposEscenaManifiesto]
+
 class EscenaConAudiosDeSegmentos(BaseModel):
     """Contiene el ID de la escena original y una lista de los audios de sus segmentos."""
     id_escena_original: str = Field(..., description="ID de la escena original proveniente del Servicio_ProcesamientoTexto.")
     # El título de la escena del post principal podría ir aquí si fuera útil, o lo obtenemos del input original.
     # titulo_escena_original: Optional[str] = None 
     audios_de_segmentos: List[SegmentoAudioInfo] = Field(..., description="Lista de audios generados para cada segmento de esta escena.")
+    audio_escena_combinado: Optional[AudioCombinadoInfo] = Field(default=None, description="Audio de la escena completa (segmentos seguidos con la pausa configurada), si se pidieron audios combinados.")
 
 # --- Modelo de Respuesta Principal ACTUALIZADO ---
 
@@ -186,6 +227,10 @@ class VideoScriptTTSResponse(BaseModel): # Modelo Actualizado
     # Opcional: Audio para el guion completo (si se decide mantener esta funcionalidad)
     audio_guion_completo: Optional[BasicTTSResponse] = Field(default=None, description="Información del audio generado para el guion narrativo completo, si se procesó.") # Reutilizamos BasicTTSResponse
     audios_por_escena: List[EscenaConAudiosDeSegmentos] = Field(..., description="Lista de escenas, cada una con los audios de sus segmentos narrativos.")
+    caracteres_ahorrados_normalizacion: int = Field(default=0, description="Caracteres originales menos caracteres sintetizados, sumados sobre todos los segmentos (negativo si la expansión de números alargó el texto).")
+    audio_proyecto_combinado: Optional[AudioCombinadoInfo] = Field(default=None, description="Audio del proyecto completo (todas las escenas seguidas), si se pidieron audios combinados.")
+    ruta_manifiesto_tiempos: Optional[str] = Field(default=None, description="Ruta o URL del manifiesto JSON con los tiempos de cada segmento en los audios combinados.")
+    manifiesto_tiempos: Optional[ManifiestoTiemposAudio] = Field(default=None, description="Contenido del manifiesto de tiempos.")
 
     class Config:
         json_schema_extra = {
@@ -241,3 +286,30 @@ class VideoScriptTTSResponse(BaseModel): # Modelo Actualizado
                 ]
             }
         }
+
+
+# --- Modelos del protocolo de trabajos asíncronos (202 Accepted + consulta de estado) ---
+EstadoTrabajo = Literal["pendiente", "en_curso", "completado", "error"]
+
+class TrabajoAceptado(BaseModel):
+    """Respuesta 202 al encolar un trabajo."""
+    id_trabajo: str = Field(..., description="Identificador del trabajo.")
+    estado: EstadoTrabajo = Field(..., description="Estado en el momento de aceptarlo (normalmente 'pendiente').")
+    url_estado: str = Field(..., description="Ruta para consultar el estado y, al terminar, el resultado.")
+
+class ErrorTrabajo(BaseModel):
+    """Error con el que terminó un trabajo: el mismo código y detalle que devolvería el endpoint síncrono."""
+    codigo_http: int
+    tipo_error: str
+    mensaje: str
+
+class EstadoTrabajoAudios(BaseModel):
+    """Estado de un trabajo de generación de audios para un guion de video. 'resultado' solo está presente si estado='completado'."""
+    id_trabajo: str
+    tipo: str
+    estado: EstadoTrabajo
+    creado_en: datetime
+    iniciado_en: Optional[datetime] = None
+    finalizado_en: Optional[datetime] = None
+    resultado: Optional[VideoScriptTTSResponse] = None
+    error: Optional[ErrorTrabajo] = None
@@ -1,12 +1,24 @@
 import os
-import io # Necesario para pydub con streams de bytes
+import sqlite3
 import uuid # Para generar nombres de archivo únicos
-from typing import List, Optional, Dict, Any # Any es para el tipo de retorno de _llamar_openai_api si lo tuviéramos aquí
-from google.cloud import texttospeech_v1 as tts # Cliente de Google Cloud TTS
-from pydub import AudioSegment # Para concatenar audio
+import asyncio
+import time
+from typing import List, Optional, Dict, Any, Awaitable, Callable, Iterable, Tuple # Any es para el tipo de retorno de _llamar_openai_api si lo tuviéramos aquí
+from xml.sax.saxutils import escape as xml_escape
+from google.cloud import texttospeech_v1beta1 as tts_beta # Solo para pedir los instantes de las marcas SSML
 
 from ..core.config import get_settings # Para nuestras configuraciones
-from ..models_schemas import BasicTTSRequest, VoiceConfigInput, BasicTTSResponse, TTSMetadataOutput, VideoScriptTTSResponse, VideoScriptTTSRequest, AudioGeneradoInfo, SegmentoAudioInfo, EscenaConAudiosDeSegmentos # Modelos de entrada y salida
+from ..core.tts_client import sintetizar_google # Cliente de Google TTS compartido por el proceso
+from ..core.almacenamiento import get_almacenamiento # Almacenamiento de los audios publicados (local o S3)
+from .normalizacion_texto import normalizar_texto_narracion
+from .proveedores_tts import ProveedorTTS, ParametrosVoz, LimiteTasaProveedor, obtener_proveedor, proveedor_de_respaldo
+from .planificador_tts import PlanificadorTTS, Prioridad, obtener_planificador
+from .segmentacion_texto import dividir_texto_en_fragmentos
+from .cache_audios import CacheAudiosTTS, get_cache_audios
+from .formato_audio import concatenar_mp3, concatenar_wav, duracion_audio, dividir_wav_en_instantes
+from .procesamiento_audio import exportar_audio_con_pydub, calcular_duracion_decodificando
+from .combinacion_audio import combinar_audios_proyecto
+from ..models_schemas import BasicTTSRequest, VoiceConfigInput, BasicTTSResponse, TTSMetadataOutput, VideoScriptTTSResponse, VideoScriptTTSRequest, AudioGeneradoInfo, SegmentoAudioInfo, EscenaConAudiosDeSegmentos, AudioCombinadoInfo, ManifiestoTiemposAudio, TiemposEscenaManifiesto, TiempoSegmentoManifiesto # Modelos de entrada y salida
 
 # Cargamos la configuración una vez al inicio del módulo.
 settings = get_settings()
@@ -26,100 +38,140 @@ elif not os.getenv("GOOGLE_APPLICATION_CREDENTIALS"): # Si no está en settings
     print("Servicio Audio: GOOGLE_APPLICATION_CREDENTIALS no está definida en config ni en el entorno. Se intentará usar ADC.")
 
 
-# --- Función Auxiliar para Dividir Texto en Fragmentos ---
-def _dividir_texto_en_fragmentos(texto_completo: str, limite_caracteres: int) -> List[str]:
+# --- Concurrencia de la Síntesis ---
+# Un planificador por proveedor y por proceso: limita las llamadas de síntesis en vuelo de todas las solicitudes
+# juntas y reparte los turnos entre proyectos (ver planificador_tts.py).
+
+def _limite_concurrencia_proveedor(proveedor: str) -> int:
+    try:
+        return max(1, obtener_proveedor(proveedor).limite_concurrencia())
+    except ValueError: # Proveedor desconocido: la solicitud fallará al validarlo
+        return 1
+
+def _obtener_planificador_proveedor(proveedor: str) -> PlanificadorTTS:
+    return obtener_planificador(proveedor, _limite_concurrencia_proveedor(proveedor), settings.TTS_FAIR_SHARE_ENABLED)
+
+async def _reunir_cancelando_si_falla(corrutinas: Iterable[Awaitable[Any]]) -> List[Any]:
+    """Como asyncio.gather (resultados en el orden de entrada), pero si una falla cancela las demás antes de propagar el error."""
+    tareas = [asyncio.ensure_future(c) for c in corrutinas]
+    try:
+        return list(await asyncio.gather(*tareas))
+    except BaseException:
+        for tarea in tareas: tarea.cancel()
+        await asyncio.gather(*tareas, return_exceptions=True)
+        raise
+
+
+# Formato de archivo que produce cada codificación del proveedor (LINEAR16 llega como WAV con cabecera).
+_FORMATO_ARCHIVO_POR_CODIFICACION = {"MP3": "mp3", "LINEAR16": "wav", "OGG_OPUS": "ogg"}
+
+def _componer_sin_transcodificar(fragmentos_audio: List[bytes], formato: str) -> Optional[Tuple[bytes, Optional[float]]]:
+    """
+    Compone el audio final a partir de los bytes del proveedor sin decodificar. Devuelve (bytes, duración en
+    segundos o None si no se puede calcular sin decodificar), o None si el formato requiere pasar por pydub.
+    Lanza ValueError si los fragmentos no se pueden unir directamente.
+    """
+    if formato == "mp3" and len(fragmentos_audio) > 1: return concatenar_mp3(fragmentos_audio)
+    if formato == "wav": return concatenar_wav(fragmentos_audio)
+    if len(fragmentos_audio) > 1: return None # OGG Opus de varios fragmentos: se une con pydub
+    duracion = duracion_audio(fragmentos_audio[0], formato) # Solo se leen las cabeceras del contenedor
+    if formato == "mp3" and duracion is None: raise ValueError("El MP3 del proveedor no contiene tramas de audio reconocibles.")
+    return fragmentos_audio[0], duracion
+
+def _eliminar_copia_local(ruta_local: str) -> None:
+    try:
+        os.remove(ruta_local)
+    except OSError as e:
+        print(f"Servicio Audio: ADVERTENCIA - No se pudo borrar la copia local {ruta_local}: {e}")
+
+async def _publicar_audio(id_proyecto: str, nombre_archivo: str, ruta_local: str, conservar_copia_local: bool = False) -> str:
     """
-    Divide un texto largo en fragmentos más pequeños, respetando los límites de caracteres
-    e intentando cortar en finales de oración o párrafo.
+    Publica un audio del proyecto en el almacenamiento configurado y devuelve su URL: prefirmada o de la CDN con S3, o
+    AUDIO_BASE_URL/<proyecto>/<archivo> si se sirve desde el propio servicio (su ruta interna si AUDIO_BASE_URL no es una URL HTTP).
+    Con S3 la copia local se borra tras subirla, salvo que todavía se necesite (ej. para generar los audios combinados).
     """
-    fragmentos = []
-    texto_restante = texto_completo.strip()
-    # Delimitadores priorizados: doble salto de línea, luego finales de oración seguidos de espacio, luego finales de oración.
-    delimitadores_busqueda = ['\n\n', '. ', '! ', '? ', '\n', '.', '!', '?'] 
-
-    if not texto_restante:
-        return []
-
-    while len(texto_restante) > 0:
-        if len(texto_restante) <= limite_caracteres:
-            fragmentos.append(texto_restante)
-            break
-        
-        punto_de_corte_encontrado = -1
-
-        # Intentar encontrar el último delimitador válido ANTES del límite
-        for delimitador in delimitadores_busqueda:
-            # Buscamos el delimitador en la sección del texto hasta el límite
-            # El corte se hará DESPUÉS del delimitador encontrado
-            pos_temp = texto_restante.rfind(delimitador, 0, limite_caracteres)
-            if pos_temp != -1: # Si se encontró el delimitador
-                # Queremos el corte más lejano posible pero dentro del límite
-                # que también sea el más largo de los delimitadores encontrados en esa posición.
-                pos_corte_propuesto = pos_temp + len(delimitador)
-                if pos_corte_propuesto > punto_de_corte_encontrado:
-                    punto_de_corte_encontrado = pos_corte_propuesto
-        
-        if punto_de_corte_encontrado > 0: # Si encontramos un buen punto de corte
-            fragmento_actual = texto_restante[:punto_de_corte_encontrado].strip()
-            texto_restante = texto_restante[punto_de_corte_encontrado:].strip()
-        else: # No se encontró un buen delimitador, o la primera oración es muy larga
-              # Cortamos por el límite de caracteres, intentando no cortar a mitad de palabra
-            pos_corte_forzado = texto_restante.rfind(' ', 0, limite_caracteres)
-            if pos_corte_forzado <= 0 : # No hay espacios, o el primer espacio está muy lejos
-                pos_corte_forzado = limite_caracteres # Corte duro
-            
-            fragmento_actual = texto_restante[:pos_corte_forzado].strip()
-            texto_restante = texto_restante[pos_corte_forzado:].strip()
-
-        if fragmento_actual: # Añadir solo si no está vacío
-            fragmentos.append(fragmento_actual)
-            # print(f"    Fragmento generado (len: {len(fragmento_actual)}): '{fragmento_actual[:50]}...'") # Debug
-
-    return fragmentos
+    almacenamiento = get_almacenamiento()
+    clave = f"{id_proyecto}/{nombre_archivo}"
+    try:
+        await almacenamiento.publicar_archivo(ruta_local, clave)
+    except Exception as e:
+        print(f"Servicio Audio: Error al publicar {clave} en el almacenamiento: {type(e).__name__} - {e}")
+        raise ValueError(f"Error al guardar el archivo de audio en el almacenamiento: {e}")
+    if not almacenamiento.es_local and not conservar_copia_local:
+        _eliminar_copia_local(ruta_local)
+    url_directa = await almacenamiento.url_descarga(clave)
+    if url_directa:
+        return url_directa
+    # Si AUDIO_BASE_URL está configurada y es una URL HTTP válida
+    if settings.AUDIO_BASE_URL and settings.AUDIO_BASE_URL.startswith(("http://", "https://")):
+        base_url = settings.AUDIO_BASE_URL.rstrip('/')
+        return f"{base_url}/{clave}" # Incluye subcarpeta del proyecto
+    # Fallback a la ruta interna del contenedor si AUDIO_BASE_URL no es una URL completa
+    if settings.AUDIO_BASE_URL: # Si existe pero no es http, loguear advertencia
+        print(f"Servicio Audio: ADVERTENCIA - AUDIO_BASE_URL ('{settings.AUDIO_BASE_URL}') no parece una URL HTTP válida. Devolviendo ruta interna.")
+    return ruta_local
+
+def _normalizar_para_tts(texto: str) -> str:
+    if not settings.TTS_TEXT_NORMALIZATION_ENABLED: return texto
+    return normalizar_texto_narracion(texto, settings.TTS_TEXT_NORMALIZATION_EXPAND_NUMBERS)
+
+def _sin_transcodificar_disponible() -> bool:
+    """La ruta sin transcodificar escribe los bytes del proveedor tal cual, así que no admite normalización."""
+    return settings.AUDIO_ZERO_TRANSCODE_ENABLED and settings.AUDIO_NORMALIZATION_MODE == "ninguna"
+
+def _modo_procesamiento_audio() -> str:
+    if _sin_transcodificar_disponible(): return "directo"
+    if settings.AUDIO_NORMALIZATION_MODE == "ninguna": return "pydub"
+    return f"pydub/{settings.AUDIO_NORMALIZATION_MODE}/{settings.AUDIO_NORMALIZATION_TARGET_LUFS}/{settings.AUDIO_NORMALIZATION_PEAK_DBFS}"
+
+def _clave_cache_audio(proveedor: ProveedorTTS, texto_a_sintetizar: str, parametros: ParametrosVoz, formato: str) -> str:
+    return CacheAudiosTTS.calcular_clave(
+        proveedor.nombre, texto_a_sintetizar, parametros.voz, parametros.idioma, parametros.velocidad, parametros.tono,
+        f"{parametros.codificacion}/{formato}/{_modo_procesamiento_audio()}",
+        settings.AUDIO_OUTPUT_MP3_BITRATE
+    )
+
+async def _sintetizar_fragmentos(
+    proveedor: ProveedorTTS, parametros: ParametrosVoz, fragmentos_de_texto: List[str], clave_reparto: str, prioridad: Prioridad
+) -> List[bytes]:
+    """
+    Sintetiza los fragmentos en paralelo (hasta el límite del proveedor, con los turnos repartidos por `clave_reparto`)
+    y devuelve sus audios en el orden original.
+    """
+    async def _sintetizar_fragmento(i: int, fragmento: str) -> bytes:
+        async with _obtener_planificador_proveedor(proveedor.nombre).turno(clave_reparto, prioridad):
+            print(f"  Servicio Audio: Procesando fragmento {i+1}/{len(fragmentos_de_texto)} con '{proveedor.nombre}' (len: {len(fragmento)}, {len(fragmento.encode('utf-8'))} bytes)...")
+            try:
+                contenido_audio = await proveedor.sintetizar(fragmento, parametros)
+            except LimiteTasaProveedor:
+                raise # Se gestiona arriba (proveedor de respaldo)
+            except Exception as e:
+                print(f"Servicio Audio: Error al sintetizar fragmento {i+1}: {type(e).__name__} - {e}")
+                raise ValueError(f"Error del proveedor TTS al procesar el fragmento '{fragmento[:30]}...': {e}")
+        print(f"  Servicio Audio: Fragmento {i+1} sintetizado exitosamente.")
+        return contenido_audio
 
+    return await _reunir_cancelando_si_falla(_sintetizar_fragmento(i, fragmento) for i, fragmento in enumerate(fragmentos_de_texto))
 
 # --- Función Principal del Servicio de TTS Básico ---
 async def generar_audio_tts_basico(
-    datos_solicitud: BasicTTSRequest
+    datos_solicitud: BasicTTSRequest, conservar_copia_local: bool = False
 ) -> BasicTTSResponse:
     print(f"Servicio Audio: Iniciando generación para id_solicitud: {datos_solicitud.id_solicitud or 'No provisto'}, id_proyecto: {datos_solicitud.id_proyecto or 'default_project'}")
 
     texto_original: str = datos_solicitud.texto_a_convertir
     id_solicitud_usar: str = datos_solicitud.id_solicitud or str(uuid.uuid4())
     id_proyecto_usar: str = datos_solicitud.id_proyecto or "default_project"
+    # Los turnos del proveedor se reparten por proyecto; una solicitud suelta sin proyecto cuenta como uno propio.
+    clave_reparto = datos_solicitud.id_proyecto or id_solicitud_usar
 
-    if datos_solicitud.proveedor_tts.lower() != "google":
-        raise ValueError(f"Proveedor TTS '{datos_solicitud.proveedor_tts}' no soportado. Actualmente solo 'google' está implementado.")
+    proveedor = obtener_proveedor(datos_solicitud.proveedor_tts) # ValueError si no está soportado
 
-    client = tts.TextToSpeechAsyncClient()
     config_voz_req = datos_solicitud.configuracion_voz if datos_solicitud.configuracion_voz is not None else VoiceConfigInput()
 
-    language_code_final: str = config_voz_req.idioma_codigo
-    if not language_code_final: language_code_final = settings.GOOGLE_TTS_DEFAULT_LANGUAGE_CODE
-
-    voice_name_final: Optional[str] = config_voz_req.id_voz
-    if not voice_name_final: voice_name_final = settings.GOOGLE_TTS_DEFAULT_VOICE_NAME
-    
-    voice_params = tts.VoiceSelectionParams(language_code=language_code_final, name=voice_name_final)
-
-    audio_encoding_final: tts.AudioEncoding = tts.AudioEncoding.MP3 # Default
-    output_format_setting = settings.AUDIO_OUTPUT_FORMAT.upper()
-    if output_format_setting == "LINEAR16" or output_format_setting == "WAV":
-        audio_encoding_final = tts.AudioEncoding.LINEAR16
-    elif output_format_setting == "OGG_OPUS":
-        audio_encoding_final = tts.AudioEncoding.OGG_OPUS
-    
-    # --- AudioConfig SIMPLIFICADO: Sin intentar establecer mp3_bitrate explícitamente ---
-    audio_config = tts.AudioConfig(
-        audio_encoding=audio_encoding_final,
-        speaking_rate=config_voz_req.velocidad if config_voz_req.velocidad is not None else 1.0,
-        pitch=config_voz_req.tono if config_voz_req.tono is not None else 0.0
-        # sample_rate_hertz se puede añadir aquí si audio_encoding_final es LINEAR16 y quieres controlarlo
-        # Para MP3, Google determina la mejor sample_rate_hertz basada en su modelo de voz.
-    )
-    # ----------------------------------------------------------------------------------
+    parametros_voz = proveedor.parametros(config_voz_req)
 
-    print(f"Servicio Audio: Config TTS - Voz: {voice_name_final}, Idioma: {language_code_final}, Encoding API: {audio_encoding_final.name}")
+    print(f"Servicio Audio: Config TTS - Proveedor: {proveedor.nombre}, Voz: {parametros_voz.voz}, Idioma: {parametros_voz.idioma}, Encoding API: {parametros_voz.codificacion}")
     # ... (resto de la función: chunking, llamada a synthesize_speech, concatenación, guardado en subcarpeta,
     #      cálculo de duración, y construcción de BasicTTSResponse como en la última versión completa que te di) ...
 
@@ -133,40 +185,9 @@ async def generar_audio_tts_basico(
     # - fragmentos_de_texto: List[str] (para metadata.numero_fragmentos)
 
     # ----- INICIO: Lógica de TTS, concatenación y guardado (de la versión completa anterior) -----
-    fragmentos_de_texto = _dividir_texto_en_fragmentos(texto_original, settings.TTS_MAX_CHARS_PER_CHUNK)
-    if not fragmentos_de_texto:
-        raise ValueError("El texto para convertir a audio está vacío o es inválido después de la limpieza.")
-    print(f"Servicio Audio: Texto dividido en {len(fragmentos_de_texto)} fragmento(s).")
-    
-    lista_contenidos_audio_fragmentos: List[bytes] = []
-    for i, fragmento in enumerate(fragmentos_de_texto):
-        print(f"  Servicio Audio: Procesando fragmento {i+1}/{len(fragmentos_de_texto)} (len: {len(fragmento)})...")
-        synthesis_input = tts.SynthesisInput(text=fragmento)
-        try:
-            response_tts = await client.synthesize_speech(
-                request={"input": synthesis_input, "voice": voice_params, "audio_config": audio_config}
-            )
-            lista_contenidos_audio_fragmentos.append(response_tts.audio_content)
-            print(f"  Servicio Audio: Fragmento {i+1} sintetizado exitosamente.")
-        except Exception as e:
-            print(f"Servicio Audio: Error al sintetizar fragmento {i+1}: {type(e).__name__} - {e}")
-            raise ValueError(f"Error del proveedor TTS al procesar el fragmento '{fragmento[:30]}...': {e}")
-    
-    if not lista_contenidos_audio_fragmentos:
-        raise ValueError("No se pudo generar contenido de audio a partir del texto proporcionado.")
-
-    audio_final_segment: Optional[AudioSegment] = None
-    if len(lista_contenidos_audio_fragmentos) == 1:
-        audio_final_segment = AudioSegment.from_file(io.BytesIO(lista_contenidos_audio_fragmentos[0]))
-    elif len(lista_contenidos_audio_fragmentos) > 1:
-        segmento_combinado = AudioSegment.from_file(io.BytesIO(lista_contenidos_audio_fragmentos[0]))
-        for i in range(1, len(lista_contenidos_audio_fragmentos)):
-            fragmento_segment = AudioSegment.from_file(io.BytesIO(lista_contenidos_audio_fragmentos[i]))
-            segmento_combinado += fragmento_segment
-        audio_final_segment = segmento_combinado
-    
-    if not audio_final_segment:
-        raise ValueError("No se pudo procesar el contenido de audio después de la síntesis.")
+    texto_a_sintetizar = _normalizar_para_tts(texto_original)
+    if settings.TTS_TEXT_NORMALIZATION_ENABLED:
+        print(f"Servicio Audio: Texto normalizado para TTS ({len(texto_original)} -> {len(texto_a_sintetizar)} caracteres).")
 
     directorio_proyecto_audio = os.path.join(settings.AUDIO_STORAGE_PATH, id_proyecto_usar)
     os.makedirs(directorio_proyecto_audio, exist_ok=True)
@@ -175,43 +196,99 @@ async def generar_audio_tts_basico(
     nombre_archivo_salida = f"{id_solicitud_usar}.{final_output_format_lower}"
     ruta_completa_archivo_salida = os.path.join(directorio_proyecto_audio, nombre_archivo_salida) 
 
-    print(f"Servicio Audio: Exportando audio final a: {ruta_completa_archivo_salida} en formato {final_output_format_lower}")
-    try:
-        if final_output_format_lower == "mp3":
-            # Usamos el bitrate de settings si está definido y es MP3
-            audio_final_segment.export(ruta_completa_archivo_salida, format="mp3", bitrate=f"{settings.AUDIO_OUTPUT_MP3_BITRATE // 1000}k")
-        elif final_output_format_lower == "wav":
-            audio_final_segment.export(ruta_completa_archivo_salida, format="wav")
-        elif final_output_format_lower == "ogg": 
-            audio_final_segment.export(ruta_completa_archivo_salida, format="ogg", codec="opus")
+    # Caché de audios por contenido: el mismo texto con la misma voz y formato se reutiliza (enlace duro) sin llamar al proveedor.
+    cache_audios = get_cache_audios()
+    clave_cache: Optional[str] = None
+    resultado_cache: Optional[Tuple[float, int]] = None
+    if cache_audios is not None:
+        clave_cache = _clave_cache_audio(proveedor, texto_a_sintetizar, parametros_voz, final_output_format_lower)
+        try:
+            resultado_cache = await cache_audios.obtener(clave_cache, ruta_completa_archivo_salida)
+        except (sqlite3.Error, OSError) as e:
+            print(f"Servicio Audio: ADVERTENCIA - Error al consultar la caché de audios: {e}. Se sintetiza sin caché.")
+
+    if resultado_cache is not None:
+        duracion_final_seg, numero_fragmentos = resultado_cache
+        print(f"Servicio Audio: Audio obtenido de la caché (clave {clave_cache[:12]}...) en: {ruta_completa_archivo_salida}")
+    else:
+        fragmentos_de_texto = dividir_texto_en_fragmentos(texto_a_sintetizar, settings.TTS_MAX_BYTES_PER_CHUNK)
+        if not fragmentos_de_texto:
+            raise ValueError("El texto para convertir a audio está vacío o es inválido después de la limpieza.")
+        print(f"Servicio Audio: Texto dividido en {len(fragmentos_de_texto)} fragmento(s).")
+    
+        # Los fragmentos se sintetizan en paralelo (hasta el límite del proveedor) y se concatenan en su orden original.
+        try:
+            lista_contenidos_audio_fragmentos = await _sintetizar_fragmentos(
+                proveedor, parametros_voz, fragmentos_de_texto, clave_reparto, datos_solicitud.prioridad
+            )
+        except LimiteTasaProveedor as e:
+            # Con TTS_FALLBACK_PROVIDER, el texto completo se repite con el respaldo (todos los fragmentos con la misma voz).
+            respaldo = proveedor_de_respaldo(proveedor)
+            if respaldo is None: raise
+            print(f"Servicio Audio: ADVERTENCIA - {e}. Se sintetiza con el proveedor de respaldo '{respaldo.nombre}'.")
+            proveedor, parametros_voz = respaldo, respaldo.parametros(config_voz_req, usar_voz_pedida=False)
+            if clave_cache is not None:
+                clave_cache = _clave_cache_audio(proveedor, texto_a_sintetizar, parametros_voz, final_output_format_lower)
+            lista_contenidos_audio_fragmentos = await _sintetizar_fragmentos(
+                proveedor, parametros_voz, fragmentos_de_texto, clave_reparto, datos_solicitud.prioridad
+            )
+    
+        if not lista_contenidos_audio_fragmentos:
+            raise ValueError("No se pudo generar contenido de audio a partir del texto proporcionado.")
+
+        # Ruta rápida (sin transcodificar): si el proveedor ya entrega el formato de salida, se escriben sus bytes tal cual
+        # (un fragmento) o se unen a nivel de trama (MP3) / de muestras (WAV). Solo se decodifica y recodifica con
+        # pydub/ffmpeg cuando los formatos no coinciden o los fragmentos no se pueden unir directamente.
+        audio_sin_transcodificar: Optional[Tuple[bytes, Optional[float]]] = None
+        if _sin_transcodificar_disponible() and _FORMATO_ARCHIVO_POR_CODIFICACION.get(parametros_voz.codificacion) == final_output_format_lower:
+            try:
+                audio_sin_transcodificar = _componer_sin_transcodificar(lista_contenidos_audio_fragmentos, final_output_format_lower)
+            except ValueError as e:
+                print(f"Servicio Audio: ADVERTENCIA - No se pudo unir el audio sin transcodificar ({e}). Se usa pydub.")
+
+        if audio_sin_transcodificar is not None:
+            contenido_audio, duracion_calculada = audio_sin_transcodificar
+            print(f"Servicio Audio: Escribiendo audio sin transcodificar en: {ruta_completa_archivo_salida}")
+            try:
+                if os.path.exists(ruta_completa_archivo_salida): os.remove(ruta_completa_archivo_salida) # Puede ser un enlace duro a la caché
+                with open(ruta_completa_archivo_salida, "wb") as archivo_salida:
+                    archivo_salida.write(contenido_audio)
+            except OSError as e:
+                print(f"Servicio Audio: Error al guardar el archivo de audio: {e}")
+                raise ValueError(f"Error al guardar el archivo de audio procesado: {e}")
+            if duracion_calculada is None: # Contenedor no reconocible: solo se decodifica (en el pool), no se recodifica
+                duracion_calculada = await calcular_duracion_decodificando(contenido_audio)
+            duracion_final_seg = round(duracion_calculada, 2)
         else:
-            raise ValueError(f"Formato de audio de salida no soportado para exportación con pydub: {final_output_format_lower}")
-        print(f"Servicio Audio: Audio guardado exitosamente.")
-    except Exception as e:
-        print(f"Servicio Audio: Error al exportar/guardar el archivo de audio: {e}")
-        raise ValueError(f"Error al guardar el archivo de audio procesado: {e}. Verifica dependencias como ffmpeg.")
-        
-    duracion_final_seg = round(len(audio_final_segment) / 1000.0, 2)
+            # Decodificar, concatenar y codificar es trabajo de CPU: se hace en el pool de procesos para no bloquear el event loop.
+            print(f"Servicio Audio: Exportando audio final a: {ruta_completa_archivo_salida} en formato {final_output_format_lower}")
+            try:
+                duracion_calculada = await exportar_audio_con_pydub(
+                    lista_contenidos_audio_fragmentos, ruta_completa_archivo_salida, final_output_format_lower, settings.AUDIO_OUTPUT_MP3_BITRATE // 1000
+                )
+                print(f"Servicio Audio: Audio guardado exitosamente.")
+            except Exception as e:
+                print(f"Servicio Audio: Error al exportar/guardar el archivo de audio: {e}")
+                raise ValueError(f"Error al guardar el archivo de audio procesado: {e}. Verifica dependencias como ffmpeg.")
+            duracion_final_seg = round(duracion_calculada, 2)
+        numero_fragmentos = len(fragmentos_de_texto)
+        if cache_audios is not None:
+            try:
+                await cache_audios.guardar(clave_cache, ruta_completa_archivo_salida, final_output_format_lower, duracion_final_seg, numero_fragmentos)
+            except (sqlite3.Error, OSError) as e:
+                print(f"Servicio Audio: ADVERTENCIA - No se pudo guardar el audio en la caché: {e}")
     # ----- FIN: Lógica de TTS, concatenación y guardado -----
 
-    # Construcción de la URL/Ruta para la Respuesta
-    # Si AUDIO_BASE_URL está configurada y es una URL HTTP válida
-    url_audio_respuesta: str
-    if settings.AUDIO_BASE_URL and settings.AUDIO_BASE_URL.startswith(("http://", "https://")):
-        base_url = settings.AUDIO_BASE_URL.rstrip('/')
-        nombre_relativo_archivo = f"{id_proyecto_usar}/{nombre_archivo_salida}" # Incluye subcarpeta del proyecto
-        url_audio_respuesta = f"{base_url}/{nombre_relativo_archivo.lstrip('/')}"
-    else: # Fallback a la ruta interna del contenedor si AUDIO_BASE_URL no es una URL completa
-        url_audio_respuesta = ruta_completa_archivo_salida
-        if settings.AUDIO_BASE_URL: # Si existe pero no es http, loguear advertencia
-             print(f"Servicio Audio: ADVERTENCIA - AUDIO_BASE_URL ('{settings.AUDIO_BASE_URL}') no parece una URL HTTP válida. Devolviendo ruta interna.")
-
+    url_audio_respuesta = await _publicar_audio(id_proyecto_usar, nombre_archivo_salida, ruta_completa_archivo_salida, conservar_copia_local)
 
     metadata_respuesta = TTSMetadataOutput(
-        proveedor_usado="google",
-        voz_usada=voice_name_final,
-        idioma_codigo_usado=language_code_final,
-        numero_fragmentos=len(fragmentos_de_texto)
+        proveedor_usado=proveedor.nombre,
+        voz_usada=parametros_voz.voz,
+        idioma_codigo_usado=parametros_voz.idioma,
+        numero_fragmentos=numero_fragmentos,
+        audio_desde_cache=resultado_cache is not None,
+        caracteres_texto_original=len(texto_original),
+        caracteres_sintetizados=len(texto_a_sintetizar)
     )
     
     respuesta_final = BasicTTSResponse(
@@ -225,6 +302,200 @@ async def generar_audio_tts_basico(
     print(f"Servicio Audio: Generación de audio básico completada. Ruta/URL: {respuesta_final.ruta_audio_generado}")
     return respuesta_final
 
+# --- Síntesis por lotes SSML (varios segmentos de una escena en una sola llamada) ---
+# Los segmentos consecutivos de una escena se empaquetan en un único SSML (hasta TTS_SSML_BATCH_MAX_BYTES) con una
+# marca <mark> delante de cada uno; Google devuelve el instante de cada marca (API v1beta1, enable_time_pointing).
+# El lote se pide siempre en LINEAR16 y se corta en esos instantes a la muestra exacta: un MP3 no se puede cortar por
+# tramas sin más (las primeras tramas de cada trozo toman datos del reservorio de bits de la trama anterior y el trozo
+# empezaría con un chasquido). Con salida WAV los trozos se escriben tal cual; con salida MP3 cada trozo se codifica
+# una vez en el pool de procesos. Cada segmento termina con su propio archivo y su propio SegmentoAudioInfo, igual
+# que sintetizado por separado.
+_BYTES_ENVOLTORIO_SSML = len("<speak></speak>")
+_BYTES_MARCA_SSML = len('<mark name="s000"/> ') # Marca delante de cada segmento más el espacio que lo separa del siguiente
+_FORMATOS_LOTE_SSML = ("mp3", "wav")
+
+ResultadoSegmento = Optional[Tuple[SegmentoAudioInfo, TTSMetadataOutput, str]]
+
+
+def _lotes_ssml_disponibles(proveedor: str) -> bool:
+    formato = settings.AUDIO_OUTPUT_FORMAT.lower()
+    return settings.TTS_SSML_BATCHING_ENABLED and _sin_transcodificar_disponible() and proveedor.lower() == "google" and formato in _FORMATOS_LOTE_SSML
+
+
+async def _generar_audios_escena_por_lotes(
+    id_proyecto: str, escena_input, config_voz: Optional[VoiceConfigInput], prioridad: Prioridad,
+    generar_individual: Callable[[int], Awaitable[ResultadoSegmento]]
+) -> List[ResultadoSegmento]:
+    """
+    Genera los audios de los segmentos de una escena agrupándolos en lotes SSML. Los segmentos en caché se reutilizan,
+    los que quedan solos en un lote (o cuyo lote falla) se generan por separado con `generar_individual(i)`.
+    Devuelve un resultado por segmento, en el orden de la escena.
+    """
+    proveedor = obtener_proveedor("google")
+    parametros_voz = proveedor.parametros(config_voz or VoiceConfigInput())
+    formato = settings.AUDIO_OUTPUT_FORMAT.lower()
+    directorio_proyecto = os.path.join(settings.AUDIO_STORAGE_PATH, id_proyecto)
+    os.makedirs(directorio_proyecto, exist_ok=True)
+    cache_audios = get_cache_audios()
+    resultados: List[ResultadoSegmento] = [None] * len(escena_input.segmentos_narrativos)
+
+    async def _resultado(segmento_input, nombre_archivo: str, duracion: float, texto_normalizado: str, desde_cache: bool, fragmentos: int) -> ResultadoSegmento:
+        # La copia local se conserva hasta generar los audios combinados (generar_audios_para_script_video la borra al final).
+        try:
+            url_audio = await _publicar_audio(id_proyecto, nombre_archivo, os.path.join(directorio_proyecto, nombre_archivo), conservar_copia_local=True)
+        except ValueError as e:
+            print(f"      Servicio Audio: ERROR al publicar el audio del segmento {segmento_input.id_original_segmento or nombre_archivo} (escena {escena_input.id_escena}): {e}")
+            return None
+        info = SegmentoAudioInfo(
+            id_segmento_original=segmento_input.id_original_segmento, tipo_segmento=segmento_input.tipo_segmento, autor_segmento=segmento_input.autor,
+            ruta_audio_generado=url_audio,
+            duracion_audio_seg=round(duracion, 2), formato_audio=formato
+        )
+        metadata = TTSMetadataOutput(
+            proveedor_usado=proveedor.nombre, voz_usada=parametros_voz.voz, idioma_codigo_usado=parametros_voz.idioma, numero_fragmentos=fragmentos,
+            audio_desde_cache=desde_cache, caracteres_texto_original=len(segmento_input.texto_es), caracteres_sintetizados=len(texto_normalizado)
+        )
+        return info, metadata, os.path.join(directorio_proyecto, nombre_archivo)
+
+    # 1. Caché y preparación del SSML de cada segmento pendiente: (índice, segmento, texto normalizado, nombre de archivo, clave, SSML).
+    pendientes: List[Tuple[int, Any, str, str, Optional[str], str]] = []
+    for i, segmento_input in enumerate(escena_input.segmentos_narrativos):
+        id_segmento = segmento_input.id_original_segmento or f"segmento_{i}"
+        nombre_archivo = f"{id_proyecto}_{escena_input.id_escena}_{id_segmento}.{formato}"
+        texto_normalizado = _normalizar_para_tts(segmento_input.texto_es)
+        clave = None
+        if cache_audios is not None:
+            clave = _clave_cache_audio(proveedor, texto_normalizado, parametros_voz, formato)
+            try:
+                en_cache = await cache_audios.obtener(clave, os.path.join(directorio_proyecto, nombre_archivo))
+            except (sqlite3.Error, OSError) as e:
+                print(f"Servicio Audio: ADVERTENCIA - Error al consultar la caché de audios: {e}. Se sintetiza sin caché.")
+                en_cache = None
+            if en_cache is not None:
+                resultados[i] = await _resultado(segmento_input, nombre_archivo, en_cache[0], texto_normalizado, True, en_cache[1])
+                continue
+        pendientes.append((i, segmento_input, texto_normalizado, nombre_archivo, clave, xml_escape(texto_normalizado)))
+
+    # 2. Lotes de segmentos consecutivos dentro del límite de bytes del proveedor.
+    lotes: List[List[Tuple[int, Any, str, str, Optional[str], str]]] = []
+    bytes_lote = 0
+    for pendiente in pendientes:
+        bytes_segmento = len(pendiente[5].encode("utf-8")) + _BYTES_MARCA_SSML
+        if not lotes or bytes_lote + bytes_segmento > settings.TTS_SSML_BATCH_MAX_BYTES:
+            lotes.append([])
+            bytes_lote = _BYTES_ENVOLTORIO_SSML
+        lotes[-1].append(pendiente)
+        bytes_lote += bytes_segmento
+
+    async def _generar_por_separado(lote) -> None:
+        # En paralelo, como el resto de segmentos: el planificador del proveedor acota las llamadas en vuelo.
+        # generar_individual aísla sus errores (devuelve None), así que un fallo no cancela a los demás.
+        for p, resultado in zip(lote, await asyncio.gather(*(generar_individual(p[0]) for p in lote))):
+            resultados[p[0]] = resultado
+
+    async def _sintetizar_lote(lote) -> None:
+        if len(lote) == 1 or any(len(p[5].encode("utf-8")) + _BYTES_MARCA_SSML + _BYTES_ENVOLTORIO_SSML > settings.TTS_SSML_BATCH_MAX_BYTES for p in lote):
+            await _generar_por_separado(lote) # Segmento largo o solo: camino normal (con división en fragmentos)
+            return
+        ssml = "<speak>" + "".join(f'<mark name="s{k}"/>{p[5]} ' for k, p in enumerate(lote)) + "</speak>"
+        try:
+            async with _obtener_planificador_proveedor(proveedor.nombre).turno(id_proyecto, prioridad):
+                respuesta = await sintetizar_google({
+                    "input": {"ssml": ssml},
+                    "voice": {"language_code": parametros_voz.idioma, "name": parametros_voz.voz},
+                    "audio_config": {"audio_encoding": int(tts_beta.AudioEncoding["LINEAR16"]), "speaking_rate": parametros_voz.velocidad, "pitch": parametros_voz.tono},
+                    "enable_time_pointing": [tts_beta.SynthesizeSpeechRequest.TimepointType.SSML_MARK],
+                }, version="v1beta1")
+            instantes_por_marca = {punto.mark_name: punto.time_seconds for punto in respuesta.timepoints}
+            faltan = [f"s{k}" for k in range(1, len(lote)) if f"s{k}" not in instantes_por_marca]
+            if faltan: raise ValueError(f"La respuesta no incluye el instante de las marcas {faltan}.")
+            instantes = [0.0] + [instantes_por_marca[f"s{k}"] for k in range(1, len(lote))]
+            trozos = dividir_wav_en_instantes(respuesta.audio_content, instantes)
+            vacios = [lote[k][1].id_original_segmento or lote[k][0] for k, (_, duracion) in enumerate(trozos) if duracion <= 0]
+            if vacios: raise ValueError(f"Marcas sin audio entre ellas (segmentos {vacios}).")
+            if formato == "mp3":
+                rutas = [os.path.join(directorio_proyecto, p[3]) for p in lote]
+                duraciones = await asyncio.gather(*(
+                    exportar_audio_con_pydub([contenido], ruta, formato, settings.AUDIO_OUTPUT_MP3_BITRATE // 1000) for (contenido, _), ruta in zip(trozos, rutas)
+                ))
+                trozos = [(None, duracion) for duracion in duraciones] # Ya escritos por el pool
+        except Exception as e:
+            print(f"Servicio Audio: ADVERTENCIA - Falló el lote SSML de {len(lote)} segmentos (escena {escena_input.id_escena}): {type(e).__name__} - {e}. Se sintetizan por separado.")
+            await _generar_por_separado(lote)
+            return
+        for (i, segmento_input, texto_normalizado, nombre_archivo, clave, _), (contenido, duracion) in zip(lote, trozos):
+            ruta = os.path.join(directorio_proyecto, nombre_archivo)
+            if contenido is not None:
+                try:
+                    if os.path.exists(ruta): os.remove(ruta) # Puede ser un enlace duro a la caché
+                    with open(ruta, "wb") as archivo_salida:
+                        archivo_salida.write(contenido)
+                except OSError as e:
+                    print(f"      Servicio Audio: ERROR al guardar el audio del segmento {segmento_input.id_original_segmento or i} (escena {escena_input.id_escena}): {e}")
+                    continue
+            if cache_audios is not None:
+                try:
+                    await cache_audios.guardar(clave, ruta, formato, round(duracion, 2), 1)
+                except (sqlite3.Error, OSError) as e:
+                    print(f"Servicio Audio: ADVERTENCIA - No se pudo guardar el audio en la caché: {e}")
+            resultados[i] = await _resultado(segmento_input, nombre_archivo, duracion, texto_normalizado, False, 1)
+        print(f"  Servicio Audio: Lote SSML de {len(lote)} segmentos (escena {escena_input.id_escena}) sintetizado en una llamada.")
+
+    await asyncio.gather(*(_sintetizar_lote(lote) for lote in lotes))
+    return resultados
+
+
+async def _generar_audios_combinados(
+    id_proyecto: str, escenas: List[EscenaConAudiosDeSegmentos], rutas_locales_por_escena: List[List[str]], pausa_seg: Optional[float]
+) -> Tuple[AudioCombinadoInfo, ManifiestoTiemposAudio, str]:
+    """
+    Escribe un audio por escena y uno del proyecto (una sola pasada por los segmentos) y el manifiesto JSON de tiempos.
+    Completa en `escenas` el audio combinado de cada escena y los instantes de inicio de cada segmento.
+    """
+    formato = settings.AUDIO_OUTPUT_FORMAT.lower()
+    pausa = settings.AUDIO_MERGE_GAP_SEG if pausa_seg is None else pausa_seg
+    directorio_proyecto = os.path.join(settings.AUDIO_STORAGE_PATH, id_proyecto)
+    nombres_escenas = [f"{id_proyecto}_{escena.id_escena_original}_combinado.{formato}" for escena in escenas]
+    nombre_proyecto = f"{id_proyecto}_completo.{formato}"
+    inicio = time.perf_counter()
+    tiempos_escenas, duracion_total = await combinar_audios_proyecto(
+        rutas_locales_por_escena, [os.path.join(directorio_proyecto, nombre) for nombre in nombres_escenas],
+        os.path.join(directorio_proyecto, nombre_proyecto), formato, pausa, settings.AUDIO_OUTPUT_MP3_BITRATE // 1000
+    )
+    print(f"Servicio Audio: Audios combinados del proyecto {id_proyecto} ({len(escenas)} escenas, {round(duracion_total, 2)} s) generados en {time.perf_counter() - inicio:.2f} s.")
+
+    tiempos_manifiesto: List[TiemposEscenaManifiesto] = []
+    for escena, nombre_escena, (inicio_escena, duracion_escena, tiempos_segmentos) in zip(escenas, nombres_escenas, tiempos_escenas):
+        url_escena = await _publicar_audio(id_proyecto, nombre_escena, os.path.join(directorio_proyecto, nombre_escena))
+        escena.audio_escena_combinado = AudioCombinadoInfo(
+            ruta_audio_generado=url_escena, duracion_audio_seg=round(duracion_escena, 3), formato_audio=formato, inicio_en_proyecto_seg=round(inicio_escena, 3)
+        )
+        segmentos_manifiesto: List[TiempoSegmentoManifiesto] = []
+        for segmento, (inicio_segmento, duracion_segmento) in zip(escena.audios_de_segmentos, tiempos_segmentos):
+            segmento.inicio_en_escena_seg = round(inicio_segmento, 3)
+            segmento.inicio_en_proyecto_seg = round(inicio_escena + inicio_segmento, 3)
+            segmentos_manifiesto.append(TiempoSegmentoManifiesto(
+                id_segmento_original=segmento.id_segmento_original, tipo_segmento=segmento.tipo_segmento,
+                inicio_en_escena_seg=segmento.inicio_en_escena_seg, inicio_en_proyecto_seg=segmento.inicio_en_proyecto_seg,
+                duracion_seg=round(duracion_segmento, 3)
+            ))
+        tiempos_manifiesto.append(TiemposEscenaManifiesto(
+            id_escena_original=escena.id_escena_original, ruta_audio_escena=url_escena, inicio_en_proyecto_seg=round(inicio_escena, 3),
+            duracion_seg=round(duracion_escena, 3), segmentos=segmentos_manifiesto
+        ))
+
+    url_proyecto = await _publicar_audio(id_proyecto, nombre_proyecto, os.path.join(directorio_proyecto, nombre_proyecto))
+    manifiesto = ManifiestoTiemposAudio(
+        id_proyecto=id_proyecto, formato_audio=formato, pausa_entre_segmentos_seg=pausa, ruta_audio_proyecto=url_proyecto,
+        duracion_total_seg=round(duracion_total, 3), escenas=tiempos_manifiesto
+    )
+    nombre_manifiesto = f"{id_proyecto}_tiempos.json"
+    ruta_manifiesto = os.path.join(directorio_proyecto, nombre_manifiesto)
+    with open(ruta_manifiesto, "w", encoding="utf-8") as archivo_manifiesto:
+        archivo_manifiesto.write(manifiesto.model_dump_json(indent=2))
+    audio_proyecto = AudioCombinadoInfo(ruta_audio_generado=url_proyecto, duracion_audio_seg=round(duracion_total, 3), formato_audio=formato)
+    return audio_proyecto, manifiesto, await _publicar_audio(id_proyecto, nombre_manifiesto, ruta_manifiesto)
+
 # --- NUEVA FUNCIÓN: Para generar audios para un guion de video completo ---
 async def generar_audios_para_script_video(
     datos_script: VideoScriptTTSRequest # Ahora VideoScriptTTSRequest espera escenas con segmentos
@@ -234,6 +505,7 @@ async def generar_audios_para_script_video(
     id_proyecto = datos_script.id_proyecto
     audios_por_escena_final: List[EscenaConAudiosDeSegmentos] = []
     audio_guion_completo_info: Optional[BasicTTSResponse] = None # Cambiado a BasicTTSResponse para consistencia
+    caracteres_ahorrados_normalizacion = 0
 
     proveedor_a_usar = datos_script.proveedor_tts_global or "google"
     config_voz_a_usar = datos_script.configuracion_voz_global # Puede ser None, generar_audio_tts_basico usará sus defaults
@@ -257,43 +529,69 @@ async def generar_audios_para_script_video(
     #         print(f"  Servicio Audio: ERROR INESPERADO al generar audio para guion completo (proyecto {id_proyecto}): {e}")
     # --- FIN SECCIÓN COMENTADA/ELIMINADA ---
 
-    # 2. Generar audio para cada segmento de cada escena
+    # 2. Generar audio para cada segmento de cada escena.
+    # Todos los segmentos del guion se lanzan a la vez; el planificador del proveedor acota las llamadas en vuelo y
+    # reparte los turnos con los demás proyectos en curso (según `prioridad`), así que un guion largo no acapara el proveedor.
+    # Cada segmento aísla sus errores (un fallo no cancela el resto) y los resultados se recogen en el orden del guion.
+    async def _generar_audio_segmento(escena_input, i: int, segmento_input) -> ResultadoSegmento:
+        print(f"      Servicio Audio: Procesando segmento tipo '{segmento_input.tipo_segmento}' (ID original: {segmento_input.id_original_segmento or 'N/A'}) de la escena {escena_input.id_escena}...")
+        try:
+            # Usar id_original_segmento si existe y es único, sino un índice.
+            id_segmento_para_audio = segmento_input.id_original_segmento or f"segmento_{i}"
+            id_solicitud_segmento = f"{id_proyecto}_{escena_input.id_escena}_{id_segmento_para_audio}"
+
+            solicitud_tts_segmento = BasicTTSRequest(
+                texto_a_convertir=segmento_input.texto_es,
+                id_solicitud=id_solicitud_segmento,
+                id_proyecto=id_proyecto,
+                proveedor_tts=proveedor_a_usar,
+                configuracion_voz=config_voz_a_usar,
+                prioridad=datos_script.prioridad
+            )
+            # La copia local se conserva hasta generar los audios combinados; se borra al final si el almacenamiento es S3.
+            respuesta_tts_basico_segmento = await generar_audio_tts_basico(solicitud_tts_segmento, conservar_copia_local=True)
+
+            info_audio_segmento = SegmentoAudioInfo(
+                id_segmento_original=segmento_input.id_original_segmento,
+                tipo_segmento=segmento_input.tipo_segmento,
+                autor_segmento=segmento_input.autor,
+                ruta_audio_generado=respuesta_tts_basico_segmento.ruta_audio_generado,
+                duracion_audio_seg=respuesta_tts_basico_segmento.duracion_audio_seg,
+                formato_audio=respuesta_tts_basico_segmento.formato_audio
+            )
+            print(f"      Servicio Audio: Audio para segmento '{segmento_input.tipo_segmento}' generado: {respuesta_tts_basico_segmento.ruta_audio_generado}")
+            ruta_local_segmento = os.path.join(settings.AUDIO_STORAGE_PATH, id_proyecto, f"{id_solicitud_segmento}.{respuesta_tts_basico_segmento.formato_audio}")
+            return info_audio_segmento, respuesta_tts_basico_segmento.metadata_tts, ruta_local_segmento
+        except ValueError as e:
+            print(f"      Servicio Audio: ERROR al generar audio para segmento tipo '{segmento_input.tipo_segmento}' (escena {escena_input.id_escena}, proyecto {id_proyecto}): {e}")
+        except Exception as e:
+            print(f"      Servicio Audio: ERROR INESPERADO al generar audio para segmento (escena {escena_input.id_escena}, proyecto {id_proyecto}): {e}")
+        return None
+
     print(f"  Servicio Audio: Procesando {len(datos_script.escenas)} escenas para el proyecto {id_proyecto}...")
-    for escena_input in datos_script.escenas: # escena_input es de tipo _EscenaConSegmentosInput
-        print(f"    Servicio Audio: Procesando segmentos para escena ID: {escena_input.id_escena}")
+    inicio_sintesis = time.perf_counter()
+    usar_lotes_ssml = _lotes_ssml_disponibles(proveedor_a_usar)
+    def _audios_escena(escena_input) -> Awaitable[List[ResultadoSegmento]]:
+        if usar_lotes_ssml and len(escena_input.segmentos_narrativos) > 1:
+            return _generar_audios_escena_por_lotes(
+                id_proyecto, escena_input, config_voz_a_usar, datos_script.prioridad,
+                lambda i: _generar_audio_segmento(escena_input, i, escena_input.segmentos_narrativos[i])
+            )
+        return asyncio.gather(*(_generar_audio_segmento(escena_input, i, segmento_input) for i, segmento_input in enumerate(escena_input.segmentos_narrativos)))
+    resultados_por_escena = await asyncio.gather(*(_audios_escena(escena_input) for escena_input in datos_script.escenas))
+    print(f"  Servicio Audio: Segmentos del proyecto {id_proyecto} sintetizados en {time.perf_counter() - inicio_sintesis:.2f} s (concurrencia máxima del proveedor: {_limite_concurrencia_proveedor(proveedor_a_usar.lower())}).")
+
+    rutas_locales_por_escena: List[List[str]] = [] # Paralela a audios_por_escena_final (para los audios combinados)
+    for escena_input, resultados_escena in zip(datos_script.escenas, resultados_por_escena): # escena_input es de tipo _EscenaConSegmentosInput
         segmentos_con_audio_para_esta_escena: List[SegmentoAudioInfo] = []
-        
-        for i, segmento_input in enumerate(escena_input.segmentos_narrativos): # segmento_input es de tipo _SegmentoNarrativoInput
-            print(f"      Servicio Audio: Procesando segmento tipo '{segmento_input.tipo_segmento}' (ID original: {segmento_input.id_original_segmento or 'N/A'})...")
-            try:
-                # Usar id_original_segmento si existe y es único, sino un índice.
-                id_segmento_para_audio = segmento_input.id_original_segmento or f"segmento_{i}"
-                id_solicitud_segmento = f"{id_proyecto}_{escena_input.id_escena}_{id_segmento_para_audio}"
-
-                solicitud_tts_segmento = BasicTTSRequest(
-                    texto_a_convertir=segmento_input.texto_es,
-                    id_solicitud=id_solicitud_segmento,
-                    id_proyecto=id_proyecto,
-                    proveedor_tts=proveedor_a_usar,
-                    configuracion_voz=config_voz_a_usar
-                )
-                respuesta_tts_basico_segmento = await generar_audio_tts_basico(solicitud_tts_segmento)
-
-                info_audio_segmento = SegmentoAudioInfo(
-                    id_segmento_original=segmento_input.id_original_segmento,
-                    tipo_segmento=segmento_input.tipo_segmento,
-                    autor_segmento=segmento_input.autor,
-                    ruta_audio_generado=respuesta_tts_basico_segmento.ruta_audio_generado,
-                    duracion_audio_seg=respuesta_tts_basico_segmento.duracion_audio_seg,
-                    formato_audio=respuesta_tts_basico_segmento.formato_audio
-                )
-                segmentos_con_audio_para_esta_escena.append(info_audio_segmento)
-                print(f"      Servicio Audio: Audio para segmento '{segmento_input.tipo_segmento}' generado: {respuesta_tts_basico_segmento.ruta_audio_generado}")
-            except ValueError as e:
-                print(f"      Servicio Audio: ERROR al generar audio para segmento tipo '{segmento_input.tipo_segmento}' (escena {escena_input.id_escena}, proyecto {id_proyecto}): {e}")
-            except Exception as e:
-                print(f"      Servicio Audio: ERROR INESPERADO al generar audio para segmento (escena {escena_input.id_escena}, proyecto {id_proyecto}): {e}")
-        
+        rutas_locales_escena: List[str] = []
+        for resultado_segmento in resultados_escena:
+            if resultado_segmento is None: continue
+            info_audio_segmento, metadata_segmento, ruta_local_segmento = resultado_segmento
+            segmentos_con_audio_para_esta_escena.append(info_audio_segmento)
+            rutas_locales_escena.append(ruta_local_segmento)
+            caracteres_ahorrados_normalizacion += (metadata_segmento.caracteres_texto_original or 0) - (metadata_segmento.caracteres_sintetizados or 0)
+
         if segmentos_con_audio_para_esta_escena: # Solo añadir si se generaron audios para la escena
             audios_por_escena_final.append(
                 EscenaConAudiosDeSegmentos(
@@ -301,13 +599,34 @@ async def generar_audios_para_script_video(
                     audios_de_segmentos=segmentos_con_audio_para_esta_escena
                 )
             )
+            rutas_locales_por_escena.append(rutas_locales_escena)
+
+    # Audios combinados por escena y del proyecto, con manifiesto de tiempos (opcional).
+    audio_proyecto_combinado: Optional[AudioCombinadoInfo] = None
+    manifiesto: Optional[ManifiestoTiemposAudio] = None
+    url_manifiesto: Optional[str] = None
+    if datos_script.generar_audios_combinados and audios_por_escena_final:
+        try:
+            audio_proyecto_combinado, manifiesto, url_manifiesto = await _generar_audios_combinados(
+                id_proyecto, audios_por_escena_final, rutas_locales_por_escena, datos_script.pausa_entre_segmentos_seg
+            )
+        except (ValueError, OSError) as e:
+            # Los audios por segmento siguen siendo válidos: se devuelven sin los combinados.
+            print(f"Servicio Audio: ERROR al generar los audios combinados del proyecto {id_proyecto}: {e}")
+    if not get_almacenamiento().es_local: # Los segmentos ya están en el almacenamiento: las copias de trabajo sobran
+        for rutas_locales_escena in rutas_locales_por_escena:
+            for ruta_local_segmento in rutas_locales_escena: _eliminar_copia_local(ruta_local_segmento)
 
     # 3. Ensamblar la respuesta final
     respuesta_video_script_tts = VideoScriptTTSResponse(
         id_proyecto=id_proyecto,
         audio_guion_completo=audio_guion_completo_info, # Será None si falló o no se pidió
-        audios_por_escena=audios_por_escena_final
+        audios_por_escena=audios_por_escena_final,
+        caracteres_ahorrados_normalizacion=caracteres_ahorrados_normalizacion,
+        audio_proyecto_combinado=audio_proyecto_combinado,
+        ruta_manifiesto_tiempos=url_manifiesto,
+        manifiesto_tiempos=manifiesto
     )
     
-    print(f"Servicio Audio: Generación de audios para video (por segmento) del proyecto {id_proyecto} completada.")
+    print(f"Servicio Audio: Generación de audios para video (por segmento) del proyecto {id_proyecto} completada. Caracteres ahorrados por la normalización: {caracteres_ahorrados_normalizacion}.")
     return respuesta_video_script_tts
\ No newline at end of file
@@ -0,0 +1,165 @@
+import asyncio
+import hashlib
+import json
+import os
+import shutil
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+
+from ..core.config import get_settings
+
+# Caché de audios sintetizados direccionada por contenido, compartida entre proyectos.
+# La clave es un hash de (proveedor, texto enviado al TTS, voz, idioma, velocidad, tono, codificación, bitrate),
+# de modo que reintentos, re-ejecuciones del mismo post y textos repetidos (ej. "[comentario no disponible o vacío]")
+# se sintetizan y exportan una sola vez. Cada audio se guarda una vez en TTS_CACHE_PATH y los proyectos reciben
+# un enlace duro (hardlink) al archivo; si el enlace no es posible (otro sistema de archivos) se copia.
+# Un índice SQLite en el mismo directorio lleva tamaños y último acceso; al superarse TTS_CACHE_MAX_MB se
+# expulsan las entradas de acceso más antiguo (LRU). Expulsar no afecta a los proyectos: sus enlaces conservan el audio.
+
+_NOMBRE_INDICE = "indice.sqlite3"
+
+
+class CacheAudiosTTS:
+    def __init__(self, ruta_directorio: str, max_bytes: int):
+        self.ruta_directorio = ruta_directorio
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self.estadisticas: Dict[str, int] = {
+            "aciertos": 0, "fallos": 0, "escrituras": 0, "expulsiones": 0, "enlaces": 0, "copias": 0
+        }
+        os.makedirs(ruta_directorio, exist_ok=True)
+        self._conexion = sqlite3.connect(os.path.join(ruta_directorio, _NOMBRE_INDICE), check_same_thread=False, isolation_level=None)
+        self._conexion.execute("PRAGMA journal_mode=WAL")
+        self._conexion.execute("PRAGMA synchronous=NORMAL")
+        self._conexion.execute(
+            "CREATE TABLE IF NOT EXISTS audios ("
+            " clave TEXT PRIMARY KEY, ruta_relativa TEXT NOT NULL, duracion_seg REAL NOT NULL, numero_fragmentos INTEGER NOT NULL,"
+            " tamano_bytes INTEGER NOT NULL, creado_en REAL NOT NULL, ultimo_acceso REAL NOT NULL)"
+        )
+        self._conexion.execute("CREATE INDEX IF NOT EXISTS idx_audios_ultimo_acceso ON audios (ultimo_acceso)")
+
+    @staticmethod
+    def calcular_clave(
+        proveedor: str, texto: str, voz: Optional[str], idioma: str, velocidad: float, tono: float, codificacion: str, bitrate: int
+    ) -> str:
+        material = json.dumps(["audio_v1", proveedor, texto, voz, idioma, velocidad, tono, codificacion, bitrate], ensure_ascii=False)
+        return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+    def _ruta_relativa(self, clave: str, formato: str) -> str:
+        return os.path.join(clave[:2], f"{clave}.{formato}") # Subdirectorios por prefijo para no llenar un único directorio
+
+    def _enlazar_o_copiar(self, origen: str, destino: str) -> None:
+        # Llamar con self._lock adquirido (las estadísticas se comparten entre hilos).
+        if os.path.exists(destino): os.remove(destino) # Un destino previo (re-ejecución) se sustituye
+        try:
+            os.link(origen, destino)
+            self.estadisticas["enlaces"] += 1
+        except OSError:
+            shutil.copyfile(origen, destino)
+            self.estadisticas["copias"] += 1
+
+    def _obtener_sync(self, clave: str, ruta_destino: str) -> Optional[Tuple[float, int]]:
+        """Si la clave está en caché, materializa el audio en ruta_destino y devuelve (duracion_seg, numero_fragmentos)."""
+        ahora = time.time()
+        with self._lock:
+            fila = self._conexion.execute("SELECT ruta_relativa, duracion_seg, numero_fragmentos FROM audios WHERE clave = ?", (clave,)).fetchone()
+            if fila is None:
+                self.estadisticas["fallos"] += 1
+                return None
+            ruta_relativa, duracion_seg, numero_fragmentos = fila
+            ruta_cache = os.path.join(self.ruta_directorio, ruta_relativa)
+            if not os.path.exists(ruta_cache): # Archivo borrado a mano: la entrada ya no sirve
+                self._conexion.execute("DELETE FROM audios WHERE clave = ?", (clave,))
+                self.estadisticas["fallos"] += 1
+                return None
+            self._enlazar_o_copiar(ruta_cache, ruta_destino)
+            self._conexion.execute("UPDATE audios SET ultimo_acceso = ? WHERE clave = ?", (ahora, clave))
+            self.estadisticas["aciertos"] += 1
+            return duracion_seg, numero_fragmentos
+
+    def _guardar_sync(self, clave: str, ruta_origen: str, formato: str, duracion_seg: float, numero_fragmentos: int) -> None:
+        """Incorpora a la caché el audio ya exportado en ruta_origen (archivo del proyecto)."""
+        ahora = time.time()
+        ruta_relativa = self._ruta_relativa(clave, formato)
+        ruta_cache = os.path.join(self.ruta_directorio, ruta_relativa)
+        with self._lock:
+            os.makedirs(os.path.dirname(ruta_cache), exist_ok=True)
+            self._enlazar_o_copiar(ruta_origen, ruta_cache)
+            self._conexion.execute(
+                "INSERT OR REPLACE INTO audios (clave, ruta_relativa, duracion_seg, numero_fragmentos, tamano_bytes, creado_en, ultimo_acceso)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (clave, ruta_relativa, duracion_seg, numero_fragmentos, os.path.getsize(ruta_cache), ahora, ahora)
+            )
+            self.estadisticas["escrituras"] += 1
+            self._expulsar_sync()
+
+    def _expulsar_sync(self) -> None:
+        # Llamar con self._lock adquirido.
+        total_bytes = self._conexion.execute("SELECT COALESCE(SUM(tamano_bytes), 0) FROM audios").fetchone()[0]
+        if total_bytes <= self.max_bytes: return
+        exceso = total_bytes - self.max_bytes
+        liberado = 0
+        expulsadas = []
+        for clave, ruta_relativa, tamano in self._conexion.execute("SELECT clave, ruta_relativa, tamano_bytes FROM audios ORDER BY ultimo_acceso ASC"):
+            expulsadas.append((clave, ruta_relativa))
+            liberado += tamano
+            if liberado >= exceso: break
+        for clave, ruta_relativa in expulsadas:
+            try:
+                os.remove(os.path.join(self.ruta_directorio, ruta_relativa))
+            except FileNotFoundError:
+                pass
+            self._conexion.execute("DELETE FROM audios WHERE clave = ?", (clave,))
+        self.estadisticas["expulsiones"] += len(expulsadas)
+
+    async def obtener(self, clave: str, ruta_destino: str) -> Optional[Tuple[float, int]]:
+        return await asyncio.to_thread(self._obtener_sync, clave, ruta_destino)
+
+    async def guardar(self, clave: str, ruta_origen: str, formato: str, duracion_seg: float, numero_fragmentos: int) -> None:
+        await asyncio.to_thread(self._guardar_sync, clave, ruta_origen, formato, duracion_seg, numero_fragmentos)
+
+    def resumen(self) -> Dict[str, Any]:
+        with self._lock:
+            entradas, total_bytes = self._conexion.execute("SELECT COUNT(*), COALESCE(SUM(tamano_bytes), 0) FROM audios").fetchone()
+        consultas = self.estadisticas["aciertos"] + self.estadisticas["fallos"]
+        return {
+            **self.estadisticas,
+            "tasa_aciertos": round(self.estadisticas["aciertos"] / consultas, 4) if consultas else 0.0,
+            "entradas": entradas,
+            "tamano_bytes": total_bytes,
+            "max_bytes": self.max_bytes
+        }
+
+    def cerrar(self) -> None:
+        with self._lock:
+            self._conexion.close()
+
+
+_cache_audios: Optional[CacheAudiosTTS] = None
+_cache_audios_no_disponible = False # Evita reintentar (y loguear) la apertura en cada llamada si falló una vez
+
+
+def get_cache_audios() -> Optional[CacheAudiosTTS]:
+    """Devuelve la caché del proceso (creándola en la primera llamada), o None si está desactivada."""
+    global _cache_audios, _cache_audios_no_disponible
+    settings = get_settings()
+    if not settings.TTS_CACHE_ENABLED or _cache_audios_no_disponible: return None
+    if _cache_audios is None:
+        try:
+            _cache_audios = CacheAudiosTTS(settings.TTS_CACHE_PATH, settings.TTS_CACHE_MAX_MB * 1024 * 1024)
+            print(f"Servicio Audio: Caché de audios TTS abierta en {settings.TTS_CACHE_PATH} (máx {settings.TTS_CACHE_MAX_MB} MB).")
+        except (sqlite3.Error, OSError) as e:
+            # Sin caché el servicio sigue funcionando; solo se pierde la reutilización de audios.
+            print(f"Servicio Audio: ADVERTENCIA - No se pudo abrir la caché de audios en {settings.TTS_CACHE_PATH}: {e}. Se continúa sin caché.")
+            _cache_audios_no_disponible = True
+            return None
+    return _cache_audios
+
+
+def cerrar_cache_audios() -> None:
+    global _cache_audios
+    if _cache_audios is not None:
+        _cache_audios.cerrar()
+        _cache_audios = None
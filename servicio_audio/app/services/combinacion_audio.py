@@ -0,0 +1,149 @@
+import asyncio
+import mmap
+import os
+import wave
+from typing import BinaryIO, List, Optional, Sequence, Tuple
+
+from ..core.config import get_settings
+from .formato_audio import TramaMP3, iterar_tramas_mp3
+from .procesamiento_audio import combinar_audio_con_pydub
+
+# Audios combinados de un guion: uno por escena (sus segmentos seguidos, separados por una pausa) y uno para
+# el proyecto completo (las escenas seguidas, con la misma pausa entre escenas), más los tiempos de cada segmento.
+# MP3 y WAV se combinan en una sola pasada en streaming: cada segmento se lee una vez (mapeado en memoria) y sus
+# tramas/muestras se escriben a la vez en el archivo de la escena y en el del proyecto, sin decodificar; la
+# pausa se inserta como tramas MP3 silenciosas o muestras a cero. Otros formatos (OGG Opus), segmentos con
+# parámetros distintos o la normalización (AUDIO_NORMALIZATION_MODE) pasan por el pool de procesos, que decodifica
+# a PCM y combina con NumPy.
+
+# Tiempos de una escena combinada: (inicio en el proyecto, duración, [(inicio del segmento en la escena, duración del segmento)])
+TiemposEscena = Tuple[float, float, List[Tuple[float, float]]]
+
+_BLOQUE_TRAMAS_WAV = 65536
+
+
+def _trama_silencio_mp3(datos: bytes, trama: TramaMP3) -> bytes:
+    """
+    Trama MP3 silenciosa con los mismos parámetros que `trama`: su misma cabecera sin CRC ni relleno, seguida de ceros.
+    Con la información lateral a cero (part2_3_length = 0) el decodificador no lee datos y produce silencio.
+    """
+    cabecera = bytearray(datos[trama.inicio:trama.inicio + 4])
+    cabecera[1] |= 0x01 # Bit de protección = 1 -> sin CRC
+    relleno = (cabecera[2] >> 1) & 0x01
+    cabecera[2] &= 0xFD # Sin byte de relleno
+    return bytes(cabecera) + bytes(trama.fin - trama.inicio - relleno - 4)
+
+
+class _CombinadorMP3:
+    def __init__(self, pausa_seg: float):
+        self.pausa_seg = pausa_seg
+        self._formato: Optional[Tuple[int, int]] = None
+        self._silencio: Optional[bytes] = None
+        self._duracion_silencio = 0.0
+
+    def escribir_segmento(self, ruta: str, destinos: Sequence[BinaryIO]) -> float:
+        """Copia las tramas de audio del segmento a todos los destinos. Devuelve su duración."""
+        duracion = 0.0
+        with open(ruta, "rb") as archivo, mmap.mmap(archivo.fileno(), 0, access=mmap.ACCESS_READ) as datos:
+            inicio_tramo = fin_tramo = -1
+            for trama in iterar_tramas_mp3(datos):
+                if trama.es_cabecera_vbr: continue
+                formato_trama = (trama.frecuencia_hz, trama.canales)
+                if self._formato is None:
+                    self._formato = formato_trama
+                    self._silencio = _trama_silencio_mp3(datos, trama)
+                    self._duracion_silencio = trama.muestras / trama.frecuencia_hz
+                elif formato_trama != self._formato:
+                    raise ValueError(f"El segmento {os.path.basename(ruta)} tiene un formato MP3 distinto ({self._formato} vs {formato_trama}).")
+                duracion += trama.muestras / trama.frecuencia_hz
+                if trama.inicio != fin_tramo: # Las tramas contiguas se copian por tramos
+                    if fin_tramo > inicio_tramo >= 0:
+                        for destino in destinos: destino.write(datos[inicio_tramo:fin_tramo])
+                    inicio_tramo = trama.inicio
+                fin_tramo = trama.fin
+            if fin_tramo > inicio_tramo >= 0:
+                for destino in destinos: destino.write(datos[inicio_tramo:fin_tramo])
+        if duracion <= 0:
+            raise ValueError(f"El segmento {os.path.basename(ruta)} no contiene tramas MP3 de audio.")
+        return duracion
+
+    def escribir_pausa(self, destinos: Sequence[BinaryIO]) -> float:
+        if self._silencio is None or self.pausa_seg <= 0: return 0.0
+        numero_tramas = round(self.pausa_seg / self._duracion_silencio)
+        bloque = self._silencio * numero_tramas
+        for destino in destinos: destino.write(bloque)
+        return numero_tramas * self._duracion_silencio # Duración real (la pausa se redondea a tramas enteras)
+
+
+class _CombinadorWAV:
+    def __init__(self, pausa_seg: float):
+        self.pausa_seg = pausa_seg
+        self._parametros: Optional[Tuple[int, int, int]] = None
+        self._destinos_configurados = set() # id() de los escritores cuya cabecera ya tiene los parámetros
+
+    def escribir_segmento(self, ruta: str, destinos: Sequence[wave.Wave_write]) -> float:
+        with wave.open(ruta, "rb") as lector:
+            parametros = (lector.getnchannels(), lector.getsampwidth(), lector.getframerate())
+            if self._parametros is None:
+                self._parametros = parametros
+            elif parametros != self._parametros:
+                raise ValueError(f"El segmento {os.path.basename(ruta)} tiene parámetros WAV distintos ({self._parametros} vs {parametros}).")
+            for destino in destinos:
+                if id(destino) not in self._destinos_configurados:
+                    destino.setparams(lector.getparams())
+                    self._destinos_configurados.add(id(destino))
+            numero_tramas = lector.getnframes()
+            while True:
+                bloque = lector.readframes(_BLOQUE_TRAMAS_WAV)
+                if not bloque: break
+                for destino in destinos: destino.writeframesraw(bloque) # La cabecera se corrige al cerrar
+        return numero_tramas / parametros[2]
+
+    def escribir_pausa(self, destinos: Sequence[wave.Wave_write]) -> float:
+        if self._parametros is None or self.pausa_seg <= 0: return 0.0
+        canales, ancho, frecuencia = self._parametros
+        numero_tramas = round(self.pausa_seg * frecuencia)
+        silencio = bytes(numero_tramas * canales * ancho)
+        for destino in destinos: destino.writeframesraw(silencio)
+        return numero_tramas / frecuencia
+
+
+def _combinar_en_streaming(
+    rutas_segmentos_por_escena: List[List[str]], rutas_escenas: List[str], ruta_proyecto: str, formato: str, pausa_seg: float
+) -> Tuple[List[TiemposEscena], float]:
+    """Una sola pasada por los segmentos: cada uno se escribe a la vez en su escena y en el proyecto."""
+    es_wav = formato == "wav"
+    combinador = _CombinadorWAV(pausa_seg) if es_wav else _CombinadorMP3(pausa_seg)
+    abrir = (lambda ruta: wave.open(ruta, "wb")) if es_wav else (lambda ruta: open(ruta, "wb"))
+    tiempos_escenas: List[TiemposEscena] = []
+    posicion_proyecto = 0.0
+    with abrir(ruta_proyecto) as proyecto:
+        for indice_escena, (rutas_segmentos, ruta_escena) in enumerate(zip(rutas_segmentos_por_escena, rutas_escenas)):
+            if indice_escena > 0: posicion_proyecto += combinador.escribir_pausa([proyecto])
+            inicio_escena = posicion_proyecto
+            tiempos_segmentos: List[Tuple[float, float]] = []
+            posicion_escena = 0.0
+            with abrir(ruta_escena) as escena:
+                for indice_segmento, ruta_segmento in enumerate(rutas_segmentos):
+                    if indice_segmento > 0: posicion_escena += combinador.escribir_pausa([escena, proyecto])
+                    duracion_segmento = combinador.escribir_segmento(ruta_segmento, [escena, proyecto])
+                    tiempos_segmentos.append((posicion_escena, duracion_segmento))
+                    posicion_escena += duracion_segmento
+            posicion_proyecto = inicio_escena + posicion_escena
+            tiempos_escenas.append((inicio_escena, posicion_escena, tiempos_segmentos))
+    return tiempos_escenas, posicion_proyecto
+
+
+async def combinar_audios_proyecto(
+    rutas_segmentos_por_escena: List[List[str]], rutas_escenas: List[str], ruta_proyecto: str, formato: str, pausa_seg: float, bitrate_kbps: int
+) -> Tuple[List[TiemposEscena], float]:
+    """
+    Genera el audio combinado de cada escena (rutas_escenas[i] a partir de rutas_segmentos_por_escena[i]) y el del
+    proyecto completo. Devuelve los tiempos por escena y la duración total. Lanza ValueError si no se pudo combinar.
+    """
+    if formato in ("mp3", "wav") and get_settings().AUDIO_NORMALIZATION_MODE == "ninguna":
+        try:
+            return await asyncio.to_thread(_combinar_en_streaming, rutas_segmentos_por_escena, rutas_escenas, ruta_proyecto, formato, pausa_seg)
+        except (ValueError, wave.Error, EOFError) as e:
+            print(f"Servicio Audio: ADVERTENCIA - No se pudieron combinar los audios sin transcodificar ({e}). Se usa pydub.")
+    return await combinar_audio_con_pydub(rutas_segmentos_por_escena, rutas_escenas, ruta_proyecto, formato, pausa_seg, bitrate_kbps)
@@ -0,0 +1,259 @@
+import io
+import struct
+import wave
+from typing import Iterator, List, Optional, Tuple
+
+# Utilidades para trabajar con el audio codificado que devuelve el proveedor TTS sin decodificarlo
+# (sin pydub/ffmpeg): recorrido de tramas MP3, concatenación a nivel de trama, unión de WAV (LINEAR16)
+# y cálculo de la duración leyendo solo el contenedor (cabecera Xing/VBRI o tramas MP3, posición
+# de gránulo de la última página OGG, cabecera WAV).
+# Permiten escribir el audio tal cual lo entrega el proveedor en el caso habitual, sin pérdida de calidad
+# por recodificar y sin el coste de CPU de decodificar + codificar cada segmento.
+
+# Tablas de la cabecera MPEG audio (kbps). Índice 0 = "free", 15 = inválido.
+_BITRATES_KBPS = {
+    (1, 1): (0, 32, 64, 96, 128, 160, 192, 224, 256, 288, 320, 352, 384, 416, 448),
+    (1, 2): (0, 32, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 384),
+    (1, 3): (0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320),
+    (2, 1): (0, 32, 48, 56, 64, 80, 96, 112, 128, 144, 160, 176, 192, 224, 256),
+    (2, 2): (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+    (2, 3): (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+}
+_FRECUENCIAS_HZ = {3: (44100, 48000, 32000), 2: (22050, 24000, 16000), 0: (11025, 12000, 8000)} # Clave: bits de versión
+_TAMANO_ID3V1 = 128
+
+
+class TramaMP3:
+    """Posición y parámetros de una trama MPEG audio dentro de un buffer."""
+    __slots__ = ("inicio", "fin", "muestras", "frecuencia_hz", "canales", "version", "es_cabecera_vbr", "tramas_declaradas")
+
+    def __init__(self, inicio: int, fin: int, muestras: int, frecuencia_hz: int, canales: int, version: int):
+        self.inicio = inicio
+        self.fin = fin
+        self.muestras = muestras
+        self.frecuencia_hz = frecuencia_hz
+        self.canales = canales
+        self.version = version # 1 = MPEG-1; 2 = MPEG-2 y MPEG-2.5
+        self.es_cabecera_vbr = False
+        self.tramas_declaradas: Optional[int] = None # Número de tramas de audio del archivo según la cabecera Xing/VBRI
+
+
+def _saltar_id3v2(datos: bytes) -> int:
+    """Devuelve la posición tras la etiqueta ID3v2 inicial (0 si no la hay)."""
+    if len(datos) < 10 or datos[:3] != b"ID3": return 0
+    tamano = (datos[6] & 0x7F) << 21 | (datos[7] & 0x7F) << 14 | (datos[8] & 0x7F) << 7 | (datos[9] & 0x7F) # Entero "synchsafe"
+    con_pie = datos[5] & 0x10
+    return 10 + tamano + (10 if con_pie else 0)
+
+
+def _leer_trama(datos: bytes, pos: int, fin_datos: int) -> Optional[TramaMP3]:
+    if pos + 4 > fin_datos or datos[pos] != 0xFF or (datos[pos + 1] & 0xE0) != 0xE0: return None
+    bits_version = (datos[pos + 1] >> 3) & 0x03
+    bits_capa = (datos[pos + 1] >> 1) & 0x03
+    indice_bitrate = datos[pos + 2] >> 4
+    indice_frecuencia = (datos[pos + 2] >> 2) & 0x03
+    if bits_version == 1 or bits_capa == 0 or indice_bitrate in (0, 15) or indice_frecuencia == 3: return None
+    version = 1 if bits_version == 3 else 2
+    capa = 4 - bits_capa # bits 3 -> capa I, 2 -> capa II, 1 -> capa III
+    bitrate = _BITRATES_KBPS[(version, capa)][indice_bitrate] * 1000
+    frecuencia = _FRECUENCIAS_HZ[bits_version][indice_frecuencia]
+    relleno = (datos[pos + 2] >> 1) & 0x01
+    canales = 1 if (datos[pos + 3] >> 6) == 3 else 2
+    if capa == 1:
+        muestras = 384
+        tamano = (12 * bitrate // frecuencia + relleno) * 4
+    else:
+        muestras = 576 if (capa == 3 and version == 2) else 1152
+        tamano = muestras // 8 * bitrate // frecuencia + relleno
+    if pos + tamano > fin_datos: return None # Trama truncada
+    return TramaMP3(pos, pos + tamano, muestras, frecuencia, canales, version)
+
+
+def _marcar_cabecera_vbr(datos: bytes, trama: TramaMP3) -> None:
+    # La trama Xing/Info (LAME) o VBRI no contiene audio: describe el archivo completo (número de tramas, tabla de búsqueda).
+    desplazamiento_info = trama.inicio + 4 + ((17 if trama.canales == 1 else 32) if trama.version == 1 else (9 if trama.canales == 1 else 17))
+    if datos[desplazamiento_info:desplazamiento_info + 4] in (b"Xing", b"Info"):
+        trama.es_cabecera_vbr = True
+        banderas = struct.unpack(">I", datos[desplazamiento_info + 4:desplazamiento_info + 8])[0]
+        if banderas & 0x01: # Campo "frames" presente
+            trama.tramas_declaradas = struct.unpack(">I", datos[desplazamiento_info + 8:desplazamiento_info + 12])[0]
+    elif datos[trama.inicio + 36:trama.inicio + 40] == b"VBRI":
+        trama.es_cabecera_vbr = True
+        trama.tramas_declaradas = struct.unpack(">I", datos[trama.inicio + 50:trama.inicio + 54])[0]
+
+
+def iterar_tramas_mp3(datos: bytes) -> Iterator[TramaMP3]:
+    """
+    Recorre las tramas de un MP3 saltando etiquetas ID3 y bytes basura entre tramas.
+    La primera trama se marca si es una cabecera Xing/Info/VBRI (sin audio).
+    """
+    pos = _saltar_id3v2(datos)
+    fin_datos = len(datos)
+    if fin_datos - pos >= _TAMANO_ID3V1 and datos[fin_datos - _TAMANO_ID3V1:fin_datos - _TAMANO_ID3V1 + 3] == b"TAG":
+        fin_datos -= _TAMANO_ID3V1
+    primera = True
+    while pos + 4 <= fin_datos:
+        trama = _leer_trama(datos, pos, fin_datos)
+        if trama is None:
+            pos += 1 # Resincronizar
+            continue
+        if primera:
+            _marcar_cabecera_vbr(datos, trama)
+            primera = False
+        yield trama
+        pos = trama.fin
+
+
+def duracion_mp3(datos: bytes) -> float:
+    """
+    Duración en segundos. Si la primera trama es una cabecera Xing/Info/VBRI con el número de tramas, se usa
+    directamente; si no, se suman las muestras de las tramas (solo se leen cabeceras, no se decodifica audio).
+    """
+    duracion = 0.0
+    for trama in iterar_tramas_mp3(datos):
+        if trama.es_cabecera_vbr:
+            if trama.tramas_declaradas: return trama.tramas_declaradas * trama.muestras / trama.frecuencia_hz
+            continue
+        duracion += trama.muestras / trama.frecuencia_hz
+    return duracion
+
+
+def concatenar_mp3(fragmentos: List[bytes]) -> Tuple[bytes, float]:
+    """
+    Une varios MP3 copiando solo sus tramas de audio (sin etiquetas ID3 ni cabeceras Xing/Info, que
+    describirían a un único fragmento). Devuelve (bytes, duración en segundos). Lanza ValueError si algún
+    fragmento no contiene tramas o si difieren en frecuencia de muestreo o canales (no se pueden unir sin recodificar).
+    """
+    partes: List[bytes] = []
+    duracion = 0.0
+    formato_comun: Optional[Tuple[int, int]] = None
+    for indice, fragmento in enumerate(fragmentos):
+        tramas = [t for t in iterar_tramas_mp3(fragmento) if not t.es_cabecera_vbr]
+        if not tramas:
+            raise ValueError(f"El fragmento MP3 {indice + 1} no contiene tramas de audio válidas.")
+        for trama in tramas:
+            formato_trama = (trama.frecuencia_hz, trama.canales)
+            if formato_comun is None: formato_comun = formato_trama
+            elif formato_trama != formato_comun:
+                raise ValueError(f"Los fragmentos MP3 tienen formatos distintos ({formato_comun} vs {formato_trama}).")
+            duracion += trama.muestras / trama.frecuencia_hz
+        # Las tramas son contiguas salvo basura ocasional: se copian por tramos para no trocear el buffer trama a trama.
+        inicio_tramo = tramas[0].inicio
+        fin_tramo = tramas[0].fin
+        for trama in tramas[1:]:
+            if trama.inicio != fin_tramo:
+                partes.append(fragmento[inicio_tramo:fin_tramo])
+                inicio_tramo = trama.inicio
+            fin_tramo = trama.fin
+        partes.append(fragmento[inicio_tramo:fin_tramo])
+    return b"".join(partes), duracion
+
+
+def concatenar_wav(fragmentos: List[bytes]) -> Tuple[bytes, float]:
+    """
+    Une varios WAV PCM (LINEAR16) copiando sus muestras bajo una única cabecera. Devuelve (bytes, duración en segundos).
+    Lanza ValueError si algún fragmento no es un WAV válido o si difieren en parámetros (canales, ancho, frecuencia).
+    """
+    parametros_comunes: Optional[Tuple[int, int, int]] = None
+    muestras: List[bytes] = []
+    total_tramas = 0
+    for indice, fragmento in enumerate(fragmentos):
+        try:
+            with wave.open(io.BytesIO(fragmento), "rb") as lector:
+                parametros = (lector.getnchannels(), lector.getsampwidth(), lector.getframerate())
+                numero_tramas = lector.getnframes()
+                muestras.append(lector.readframes(numero_tramas))
+        except (wave.Error, EOFError) as e:
+            raise ValueError(f"El fragmento WAV {indice + 1} no es válido: {e}")
+        if parametros_comunes is None: parametros_comunes = parametros
+        elif parametros != parametros_comunes:
+            raise ValueError(f"Los fragmentos WAV tienen parámetros distintos ({parametros_comunes} vs {parametros}).")
+        total_tramas += numero_tramas
+    if parametros_comunes is None:
+        raise ValueError("No hay fragmentos WAV que unir.")
+    salida = io.BytesIO()
+    with wave.open(salida, "wb") as escritor:
+        escritor.setnchannels(parametros_comunes[0])
+        escritor.setsampwidth(parametros_comunes[1])
+        escritor.setframerate(parametros_comunes[2])
+        escritor.writeframes(b"".join(muestras))
+    return salida.getvalue(), total_tramas / parametros_comunes[2]
+
+
+def duracion_wav(datos: bytes) -> Optional[float]:
+    """Duración de un WAV PCM a partir de su cabecera (None si no es un WAV legible)."""
+    try:
+        with wave.open(io.BytesIO(datos), "rb") as lector:
+            return lector.getnframes() / lector.getframerate()
+    except (wave.Error, EOFError, ZeroDivisionError):
+        return None
+
+
+def _leer_pagina_ogg(datos: bytes, pos: int) -> Optional[Tuple[int, int, int]]:
+    """Devuelve (posición de gránulo, número de serie, inicio de los datos de la página) o None si no hay una cabecera válida."""
+    if datos[pos:pos + 4] != b"OggS" or pos + 27 > len(datos): return None
+    granulo, serie = struct.unpack("<qI", datos[pos + 6:pos + 18])
+    numero_segmentos = datos[pos + 26]
+    return granulo, serie, pos + 27 + numero_segmentos
+
+
+def duracion_ogg(datos: bytes) -> Optional[float]:
+    """
+    Duración de un OGG (Opus o Vorbis) con la posición de gránulo de la última página del flujo. Solo se leen la
+    cabecera de identificación (primera página) y las últimas páginas. None si el contenedor no es reconocible.
+    """
+    primera = _leer_pagina_ogg(datos, 0)
+    if primera is None: return None
+    _, serie_flujo, inicio_paquete = primera
+    identificacion = datos[inicio_paquete:inicio_paquete + 19]
+    if identificacion[:8] == b"OpusHead":
+        pre_skip = struct.unpack("<H", identificacion[10:12])[0]
+        frecuencia, descontar = 48000, pre_skip # El gránulo de Opus siempre cuenta muestras a 48 kHz e incluye el pre-skip
+    elif identificacion[:7] == b"\x01vorbis":
+        frecuencia, descontar = struct.unpack("<I", identificacion[12:16])[0], 0
+    else:
+        return None
+    if frecuencia <= 0: return None
+    pos = len(datos)
+    while True: # Desde el final hacia atrás: última página del flujo con un gránulo definido (-1 = ningún paquete termina en ella)
+        pos = datos.rfind(b"OggS", 0, pos)
+        if pos < 0: return None
+        pagina = _leer_pagina_ogg(datos, pos)
+        if pagina is not None and pagina[1] == serie_flujo and pagina[0] >= 0:
+            return max(pagina[0] - descontar, 0) / frecuencia
+
+
+def duracion_audio(datos: bytes, formato: str) -> Optional[float]:
+    """Duración en segundos leyendo solo el contenedor ("mp3", "wav", "ogg"). None si no se puede determinar sin decodificar."""
+    if formato == "mp3":
+        duracion = duracion_mp3(datos)
+        return duracion if duracion > 0 else None
+    if formato == "wav": return duracion_wav(datos)
+    if formato == "ogg": return duracion_ogg(datos)
+    return None
+
+
+def dividir_wav_en_instantes(datos: bytes, instantes: List[float]) -> List[Tuple[bytes, float]]:
+    """
+    Corta un WAV PCM en len(instantes) trozos, el i-ésimo desde instantes[i] hasta instantes[i+1] (el último hasta el
+    final), a la muestra exacta. El audio anterior al primer instante se incluye en el primer trozo. Devuelve
+    [(bytes, duración en segundos)]; un trozo tiene duración 0 si dos instantes coinciden. Lanza ValueError si el WAV no es válido.
+    """
+    try:
+        with wave.open(io.BytesIO(datos), "rb") as lector:
+            parametros = lector.getparams()
+            muestras = lector.readframes(lector.getnframes())
+    except (wave.Error, EOFError) as e:
+        raise ValueError(f"El WAV no es válido: {e}")
+    tamano_trama = parametros.nchannels * parametros.sampwidth
+    total_tramas = len(muestras) // tamano_trama
+    cortes = [0] + [min(max(round(instante * parametros.framerate), 0), total_tramas) for instante in instantes[1:]] + [total_tramas]
+    for i in range(1, len(cortes)): cortes[i] = max(cortes[i], cortes[i - 1])
+    trozos: List[Tuple[bytes, float]] = []
+    for desde, hasta in zip(cortes, cortes[1:]):
+        salida = io.BytesIO()
+        with wave.open(salida, "wb") as escritor:
+            escritor.setparams(parametros)
+            escritor.writeframes(muestras[desde * tamano_trama:hasta * tamano_trama])
+        trozos.append((salida.getvalue(), (hasta - desde) / parametros.framerate))
+    return trozos
@@ -0,0 +1,184 @@
+import io
+import math
+from typing import Dict, List, Literal, Optional, Sequence, Tuple, Union
+
+import numpy as np
+from pydub import AudioSegment
+
+# Motor de audio en memoria sobre arrays de NumPy, para las rutas que decodifican y recodifican (pool de procesos).
+# Con pydub, `audio_final += fragmento` copia todo el audio acumulado en cada unión (trabajo cuadrático en el número
+# de fragmentos). Aquí cada fragmento se decodifica una vez a PCM de 16 bits, las duraciones se suman antes de copiar
+# nada y las muestras se escriben en un único array float32 preasignado (tramas × canales); pausas, ganancia y
+# normalización (de pico o de sonoridad LUFS, ITU-R BS.1770) son operaciones vectorizadas sobre ese array, y el
+# resultado se convierte a PCM de 16 bits y se codifica una sola vez por archivo de salida.
+
+_ESCALA_INT16 = 32768.0
+
+# Normalización de sonoridad (ITU-R BS.1770-4): bloques de 400 ms con solapamiento del 75 % y doble puerta.
+_PASOS_POR_BLOQUE = 4 # Bloque de 400 ms = 4 pasos de 100 ms
+_PUERTA_ABSOLUTA_LUFS = -70.0
+_PUERTA_RELATIVA_LU = -10.0
+_DESPLAZAMIENTO_LUFS = -0.691
+# La ponderación K se aplica en el dominio de la frecuencia por tramos (con margen a cada lado para que la respuesta
+# del filtro no se corte en los bordes), sin calcular la FFT del audio completo de una vez.
+_TAMANO_FFT_PONDERACION = 1 << 16
+
+ModoNormalizacion = Literal["ninguna", "pico", "lufs"]
+
+
+def decodificar(origen: Union[bytes, str], frecuencia: Optional[int] = None, canales: Optional[int] = None) -> Tuple[np.ndarray, int, int]:
+    """
+    Decodifica un audio (bytes del proveedor o ruta de archivo) a PCM de 16 bits, convirtiéndolo a la frecuencia y
+    los canales indicados si no coinciden. Devuelve (muestras int16 de forma (tramas, canales), frecuencia, canales).
+    """
+    audio = AudioSegment.from_file(io.BytesIO(origen) if isinstance(origen, bytes) else origen)
+    if frecuencia is not None and audio.frame_rate != frecuencia: audio = audio.set_frame_rate(frecuencia)
+    if canales is not None and audio.channels != canales: audio = audio.set_channels(canales)
+    if audio.sample_width != 2: audio = audio.set_sample_width(2)
+    return np.frombuffer(audio.raw_data, dtype="<i2").reshape(-1, audio.channels), audio.frame_rate, audio.channels
+
+
+def decodificar_pistas(origenes: Sequence[Union[bytes, str]]) -> Tuple[List[np.ndarray], int, int]:
+    """Decodifica cada audio una vez. El primero fija la frecuencia y los canales; el resto se convierte a ellos."""
+    primera, frecuencia, canales = decodificar(origenes[0])
+    return [primera] + [decodificar(origen, frecuencia, canales)[0] for origen in origenes[1:]], frecuencia, canales
+
+
+class BufferPCM:
+    """Audio en memoria: un único array float32 (tramas × canales) con muestras en [-1, 1]."""
+
+    def __init__(self, muestras: np.ndarray, frecuencia: int):
+        self.muestras = muestras
+        self.frecuencia = frecuencia
+
+    @classmethod
+    def concatenar(cls, pistas: Sequence[np.ndarray], frecuencia: int, canales: int, pausa_seg: float = 0.0) -> Tuple["BufferPCM", List[int]]:
+        """
+        Une las pistas (int16, forma (tramas, canales)) con `pausa_seg` de silencio entre cada par, en un array
+        reservado de una vez con su tamaño final. Devuelve el buffer y la trama de inicio de cada pista.
+        """
+        tramas_pausa = max(round(pausa_seg * frecuencia), 0)
+        total = sum(len(pista) for pista in pistas) + tramas_pausa * max(len(pistas) - 1, 0)
+        muestras = np.zeros((total, canales), dtype=np.float32) # Las pausas quedan a cero
+        inicios: List[int] = []
+        posicion = 0
+        for i, pista in enumerate(pistas):
+            if i > 0: posicion += tramas_pausa
+            inicios.append(posicion)
+            np.multiply(pista, 1.0 / _ESCALA_INT16, out=muestras[posicion:posicion + len(pista)])
+            posicion += len(pista)
+        return cls(muestras, frecuencia), inicios
+
+    @property
+    def tramas(self) -> int:
+        return len(self.muestras)
+
+    def duracion_seg(self) -> float:
+        return self.tramas / self.frecuencia
+
+    def aplicar_ganancia(self, ganancia_db: float) -> None:
+        if ganancia_db != 0.0: self.muestras *= np.float32(10.0 ** (ganancia_db / 20.0))
+
+    def pico_dbfs(self) -> float:
+        pico = float(np.max(np.abs(self.muestras))) if self.tramas else 0.0
+        return 20.0 * math.log10(pico) if pico > 0 else -math.inf
+
+    def sonoridad_lufs(self) -> float:
+        """Sonoridad integrada (LUFS) según ITU-R BS.1770-4. -inf para silencio o audios más cortos que un paso."""
+        paso = round(self.frecuencia * 0.1)
+        energia_pasos = sum(_energia_ponderada_por_paso(self.muestras[:, canal], self.frecuencia, paso) for canal in range(self.muestras.shape[1]))
+        if len(energia_pasos) == 0: return -math.inf
+        if len(energia_pasos) < _PASOS_POR_BLOQUE: # Más corto que un bloque: un único bloque con todo el audio
+            energia_bloques = np.array([energia_pasos.sum() / (len(energia_pasos) * paso)])
+        else:
+            energia_bloques = np.convolve(energia_pasos, np.ones(_PASOS_POR_BLOQUE), mode="valid") / (_PASOS_POR_BLOQUE * paso)
+        with np.errstate(divide="ignore"):
+            sonoridad_bloques = _DESPLAZAMIENTO_LUFS + 10.0 * np.log10(energia_bloques)
+        sobre_puerta_absoluta = energia_bloques[sonoridad_bloques > _PUERTA_ABSOLUTA_LUFS]
+        if len(sobre_puerta_absoluta) == 0: return -math.inf
+        puerta_relativa = _DESPLAZAMIENTO_LUFS + 10.0 * math.log10(sobre_puerta_absoluta.mean()) + _PUERTA_RELATIVA_LU
+        sobre_puertas = energia_bloques[(sonoridad_bloques > _PUERTA_ABSOLUTA_LUFS) & (sonoridad_bloques > puerta_relativa)]
+        return _DESPLAZAMIENTO_LUFS + 10.0 * math.log10(sobre_puertas.mean())
+
+    def normalizar(self, modo: ModoNormalizacion, objetivo_lufs: float, techo_dbfs: float) -> float:
+        """
+        "pico": lleva el pico a `techo_dbfs`. "lufs": lleva la sonoridad integrada a `objetivo_lufs` sin que el pico
+        supere `techo_dbfs` (sin limitador: si el techo lo impide, el audio queda por debajo del objetivo).
+        Devuelve la ganancia aplicada en dB (0 con "ninguna" o con silencio).
+        """
+        if modo == "ninguna": return 0.0
+        pico = self.pico_dbfs()
+        if pico == -math.inf: return 0.0
+        ganancia_db = techo_dbfs - pico
+        if modo == "lufs":
+            sonoridad = self.sonoridad_lufs()
+            if sonoridad == -math.inf: return 0.0
+            ganancia_db = min(objetivo_lufs - sonoridad, ganancia_db)
+        self.aplicar_ganancia(ganancia_db)
+        return ganancia_db
+
+    def a_pcm16(self) -> np.ndarray:
+        """Muestras en PCM de 16 bits (con recorte a fondo de escala), listas para codificar."""
+        pcm = np.empty(self.muestras.shape, dtype="<i2")
+        escaladas = self.muestras * np.float32(_ESCALA_INT16)
+        np.clip(escaladas, -_ESCALA_INT16, _ESCALA_INT16 - 1, out=escaladas)
+        np.rint(escaladas, out=escaladas)
+        pcm[...] = escaladas
+        return pcm
+
+
+def segmento_desde_pcm16(pcm: np.ndarray, frecuencia: int) -> AudioSegment:
+    """AudioSegment de pydub sobre muestras int16 (tramas, canales), para exportarlo con ffmpeg."""
+    return AudioSegment(data=np.ascontiguousarray(pcm).tobytes(), sample_width=2, frame_rate=frecuencia, channels=pcm.shape[1])
+
+
+# --- Ponderación K (ITU-R BS.1770): estante alto de +4 dB en 1500 Hz y pasa altos en 38 Hz ---
+
+def _biquad_estante_alto(frecuencia: int, ganancia_db: float = 4.0, frecuencia_corte: float = 1500.0, q: float = 1 / math.sqrt(2)) -> Tuple[List[float], List[float]]:
+    a = 10 ** (ganancia_db / 40.0)
+    w0 = 2 * math.pi * frecuencia_corte / frecuencia
+    alfa, coseno = math.sin(w0) / (2 * q), math.cos(w0)
+    b = [a * ((a + 1) + (a - 1) * coseno + 2 * math.sqrt(a) * alfa), -2 * a * ((a - 1) + (a + 1) * coseno), a * ((a + 1) + (a - 1) * coseno - 2 * math.sqrt(a) * alfa)]
+    den = [(a + 1) - (a - 1) * coseno + 2 * math.sqrt(a) * alfa, 2 * ((a - 1) - (a + 1) * coseno), (a + 1) - (a - 1) * coseno - 2 * math.sqrt(a) * alfa]
+    return b, den
+
+
+def _biquad_pasa_altos(frecuencia: int, frecuencia_corte: float = 38.0, q: float = 0.5) -> Tuple[List[float], List[float]]:
+    w0 = 2 * math.pi * frecuencia_corte / frecuencia
+    alfa, coseno = math.sin(w0) / (2 * q), math.cos(w0)
+    return [(1 + coseno) / 2, -(1 + coseno), (1 + coseno) / 2], [1 + alfa, -2 * coseno, 1 - alfa]
+
+
+_respuestas_k: Dict[Tuple[int, int], np.ndarray] = {}
+
+
+def _respuesta_ponderacion_k(frecuencia: int, tamano_fft: int) -> np.ndarray:
+    """Respuesta en frecuencia de la ponderación K en los bins de una rfft de `tamano_fft` puntos."""
+    clave = (frecuencia, tamano_fft)
+    if clave not in _respuestas_k:
+        z = np.exp(-1j * np.linspace(0, math.pi, tamano_fft // 2 + 1)) # z^-1 en cada bin
+        respuesta = np.ones_like(z)
+        for b, den in (_biquad_estante_alto(frecuencia), _biquad_pasa_altos(frecuencia)):
+            respuesta *= (b[0] + b[1] * z + b[2] * z * z) / (den[0] + den[1] * z + den[2] * z * z)
+        _respuestas_k[clave] = respuesta
+    return _respuestas_k[clave]
+
+
+def _energia_ponderada_por_paso(canal: np.ndarray, frecuencia: int, paso: int) -> np.ndarray:
+    """Suma de los cuadrados de la señal con ponderación K en cada paso completo de `paso` muestras."""
+    numero_pasos = len(canal) // paso
+    if numero_pasos == 0: return np.zeros(0)
+    margen = paso # 100 ms: la respuesta de ambos filtros ya se ha extinguido
+    tamano_fft = max(_TAMANO_FFT_PONDERACION, 1 << (_PASOS_POR_BLOQUE * paso + 2 * margen - 1).bit_length())
+    pasos_por_tramo = (tamano_fft - 2 * margen) // paso
+    respuesta = _respuesta_ponderacion_k(frecuencia, tamano_fft)
+    energia = np.empty(numero_pasos)
+    for primer_paso in range(0, numero_pasos, pasos_por_tramo):
+        pasos_tramo = min(pasos_por_tramo, numero_pasos - primer_paso)
+        inicio = primer_paso * paso
+        desde = max(inicio - margen, 0)
+        hasta = min(inicio + pasos_tramo * paso + margen, len(canal))
+        filtrada = np.fft.irfft(np.fft.rfft(canal[desde:hasta], tamano_fft) * respuesta, tamano_fft)
+        util = filtrada[inicio - desde:inicio - desde + pasos_tramo * paso]
+        energia[primer_paso:primer_paso + pasos_tramo] = np.square(util).reshape(pasos_tramo, paso).sum(axis=1)
+    return energia
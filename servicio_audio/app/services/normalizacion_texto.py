@@ -0,0 +1,214 @@
+import html
+import re
+from typing import Callable, List, Match, Optional, Pattern, Tuple, Union
+
+# Normalización del texto de narración antes de enviarlo al TTS.
+# El texto de Reddit llega con markdown, enlaces, emojis, notas de edición ("EDIT: ..."), puntuación repetida,
+# citas y entidades HTML: todo eso se factura como caracteres de TTS, alarga la síntesis y a veces la hace fallar.
+# Las reglas son tablas de expresiones regulares compiladas una sola vez al importar el módulo y se aplican en orden.
+
+Reemplazo = Union[str, Callable[[Match], str]]
+
+# --- Números en palabras (español) ---
+_UNIDADES = ["cero", "uno", "dos", "tres", "cuatro", "cinco", "seis", "siete", "ocho", "nueve",
+             "diez", "once", "doce", "trece", "catorce", "quince", "dieciséis", "diecisiete", "dieciocho", "diecinueve",
+             "veinte", "veintiuno", "veintidós", "veintitrés", "veinticuatro", "veinticinco", "veintiséis", "veintisiete", "veintiocho", "veintinueve"]
+_DECENAS = {3: "treinta", 4: "cuarenta", 5: "cincuenta", 6: "sesenta", 7: "setenta", 8: "ochenta", 9: "noventa"}
+_CENTENAS = {1: "ciento", 2: "doscientos", 3: "trescientos", 4: "cuatrocientos", 5: "quinientos",
+             6: "seiscientos", 7: "setecientos", 8: "ochocientos", 9: "novecientos"}
+_ORDINALES = {1: "primero", 2: "segundo", 3: "tercero", 4: "cuarto", 5: "quinto",
+              6: "sexto", 7: "séptimo", 8: "octavo", 9: "noveno", 10: "décimo"}
+MAXIMO_NUMERO_EXPANDIDO = 999_999_999_999 # Por encima se deja el número en cifras
+
+
+def _menor_de_mil(n: int) -> str:
+    if n < 30: return _UNIDADES[n]
+    if n < 100:
+        decena, unidad = divmod(n, 10)
+        return _DECENAS[decena] + (f" y {_UNIDADES[unidad]}" if unidad else "")
+    if n == 100: return "cien"
+    centena, resto = divmod(n, 100)
+    return _CENTENAS[centena] + (f" {_menor_de_mil(resto)}" if resto else "")
+
+
+def _apocopar(palabras: str) -> str:
+    """'uno' -> 'un' delante de 'mil'/'millones' (veintiún mil, treinta y un millones)."""
+    if palabras.endswith("veintiuno"): return palabras[:-len("veintiuno")] + "veintiún"
+    if palabras.endswith("uno"): return palabras[:-1]
+    return palabras
+
+
+def entero_a_palabras(n: int) -> str:
+    if n < 0: return "menos " + entero_a_palabras(-n)
+    if n < 1000: return _menor_de_mil(n)
+    if n < 1_000_000:
+        miles, resto = divmod(n, 1000)
+        prefijo = "mil" if miles == 1 else f"{_apocopar(_menor_de_mil(miles))} mil"
+        return prefijo + (f" {_menor_de_mil(resto)}" if resto else "")
+    millones, resto = divmod(n, 1_000_000)
+    prefijo = "un millón" if millones == 1 else f"{_apocopar(entero_a_palabras(millones))} millones"
+    return prefijo + (f" {entero_a_palabras(resto)}" if resto else "")
+
+
+def _numero_a_palabras(cifras: str) -> str:
+    """Convierte '1.500', '1,500', '3,5' o '42' a palabras; si no se puede, devuelve las cifras tal cual."""
+    if re.fullmatch(r"\d{1,3}(?:[.,]\d{3})+", cifras): # Separadores de miles
+        valor = int(re.sub(r"[.,]", "", cifras))
+        return entero_a_palabras(valor) if valor <= MAXIMO_NUMERO_EXPANDIDO else cifras
+    if re.fullmatch(r"\d+[.,]\d+", cifras): # Decimales: "tres coma cinco"
+        entera, decimal = re.split(r"[.,]", cifras)
+        if int(entera) > MAXIMO_NUMERO_EXPANDIDO or len(decimal) > 3: return cifras
+        # "3,05" -> "tres coma cero cinco"; "3,5" -> "tres coma cinco"; "3,25" -> "tres coma veinticinco"
+        parte_decimal = " ".join(_UNIDADES[int(d)] for d in decimal) if decimal.startswith("0") else entero_a_palabras(int(decimal))
+        return f"{entero_a_palabras(int(entera))} coma {parte_decimal}"
+    valor = int(cifras)
+    return entero_a_palabras(valor) if valor <= MAXIMO_NUMERO_EXPANDIDO else cifras
+
+
+_NUMERO = r"\d{1,3}(?:[.,]\d{3})+|\d+[.,]\d+|\d+"
+_ANTES_NUMERO = r"(?<![\w.,:/])"
+_DESPUES_NUMERO = r"(?![\w/]|[.,:]\d)"
+_SIGUIENTE_PALABRA = r"(?=\s+(?P<sig>[^\W\d_]+))?" # Palabra que sigue al número (para la concordancia)
+
+
+_TERMINACIONES_FEMENINAS = ("a", "as", "ción", "ciones", "sión", "siones", "dad", "dades", "tad", "tades")
+_FEMENINOS = frozenset(("vez", "veces", "noche", "noches", "mujer", "mujeres", "madre", "parte", "partes", "tarde", "tardes",
+                        "mano", "manos", "calle", "calles", "clase", "clases", "llave", "llaves", "foto", "fotos", "moto", "red", "gente"))
+_MASCULINOS_EN_A = frozenset(("día", "días", "problema", "problemas", "mapa", "programa", "sistema", "tema", "temas", "idioma", "planeta", "sofá"))
+
+
+def _concordar_uno(palabras: str, siguiente: Optional[str]) -> str:
+    """
+    Concordancia de 'uno' con el sustantivo que sigue: "21 años" -> "veintiún años", "1 vez" -> "una vez".
+    El género se estima por la terminación del sustantivo (-a/-as femenino), suficiente para la narración.
+    """
+    if not siguiente or not palabras.endswith("uno"): return palabras
+    siguiente = siguiente.lower()
+    if siguiente in _FEMENINOS or (siguiente.endswith(_TERMINACIONES_FEMENINAS) and siguiente not in _MASCULINOS_EN_A):
+        return palabras[:-1] + "a"
+    return _apocopar(palabras)
+
+
+def _entero_con_concordancia(m: Match) -> str:
+    cifras = m.group("n")
+    palabras = _numero_a_palabras(cifras)
+    if re.fullmatch(r"\d+[.,]\d+", cifras) and not re.fullmatch(r"\d{1,3}(?:[.,]\d{3})+", cifras): return palabras # Decimales
+    return _concordar_uno(palabras, m.group("sig"))
+
+
+def _moneda(singular: str, plural: str) -> Callable[[Match], str]:
+    def _reemplazar(m: Match) -> str:
+        cifras = m.group("n")
+        if cifras == "1": return f"un {singular}"
+        return f"{_apocopar(_numero_a_palabras(cifras))} {plural}"
+    return _reemplazar
+
+
+def _ordinal(m: Match) -> str:
+    n = int(m.group("n"))
+    palabra = _ORDINALES.get(n)
+    if palabra is None: return entero_a_palabras(n)
+    if m.group("genero") == "ª": return palabra[:-1] + "a"
+    if m.group("sig") and palabra in ("primero", "tercero"): return palabra[:-1] # "el 1º día" -> "el primer día"
+    return palabra
+
+
+_UNIDADES_MEDIDA = {"km": "kilómetros", "kg": "kilos", "cm": "centímetros", "mm": "milímetros", "mg": "miligramos", "ml": "mililitros"}
+
+_REGLAS_NUMEROS: List[Tuple[Pattern, Reemplazo]] = [
+    (re.compile(rf"{_ANTES_NUMERO}(?P<n>\d{{1,2}}):(?P<m>\d{{2}}){_DESPUES_NUMERO}"),
+     lambda m: entero_a_palabras(int(m.group("n"))) + ("" if m.group("m") == "00" else f" y {entero_a_palabras(int(m.group('m')))}")),
+    (re.compile(rf"(?:US)?\$\s?(?P<n>{_NUMERO}){_DESPUES_NUMERO}(?:\s?(?:USD|dólares|dolares)\b)?"), _moneda("dólar", "dólares")),
+    (re.compile(rf"{_ANTES_NUMERO}(?P<n>{_NUMERO})\s?(?:USD|dólares|dolares)\b"), _moneda("dólar", "dólares")),
+    (re.compile(rf"{_ANTES_NUMERO}(?P<n>{_NUMERO})\s?(?:€|EUR\b|euros\b)"), _moneda("euro", "euros")),
+    (re.compile(rf"{_ANTES_NUMERO}(?P<n>{_NUMERO})\s?%"), lambda m: f"{_numero_a_palabras(m.group('n'))} por ciento"),
+    (re.compile(rf"{_ANTES_NUMERO}(?P<n>{_NUMERO})\s?°\s?[CF]?(?!\w)"), lambda m: f"{_numero_a_palabras(m.group('n'))} grados"),
+    (re.compile(rf"{_ANTES_NUMERO}(?P<n>\d{{1,2}})\s?(?P<genero>[ºª]){_SIGUIENTE_PALABRA}"), _ordinal),
+    (re.compile(rf"{_ANTES_NUMERO}(?P<n>{_NUMERO})\s?(?P<u>{'|'.join(_UNIDADES_MEDIDA)})\b"),
+     lambda m: f"{_numero_a_palabras(m.group('n'))} {_UNIDADES_MEDIDA[m.group('u')]}"),
+    (re.compile(rf"{_ANTES_NUMERO}(?P<n>{_NUMERO}){_DESPUES_NUMERO}{_SIGUIENTE_PALABRA}"), _entero_con_concordancia),
+]
+
+# --- Abreviaturas habituales (se comparan sin distinguir mayúsculas salvo las que dependen de ello) ---
+_ABREVIATURAS = {
+    "aprox.": "aproximadamente", "etc.": "etcétera", "pág.": "página", "págs.": "páginas", "núm.": "número",
+    "sr.": "señor", "sra.": "señora", "srta.": "señorita", "dr.": "doctor", "dra.": "doctora",
+    "ud.": "usted", "uds.": "ustedes", "vs.": "contra", "vs": "contra", "p. ej.": "por ejemplo", "p.ej.": "por ejemplo",
+    "tb": "también", "tmb": "también", "tmbn": "también", "xq": "porque", "pq": "porque", "porq": "porque",
+    "q": "que", "k": "que", "xd": "", "lol": "", "tl;dr": "en resumen", "tldr": "en resumen",
+}
+_PATRON_ABREVIATURAS = re.compile(
+    r"(?<![\w.])(" + "|".join(re.escape(a) for a in sorted(_ABREVIATURAS, key=len, reverse=True)) + r")(?![\w])",
+    re.IGNORECASE
+)
+
+# --- Limpieza de markdown, enlaces, ruido y notas de edición (en este orden) ---
+_EMOJIS = (
+    r"\U0001F000-\U0001FAFF"  # Emoticonos, pictogramas, transporte, símbolos suplementarios, banderas
+    r"\u2600-\u27BF"          # Símbolos varios y dingbats
+    r"\u2300-\u23FF\u2B00-\u2BFF"
+    r"\uFE0E\uFE0F\u200D\u20E3" # Selectores de variación, unión de ancho cero, tecla
+)
+_REGLAS_LIMPIEZA: List[Tuple[Pattern, Reemplazo]] = [
+    (re.compile(r"[\u200B\u200C\u2060\uFEFF\u00AD]"), ""), # Espacios de ancho cero (&#x200B; de Reddit) y guiones blandos
+    (re.compile(r"```.*?```", re.DOTALL), " "), # Bloques de código
+    (re.compile(r"`([^`\n]*)`"), r"\1"),
+    (re.compile(r"!\[([^\]]*)\]\([^)]*\)"), r"\1"), # Imágenes
+    (re.compile(r"\[([^\]]+)\]\((?:[^()]|\([^)]*\))*\)"), r"\1"), # [texto](url) -> texto
+    (re.compile(r"<?(?:https?://|www\.)[^\s<>()\]]+>?", re.IGNORECASE), " "), # URLs sueltas
+    (re.compile(r"(?<![\w/])/?u/([^\W\d_]+)[\w-]*"), r"\1"), # u/usuario_123 -> usuario
+    (re.compile(r"(?<![\w/])/?r/([\w-]+)"), r"\1"), # r/subreddit -> subreddit
+    (re.compile(r"(?m)^\s{0,3}(?:[-*_]\s*){3,}$"), " "), # Separadores horizontales
+    (re.compile(r"(?m)^\s{0,3}#{1,6}\s*"), ""), # Encabezados
+    (re.compile(r"(?m)^\s*(?:&gt;|>)+\s?"), ""), # Marcas de cita (el texto citado se conserva)
+    (re.compile(r"(?m)^\s*(?:[-*+•]|\d{1,3}[.)])\s+"), ""), # Viñetas y listas numeradas
+    (re.compile(r">!(.*?)!<", re.DOTALL), r"\1"), # Spoilers
+    (re.compile(r"(\*{1,3}|_{2,3}|~~)(?=\S)(.+?)(?<=\S)\1", re.DOTALL), r"\2"), # Negrita, cursiva, tachado
+    (re.compile(r"(?<!\w)_(?=\S)([^_\n]+?)(?<=\S)_(?!\w)"), r"\1"), # _cursiva_
+    (re.compile(r"\^\(([^)]*)\)|\^"), r"\1"), # Superíndices
+    (re.compile(r"\|"), " "), # Celdas de tablas
+    (re.compile(r"\s&\s"), " y "),
+    # Notas de edición: desde la marca hasta el final de la línea ("EDIT:", "Edit 2 -", "Editado:", "UPDATE:", ...)
+    (re.compile(r"(?im)(?:^|(?<=[.!?…]))[ \t]*\(?(?:edit(?:ado|o)?|edición|edicion|update|actualización|actualizacion|eta)[ \t]*\d*[ \t]*[:\-–][^\n]*"), " "),
+    (re.compile(f"[{_EMOJIS}]+"), " "),
+    (re.compile(r"(?<!\d)[:;=]-?[)(DPp3/\\|]+(?!\w)"), " "), # Emoticonos de texto :) ;) :D (no "2:3", marcador o proporción)
+    (re.compile(r"[\[\]{}*_~#<>]"), " "), # Restos de marcado que el TTS no pronuncia
+]
+_REGLAS_PUNTUACION: List[Tuple[Pattern, Reemplazo]] = [
+    (re.compile(r"\.{4,}|…+"), "..."),
+    (re.compile(r"([!?¡¿])[!?¡¿1]+"), r"\1"), # "!!!", "?!?!", "!!1" -> un solo signo
+    (re.compile(r"([,;:])\1+"), r"\1"),
+    # "nooooo" -> "no": solo letras minúsculas, para no tocar números romanos ("capítulo III", "Luis XIII") ni siglas ("WWW")
+    (re.compile(r"([a-zñáéíóúü])\1{2,}"), r"\1"),
+    (re.compile(r"(?:(?<=\s)|^)[^\w\s¡¿\"'(]+(?=\s|$)"), " "), # Signos sueltos sin palabra
+    (re.compile(r"\s+([,.;:!?…)])"), r"\1"),
+    (re.compile(r"[ \t]+"), " "),
+    (re.compile(r" *\n(?: *\n)+ *"), "\n\n"), # Líneas en blanco -> un solo salto de párrafo (la división en fragmentos corta ahí)
+    (re.compile(r" *\n *"), "\n"),
+]
+
+
+def _aplicar(reglas: List[Tuple[Pattern, Reemplazo]], texto: str) -> str:
+    for patron, reemplazo in reglas:
+        texto = patron.sub(reemplazo, texto)
+    return texto
+
+
+def _expandir_abreviatura(m: Match) -> str:
+    encontrada = m.group(1)
+    if encontrada.lower() in ("q", "k") and encontrada.isupper(): return encontrada # "Q" o "K" sueltas en mayúscula (letras, no "que")
+    return _ABREVIATURAS[encontrada.lower()]
+
+
+def normalizar_texto_narracion(texto: str, expandir_numeros: bool = True) -> str:
+    """
+    Devuelve el texto listo para el TTS: sin markdown, enlaces, emojis ni notas de edición, con la puntuación
+    repetida y los espacios colapsados, las abreviaturas expandidas y (opcionalmente) los números en palabras.
+    """
+    if not texto: return ""
+    texto = html.unescape(html.unescape(texto)) # Reddit a veces escapa dos veces (&amp;gt;)
+    texto = _aplicar(_REGLAS_LIMPIEZA, texto)
+    texto = _PATRON_ABREVIATURAS.sub(_expandir_abreviatura, texto)
+    if expandir_numeros: texto = _aplicar(_REGLAS_NUMEROS, texto)
+    texto = _aplicar(_REGLAS_PUNTUACION, texto)
+    return texto.strip()
@@ -0,0 +1,120 @@
+import asyncio
+import itertools
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Deque, Dict, Literal
+
+# Reparto de las llamadas de síntesis entre proyectos. Con un semáforo por proveedor, los turnos se daban por orden
+# de llegada: un guion de 80 segmentos encolaba todas sus llamadas y un guion de 5 que llegaba después esperaba a
+# que terminaran. Ahora cada proveedor tiene un planificador con el mismo límite de llamadas en vuelo y una cola por
+# proyecto; cuando se libera un turno, se lo lleva el proyecto con menos uso ponderado (stride scheduling): con pesos
+# iguales es un round-robin entre los proyectos con trabajo pendiente, y la prioridad de la solicitud cambia el peso.
+# Un proyecto que vuelve tras estar inactivo entra con el uso actual, sin acumular crédito por el tiempo sin pedir.
+
+Prioridad = Literal["baja", "normal", "alta"]
+
+PESOS_POR_PRIORIDAD: Dict[str, float] = {"baja": 0.5, "normal": 1.0, "alta": 2.0} # Proporción de turnos entre proyectos en espera
+
+
+class PlanificadorTTS:
+    """Límite de llamadas en vuelo de un proveedor, con turnos repartidos entre proyectos según su peso."""
+
+    def __init__(self, capacidad: int, reparto_por_proyecto: bool = True):
+        self.capacidad = capacidad
+        self.reparto_por_proyecto = reparto_por_proyecto # Si es False, una sola cola (orden de llegada, como un semáforo)
+        self.en_vuelo = 0
+        self.turnos_concedidos = 0
+        self._colas: Dict[str, Deque["asyncio.Future[None]"]] = {}
+        self._en_vuelo_por_proyecto: Dict[str, int] = {}
+        self._uso: Dict[str, float] = {} # Uso ponderado de cada proyecto activo (en vuelo o en cola)
+        self._peso: Dict[str, float] = {}
+        self._uso_actual = 0.0 # Uso del último proyecto que recibió turno
+        self._llegada: Dict[str, int] = {} # Desempate: orden en que se activó cada proyecto
+        self._contador_llegadas = itertools.count()
+
+    @asynccontextmanager
+    async def turno(self, proyecto: str, prioridad: Prioridad = "normal") -> AsyncIterator[None]:
+        clave = proyecto if self.reparto_por_proyecto else ""
+        await self._adquirir(clave, PESOS_POR_PRIORIDAD.get(prioridad, 1.0))
+        try:
+            yield
+        finally:
+            self._liberar(clave)
+
+    async def _adquirir(self, clave: str, peso: float) -> None:
+        if clave not in self._uso:
+            self._uso[clave] = self._uso_actual
+            self._llegada[clave] = next(self._contador_llegadas)
+        self._peso[clave] = peso
+        if self.en_vuelo < self.capacidad and not any(self._colas.values()):
+            self._conceder(clave)
+            return
+        espera: "asyncio.Future[None]" = asyncio.get_running_loop().create_future()
+        self._colas.setdefault(clave, deque()).append(espera)
+        try:
+            await espera
+        except asyncio.CancelledError:
+            if espera.done() and not espera.cancelled():
+                self._liberar(clave) # El turno llegó a la vez que la cancelación: se devuelve
+            else:
+                # _despachar puede haber sacado ya de la cola la espera cancelada (y la cola puede no existir)
+                cola = self._colas.get(clave)
+                if cola is not None and espera in cola: cola.remove(espera)
+                self._olvidar_si_inactivo(clave)
+            raise
+
+    def _conceder(self, clave: str) -> None:
+        self.en_vuelo += 1
+        self.turnos_concedidos += 1
+        self._en_vuelo_por_proyecto[clave] = self._en_vuelo_por_proyecto.get(clave, 0) + 1
+        self._uso_actual = self._uso[clave]
+        self._uso[clave] += 1.0 / self._peso[clave]
+
+    def _liberar(self, clave: str) -> None:
+        self.en_vuelo -= 1
+        self._en_vuelo_por_proyecto[clave] -= 1
+        self._olvidar_si_inactivo(clave)
+        self._despachar()
+
+    def _despachar(self) -> None:
+        while self.en_vuelo < self.capacidad:
+            con_cola = [clave for clave, cola in self._colas.items() if cola]
+            if not con_cola: return
+            clave = min(con_cola, key=lambda c: (self._uso[c], self._llegada[c]))
+            espera = self._colas[clave].popleft()
+            if espera.done(): continue # Cancelada mientras esperaba
+            espera.set_result(None)
+            self._conceder(clave)
+
+    def _olvidar_si_inactivo(self, clave: str) -> None:
+        if self._en_vuelo_por_proyecto.get(clave, 0) == 0 and not self._colas.get(clave):
+            for registro in (self._colas, self._en_vuelo_por_proyecto, self._uso, self._peso, self._llegada):
+                registro.pop(clave, None)
+
+    def resumen(self) -> Dict[str, Any]:
+        return {
+            "capacidad": self.capacidad,
+            "reparto_por_proyecto": self.reparto_por_proyecto,
+            "en_vuelo": self.en_vuelo,
+            "turnos_concedidos": self.turnos_concedidos,
+            "proyectos": {
+                clave or "(todos)": {"en_vuelo": self._en_vuelo_por_proyecto.get(clave, 0), "en_cola": len(self._colas.get(clave, ())), "peso": self._peso[clave]}
+                for clave in self._uso
+            },
+        }
+
+
+# Un planificador por proveedor y por proceso. Se crean en el primer uso, dentro del event loop.
+_planificadores: Dict[str, PlanificadorTTS] = {}
+
+
+def obtener_planificador(proveedor: str, capacidad: int, reparto_por_proyecto: bool = True) -> PlanificadorTTS:
+    planificador = _planificadores.get(proveedor)
+    if planificador is None:
+        planificador = PlanificadorTTS(capacidad, reparto_por_proyecto)
+        _planificadores[proveedor] = planificador
+    return planificador
+
+
+def resumen_planificadores() -> Dict[str, Any]:
+    return {proveedor: planificador.resumen() for proveedor, planificador in _planificadores.items()}
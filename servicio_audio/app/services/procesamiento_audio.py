@@ -0,0 +1,208 @@
+import asyncio
+import io
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Dict, List, Optional, Tuple
+
+from pydub import AudioSegment
+
+from ..core.config import get_settings
+from .motor_pcm import BufferPCM, decodificar_pistas, segmento_desde_pcm16
+
+# Pool de procesos para el trabajo de CPU con pydub/ffmpeg (decodificar, concatenar, codificar).
+# Ejecutarlo dentro del handler async bloqueaba el event loop: mientras una solicitud codificaba, el resto
+# de solicitudes y el /health quedaban detenidos. Ahora el loop solo envía el trabajo y espera el resultado.
+# Los fragmentos viajan al proceso como los bytes originales del proveedor (una sola serialización, sin
+# BytesIO ni copias intermedias) y el proceso escribe el archivo final directamente: el audio codificado
+# no vuelve por la tubería, solo la duración y el tiempo empleado.
+# El pool se crea con "spawn": hacer fork de un proceso con el canal gRPC de Google TTS abierto no es seguro.
+# Dentro del proceso, la unión, las pausas y la normalización se hacen sobre arrays de NumPy (motor_pcm.py): cada
+# audio se decodifica una vez y cada archivo de salida se codifica una vez.
+
+# (modo, sonoridad objetivo en LUFS, techo de pico en dBFS), ver AUDIO_NORMALIZATION_*
+Normalizacion = Tuple[str, float, float]
+
+_pool: Optional[ProcessPoolExecutor] = None
+_semaforo_envios: Optional[asyncio.Semaphore] = None # Limita los trabajos enviados y aún no terminados (cola acotada)
+_metricas: Dict[str, Any] = {
+    "trabajos_completados": 0, "trabajos_fallidos": 0, "en_vuelo": 0, "en_vuelo_max": 0, "esperando_envio": 0,
+    "segundos_codificacion_total": 0.0, "segundos_codificacion_max": 0.0, "segundos_espera_total": 0.0
+}
+
+
+def _numero_procesos() -> int:
+    configurado = get_settings().AUDIO_PROCESS_POOL_WORKERS
+    return configurado if configurado > 0 else (os.cpu_count() or 1)
+
+
+# --- Funciones que se ejecutan en los procesos del pool (deben ser de nivel de módulo para poder serializarse) ---
+
+def _exportar_con_pydub(fragmentos_audio: List[bytes], ruta_salida: str, formato: str, bitrate_kbps: int, normalizacion: Normalizacion) -> Tuple[float, float]:
+    """Decodifica, concatena y normaliza los fragmentos y exporta el resultado. Devuelve (duración en segundos, segundos de CPU empleados)."""
+    inicio = time.perf_counter()
+    pistas, frecuencia, canales = decodificar_pistas(fragmentos_audio)
+    audio_final, _ = BufferPCM.concatenar(pistas, frecuencia, canales)
+    del pistas
+    audio_final.normalizar(*normalizacion)
+    if os.path.exists(ruta_salida): os.remove(ruta_salida) # Puede ser un enlace duro a la caché: no sobrescribir el audio cacheado
+    _exportar_segmento(segmento_desde_pcm16(audio_final.a_pcm16(), frecuencia), ruta_salida, formato, bitrate_kbps)
+    return audio_final.duracion_seg(), time.perf_counter() - inicio
+
+
+def _duracion_por_decodificacion(contenido_audio: bytes) -> Tuple[float, float]:
+    inicio = time.perf_counter()
+    return len(AudioSegment.from_file(io.BytesIO(contenido_audio))) / 1000.0, time.perf_counter() - inicio
+
+
+def _exportar_segmento(audio: AudioSegment, ruta_salida: str, formato: str, bitrate_kbps: int) -> None:
+    if formato == "mp3": audio.export(ruta_salida, format="mp3", bitrate=f"{bitrate_kbps}k")
+    elif formato == "wav": audio.export(ruta_salida, format="wav")
+    elif formato == "ogg": audio.export(ruta_salida, format="ogg", codec="opus")
+    else: raise ValueError(f"Formato de audio de salida no soportado para exportación con pydub: {formato}")
+
+
+def _combinar_con_pydub(
+    rutas_segmentos_por_escena: List[List[str]], rutas_escenas: List[str], ruta_proyecto: str, formato: str, pausa_seg: float, bitrate_kbps: int,
+    normalizacion: Normalizacion
+) -> Tuple[Tuple[List[Tuple[float, float, List[Tuple[float, float]]]], float], float]:
+    """
+    Combina los segmentos por escena y el proyecto completo. La misma pausa separa los segmentos y las escenas, así
+    que el proyecto es un único buffer con todos los segmentos y cada escena es un tramo de él (se normaliza el
+    proyecto entero, con una sola ganancia). Devuelve ((tiempos por escena, duración total), segundos de CPU).
+    """
+    inicio = time.perf_counter()
+    pistas, frecuencia, canales = decodificar_pistas([ruta for rutas_segmentos in rutas_segmentos_por_escena for ruta in rutas_segmentos])
+    tramas_pistas = [len(pista) for pista in pistas]
+    proyecto, inicios = BufferPCM.concatenar(pistas, frecuencia, canales, pausa_seg)
+    del pistas
+    proyecto.normalizar(*normalizacion)
+    pcm = proyecto.a_pcm16()
+    tiempos_escenas = []
+    primera = 0 # Índice de la primera pista de la escena
+    for rutas_segmentos, ruta_escena in zip(rutas_segmentos_por_escena, rutas_escenas):
+        ultima = primera + len(rutas_segmentos) - 1
+        inicio_escena, fin_escena = inicios[primera], inicios[ultima] + tramas_pistas[ultima]
+        tiempos_segmentos = [((inicios[k] - inicio_escena) / frecuencia, tramas_pistas[k] / frecuencia) for k in range(primera, ultima + 1)]
+        _exportar_segmento(segmento_desde_pcm16(pcm[inicio_escena:fin_escena], frecuencia), ruta_escena, formato, bitrate_kbps)
+        tiempos_escenas.append((inicio_escena / frecuencia, (fin_escena - inicio_escena) / frecuencia, tiempos_segmentos))
+        primera = ultima + 1
+    _exportar_segmento(segmento_desde_pcm16(pcm, frecuencia), ruta_proyecto, formato, bitrate_kbps)
+    return (tiempos_escenas, proyecto.duracion_seg()), time.perf_counter() - inicio
+
+
+# --- Lado del event loop ---
+
+def iniciar_pool_audio() -> None:
+    """Crea el pool de procesos. Se llama una vez al arrancar la app (si no, se crea en el primer uso)."""
+    _obtener_pool()
+
+
+def _obtener_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(max_workers=_numero_procesos(), mp_context=multiprocessing.get_context("spawn"))
+        print(f"Servicio Audio: Pool de procesos de audio creado ({_numero_procesos()} procesos, máx. {get_settings().AUDIO_PROCESS_POOL_MAX_PENDING} trabajos en vuelo).")
+    return _pool
+
+
+def _descartar_pool_roto(pool: ProcessPoolExecutor) -> None:
+    # Los trabajos que ya estaban en ese pool fallan a la vez: solo el primero lo cierra y lo descarta.
+    global _pool
+    if _pool is pool:
+        _pool = None
+        pool.shutdown(wait=False, cancel_futures=True)
+        print("Servicio Audio: ADVERTENCIA - Pool de procesos de audio roto: se cierra y el siguiente trabajo crea uno nuevo.")
+
+
+def cerrar_pool_audio() -> None:
+    global _pool, _semaforo_envios
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+        _semaforo_envios = None
+        print("Servicio Audio: Pool de procesos de audio cerrado.")
+
+
+async def _ejecutar_en_pool(funcion, *argumentos) -> Any:
+    """
+    Envía un trabajo al pool respetando el límite de trabajos en vuelo y registra las métricas.
+    `funcion` devuelve (resultado, segundos de CPU empleados); aquí se devuelve solo el resultado.
+    """
+    global _semaforo_envios
+    if _semaforo_envios is None:
+        _semaforo_envios = asyncio.Semaphore(get_settings().AUDIO_PROCESS_POOL_MAX_PENDING)
+    inicio = time.perf_counter()
+    _metricas["esperando_envio"] += 1
+    enviado = False
+    try:
+        async with _semaforo_envios:
+            _metricas["esperando_envio"] -= 1
+            enviado = True
+            _metricas["en_vuelo"] += 1
+            _metricas["en_vuelo_max"] = max(_metricas["en_vuelo_max"], _metricas["en_vuelo"])
+            # El pool se lee tras el turno: si otro trabajo lo descartó mientras se esperaba, aquí se crea uno nuevo
+            # (nunca se envía al ejecutor por defecto del loop, que correría pydub/ffmpeg en un hilo).
+            pool = _obtener_pool()
+            try:
+                resultado, segundos_codificacion = await asyncio.get_running_loop().run_in_executor(pool, funcion, *argumentos)
+            except BrokenProcessPool as e:
+                # Un proceso murió (ej. OOM de ffmpeg): se cierra y descarta el pool para que el siguiente trabajo cree uno nuevo.
+                _metricas["trabajos_fallidos"] += 1
+                _descartar_pool_roto(pool)
+                raise ValueError(f"El pool de procesos de audio dejó de funcionar: {e}")
+            except Exception:
+                _metricas["trabajos_fallidos"] += 1
+                raise
+            finally:
+                _metricas["en_vuelo"] -= 1
+    finally:
+        if not enviado: _metricas["esperando_envio"] -= 1 # Cancelado mientras esperaba turno
+    _metricas["trabajos_completados"] += 1
+    _metricas["segundos_codificacion_total"] += segundos_codificacion
+    _metricas["segundos_codificacion_max"] = max(_metricas["segundos_codificacion_max"], segundos_codificacion)
+    _metricas["segundos_espera_total"] += max(time.perf_counter() - inicio - segundos_codificacion, 0.0)
+    return resultado
+
+
+def normalizacion_configurada() -> Normalizacion:
+    settings = get_settings()
+    return settings.AUDIO_NORMALIZATION_MODE, settings.AUDIO_NORMALIZATION_TARGET_LUFS, settings.AUDIO_NORMALIZATION_PEAK_DBFS
+
+
+async def exportar_audio_con_pydub(fragmentos_audio: List[bytes], ruta_salida: str, formato: str, bitrate_kbps: int) -> float:
+    """Decodifica, concatena, normaliza y exporta en el pool de procesos. Devuelve la duración del audio en segundos."""
+    return await _ejecutar_en_pool(_exportar_con_pydub, fragmentos_audio, ruta_salida, formato, bitrate_kbps, normalizacion_configurada())
+
+
+async def calcular_duracion_decodificando(contenido_audio: bytes) -> float:
+    """Duración de un audio decodificándolo en el pool de procesos (para formatos sin cálculo de duración propio)."""
+    return await _ejecutar_en_pool(_duracion_por_decodificacion, contenido_audio)
+
+
+def resumen_metricas_pool_audio() -> Dict[str, Any]:
+    completados = _metricas["trabajos_completados"]
+    return {
+        "pool_activo": _pool is not None,
+        "procesos": _numero_procesos(),
+        "max_trabajos_en_vuelo": get_settings().AUDIO_PROCESS_POOL_MAX_PENDING,
+        "trabajos_completados": completados,
+        "trabajos_fallidos": _metricas["trabajos_fallidos"],
+        "en_vuelo": _metricas["en_vuelo"],
+        "en_vuelo_max": _metricas["en_vuelo_max"],
+        "esperando_envio": _metricas["esperando_envio"],
+        "segundos_codificacion_medio": round(_metricas["segundos_codificacion_total"] / completados, 4) if completados else None,
+        "segundos_codificacion_max": round(_metricas["segundos_codificacion_max"], 4),
+        "segundos_espera_medio": round(_metricas["segundos_espera_total"] / completados, 4) if completados else None,
+    }
+
+
+async def combinar_audio_con_pydub(
+    rutas_segmentos_por_escena: List[List[str]], rutas_escenas: List[str], ruta_proyecto: str, formato: str, pausa_seg: float, bitrate_kbps: int
+) -> Tuple[List[Tuple[float, float, List[Tuple[float, float]]]], float]:
+    """Audios combinados por escena y del proyecto con pydub, en el pool de procesos. Devuelve (tiempos por escena, duración total)."""
+    return await _ejecutar_en_pool(
+        _combinar_con_pydub, rutas_segmentos_por_escena, rutas_escenas, ruta_proyecto, formato, pausa_seg, bitrate_kbps, normalizacion_configurada()
+    )
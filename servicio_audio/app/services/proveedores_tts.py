@@ -0,0 +1,166 @@
+import asyncio
+import os
+import shutil
+import struct
+from typing import Dict, NamedTuple, Optional
+
+from google.api_core import exceptions as google_exceptions
+from google.cloud import texttospeech_v1 as tts # Cliente de Google Cloud TTS
+
+from ..core.config import get_settings
+from ..core.tts_client import sintetizar_google # Cliente de Google TTS compartido por el proceso
+from ..models_schemas import VoiceConfigInput
+
+# Proveedores de TTS detrás de una interfaz común (ProveedorTTS): resolver los parámetros de voz de una solicitud y
+# sintetizar un fragmento de texto. El resto del servicio (división en fragmentos, caché, unión sin transcodificar,
+# exportación con pydub) no depende del proveedor.
+# - "google": Google Cloud TTS (cuota y latencia de red).
+# - "local": espeak-ng dentro del propio contenedor. Sin red ni cuota: para previsualizaciones, pruebas y como respaldo
+#   cuando Google limita la tasa (TTS_FALLBACK_PROVIDER). Entrega WAV (LINEAR16) y se recodifica al formato de salida.
+settings = get_settings()
+
+
+class ParametrosVoz(NamedTuple):
+    idioma: str
+    voz: str
+    velocidad: float
+    tono: float
+    codificacion: str # Formato en que el proveedor entrega el audio: "MP3", "LINEAR16" u "OGG_OPUS"
+
+
+class LimiteTasaProveedor(ValueError):
+    """El proveedor rechazó la llamada por cuota o límite de tasa (ej. RESOURCE_EXHAUSTED de Google)."""
+
+
+class ProveedorTTS:
+    nombre = ""
+
+    def limite_concurrencia(self) -> int:
+        """Llamadas de síntesis en vuelo a la vez para este proveedor (en todo el proceso)."""
+        return 1
+
+    def parametros(self, config_voz: VoiceConfigInput, usar_voz_pedida: bool = True) -> ParametrosVoz:
+        """
+        Parámetros de voz para la solicitud. Con usar_voz_pedida=False se ignora `id_voz` (ej. al usar el proveedor
+        como respaldo, la voz pedida es de otro proveedor).
+        """
+        raise NotImplementedError
+
+    async def sintetizar(self, texto: str, parametros: ParametrosVoz) -> bytes:
+        """Audio del texto en la codificación de `parametros`. Lanza LimiteTasaProveedor si el proveedor limita la tasa."""
+        raise NotImplementedError
+
+
+def _codificacion_google() -> str:
+    formato_salida = settings.AUDIO_OUTPUT_FORMAT.upper()
+    if formato_salida in ("LINEAR16", "WAV"): return "LINEAR16"
+    if formato_salida == "OGG_OPUS": return "OGG_OPUS"
+    return "MP3" # Default
+
+
+class ProveedorGoogle(ProveedorTTS):
+    nombre = "google"
+
+    def limite_concurrencia(self) -> int:
+        return settings.TTS_GOOGLE_MAX_CONCURRENT_CALLS
+
+    def parametros(self, config_voz: VoiceConfigInput, usar_voz_pedida: bool = True) -> ParametrosVoz:
+        return ParametrosVoz(
+            idioma=config_voz.idioma_codigo or settings.GOOGLE_TTS_DEFAULT_LANGUAGE_CODE,
+            voz=(config_voz.id_voz if usar_voz_pedida else None) or settings.GOOGLE_TTS_DEFAULT_VOICE_NAME,
+            velocidad=config_voz.velocidad if config_voz.velocidad is not None else 1.0,
+            tono=config_voz.tono if config_voz.tono is not None else 0.0,
+            # Para MP3, Google determina la mejor sample_rate_hertz basada en su modelo de voz.
+            codificacion=_codificacion_google()
+        )
+
+    async def sintetizar(self, texto: str, parametros: ParametrosVoz) -> bytes:
+        try:
+            respuesta = await sintetizar_google({
+                "input": tts.SynthesisInput(text=texto),
+                "voice": tts.VoiceSelectionParams(language_code=parametros.idioma, name=parametros.voz),
+                "audio_config": tts.AudioConfig(
+                    audio_encoding=tts.AudioEncoding[parametros.codificacion], speaking_rate=parametros.velocidad, pitch=parametros.tono
+                ),
+            })
+        except google_exceptions.ResourceExhausted as e:
+            raise LimiteTasaProveedor(f"Límite de tasa excedido en Google TTS: {e}")
+        return respuesta.audio_content
+
+
+# espeak-ng: velocidad en palabras por minuto (175 por defecto) y tono de 0 a 99 (50 por defecto).
+# El tono de la solicitud está en semitonos al estilo de Google (-20 a 20).
+_PALABRAS_POR_MINUTO_BASE = 175
+_PALABRAS_POR_MINUTO_RANGO = (80, 450)
+_TONO_ESPEAK_POR_SEMITONO = 2.5
+
+
+def _corregir_cabecera_wav(datos: bytes) -> bytes:
+    """
+    espeak-ng escribe en stdout sin poder volver atrás, así que la cabecera WAV lleva tamaños de relleno.
+    Se corrigen con la longitud real para que la duración y la unión de fragmentos WAV sean correctas.
+    """
+    if len(datos) < 12 or datos[:4] != b"RIFF" or datos[8:12] != b"WAVE": return datos
+    corregidos = bytearray(datos)
+    struct.pack_into("<I", corregidos, 4, len(datos) - 8)
+    posicion = 12
+    while posicion + 8 <= len(datos):
+        identificador, tamano = datos[posicion:posicion + 4], struct.unpack_from("<I", datos, posicion + 4)[0]
+        if identificador == b"data":
+            struct.pack_into("<I", corregidos, posicion + 4, len(datos) - posicion - 8)
+            break
+        posicion += 8 + tamano + (tamano & 1)
+    return bytes(corregidos)
+
+
+class ProveedorEspeak(ProveedorTTS):
+    nombre = "local"
+
+    def limite_concurrencia(self) -> int:
+        configurado = settings.TTS_LOCAL_MAX_CONCURRENT
+        return configurado if configurado > 0 else (os.cpu_count() or 1)
+
+    def parametros(self, config_voz: VoiceConfigInput, usar_voz_pedida: bool = True) -> ParametrosVoz:
+        return ParametrosVoz(
+            idioma=config_voz.idioma_codigo or settings.GOOGLE_TTS_DEFAULT_LANGUAGE_CODE,
+            voz=(config_voz.id_voz if usar_voz_pedida else None) or settings.TTS_LOCAL_DEFAULT_VOICE,
+            velocidad=config_voz.velocidad if config_voz.velocidad is not None else 1.0,
+            tono=config_voz.tono if config_voz.tono is not None else 0.0,
+            codificacion="LINEAR16"
+        )
+
+    async def sintetizar(self, texto: str, parametros: ParametrosVoz) -> bytes:
+        binario = shutil.which(settings.TTS_LOCAL_ESPEAK_BINARY)
+        if binario is None:
+            raise ValueError(f"Error del proveedor TTS local: no se encontró el ejecutable '{settings.TTS_LOCAL_ESPEAK_BINARY}' (instala espeak-ng).")
+        minimo, maximo = _PALABRAS_POR_MINUTO_RANGO
+        palabras_por_minuto = min(max(round(_PALABRAS_POR_MINUTO_BASE * parametros.velocidad), minimo), maximo)
+        tono = min(max(round(50 + parametros.tono * _TONO_ESPEAK_POR_SEMITONO), 0), 99)
+        # Proceso aparte y sin shell: el texto va por stdin (sin límites de longitud de argumentos ni problemas de comillas).
+        proceso = await asyncio.create_subprocess_exec(
+            binario, "--stdout", "--stdin", "-b", "1", "-v", parametros.voz, "-s", str(palabras_por_minuto), "-p", str(tono),
+            stdin=asyncio.subprocess.PIPE, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE
+        )
+        salida, errores = await proceso.communicate(texto.encode("utf-8"))
+        if proceso.returncode != 0 or not salida:
+            raise ValueError(f"Error del proveedor TTS local (espeak-ng, código {proceso.returncode}): {errores.decode('utf-8', errors='replace')[:200]}")
+        return _corregir_cabecera_wav(salida)
+
+
+_PROVEEDORES: Dict[str, ProveedorTTS] = {"google": ProveedorGoogle(), "local": ProveedorEspeak()}
+_ALIAS_PROVEEDORES = {"espeak": "local", "espeak-ng": "local"}
+
+
+def obtener_proveedor(nombre: str) -> ProveedorTTS:
+    nombre_normalizado = nombre.lower()
+    proveedor = _PROVEEDORES.get(_ALIAS_PROVEEDORES.get(nombre_normalizado, nombre_normalizado))
+    if proveedor is None:
+        raise ValueError(f"Proveedor TTS '{nombre}' no soportado. Disponibles: {', '.join(sorted(_PROVEEDORES))}.")
+    return proveedor
+
+
+def proveedor_de_respaldo(proveedor: ProveedorTTS) -> Optional[ProveedorTTS]:
+    """Proveedor a usar cuando `proveedor` limita la tasa (TTS_FALLBACK_PROVIDER), o None si no hay respaldo."""
+    if not settings.TTS_FALLBACK_PROVIDER: return None
+    respaldo = obtener_proveedor(settings.TTS_FALLBACK_PROVIDER)
+    return respaldo if respaldo is not proveedor else None
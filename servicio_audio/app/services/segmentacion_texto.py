@@ -0,0 +1,126 @@
+import re
+from typing import List, Optional, Tuple
+
+# División del texto de narración en fragmentos para el TTS.
+# Google Cloud TTS limita cada solicitud a 5000 bytes de texto, no a 5000 caracteres: en español las vocales
+# acentuadas, la "ñ", "¿", "¡" y las comillas tipográficas ocupan 2 o 3 bytes en UTF-8, así que un límite por
+# caracteres podía exceder el de la API. Cada fragmento se resuelve con operaciones nativas sobre su ventana: se
+# codifica una vez la ventana de `limite_bytes` caracteres para saber hasta qué carácter cabe y, dentro de ella, se
+# busca desde el final el último punto de corte de cada tipo (párrafo, frase, línea, cláusula, espacio). Así el
+# trabajo en Python es por fragmento y no por palabra (ver tests/benchmarks/bench_segmentacion_texto.py).
+
+# Último punto de corte de cada tipo dentro de la ventana. El prefijo voraz (?s:.*) hace que match() devuelva la
+# última aparición. El grupo "fin" termina donde acaba el texto del fragmento; el resto del patrón solo mira (sin
+# consumir) el espacio que lo separa del siguiente.
+_CORTES_PREFERIDOS = [ # En orden de preferencia
+    re.compile(r"(?s:.*)(?P<fin>\S)(?=\s*\n\s*\n)"), # Párrafo (también "Fin.\n\nOtro párrafo")
+    re.compile(r"(?s:.*)(?P<fin>[.!?…]+[\"'”’»)\]]*)(?=\s)"), # Frase (se descartan abreviaturas y "etc. y")
+    re.compile(r"(?s:.*)(?P<fin>\S)(?=\s*\n)"), # Línea
+    re.compile(r"(?s:.*)(?P<fin>[,;:])(?=\s)"), # Cláusula
+]
+_CORTE_FRASE = _CORTES_PREFERIDOS[1]
+_CORTE_ESPACIO = re.compile(r"(?s:.*)(?P<fin>\S)(?=\s)") # Cualquier espacio: es también el corte más lejano de cualquier tipo
+_ESPACIOS = re.compile(r"\s*")
+_MARGEN_CARACTERES_CORTE = 8 # Puntuación y comillas de cierre que puede abarcar un corte antes del mínimo
+
+# Palabras que, seguidas de punto, no terminan la frase ("el Dr. Pérez", "p. ej. esto"). Las iniciales sueltas
+# ("J. K.") tampoco. "etc." queda fuera porque suele cerrar la frase.
+_ABREVIATURAS_SIN_FIN_DE_FRASE = {
+    "sr", "sra", "srta", "dr", "dra", "ud", "uds", "vs", "aprox", "pág", "págs", "núm", "ej", "lic", "ing", "prof", "av", "art", "cap",
+}
+_LARGO_MAXIMO_ABREVIATURA = 5
+
+# Fragmentos cuyo corte preferido deja menos de esta fracción del límite se cortan en el punto más lejano
+# (de cualquier tipo) para no generar fragmentos diminutos por un salto de párrafo temprano.
+_FRACCION_MINIMA_FRAGMENTO = 0.5
+
+_BYTES_MAXIMOS_CARACTER = 4 # Un carácter ocupa como mucho 4 bytes en UTF-8: con límites menores el corte duro no avanzaría
+
+
+def _es_fin_de_frase(texto: str, inicio_puntuacion: int, siguiente: int) -> bool:
+    if siguiente < len(texto) and texto[siguiente].islower(): return False # "aprox. cinco", "etc. y"
+    if texto[inicio_puntuacion] == "." and not texto.startswith("..", inicio_puntuacion) and _es_abreviatura(texto, inicio_puntuacion):
+        return False
+    return True
+
+
+def _es_abreviatura(texto: str, posicion_punto: int) -> bool:
+    inicio = posicion_punto
+    while inicio > 0 and posicion_punto - inicio <= _LARGO_MAXIMO_ABREVIATURA and texto[inicio - 1].isalpha():
+        inicio -= 1
+    if inicio > 0 and texto[inicio - 1].isalpha(): return False # Palabra más larga que cualquier abreviatura
+    palabra = texto[inicio:posicion_punto].lower()
+    return len(palabra) == 1 or palabra in _ABREVIATURAS_SIN_FIN_DE_FRASE
+
+
+def _bytes_utf8(texto: str) -> int:
+    return len(texto.encode("utf-8"))
+
+
+def _fin_que_cabe(texto: str, inicio: int, limite_bytes: int) -> int:
+    """Índice del carácter más lejano tal que texto[inicio:fin] ocupa como mucho `limite_bytes` bytes en UTF-8."""
+    ventana = texto[inicio:inicio + limite_bytes] # Cada carácter ocupa al menos un byte: no cabe más que esto
+    codificada = ventana.encode("utf-8")
+    if len(codificada) <= limite_bytes: return inicio + len(ventana)
+    return inicio + len(codificada[:limite_bytes].decode("utf-8", errors="ignore")) # Sin el carácter cortado a medias
+
+
+def _ultimo_corte(patron: "re.Pattern[str]", texto: str, desde: int, hasta: int) -> Optional[Tuple[int, int]]:
+    """Último corte de `patron` en texto[desde:hasta] como (fin del texto del fragmento, inicio del siguiente)."""
+    while True:
+        corte = patron.match(texto, desde, hasta)
+        if corte is None: return None
+        siguiente = _ESPACIOS.match(texto, corte.end("fin")).end()
+        if patron is not _CORTE_FRASE or _es_fin_de_frase(texto, corte.start("fin"), siguiente): return corte.end("fin"), siguiente
+        hasta = corte.start("fin") # Abreviatura o frase que sigue en minúscula: se busca la anterior
+
+
+def _deja_el_minimo(texto: str, inicio: int, fin_texto: int, bytes_minimos: int) -> bool:
+    # Cada carácter ocupa al menos un byte: si hay tantos caracteres como bytes mínimos, no hace falta codificar
+    return fin_texto - inicio >= bytes_minimos or _bytes_utf8(texto[inicio:fin_texto]) >= bytes_minimos
+
+
+def _mejor_corte(texto: str, inicio: int, fin: int, limite_bytes: int) -> Optional[Tuple[int, int]]:
+    """
+    (fin del texto del fragmento, inicio del siguiente) para cortar texto[inicio:fin], o None si no hay ningún punto de
+    corte. Se elige el tipo preferido cuyo último corte deja al menos _FRACCION_MINIMA_FRAGMENTO del límite; si ninguno
+    lo deja, el corte más lejano.
+    """
+    # Hasta dónde pueden llegar los patrones: el espacio que sigue a un corte en `fin` cuenta, el texto posterior no.
+    hasta = max(_ESPACIOS.match(texto, fin).end(), fin + 1)
+    mas_lejano = _ultimo_corte(_CORTE_ESPACIO, texto, inicio, hasta)
+    bytes_minimos = int(limite_bytes * _FRACCION_MINIMA_FRAGMENTO)
+    if mas_lejano is None or not _deja_el_minimo(texto, inicio, mas_lejano[0], bytes_minimos): return mas_lejano
+    # Solo interesan los cortes que dejan el mínimo: se busca a partir de ahí (con margen para la puntuación)
+    desde = max(inicio + len(texto[inicio:fin].encode("utf-8")[:bytes_minimos].decode("utf-8", errors="ignore")) - _MARGEN_CARACTERES_CORTE, inicio)
+    for patron in _CORTES_PREFERIDOS:
+        corte = _ultimo_corte(patron, texto, desde, hasta)
+        if corte is not None and _deja_el_minimo(texto, inicio, corte[0], bytes_minimos): return corte
+    return mas_lejano
+
+
+def dividir_texto_en_fragmentos(texto_completo: str, limite_bytes: int) -> List[str]:
+    """
+    Divide el texto en fragmentos de como mucho `limite_bytes` bytes en UTF-8, cortando preferentemente entre
+    párrafos, luego entre frases (sin cortar tras abreviaturas como "Sr." o "p. ej."), saltos de línea, comas y
+    por último espacios. Una palabra que por sí sola excede el límite se corta en un límite de carácter.
+    Lanza ValueError si el límite no admite un carácter de 4 bytes (el máximo en UTF-8).
+    """
+    if limite_bytes < _BYTES_MAXIMOS_CARACTER:
+        raise ValueError(f"El límite de bytes por fragmento ({limite_bytes}) debe ser de al menos {_BYTES_MAXIMOS_CARACTER}.")
+    texto = texto_completo.strip()
+    fragmentos: List[str] = []
+    inicio = 0
+    while inicio < len(texto):
+        fin = _fin_que_cabe(texto, inicio, limite_bytes)
+        if fin == len(texto):
+            fragmentos.append(texto[inicio:])
+            break
+        corte = _mejor_corte(texto, inicio, fin, limite_bytes)
+        if corte is None: # Sin puntos de corte (una "palabra" más larga que el límite): corte duro en un límite de carácter
+            fragmentos.append(texto[inicio:fin])
+            inicio = fin
+        else:
+            fragmentos.append(texto[inicio:corte[0]])
+            inicio = corte[1]
+    return [f for f in (f.strip() for f in fragmentos) if f]
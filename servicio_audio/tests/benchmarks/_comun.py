@@ -0,0 +1,31 @@
+import shutil
+import statistics
+import time
+from typing import Callable, Dict, Optional
+
+# Utilidades compartidas por los micro-benchmarks de esta carpeta. No son tests (pytest no los recoge): se ejecutan a
+# mano desde servicio_audio, p. ej. `python -m tests.benchmarks.bench_duracion_audio`, e imprimen una tabla de tiempos.
+
+
+def medir(funcion: Callable[[], object], repeticiones: int = 20, calentamiento: int = 2) -> Dict[str, float]:
+    """Ejecuta `funcion` varias veces y devuelve la mediana y el mínimo en milisegundos."""
+    for _ in range(calentamiento): funcion()
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        funcion()
+        tiempos.append((time.perf_counter() - inicio) * 1000.0)
+    return {"mediana_ms": statistics.median(tiempos), "min_ms": min(tiempos)}
+
+
+def imprimir_fila(nombre: str, resultado: Dict[str, float], referencia: Optional[Dict[str, float]] = None) -> None:
+    fila = f"  {nombre:<45} mediana {resultado['mediana_ms']:10.3f} ms   mín {resultado['min_ms']:10.3f} ms"
+    if referencia:
+        factor = referencia["mediana_ms"] / resultado["mediana_ms"]
+        fila += f"   x{factor:.1f} más rápido" if factor >= 1 else f"   x{1 / factor:.1f} más lento"
+    print(fila)
+
+
+def ffmpeg_disponible() -> bool:
+    """pydub necesita ffmpeg (y ffprobe, para detectar el formato) para decodificar y codificar MP3/OGG."""
+    return shutil.which("ffmpeg") is not None and shutil.which("ffprobe") is not None
@@ -0,0 +1,94 @@
+import asyncio
+import io
+import wave
+from typing import Any, Optional
+
+import grpc
+from google.cloud import texttospeech_v1 as tts
+from google.cloud.texttospeech_v1.services.text_to_speech.transports import TextToSpeechGrpcAsyncIOTransport
+
+from app.core import tts_client
+from app.core.config import get_settings
+from app.services import planificador_tts
+
+# Servidor gRPC local que imita SynthesizeSpeech de Google Cloud TTS (v1), para medir el servicio sin red ni cuota.
+# Responde tras una latencia fija más un tiempo por carácter con un WAV (LINEAR16) de silencio de duración
+# proporcional al texto, y cuenta cuántas llamadas tiene en vuelo a la vez. El cliente compartido del proceso
+# (tts_client) se sustituye por uno con canal sin TLS contra este servidor, así que la síntesis recorre el mismo
+# camino que en producción: planificador, cliente gRPC async, HTTP/2.
+
+FRECUENCIA_WAV = 24000
+CARACTERES_POR_SEGUNDO_AUDIO = 15.0 # Locución en español a velocidad normal
+
+
+def wav_de_silencio(segundos: float) -> bytes:
+    salida = io.BytesIO()
+    with wave.open(salida, "wb") as escritor:
+        escritor.setnchannels(1)
+        escritor.setsampwidth(2)
+        escritor.setframerate(FRECUENCIA_WAV)
+        escritor.writeframes(bytes(2 * round(segundos * FRECUENCIA_WAV)))
+    return salida.getvalue()
+
+
+class ServidorTTSFalso:
+    def __init__(self, latencia_seg: float = 0.3, segundos_por_caracter: float = 0.0002):
+        self.latencia_seg = latencia_seg
+        self.segundos_por_caracter = segundos_por_caracter
+        self.llamadas = 0
+        self.en_vuelo = 0
+        self.max_en_vuelo = 0
+        self._servidor: Optional[grpc.aio.Server] = None
+        self._cliente_anterior: Optional[Any] = None
+
+    def reiniciar_contadores(self) -> None:
+        self.llamadas = self.max_en_vuelo = 0
+
+    async def _sintetizar(self, solicitud: tts.SynthesizeSpeechRequest, contexto: grpc.aio.ServicerContext) -> tts.SynthesizeSpeechResponse:
+        texto = solicitud.input.text or solicitud.input.ssml
+        self.llamadas += 1
+        self.en_vuelo += 1
+        self.max_en_vuelo = max(self.max_en_vuelo, self.en_vuelo)
+        try:
+            await asyncio.sleep(self.latencia_seg + self.segundos_por_caracter * len(texto))
+        finally:
+            self.en_vuelo -= 1
+        return tts.SynthesizeSpeechResponse(audio_content=wav_de_silencio(len(texto) / CARACTERES_POR_SEGUNDO_AUDIO))
+
+    async def __aenter__(self) -> "ServidorTTSFalso":
+        self._servidor = grpc.aio.server()
+        self._servidor.add_generic_rpc_handlers((grpc.method_handlers_generic_handler("google.cloud.texttospeech.v1.TextToSpeech", {
+            "SynthesizeSpeech": grpc.unary_unary_rpc_method_handler(
+                self._sintetizar, request_deserializer=tts.SynthesizeSpeechRequest.deserialize, response_serializer=tts.SynthesizeSpeechResponse.serialize
+            )
+        }),))
+        puerto = self._servidor.add_insecure_port("127.0.0.1:0")
+        await self._servidor.start()
+        canal = grpc.aio.insecure_channel(f"127.0.0.1:{puerto}")
+        self._cliente_anterior = tts_client._clientes_tts.get("v1")
+        tts_client._clientes_tts["v1"] = tts.TextToSpeechAsyncClient(transport=TextToSpeechGrpcAsyncIOTransport(channel=canal))
+        return self
+
+    async def __aexit__(self, *excepcion: Any) -> None:
+        await tts_client._clientes_tts["v1"].transport.close()
+        if self._cliente_anterior is None: tts_client._clientes_tts.pop("v1", None)
+        else: tts_client._clientes_tts["v1"] = self._cliente_anterior
+        await self._servidor.stop(grace=None)
+
+
+def preparar_servicio(directorio_salida: str) -> None:
+    """Audios en WAV (la ruta sin transcodificar, sin ffmpeg), sin caché de audios y escritos en `directorio_salida`."""
+    settings = get_settings()
+    settings.AUDIO_OUTPUT_FORMAT = "WAV"
+    settings.TTS_CACHE_ENABLED = False
+    settings.TTS_SSML_BATCHING_ENABLED = False
+    settings.AUDIO_STORAGE_BACKEND = "local"
+    settings.AUDIO_STORAGE_PATH = directorio_salida
+
+
+def fijar_concurrencia(proveedor: str, limite: int) -> None:
+    """Límite de llamadas en vuelo del proveedor; el planificador se vuelve a crear con él en el siguiente uso."""
+    settings = get_settings()
+    if proveedor == "google": settings.TTS_GOOGLE_MAX_CONCURRENT_CALLS = limite
+    else: settings.TTS_LOCAL_MAX_CONCURRENT = limite
+    planificador_tts._planificadores.pop(proveedor, None)
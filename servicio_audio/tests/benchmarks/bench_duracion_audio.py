@@ -0,0 +1,60 @@
+import io
+import sys
+import wave
+
+import numpy as np
+
+from app.services.formato_audio import concatenar_mp3, duracion_audio
+from tests.benchmarks._comun import ffmpeg_disponible, imprimir_fila, medir
+
+# Duración de un audio leyendo solo el contenedor (formato_audio.duracion_audio) frente a decodificarlo con pydub
+# (lo que hacía el servicio antes). Ejecutar desde servicio_audio: python -m tests.benchmarks.bench_duracion_audio
+# Requiere ffmpeg para generar el MP3/OGG de prueba y para la referencia con pydub; sin ffmpeg solo se mide el WAV.
+
+DURACIONES_SEG = (5, 60, 600)
+FRECUENCIA = 24000 # La de las voces de Google TTS
+
+
+def _tono(segundos: int) -> np.ndarray:
+    t = np.arange(segundos * FRECUENCIA) / FRECUENCIA
+    return (np.sin(2 * np.pi * 220.0 * t) * 8000).astype("<i2")
+
+
+def _codificar(pcm: np.ndarray, formato: str) -> bytes:
+    salida = io.BytesIO()
+    if formato == "wav":
+        with wave.open(salida, "wb") as escritor:
+            escritor.setnchannels(1)
+            escritor.setsampwidth(2)
+            escritor.setframerate(FRECUENCIA)
+            escritor.writeframes(pcm.tobytes())
+        return salida.getvalue()
+    from pydub import AudioSegment
+    audio = AudioSegment(data=pcm.tobytes(), sample_width=2, frame_rate=FRECUENCIA, channels=1)
+    if formato == "ogg": audio.export(salida, format="ogg", codec="libopus")
+    else: audio.export(salida, format="mp3", bitrate="32k")
+    return salida.getvalue()
+
+
+def main() -> None:
+    con_ffmpeg = ffmpeg_disponible()
+    if not con_ffmpeg: print("ffmpeg/ffprobe no encontrados: solo se mide WAV y sin referencia de pydub.")
+    casos = [("WAV", "wav")] + ([("MP3", "mp3"), ("MP3 sin cabecera Xing", "mp3"), ("OGG Opus", "ogg")] if con_ffmpeg else [])
+    for segundos in DURACIONES_SEG:
+        pcm = _tono(segundos)
+        for etiqueta, formato in casos:
+            datos = _codificar(pcm, formato)
+            if etiqueta == "MP3 sin cabecera Xing": # Sin cabecera Xing/Info se recorren las cabeceras de todas las tramas
+                datos = concatenar_mp3([datos])[0]
+            print(f"{etiqueta} de {segundos} s ({len(datos) / 1024:.0f} KB), duración leída: {duracion_audio(datos, formato):.3f} s")
+            cabeceras = medir(lambda: duracion_audio(datos, formato))
+            referencia = None
+            if con_ffmpeg:
+                from pydub import AudioSegment
+                referencia = medir(lambda: len(AudioSegment.from_file(io.BytesIO(datos))) / 1000.0, repeticiones=5, calentamiento=1)
+                imprimir_fila("pydub (decodificación completa)", referencia)
+            imprimir_fila("duracion_audio (solo contenedor)", cabeceras, referencia)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,55 @@
+import sys
+from typing import List
+
+import numpy as np
+from pydub import AudioSegment
+
+from app.services.motor_pcm import BufferPCM
+from tests.benchmarks._comun import imprimir_fila, medir
+
+# Unión de segmentos con pausas y normalización de un proyecto, ya decodificados (la decodificación y la codificación
+# con ffmpeg cuestan lo mismo en ambos caminos): BufferPCM (motor_pcm.py) frente al camino anterior con pydub, que
+# acumulaba `escena + pausa + segmento` y copiaba todo el audio unido en cada paso. pydub no mide LUFS: la fila de
+# referencia normaliza por pico. Ejecutar desde servicio_audio: python -m tests.benchmarks.bench_motor_pcm
+
+FRECUENCIA = 24000 # LINEAR16 de Google TTS por defecto
+SEGUNDOS_POR_SEGMENTO = 4.0
+PAUSA_SEG = 0.3
+TECHO_DBFS = -1.0
+OBJETIVO_LUFS = -16.0
+
+
+def _pistas(numero: int) -> List[np.ndarray]:
+    generador = np.random.default_rng(49)
+    tramas = round(SEGUNDOS_POR_SEGMENTO * FRECUENCIA)
+    return [(generador.standard_normal((tramas, 1)) * 3000).clip(-32768, 32767).astype("<i2") for _ in range(numero)]
+
+
+def _unir_con_pydub(segmentos: List[AudioSegment]) -> AudioSegment:
+    pausa = AudioSegment.silent(duration=round(PAUSA_SEG * 1000), frame_rate=FRECUENCIA)
+    audio = None
+    for segmento in segmentos:
+        audio = segmento if audio is None else audio + pausa + segmento
+    return audio.apply_gain(TECHO_DBFS - audio.max_dBFS)
+
+
+def _unir_con_buffer_pcm(pistas: List[np.ndarray], modo: str) -> np.ndarray:
+    audio, _ = BufferPCM.concatenar(pistas, FRECUENCIA, 1, PAUSA_SEG)
+    audio.normalizar(modo, OBJETIVO_LUFS, TECHO_DBFS)
+    return audio.a_pcm16()
+
+
+def main() -> None:
+    for numero in (10, 50, 200):
+        pistas = _pistas(numero)
+        segmentos = [AudioSegment(data=pista.tobytes(), sample_width=2, frame_rate=FRECUENCIA, channels=1) for pista in pistas]
+        print(f"{numero} segmentos de {SEGUNDOS_POR_SEGMENTO:.0f} s ({numero * SEGUNDOS_POR_SEGMENTO / 60:.1f} min a {FRECUENCIA} Hz)")
+        repeticiones = 5 if numero >= 200 else 20
+        referencia = medir(lambda: _unir_con_pydub(segmentos), repeticiones)
+        imprimir_fila("pydub: escena + pausa + segmento, pico", referencia)
+        imprimir_fila("BufferPCM: concatenar, pico", medir(lambda: _unir_con_buffer_pcm(pistas, "pico"), repeticiones), referencia)
+        imprimir_fila("BufferPCM: concatenar, LUFS (BS.1770)", medir(lambda: _unir_con_buffer_pcm(pistas, "lufs"), repeticiones), referencia)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,73 @@
+import asyncio
+import contextlib
+import io
+import shutil
+import sys
+import tempfile
+import time
+from typing import Tuple
+
+from app.core.config import get_settings
+from app.models_schemas import BasicTTSRequest
+from app.services.audio_generation_service import generar_audio_tts_basico
+from app.services.proveedores_tts import obtener_proveedor
+from tests.benchmarks._tts_falso import ServidorTTSFalso, fijar_concurrencia, preparar_servicio
+
+# Rendimiento de cada proveedor TTS sin red: solicitudes de TTS básico concurrentes (una por segmento, como las de un
+# guion) con "google" contra el servidor gRPC local de _tts_falso y con "local" (espeak-ng, si está instalado).
+# Cada proveedor usa su límite de concurrencia configurado. Se informa de segmentos por segundo, segundos de audio
+# generados por segundo de reloj y latencia media por solicitud.
+# Ejecutar desde servicio_audio: python -m tests.benchmarks.bench_proveedores_tts
+
+SEGMENTOS = 32
+LATENCIA_GOOGLE_SEG = 0.3 # Latencia por llamada del servidor falso (más 0,2 ms por carácter)
+
+_FRASES = [
+    "Mi suegra llegó a las diez sin avisar.",
+    "Le abrí la puerta, sonreí y le ofrecí café; ella lo rechazó y miró la cocina.",
+    "Mi pareja, que acababa de llegar del trabajo, no dijo nada, pero después me contó que su madre había hecho lo mismo durante años.",
+    "Gracias por los comentarios, no esperaba tantas respuestas en una sola noche.",
+]
+
+
+async def _solicitud(proveedor: str, i: int) -> Tuple[float, float]:
+    """Sintetiza un segmento. Devuelve (duración del audio, latencia de la solicitud) en segundos."""
+    inicio = time.perf_counter()
+    respuesta = await generar_audio_tts_basico(BasicTTSRequest(
+        texto_a_convertir=" ".join(_FRASES[:1 + i % len(_FRASES)]), id_solicitud=f"{proveedor}_{i:03d}", id_proyecto=f"bench_{proveedor}", proveedor_tts=proveedor
+    ))
+    return respuesta.duracion_audio_seg, time.perf_counter() - inicio
+
+
+async def _medir(proveedor: str) -> None:
+    limite = obtener_proveedor(proveedor).limite_concurrencia()
+    fijar_concurrencia(proveedor, limite)
+    inicio = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()): # El servicio registra cada fragmento
+        resultados = await asyncio.gather(*(_solicitud(proveedor, i) for i in range(SEGMENTOS)))
+    segundos = time.perf_counter() - inicio
+    duraciones, latencias = zip(*resultados)
+    print(
+        f"  {proveedor:<7} límite {limite:>2}: {segundos:6.2f} s   {SEGMENTOS / segundos:6.1f} segmentos/s   "
+        f"{sum(duraciones) / segundos:7.1f} s de audio/s   latencia media {1000 * sum(latencias) / len(latencias):7.0f} ms"
+    )
+
+
+async def _principal() -> None:
+    with tempfile.TemporaryDirectory() as directorio:
+        preparar_servicio(directorio)
+        print(f"{SEGMENTOS} solicitudes concurrentes de TTS básico por proveedor, salida WAV")
+        async with ServidorTTSFalso(LATENCIA_GOOGLE_SEG):
+            await _medir("google")
+        if shutil.which(get_settings().TTS_LOCAL_ESPEAK_BINARY):
+            await _medir("local")
+        else:
+            print(f"  local: omitido, no se encontró '{get_settings().TTS_LOCAL_ESPEAK_BINARY}' (instala espeak-ng)")
+
+
+def main() -> None:
+    asyncio.run(_principal())
+
+
+if __name__ == "__main__":
+    sys.exit(main())
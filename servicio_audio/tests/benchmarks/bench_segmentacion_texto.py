@@ -0,0 +1,64 @@
+import sys
+from typing import List
+
+from app.services.segmentacion_texto import dividir_texto_en_fragmentos
+from tests.benchmarks._comun import imprimir_fila, medir
+
+# División de 100 KB de narración en fragmentos para el TTS: el divisor por bytes UTF-8
+# (segmentacion_texto.py) frente al anterior, que volvía a buscar con rfind en el texto restante en cada fragmento y
+# limitaba por caracteres. Ejecutar desde servicio_audio: python -m tests.benchmarks.bench_segmentacion_texto
+
+TAMANO_OBJETIVO_BYTES = 100 * 1024
+LIMITE_BYTES = 4800 # TTS_MAX_BYTES_PER_CHUNK por defecto
+LIMITE_CARACTERES_ANTERIOR = 4500 # El antiguo TTS_MAX_CHARS_PER_CHUNK
+
+_PARRAFO = (
+    "Mi suegra, la Sra. Núñez, llegó a las diez sin avisar. ¿Qué podía hacer? Le abrí la puerta, sonreí y le ofrecí "
+    "café; ella lo rechazó, miró la cocina y dijo: «Esto está hecho un desastre». Mi pareja, que acababa de llegar "
+    "del trabajo, no dijo nada… pero después, a solas, me contó que su madre había hecho lo mismo durante años.\n"
+    "EDIT: gracias por los comentarios, aprox. trescientos en una noche, no me lo esperaba.\n\n"
+)
+_TEXTO_SIN_ESPACIOS = "á" * (TAMANO_OBJETIVO_BYTES // 2) # Peor caso: sin puntos de corte, todo corte duro
+
+
+def _dividir_por_caracteres_anterior(texto_completo: str, limite_caracteres: int) -> List[str]:
+    """El divisor anterior (audio_generation_service._dividir_texto_en_fragmentos), como referencia."""
+    fragmentos = []
+    texto_restante = texto_completo.strip()
+    delimitadores_busqueda = ["\n\n", ". ", "! ", "? ", "\n", ".", "!", "?"]
+    while texto_restante:
+        if len(texto_restante) <= limite_caracteres:
+            fragmentos.append(texto_restante)
+            break
+        punto_de_corte = -1
+        for delimitador in delimitadores_busqueda:
+            pos = texto_restante.rfind(delimitador, 0, limite_caracteres)
+            if pos != -1: punto_de_corte = max(punto_de_corte, pos + len(delimitador))
+        if punto_de_corte <= 0:
+            punto_de_corte = texto_restante.rfind(" ", 0, limite_caracteres)
+            if punto_de_corte <= 0: punto_de_corte = limite_caracteres
+        fragmento = texto_restante[:punto_de_corte].strip()
+        texto_restante = texto_restante[punto_de_corte:].strip()
+        if fragmento: fragmentos.append(fragmento)
+    return fragmentos
+
+
+def _resumen(fragmentos: List[str]) -> str:
+    tamanos = [len(f.encode("utf-8")) for f in fragmentos]
+    excedidos = sum(t > LIMITE_BYTES for t in tamanos)
+    return f"{len(fragmentos)} fragmentos, máx {max(tamanos)} bytes, {excedidos} por encima de {LIMITE_BYTES} bytes"
+
+
+def main() -> None:
+    texto_narracion = _PARRAFO * (TAMANO_OBJETIVO_BYTES // len(_PARRAFO.encode("utf-8")) + 1)
+    for nombre, texto in (("Narración en español", texto_narracion), ("Sin puntos de corte", _TEXTO_SIN_ESPACIOS)):
+        print(f"{nombre}: {len(texto.encode('utf-8')) / 1024:.0f} KB ({len(texto)} caracteres)")
+        print(f"  anterior: {_resumen(_dividir_por_caracteres_anterior(texto, LIMITE_CARACTERES_ANTERIOR))}")
+        print(f"  nuevo:    {_resumen(dividir_texto_en_fragmentos(texto, LIMITE_BYTES))}")
+        referencia = medir(lambda: _dividir_por_caracteres_anterior(texto, LIMITE_CARACTERES_ANTERIOR))
+        imprimir_fila("anterior (rfind por caracteres)", referencia)
+        imprimir_fila("dividir_texto_en_fragmentos (bytes UTF-8)", medir(lambda: dividir_texto_en_fragmentos(texto, LIMITE_BYTES)), referencia)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,61 @@
+import asyncio
+import contextlib
+import io
+import sys
+import tempfile
+import time
+
+from app.models_schemas import VideoScriptTTSRequest
+from app.services.audio_generation_service import generar_audios_para_script_video
+from tests.benchmarks._tts_falso import ServidorTTSFalso, fijar_concurrencia, preparar_servicio
+
+# Tiempo total de los audios de un guion de 40 segmentos (8 escenas de 5) contra un servidor gRPC local que imita a
+# Google TTS con una latencia fija por llamada. Con límite 1 el resultado equivale al bucle secuencial anterior (una
+# llamada detrás de otra); con límites mayores, los segmentos de todas las escenas se sintetizan a la vez.
+# Ejecutar desde servicio_audio: python -m tests.benchmarks.bench_tts_concurrente
+
+ESCENAS = 8
+SEGMENTOS_POR_ESCENA = 5
+LATENCIA_SEG = 0.3 # Por llamada, más 0,2 ms por carácter
+LIMITES = (1, 4, 8, 16)
+
+_TEXTO = "Mi suegra llegó a las diez sin avisar, miró la cocina y dijo que aquello era un desastre. Nadie respondió."
+
+
+def _guion(id_proyecto: str) -> VideoScriptTTSRequest:
+    return VideoScriptTTSRequest(id_proyecto=id_proyecto, escenas=[
+        {"id_escena": f"escena_{e:02d}", "segmentos_narrativos": [
+            {"tipo_segmento": "comentario_principal", "texto_es": f"{_TEXTO} Parte {e}.{s}.", "id_original_segmento": f"c{e}_s{s}"}
+            for s in range(SEGMENTOS_POR_ESCENA)
+        ]}
+        for e in range(ESCENAS)
+    ])
+
+
+async def _medir(servidor: ServidorTTSFalso, limite: int) -> None:
+    fijar_concurrencia("google", limite)
+    servidor.reiniciar_contadores()
+    inicio = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()): # El servicio registra cada segmento
+        respuesta = await generar_audios_para_script_video(_guion(f"bench_limite_{limite}"))
+    segundos = time.perf_counter() - inicio
+    ids = [segmento.id_segmento_original for escena in respuesta.audios_por_escena for segmento in escena.audios_de_segmentos]
+    en_orden = ids == [f"c{e}_s{s}" for e in range(ESCENAS) for s in range(SEGMENTOS_POR_ESCENA)]
+    print(f"  límite {limite:>2}: {segundos:6.2f} s   {len(ids)} segmentos{'' if en_orden else ' (FUERA DE ORDEN)'}, {servidor.llamadas} llamadas, máx. en vuelo en el servidor {servidor.max_en_vuelo}")
+
+
+async def _principal() -> None:
+    with tempfile.TemporaryDirectory() as directorio:
+        preparar_servicio(directorio)
+        async with ServidorTTSFalso(LATENCIA_SEG) as servidor:
+            print(f"{ESCENAS * SEGMENTOS_POR_ESCENA} segmentos, {LATENCIA_SEG * 1000:.0f} ms por llamada (secuencial: ~{ESCENAS * SEGMENTOS_POR_ESCENA * LATENCIA_SEG:.0f} s)")
+            for limite in LIMITES:
+                await _medir(servidor, limite)
+
+
+def main() -> None:
+    asyncio.run(_principal())
+
+
+if __name__ == "__main__":
+    sys.exit(main())
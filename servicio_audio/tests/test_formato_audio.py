@@ -0,0 +1,40 @@
+import io
+import wave
+
+from app.services.formato_audio import dividir_wav_en_instantes, duracion_audio, duracion_wav
+
+
+def _wav(segundos: float, frecuencia: int = 24000) -> bytes:
+    salida = io.BytesIO()
+    with wave.open(salida, "wb") as escritor:
+        escritor.setnchannels(1)
+        escritor.setsampwidth(2)
+        escritor.setframerate(frecuencia)
+        escritor.writeframes(b"".join((n % 32768).to_bytes(2, "little") for n in range(round(segundos * frecuencia))))
+    return salida.getvalue()
+
+
+def test_dividir_wav_corta_a_la_muestra_y_conserva_el_audio():
+    datos = _wav(3.0)
+    trozos = dividir_wav_en_instantes(datos, [0.0, 1.25, 2.0])
+    assert [round(duracion, 6) for _, duracion in trozos] == [1.25, 0.75, 1.0]
+    assert [duracion_wav(contenido) for contenido, _ in trozos] == [duracion for _, duracion in trozos]
+    with wave.open(io.BytesIO(datos), "rb") as lector:
+        original = lector.readframes(lector.getnframes())
+    unidos = b""
+    for contenido, _ in trozos:
+        with wave.open(io.BytesIO(contenido), "rb") as lector:
+            unidos += lector.readframes(lector.getnframes())
+    assert unidos == original
+
+
+def test_dividir_wav_con_marcas_repetidas_deja_trozos_vacios():
+    # El lote SSML comprueba la duración de cada trozo y, si alguno queda vacío, sintetiza los segmentos por separado.
+    trozos = dividir_wav_en_instantes(_wav(2.0), [0.0, 1.0, 1.0, 5.0])
+    assert [duracion for _, duracion in trozos] == [1.0, 0.0, 1.0, 0.0]
+
+
+def test_duracion_audio_lee_el_contenedor_o_devuelve_none():
+    assert duracion_audio(_wav(2.5), "wav") == 2.5
+    assert duracion_audio(b"no es audio", "ogg") is None
+    assert duracion_audio(b"no es audio", "mp3") is None
@@ -0,0 +1,62 @@
+import re
+import shutil
+import subprocess
+import wave
+
+import pytest
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("pydub")
+
+from app.services.motor_pcm import BufferPCM
+
+_TOLERANCIA_LU = 0.2 # ebur128 de ffmpeg informa con una décima de precisión
+
+
+def _buffer(muestras: "np.ndarray", frecuencia: int) -> BufferPCM:
+    return BufferPCM(muestras.astype(np.float32), frecuencia)
+
+
+def _voz_sintetica(frecuencia: int, segundos: float, canales: int) -> "np.ndarray":
+    """Ruido con envolvente de sílabas, un tramo en voz baja y un silencio final, para que actúen ambas puertas de BS.1770."""
+    generador = np.random.default_rng(1770)
+    t = np.arange(round(segundos * frecuencia)) / frecuencia
+    envolvente = 0.5 + 0.5 * np.sin(2 * np.pi * 4 * t) ** 2
+    envolvente[(t > segundos * 0.4) & (t < segundos * 0.6)] = 0.03 # Unos 25 dB por debajo: lo descarta la puerta relativa
+    envolvente[t > segundos * 0.9] = 0.0 # Silencio: lo descarta la puerta absoluta
+    return np.stack([0.05 * envolvente * generador.standard_normal(len(t)) for _ in range(canales)], axis=1)
+
+
+def _sonoridad_ffmpeg(buffer: BufferPCM, ruta) -> float:
+    pcm = buffer.a_pcm16()
+    with wave.open(str(ruta), "wb") as escritor:
+        escritor.setnchannels(pcm.shape[1])
+        escritor.setsampwidth(2)
+        escritor.setframerate(buffer.frecuencia)
+        escritor.writeframes(pcm.tobytes())
+    salida = subprocess.run(["ffmpeg", "-nostats", "-hide_banner", "-i", str(ruta), "-af", "ebur128", "-f", "null", "-"], capture_output=True, text=True, check=True)
+    return float(re.search(r"Integrated loudness:\s+I:\s+(-?[\d.]+) LUFS", salida.stderr).group(1))
+
+
+def test_sonoridad_de_la_senal_de_referencia_ebu():
+    # EBU Tech 3341, caso 1: seno de 1 kHz a -23 dBFS en ambos canales = -23 LUFS
+    frecuencia = 48000
+    seno = 10 ** (-23 / 20) * np.sin(2 * np.pi * 1000 * np.arange(frecuencia * 20) / frecuencia)
+    assert _buffer(np.stack([seno, seno], axis=1), frecuencia).sonoridad_lufs() == pytest.approx(-23.0, abs=0.05)
+
+
+@pytest.mark.skipif(shutil.which("ffmpeg") is None, reason="Necesita ffmpeg (filtro ebur128)")
+@pytest.mark.parametrize("frecuencia, canales", [(24000, 1), (48000, 2)])
+def test_sonoridad_y_ganancia_lufs_coinciden_con_ffmpeg(tmp_path, frecuencia, canales):
+    buffer = _buffer(_voz_sintetica(frecuencia, 30.0, canales), frecuencia)
+    assert buffer.sonoridad_lufs() == pytest.approx(_sonoridad_ffmpeg(buffer, tmp_path / "antes.wav"), abs=_TOLERANCIA_LU)
+
+    ganancia = buffer.normalizar("lufs", -16.0, 0.0)
+    assert ganancia > 0 # La señal de prueba está por debajo del objetivo y su pico deja margen
+    assert _sonoridad_ffmpeg(buffer, tmp_path / "despues.wav") == pytest.approx(-16.0, abs=_TOLERANCIA_LU)
+
+
+def test_normalizacion_lufs_respeta_el_techo_de_pico():
+    buffer = _buffer(_voz_sintetica(24000, 10.0, 1), 24000)
+    buffer.normalizar("lufs", -5.0, -1.0) # Objetivo inalcanzable sin limitador: manda el techo
+    assert buffer.pico_dbfs() == pytest.approx(-1.0, abs=0.01)
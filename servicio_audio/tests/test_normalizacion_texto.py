@@ -0,0 +1,22 @@
+from app.services.normalizacion_texto import normalizar_texto_narracion
+
+
+def test_letras_repetidas_se_reducen():
+    assert normalizar_texto_narracion("Nooooo puede ser", expandir_numeros=False) == "No puede ser"
+
+
+def test_numeros_romanos_y_siglas_se_conservan():
+    assert "capítulo III" in normalizar_texto_narracion("Leí el capítulo III.", expandir_numeros=False)
+    assert "Luis XIII" in normalizar_texto_narracion("Reinaba Luis XIII.", expandir_numeros=False)
+    assert "WWW" in normalizar_texto_narracion("La WWW cambió todo.", expandir_numeros=False)
+
+
+def test_saltos_de_parrafo_se_conservan():
+    texto = normalizar_texto_narracion("Primer párrafo.\n\n\n  \nSegundo párrafo.\nMisma línea siguiente.", expandir_numeros=False)
+    assert texto == "Primer párrafo.\n\nSegundo párrafo.\nMisma línea siguiente."
+
+
+def test_marcadores_y_proporciones_no_son_emoticonos():
+    assert normalizar_texto_narracion("El marcador fue 2:3.") == "El marcador fue 2:3."
+    assert normalizar_texto_narracion("Una mezcla 1:3 de agua.", expandir_numeros=False) == "Una mezcla 1:3 de agua."
+    assert normalizar_texto_narracion("Ganamos :D", expandir_numeros=False) == "Ganamos"
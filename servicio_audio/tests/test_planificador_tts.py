@@ -0,0 +1,47 @@
+import asyncio
+
+from app.services.planificador_tts import PlanificadorTTS
+
+
+def test_cancelar_varias_esperas_del_mismo_proyecto():
+    async def escenario():
+        planificador = PlanificadorTTS(capacidad=1)
+        ocupante = planificador.turno("ocupante")
+        await ocupante.__aenter__()
+
+        async def esperar_turno():
+            async with planificador.turno("proyecto"):
+                pass
+
+        esperas = [asyncio.create_task(esperar_turno()) for _ in range(5)]
+        await asyncio.sleep(0)
+        for espera in esperas: espera.cancel()
+        # Al liberar el turno antes de que las esperas procesen la cancelación, _despachar ya las saca de la cola.
+        await ocupante.__aexit__(None, None, None)
+        resultados = await asyncio.gather(*esperas, return_exceptions=True)
+        return planificador, resultados
+
+    planificador, resultados = asyncio.run(escenario())
+    assert all(isinstance(r, asyncio.CancelledError) for r in resultados)
+    assert planificador.en_vuelo == 0
+    assert planificador.resumen()["proyectos"] == {}
+
+
+def test_proyecto_pequeno_no_espera_al_grande():
+    async def escenario():
+        planificador = PlanificadorTTS(capacidad=2)
+        orden = []
+
+        async def tarea(proyecto):
+            async with planificador.turno(proyecto):
+                orden.append(proyecto)
+                await asyncio.sleep(0.001)
+
+        grandes = [asyncio.create_task(tarea("grande")) for _ in range(40)]
+        await asyncio.sleep(0)
+        pequenos = [asyncio.create_task(tarea("pequeno")) for _ in range(5)]
+        await asyncio.gather(*grandes, *pequenos)
+        return orden
+
+    orden = asyncio.run(escenario())
+    assert max(i for i, proyecto in enumerate(orden) if proyecto == "pequeno") < 15
@@ -0,0 +1,31 @@
+import asyncio
+import os
+
+import pytest
+
+pytest.importorskip("pydub")
+pytest.importorskip("pydantic_settings")
+
+from app.services import procesamiento_audio
+
+
+def _pid_del_proceso() -> tuple:
+    return os.getpid(), 0.0
+
+
+def test_trabajos_en_cola_tras_un_pool_roto_usan_un_pool_nuevo():
+    async def escenario():
+        procesamiento_audio._semaforo_envios = asyncio.Semaphore(1) # El segundo trabajo espera turno mientras el primero rompe el pool
+        roto = asyncio.create_task(procesamiento_audio._ejecutar_en_pool(os._exit, 1))
+        en_cola = asyncio.create_task(procesamiento_audio._ejecutar_en_pool(_pid_del_proceso))
+        with pytest.raises(ValueError):
+            await roto
+        return await en_cola
+
+    try:
+        pid = asyncio.run(escenario())
+        # Se ejecutó en un proceso del pool nuevo, no en un hilo del ejecutor por defecto del event loop
+        assert pid != os.getpid()
+        assert procesamiento_audio._pool is not None
+    finally:
+        procesamiento_audio.cerrar_pool_audio()
@@ -0,0 +1,20 @@
+import pytest
+
+from app.services.segmentacion_texto import dividir_texto_en_fragmentos
+
+
+@pytest.mark.parametrize("limite", [0, 1, 3])
+def test_limite_menor_que_un_caracter_lanza_error(limite):
+    with pytest.raises(ValueError):
+        dividir_texto_en_fragmentos("canción acentuada", limite)
+
+
+def test_fragmentos_respetan_el_limite_de_bytes():
+    texto = "Ésta es una oración con acentos y eñes. " * 200
+    fragmentos = dividir_texto_en_fragmentos(texto, 300)
+    assert all(len(f.encode("utf-8")) <= 300 for f in fragmentos)
+    assert " ".join(fragmentos).split() == texto.split()
+
+
+def test_limite_minimo_con_caracteres_de_cuatro_bytes():
+    assert dividir_texto_en_fragmentos("😀😀😀", 4) == ["😀", "😀", "😀"]
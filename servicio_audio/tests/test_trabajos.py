@@ -0,0 +1,61 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip("httpx")
+pytest.importorskip("pydantic_settings")
+
+from app.services import trabajos
+
+
+def _mapear_error(error: Exception):
+    return 400, {"tipo_error": "ERROR_PRUEBA", "mensaje": str(error)}
+
+
+def test_error_al_traducir_el_error_termina_el_trabajo():
+    async def ejecutar():
+        raise ValueError("fallo del servicio")
+
+    def mapear_error_roto(error: Exception):
+        raise KeyError("sin traducción")
+
+    async def escenario():
+        trabajo = trabajos.crear_trabajo("prueba", ejecutar, mapear_error_roto)
+        await asyncio.gather(*trabajos._tareas_en_vuelo)
+        return trabajo
+
+    trabajo = asyncio.run(escenario())
+    assert trabajo["estado"] == "error"
+    assert trabajo["error"]["codigo_http"] == 500
+    assert trabajo["id_trabajo"] in trabajos._finalizados_en
+
+
+def test_trabajo_cancelado_queda_en_estado_final():
+    async def ejecutar():
+        await asyncio.sleep(60)
+
+    async def escenario():
+        trabajo = trabajos.crear_trabajo("prueba", ejecutar, _mapear_error)
+        await asyncio.sleep(0)
+        assert trabajo["estado"] == "en_curso"
+        await trabajos.cancelar_trabajos_en_vuelo()
+        return trabajo
+
+    trabajo = asyncio.run(escenario())
+    assert trabajo["estado"] == "error"
+    assert trabajo["error"]["tipo_error"] == "TRABAJO_CANCELADO"
+    assert trabajo["finalizado_en"] is not None
+
+
+def test_callback_no_permitido_registra_el_trabajo_y_el_motivo(capsys):
+    async def ejecutar():
+        return {"ok": True}
+
+    async def escenario():
+        trabajo = trabajos.crear_trabajo("prueba", ejecutar, _mapear_error, url_callback="http://169.254.169.254/")
+        await asyncio.gather(*trabajos._tareas_en_vuelo)
+        return trabajo
+
+    trabajo = asyncio.run(escenario())
+    salida = capsys.readouterr().out
+    assert f"No se notifica el fin del trabajo {trabajo['id_trabajo']}: url_callback no permitida" in salida
@@ -0,0 +1,264 @@
+import asyncio
+import mimetypes
+import os
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, List, Optional, Tuple
+
+from fastapi import HTTPException, status
+from fastapi.responses import RedirectResponse, Response, StreamingResponse
+
+from .config import get_settings
+
+# Almacenamiento de los visuales descargados, detrás de una interfaz común con dos implementaciones:
+# - "local": el volumen montado en VISUAL_STORAGE_PATH (como hasta ahora). Solo sirve para un único host.
+# - "s3": un bucket compatible con S3 (AWS S3, o MinIO en desarrollo), para ejecutar varias réplicas del servicio.
+# Las descargas de Pexels/Pixabay se escriben en streaming a través de `escritor`: en local a un archivo temporal que
+# se renombra al terminar, y en S3 como subida multiparte de partes de STORAGE_S3_PART_SIZE_MB (un video nunca está
+# entero en memoria). boto3 solo se importa con VISUAL_STORAGE_BACKEND="s3".
+
+_BLOQUE_LECTURA = 256 * 1024
+_TAMANO_MINIMO_PARTE = 5 * 1024 * 1024 # S3 exige partes de al menos 5 MB (salvo la última)
+
+
+def tipo_contenido(clave: str) -> str:
+    return mimetypes.guess_type(clave)[0] or "application/octet-stream"
+
+
+def _no_encontrado(clave: str) -> HTTPException:
+    return HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail={"tipo_error": "ARCHIVO_NO_ENCONTRADO", "mensaje": f"No existe el archivo '{clave}'."})
+
+
+def _es_clave_valida(clave: str) -> bool:
+    """Rechaza claves que salgan del almacenamiento o apunten a archivos ocultos o temporales."""
+    return bool(clave) and not clave.startswith("/") and all(p and not p.startswith(".") for p in clave.split("/"))
+
+
+class _EscritorArchivoLocal:
+    def __init__(self, archivo):
+        self._archivo = archivo
+
+    async def escribir(self, datos: bytes) -> None:
+        self._archivo.write(datos)
+
+
+class AlmacenamientoLocal:
+    es_local = True
+
+    def __init__(self, directorio_base: str):
+        self.directorio_base = directorio_base
+
+    def ruta_local(self, clave: str) -> str:
+        return os.path.join(self.directorio_base, *clave.split("/"))
+
+    @asynccontextmanager
+    async def escritor(self, clave: str) -> AsyncIterator[_EscritorArchivoLocal]:
+        """Escribe en un archivo temporal oculto y lo renombra al terminar: una descarga a medias nunca queda con su nombre final."""
+        destino = self.ruta_local(clave)
+        os.makedirs(os.path.dirname(destino), exist_ok=True)
+        temporal = os.path.join(os.path.dirname(destino), f".{os.path.basename(destino)}.parcial")
+        try:
+            with open(temporal, "wb") as archivo:
+                yield _EscritorArchivoLocal(archivo)
+            os.replace(temporal, destino)
+        except BaseException:
+            if os.path.exists(temporal): os.remove(temporal)
+            raise
+
+    async def url_descarga(self, clave: str) -> Optional[str]:
+        return None # Se sirve desde el propio servicio (/media/visuals)
+
+    async def tamano(self, clave: str) -> Optional[int]:
+        ruta = self.ruta_local(clave)
+        return os.path.getsize(ruta) if os.path.isfile(ruta) else None
+
+    async def leer_rango(self, clave: str, inicio: int, fin: int) -> AsyncIterator[bytes]:
+        """Bytes [inicio, fin] (ambos incluidos) del archivo, por bloques."""
+        with open(self.ruta_local(clave), "rb") as archivo:
+            archivo.seek(inicio)
+            pendientes = fin - inicio + 1
+            while pendientes > 0:
+                bloque = await asyncio.to_thread(archivo.read, min(_BLOQUE_LECTURA, pendientes))
+                if not bloque: break
+                pendientes -= len(bloque)
+                yield bloque
+
+
+class _EscritorMultipartS3:
+    """
+    Subida multiparte en streaming: acumula como mucho una parte en memoria y la sube al completarse.
+    Un archivo que no llega a una parte se sube con un único PUT.
+    """
+    def __init__(self, cliente: Any, bucket: str, clave_objeto: str, tipo: str, tamano_parte: int):
+        self._cliente = cliente
+        self._bucket = bucket
+        self._clave_objeto = clave_objeto
+        self._tipo = tipo
+        self._tamano_parte = tamano_parte
+        self._bufer = bytearray()
+        self._id_subida: Optional[str] = None
+        self._partes: List[dict] = []
+
+    async def escribir(self, datos: bytes) -> None:
+        self._bufer += datos
+        while len(self._bufer) >= self._tamano_parte:
+            parte = bytes(self._bufer[:self._tamano_parte])
+            del self._bufer[:self._tamano_parte]
+            await self._subir_parte(parte)
+
+    async def _subir_parte(self, parte: bytes) -> None:
+        if self._id_subida is None:
+            respuesta = await asyncio.to_thread(self._cliente.create_multipart_upload, Bucket=self._bucket, Key=self._clave_objeto, ContentType=self._tipo)
+            self._id_subida = respuesta["UploadId"]
+        numero = len(self._partes) + 1
+        respuesta = await asyncio.to_thread(
+            self._cliente.upload_part, Bucket=self._bucket, Key=self._clave_objeto, UploadId=self._id_subida, PartNumber=numero, Body=parte
+        )
+        self._partes.append({"PartNumber": numero, "ETag": respuesta["ETag"]})
+
+    async def completar(self) -> None:
+        if self._id_subida is None: # Archivo pequeño: un solo PUT
+            await asyncio.to_thread(self._cliente.put_object, Bucket=self._bucket, Key=self._clave_objeto, Body=bytes(self._bufer), ContentType=self._tipo)
+            return
+        if self._bufer: await self._subir_parte(bytes(self._bufer)) # La última parte puede ser menor de 5 MB
+        self._bufer = bytearray()
+        await asyncio.to_thread(
+            self._cliente.complete_multipart_upload, Bucket=self._bucket, Key=self._clave_objeto, UploadId=self._id_subida,
+            MultipartUpload={"Parts": self._partes}
+        )
+
+    async def abortar(self) -> None:
+        if self._id_subida is None: return
+        try:
+            await asyncio.to_thread(self._cliente.abort_multipart_upload, Bucket=self._bucket, Key=self._clave_objeto, UploadId=self._id_subida)
+        except Exception as e:
+            print(f"Servicio Visuales: ADVERTENCIA - No se pudo abortar la subida multiparte de {self._clave_objeto}: {e}")
+
+
+class AlmacenamientoS3:
+    es_local = False
+
+    def __init__(self, prefijo: str, url_base_publica: Optional[str]):
+        import boto3 # Solo necesario con el backend S3
+        from botocore.config import Config
+        from botocore.exceptions import ClientError
+        settings = get_settings()
+        if not settings.STORAGE_S3_BUCKET:
+            raise ValueError("STORAGE_S3_BUCKET es obligatorio con el almacenamiento S3.")
+        self._cliente = boto3.client(
+            "s3",
+            endpoint_url=settings.STORAGE_S3_ENDPOINT_URL, # MinIO: http://minio:9000
+            region_name=settings.STORAGE_S3_REGION,
+            aws_access_key_id=settings.STORAGE_S3_ACCESS_KEY_ID,
+            aws_secret_access_key=settings.STORAGE_S3_SECRET_ACCESS_KEY,
+            config=Config(signature_version="s3v4", s3={"addressing_style": "path" if settings.STORAGE_S3_ENDPOINT_URL else "auto"}),
+        )
+        self._error_cliente = ClientError
+        self._tamano_parte = max(settings.STORAGE_S3_PART_SIZE_MB * 1024 * 1024, _TAMANO_MINIMO_PARTE)
+        self.bucket = settings.STORAGE_S3_BUCKET
+        self.prefijo = prefijo.strip("/")
+        self.url_base_publica = url_base_publica.rstrip("/") if url_base_publica else None
+        self.urls_prefirmadas = settings.STORAGE_S3_PRESIGNED_URLS
+        self.segundos_validez_url = settings.STORAGE_S3_PRESIGNED_URL_EXPIRY_SEG
+
+    def _clave_objeto(self, clave: str) -> str:
+        return f"{self.prefijo}/{clave}" if self.prefijo else clave
+
+    @asynccontextmanager
+    async def escritor(self, clave: str) -> AsyncIterator[_EscritorMultipartS3]:
+        escritor = _EscritorMultipartS3(self._cliente, self.bucket, self._clave_objeto(clave), tipo_contenido(clave), self._tamano_parte)
+        try:
+            yield escritor
+            await escritor.completar()
+        except BaseException:
+            await escritor.abortar()
+            raise
+
+    async def url_descarga(self, clave: str) -> Optional[str]:
+        if self.url_base_publica: return f"{self.url_base_publica}/{self._clave_objeto(clave)}" # CDN delante del bucket
+        if not self.urls_prefirmadas: return None # Se sirve a través del propio servicio (/media/visuals)
+        return self._cliente.generate_presigned_url( # Se firma en local, sin llamada de red
+            "get_object", Params={"Bucket": self.bucket, "Key": self._clave_objeto(clave)}, ExpiresIn=self.segundos_validez_url
+        )
+
+    async def tamano(self, clave: str) -> Optional[int]:
+        try:
+            cabecera = await asyncio.to_thread(self._cliente.head_object, Bucket=self.bucket, Key=self._clave_objeto(clave))
+        except self._error_cliente as e:
+            if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound"): return None
+            raise
+        return cabecera["ContentLength"]
+
+    async def leer_rango(self, clave: str, inicio: int, fin: int) -> AsyncIterator[bytes]:
+        respuesta = await asyncio.to_thread(
+            self._cliente.get_object, Bucket=self.bucket, Key=self._clave_objeto(clave), Range=f"bytes={inicio}-{fin}"
+        )
+        cuerpo = respuesta["Body"]
+        try:
+            while True:
+                bloque = await asyncio.to_thread(cuerpo.read, _BLOQUE_LECTURA)
+                if not bloque: break
+                yield bloque
+        finally:
+            cuerpo.close()
+
+
+_almacenamiento: Optional[Any] = None
+
+
+def get_almacenamiento() -> Any:
+    """Almacenamiento configurado (VISUAL_STORAGE_BACKEND). Se crea en la primera llamada."""
+    global _almacenamiento
+    if _almacenamiento is None:
+        settings = get_settings()
+        if settings.VISUAL_STORAGE_BACKEND == "s3":
+            _almacenamiento = AlmacenamientoS3(settings.VISUAL_STORAGE_S3_PREFIX, settings.VISUAL_STORAGE_PUBLIC_BASE_URL)
+            print(f"Servicio Visuales: Almacenamiento S3 (bucket '{_almacenamiento.bucket}', prefijo '{_almacenamiento.prefijo}').")
+        else:
+            _almacenamiento = AlmacenamientoLocal(settings.VISUAL_STORAGE_PATH)
+            print(f"Servicio Visuales: Almacenamiento local en {settings.VISUAL_STORAGE_PATH}.")
+    return _almacenamiento
+
+
+def interpretar_rango(cabecera_range: Optional[str], tamano: int) -> Optional[Tuple[int, int]]:
+    """
+    (inicio, fin) incluidos de una cabecera "Range: bytes=..." con un solo rango, o None para enviar el archivo completo
+    (sin cabecera, o con varios rangos, que se ignoran). Lanza ValueError si el rango no se puede satisfacer.
+    """
+    if not cabecera_range or not cabecera_range.startswith("bytes=") or "," in cabecera_range: return None
+    desde, _, hasta = cabecera_range[len("bytes="):].strip().partition("-")
+    try:
+        if desde == "": # Sufijo: los últimos N bytes
+            inicio, fin = max(tamano - int(hasta), 0), tamano - 1
+        else:
+            inicio = int(desde)
+            fin = min(int(hasta), tamano - 1) if hasta else tamano - 1
+    except ValueError:
+        return None # Cabecera mal formada: se ignora
+    if inicio >= tamano or inicio > fin:
+        raise ValueError(f"Rango no satisfacible para un archivo de {tamano} bytes: {cabecera_range}")
+    return inicio, fin
+
+
+async def respuesta_archivo(clave: str, cabecera_range: Optional[str], solo_cabeceras: bool = False) -> Response:
+    """
+    Respuesta HTTP para un archivo del almacenamiento, con soporte de peticiones parciales (Range, 206).
+    Si el almacenamiento da una URL directa (prefirmada o de CDN), redirige a ella y el rango lo atiende el bucket.
+    """
+    almacenamiento = get_almacenamiento()
+    if not _es_clave_valida(clave): raise _no_encontrado(clave)
+    url_directa = await almacenamiento.url_descarga(clave)
+    if url_directa:
+        return RedirectResponse(url_directa, status_code=status.HTTP_307_TEMPORARY_REDIRECT)
+    tamano = await almacenamiento.tamano(clave)
+    if tamano is None: raise _no_encontrado(clave)
+    try:
+        rango = interpretar_rango(cabecera_range, tamano)
+    except ValueError:
+        return Response(status_code=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE, headers={"Content-Range": f"bytes */{tamano}"})
+    inicio, fin = rango if rango is not None else (0, tamano - 1)
+    cabeceras = {"Accept-Ranges": "bytes", "Content-Length": str(fin - inicio + 1)}
+    if rango is not None: cabeceras["Content-Range"] = f"bytes {inicio}-{fin}/{tamano}"
+    codigo = status.HTTP_206_PARTIAL_CONTENT if rango is not None else status.HTTP_200_OK
+    if solo_cabeceras or tamano == 0:
+        return Response(status_code=codigo, headers=cabeceras, media_type=tipo_contenido(clave))
+    return StreamingResponse(almacenamiento.leer_rango(clave, inicio, fin), status_code=codigo, headers=cabeceras, media_type=tipo_contenido(clave))
@@ -17,6 +17,31 @@ class Settings(BaseSettings):
     # --- Configuración de Almacenamiento de Visuales ---
     # Ruta DENTRO del contenedor donde se guardarán los visuales.
     VISUAL_STORAGE_PATH: str = "/app/generated_visuals"
+    # URL base con la que el propio servicio sirve los visuales (/media/visuals). Si no se define, `ruta_asset_almacenado`
+    # es la ruta interna del archivo (con almacenamiento local) como hasta ahora.
+    VISUAL_BASE_URL: Optional[str] = None # ej. "http://localhost:8003/media/visuals"
+    # Dónde se guardan los visuales: "local" (VISUAL_STORAGE_PATH, un solo host) o "s3" (bucket compatible con S3, ej. MinIO).
+    VISUAL_STORAGE_BACKEND: Literal["local", "s3"] = "local"
+    VISUAL_STORAGE_S3_PREFIX: str = "visuales" # Prefijo de las claves de los visuales dentro del bucket
+    VISUAL_STORAGE_PUBLIC_BASE_URL: Optional[str] = None # CDN delante del bucket; si se define, se usa en lugar de URLs prefirmadas
+
+    # --- Bucket S3 compartido por los servicios (solo con *_STORAGE_BACKEND="s3") ---
+    STORAGE_S3_BUCKET: str = ""
+    STORAGE_S3_ENDPOINT_URL: Optional[str] = None # Vacío para AWS S3; para MinIO, ej. "http://minio:9000"
+    STORAGE_S3_REGION: Optional[str] = None
+    STORAGE_S3_ACCESS_KEY_ID: Optional[str] = None # Si no se definen, boto3 usa su cadena de credenciales habitual
+    STORAGE_S3_SECRET_ACCESS_KEY: Optional[str] = None
+    STORAGE_S3_PART_SIZE_MB: int = 8 # Tamaño de parte de las subidas multiparte (mínimo 5); como mucho una parte por descarga en memoria
+    STORAGE_S3_PRESIGNED_URLS: bool = True # Si es False (y sin CDN), los visuales se sirven a través de /media/visuals
+    STORAGE_S3_PRESIGNED_URL_EXPIRY_SEG: int = 86400
+
+    # --- Trabajos asíncronos (POST .../jobs/... -> 202 Accepted + consulta de estado) ---
+    JOBS_MAX_CONCURRENT: int = 4 # Trabajos ejecutándose a la vez en este proceso; el resto espera en estado 'pendiente'
+    JOBS_RESULT_TTL_SEG: int = 3600 # Tiempo que se conserva el resultado de un trabajo terminado
+    JOBS_CALLBACK_TIMEOUT_SEG: float = 10.0 # Timeout del POST a la url_callback al terminar un trabajo
+    # Hosts a los que se permite enviar la url_callback, separados por comas (ej. "orquestador_api_service").
+    # Vacío = no se aceptan callbacks (la url_callback viene del cliente: evita peticiones a direcciones internas).
+    JOBS_CALLBACK_ALLOWED_HOSTS: str = ""
 
     model_config = SettingsConfigDict(
         env_file_encoding='utf-8',
@@ -1,19 +1,31 @@
-from fastapi import FastAPI, HTTPException, status
-from typing import Dict  # Necesario para la respuesta de health check
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException, Query, Request, Response, status
+from typing import Dict, Optional, Tuple  # Dict necesario para la respuesta de health check
 
 # Importamos los modelos Pydantic
 from .models_schemas import (
     VisualsStockRequest, 
-    VisualsStockResponse
+    VisualsStockResponse,
+    TrabajoAceptado,
+    EstadoTrabajoVisuales
     # Los sub-modelos VisualesPorEscena y StockAssetInfo son usados por VisualsStockResponse
 )
 
 # Importamos la función principal de nuestro servicio lógico
 from .services.visual_fetching_service import obtener_visuales_de_stock_para_escenas
+from .services.trabajos import crear_trabajo, validar_url_callback, obtener_trabajo, cancelar_trabajos_en_vuelo
+from .core.almacenamiento import get_almacenamiento, respuesta_archivo
 
 # (Opcional) from .core.config import get_settings # Si main.py necesitara settings directamente
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    get_almacenamiento() # Valida la configuración del almacenamiento (local o S3) al arrancar
+    yield
+    await cancelar_trabajos_en_vuelo() # Los trabajos asíncronos que sigan en curso no sobreviven al apagado
+
 app = FastAPI(
+    lifespan=lifespan,
     title="Servicio de Generación de Visuales de Stock",
     version="1.0.0",
     description="Microservicio para buscar y descargar imágenes y videos de stock (Pexels, Pixabay) para escenas de video, basado en palabras clave.",
@@ -61,34 +73,94 @@ async def fetch_stock_media_for_script_endpoint(datos_solicitud: VisualsStockReq
         print(f"API Visuales: Visuales de stock obtenidos para id_proyecto: {resultado_visuales.id_proyecto}")
         return resultado_visuales
         
-    except ValueError as ve: 
-        mensaje_error = str(ve)
+    except Exception as e:
+        codigo_http, detalle_error = _mapear_error_visuales(e)
+        raise HTTPException(status_code=codigo_http, detail=detalle_error)
+
+def _mapear_error_visuales(error: Exception) -> Tuple[int, Dict[str, str]]:
+    """Traduce una excepción del servicio a (código HTTP, detalle {tipo_error, mensaje})."""
+    if isinstance(error, ValueError):
+        mensaje_error = str(error)
         print(f"API Visuales: Error obteniendo visuales - {mensaje_error}")
         
-        # Mapeo de mensajes de ValueError a HTTPExceptions específicas
+        # Mapeo de mensajes de ValueError a códigos HTTP específicos
         # Estos mensajes deben coincidir con los que lanza visual_fetching_service.py
         if "API key" in mensaje_error.lower() or "autenticación" in mensaje_error.lower() or "credenciales" in mensaje_error.lower():
-            raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail={"tipo_error": "ERROR_CONFIGURACION_PROVEEDOR_STOCK", "mensaje": mensaje_error})
+            return status.HTTP_500_INTERNAL_SERVER_ERROR, {"tipo_error": "ERROR_CONFIGURACION_PROVEEDOR_STOCK", "mensaje": mensaje_error}
         elif "Límite de tasa excedido" in mensaje_error:
-            raise HTTPException(status_code=status.HTTP_429_TOO_MANY_REQUESTS, detail={"tipo_error": "LIMITE_TASA_PROVEEDOR_STOCK", "mensaje": mensaje_error})
+            return status.HTTP_429_TOO_MANY_REQUESTS, {"tipo_error": "LIMITE_TASA_PROVEEDOR_STOCK", "mensaje": mensaje_error}
         elif "No se encontraron resultados" in mensaje_error or "no encontró assets" in mensaje_error.lower():
-             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail={"tipo_error": "SIN_RESULTADOS_STOCK_RELEVANTES", "mensaje": mensaje_error})
+            return status.HTTP_404_NOT_FOUND, {"tipo_error": "SIN_RESULTADOS_STOCK_RELEVANTES", "mensaje": mensaje_error}
         elif "Error al descargar" in mensaje_error:
-             raise HTTPException(status_code=status.HTTP_502_BAD_GATEWAY, detail={"tipo_error": "ERROR_DESCARGA_ASSET_EXTERNO", "mensaje": mensaje_error})
+            return status.HTTP_502_BAD_GATEWAY, {"tipo_error": "ERROR_DESCARGA_ASSET_EXTERNO", "mensaje": mensaje_error}
         elif "Error al guardar el archivo" in mensaje_error: # Error de guardado local
-             raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail={"tipo_error": "ERROR_ALMACENAMIENTO_VISUAL", "mensaje": mensaje_error})
+            return status.HTTP_500_INTERNAL_SERVER_ERROR, {"tipo_error": "ERROR_ALMACENAMIENTO_VISUAL", "mensaje": mensaje_error}
         elif "Proveedor de stock" in mensaje_error and "no soportado" in mensaje_error:
-            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail={"tipo_error": "PROVEEDOR_STOCK_NO_SOPORTADO", "mensaje": mensaje_error})
+            return status.HTTP_400_BAD_REQUEST, {"tipo_error": "PROVEEDOR_STOCK_NO_SOPORTADO", "mensaje": mensaje_error}
         else: # Otros ValueErrors específicos de la lógica de negocio
-             raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail={"tipo_error": "ERROR_OBTENCION_VISUALES_STOCK", "mensaje": mensaje_error})
-             
-    except Exception as e: # Para cualquier otro error inesperado no capturado explícitamente
-        print(f"API Visuales: Error inesperado del servidor - {type(e).__name__}: {e}")
-        # En producción, aquí se debería loggear el traceback completo de 'e' para análisis.
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail={"tipo_error": "ERROR_INTERNO_INESPERADO_VISUALES", "mensaje": f"Ocurrió un error interno en el servicio de visuales: {type(e).__name__}"}
-        )
+            return status.HTTP_400_BAD_REQUEST, {"tipo_error": "ERROR_OBTENCION_VISUALES_STOCK", "mensaje": mensaje_error}
+
+    # Para cualquier otro error inesperado no capturado explícitamente
+    print(f"API Visuales: Error inesperado del servidor - {type(error).__name__}: {error}")
+    # En producción, aquí se debería loggear el traceback completo de 'e' para análisis.
+    return status.HTTP_500_INTERNAL_SERVER_ERROR, {"tipo_error": "ERROR_INTERNO_INESPERADO_VISUALES", "mensaje": f"Ocurrió un error interno en el servicio de visuales: {type(error).__name__}"}
+
+# --- Variante Asíncrona (Trabajos) de la Obtención de Visuales de Stock ---
+@app.post(
+    "/api/v1/visuals/jobs/fetch_stock_media",
+    response_model=TrabajoAceptado,
+    status_code=status.HTTP_202_ACCEPTED,
+    summary="Encola la obtención de visuales de stock para las escenas y devuelve de inmediato un id de trabajo.",
+    tags=["Stock Media Visuals"]
+)
+async def encolar_stock_media_endpoint(
+    datos_solicitud: VisualsStockRequest,
+    response: Response,
+    url_callback: Optional[str] = Query(default=None, description="Si se indica, al terminar el trabajo se envía un POST con su estado final (modelo `EstadoTrabajoVisuales`) a esta URL.")
+):
+    """
+    Mismo proceso que `fetch_stock_media`, sin mantener la conexión abierta: responde `202 Accepted` con el
+    `id_trabajo` (y la cabecera `Location`) y el resultado se consulta en `GET /api/v1/visuals/jobs/{id_trabajo}`.
+    """
+    print(f"API Visuales: Recibida solicitud (trabajo asíncrono) de visuales de stock para id_proyecto: {datos_solicitud.id_proyecto}")
+    try:
+        validar_url_callback(url_callback)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail={"tipo_error": "URL_CALLBACK_NO_PERMITIDA", "mensaje": str(e)})
+    trabajo = crear_trabajo(
+        "fetch_stock_media",
+        lambda: obtener_visuales_de_stock_para_escenas(datos_solicitud=datos_solicitud),
+        _mapear_error_visuales,
+        url_callback
+    )
+    url_estado = f"/api/v1/visuals/jobs/{trabajo['id_trabajo']}"
+    response.headers["Location"] = url_estado
+    return TrabajoAceptado(id_trabajo=trabajo["id_trabajo"], estado=trabajo["estado"], url_estado=url_estado)
+
+@app.get(
+    "/api/v1/visuals/jobs/{id_trabajo}",
+    response_model=EstadoTrabajoVisuales,
+    status_code=status.HTTP_200_OK,
+    summary="Devuelve el estado de un trabajo de visuales y, si terminó, su resultado o su error.",
+    tags=["Stock Media Visuals"]
+)
+async def estado_trabajo_visuales_endpoint(id_trabajo: str):
+    trabajo = obtener_trabajo(id_trabajo)
+    if trabajo is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail={"tipo_error": "TRABAJO_NO_ENCONTRADO", "mensaje": f"No existe el trabajo '{id_trabajo}' (o su resultado ya caducó)."})
+    return trabajo
+
+# --- Descarga de los Visuales Almacenados ---
+# Funciona con cualquier backend de almacenamiento y atiende peticiones parciales (Range -> 206), necesarias para
+# buscar dentro de los videos sin descargarlos enteros. Con S3 y URLs prefirmadas (o CDN) redirige a la URL directa.
+@app.api_route(
+    "/media/visuals/{clave:path}",
+    methods=["GET", "HEAD"],
+    summary="Descarga un visual almacenado (admite la cabecera Range).",
+    tags=["Utilities"]
+)
+async def servir_visual_endpoint(clave: str, request: Request):
+    return await respuesta_archivo(clave, request.headers.get("range"), solo_cabeceras=request.method == "HEAD")
 
 # --- Endpoint de Health Check (Buena Práctica) ---
 @app.get(
@@ -1,4 +1,5 @@
 # En servicio_generacion_visuales/app/models_schemas.py
+from datetime import datetime
 from typing import List, Optional, Literal # Literal para opciones fijas
 from pydantic import BaseModel, Field, HttpUrl, validator
 
@@ -66,7 +67,7 @@ class VisualsStockRequest(BaseModel):
 class StockAssetInfo(BaseModel):
     """Información sobre un asset de stock (imagen o video) encontrado y almacenado."""
     tipo_asset: Literal["imagen_stock", "video_stock"] = Field(..., description="Tipo de asset.")
-    ruta_asset_almacenado: str = Field(..., description="Ruta interna al archivo almacenado por el servicio.")
+    ruta_asset_almacenado: str = Field(..., description="Ruta interna al archivo almacenado por el servicio, o su URL (prefirmada, de CDN o /media/visuals) según el almacenamiento configurado.")
     proveedor: Literal["pexels", "pixabay"] = Field(..., description="Proveedor del asset.")
     url_original_proveedor: HttpUrl = Field(..., description="URL directa a la página del asset en el sitio del proveedor (para atribución/licencia).")
     keyword_busqueda_principal: Optional[str] = Field(default=None, description="Palabra clave principal que resultó en este asset.")
@@ -121,4 +122,31 @@ class VisualsStockResponse(BaseModel):
                     }
                 ]
             }
-        }
\ No newline at end of file
+        }
+
+
+# --- Modelos del protocolo de trabajos asíncronos (202 Accepted + consulta de estado) ---
+EstadoTrabajo = Literal["pendiente", "en_curso", "completado", "error"]
+
+class TrabajoAceptado(BaseModel):
+    """Respuesta 202 al encolar un trabajo."""
+    id_trabajo: str = Field(..., description="Identificador del trabajo.")
+    estado: EstadoTrabajo = Field(..., description="Estado en el momento de aceptarlo (normalmente 'pendiente').")
+    url_estado: str = Field(..., description="Ruta para consultar el estado y, al terminar, el resultado.")
+
+class ErrorTrabajo(BaseModel):
+    """Error con el que terminó un trabajo: el mismo código y detalle que devolvería el endpoint síncrono."""
+    codigo_http: int
+    tipo_error: str
+    mensaje: str
+
+class EstadoTrabajoVisuales(BaseModel):
+    """Estado de un trabajo de obtención de visuales de stock. 'resultado' solo está presente si estado='completado'."""
+    id_trabajo: str
+    tipo: str
+    estado: EstadoTrabajo
+    creado_en: datetime
+    iniciado_en: Optional[datetime] = None
+    finalizado_en: Optional[datetime] = None
+    resultado: Optional[VisualsStockResponse] = None
+    error: Optional[ErrorTrabajo] = None
@@ -0,0 +1,148 @@
+import asyncio
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import Any, Awaitable, Callable, Dict, Optional, Set, Tuple
+from urllib.parse import urlsplit
+
+import httpx
+
+from ..core.config import get_settings
+
+# Registro en memoria de trabajos asíncronos (protocolo "202 Accepted + consulta de estado").
+# Cada trabajo se ejecuta en este mismo proceso como una tarea de asyncio y su estado vive en memoria del
+# worker de uvicorn que lo aceptó: el servicio debe correr con un solo worker (como en el Dockerfile) para que
+# la consulta de estado llegue al mismo proceso. Los trabajos terminados se purgan tras JOBS_RESULT_TTL_SEG.
+
+ESTADOS_FINALES = ("completado", "error")
+
+_trabajos: Dict[str, Dict[str, Any]] = {}
+_finalizados_en: Dict[str, float] = {} # id_trabajo -> time.monotonic() al terminar (para la purga)
+_tareas_en_vuelo: Set["asyncio.Task[None]"] = set() # Referencias fuertes: asyncio solo guarda referencias débiles
+_semaforo: Optional[asyncio.Semaphore] = None # Se crea dentro del event loop, en el primer uso
+
+
+def _ahora_iso() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+def _obtener_semaforo() -> asyncio.Semaphore:
+    global _semaforo
+    if _semaforo is None:
+        _semaforo = asyncio.Semaphore(max(1, get_settings().JOBS_MAX_CONCURRENT))
+    return _semaforo
+
+
+def validar_url_callback(url_callback: Optional[str]) -> None:
+    """
+    La url_callback llega del cliente y el servicio le hace un POST: solo se aceptan URLs http(s) cuyo host esté en
+    JOBS_CALLBACK_ALLOWED_HOSTS, para que nadie pueda usar el servicio contra direcciones internas (metadatos de la
+    nube, otros servicios de la red). Lanza ValueError si no se admite.
+    """
+    if url_callback is None: return
+    partes = urlsplit(url_callback)
+    if partes.scheme not in ("http", "https") or not partes.hostname:
+        raise ValueError(f"url_callback no válida: se requiere una URL http o https ('{url_callback}').")
+    permitidos = {h.strip().lower() for h in get_settings().JOBS_CALLBACK_ALLOWED_HOSTS.split(",") if h.strip()}
+    if partes.hostname.lower() not in permitidos:
+        raise ValueError(f"url_callback no permitida: el host '{partes.hostname}' no está en JOBS_CALLBACK_ALLOWED_HOSTS.")
+
+
+def _purgar_trabajos_caducados() -> None:
+    limite = time.monotonic() - get_settings().JOBS_RESULT_TTL_SEG
+    for id_trabajo in [i for i, fin in _finalizados_en.items() if fin < limite]:
+        _trabajos.pop(id_trabajo, None)
+        _finalizados_en.pop(id_trabajo, None)
+
+
+def crear_trabajo(
+    tipo: str,
+    ejecutar: Callable[[], Awaitable[Any]],
+    mapear_error: Callable[[Exception], Tuple[int, Dict[str, str]]],
+    url_callback: Optional[str] = None
+) -> Dict[str, Any]:
+    """
+    Registra un trabajo en estado 'pendiente' y lanza su ejecución en segundo plano. Devuelve el documento
+    de estado (el mismo que devuelve obtener_trabajo). 'mapear_error' traduce la excepción del servicio al
+    (código HTTP, detalle) que habría devuelto el endpoint síncrono.
+    """
+    _purgar_trabajos_caducados()
+    id_trabajo = uuid.uuid4().hex
+    trabajo: Dict[str, Any] = {
+        "id_trabajo": id_trabajo, "tipo": tipo, "estado": "pendiente",
+        "creado_en": _ahora_iso(), "iniciado_en": None, "finalizado_en": None,
+        "resultado": None, "error": None
+    }
+    _trabajos[id_trabajo] = trabajo
+    tarea = asyncio.create_task(_ejecutar_trabajo(trabajo, ejecutar, mapear_error, url_callback))
+    _tareas_en_vuelo.add(tarea)
+    tarea.add_done_callback(_tareas_en_vuelo.discard)
+    return trabajo
+
+
+def obtener_trabajo(id_trabajo: str) -> Optional[Dict[str, Any]]:
+    _purgar_trabajos_caducados()
+    return _trabajos.get(id_trabajo)
+
+
+async def _ejecutar_trabajo(
+    trabajo: Dict[str, Any],
+    ejecutar: Callable[[], Awaitable[Any]],
+    mapear_error: Callable[[Exception], Tuple[int, Dict[str, str]]],
+    url_callback: Optional[str]
+) -> None:
+    try:
+        async with _obtener_semaforo():
+            trabajo["estado"] = "en_curso"
+            trabajo["iniciado_en"] = _ahora_iso()
+            print(f"Servicio GeneracionVisuales: Trabajo {trabajo['id_trabajo']} ({trabajo['tipo']}) en curso.")
+            try:
+                resultado = await ejecutar()
+                trabajo["resultado"] = resultado.model_dump(mode="json") if hasattr(resultado, "model_dump") else resultado
+                _finalizar_trabajo(trabajo, "completado")
+            except Exception as e:
+                try:
+                    codigo_http, detalle_error = mapear_error(e)
+                except Exception as e_mapeo: # Un fallo al traducir el error no puede dejar el trabajo 'en_curso'
+                    print(f"Servicio GeneracionVisuales: ERROR - No se pudo traducir el error del trabajo {trabajo['id_trabajo']} ({type(e_mapeo).__name__}: {e_mapeo}).")
+                    codigo_http, detalle_error = 500, {"tipo_error": "ERROR_INTERNO_TRABAJO", "mensaje": f"{type(e).__name__}: {e}"}
+                trabajo["error"] = {"codigo_http": codigo_http, **detalle_error}
+                _finalizar_trabajo(trabajo, "error")
+    except asyncio.CancelledError:
+        # Cancelado (apagado de la app) en cola o en ejecución: queda en estado final para que se purgue
+        if trabajo["estado"] not in ESTADOS_FINALES:
+            trabajo["error"] = {"codigo_http": 503, "tipo_error": "TRABAJO_CANCELADO", "mensaje": "El trabajo se canceló antes de terminar (apagado del servicio)."}
+            _finalizar_trabajo(trabajo, "error")
+        raise
+    if url_callback:
+        await _notificar_callback(url_callback, trabajo)
+
+
+def _finalizar_trabajo(trabajo: Dict[str, Any], estado: str) -> None:
+    trabajo["estado"] = estado
+    trabajo["finalizado_en"] = _ahora_iso()
+    _finalizados_en[trabajo["id_trabajo"]] = time.monotonic()
+    print(f"Servicio GeneracionVisuales: Trabajo {trabajo['id_trabajo']} ({trabajo['tipo']}) terminado con estado '{estado}'.")
+
+
+async def _notificar_callback(url_callback: str, trabajo: Dict[str, Any]) -> None:
+    """POST del documento de estado final a url_callback. Un fallo solo se registra: el resultado sigue consultable."""
+    try:
+        validar_url_callback(url_callback) # La configuración pudo cambiar desde que se aceptó el trabajo
+    except ValueError as e:
+        print(f"Servicio GeneracionVisuales: ADVERTENCIA - No se notifica el fin del trabajo {trabajo['id_trabajo']}: {e}")
+        return
+    try:
+        async with httpx.AsyncClient(timeout=get_settings().JOBS_CALLBACK_TIMEOUT_SEG) as client:
+            response = await client.post(url_callback, json=trabajo)
+            response.raise_for_status()
+    except httpx.HTTPError as e:
+        print(f"Servicio GeneracionVisuales: ADVERTENCIA - No se pudo notificar el fin del trabajo {trabajo['id_trabajo']} a {url_callback} ({type(e).__name__}: {e}).")
+
+
+async def cancelar_trabajos_en_vuelo() -> None:
+    """Cancela los trabajos que sigan en ejecución (al apagar la app)."""
+    for tarea in list(_tareas_en_vuelo):
+        tarea.cancel()
+    if _tareas_en_vuelo:
+        await asyncio.gather(*_tareas_en_vuelo, return_exceptions=True)
@@ -4,6 +4,7 @@ import uuid
 from typing import List, Optional, Dict, Any, Literal # Añadido Literal
 
 from ..core.config import get_settings
+from ..core.almacenamiento import get_almacenamiento
 from ..models_schemas import (
     VisualsStockRequest,
     VisualsStockResponse,
@@ -16,10 +17,23 @@ from ..models_schemas import (
 settings = get_settings()
 
 # --- Función Auxiliar para Descargar y Guardar Archivos ---
-async def _descargar_y_guardar_archivo(client: httpx.AsyncClient, url_descarga: str, directorio_destino: str, nombre_archivo_base: str) -> Optional[str]:
+async def _ubicacion_asset(clave: str) -> str:
+    """URL del asset (prefirmada o de CDN con S3, o VISUAL_BASE_URL/<clave>) o, con almacenamiento local y sin VISUAL_BASE_URL, su ruta interna."""
+    almacenamiento = get_almacenamiento()
+    url_directa = await almacenamiento.url_descarga(clave)
+    if url_directa:
+        return url_directa
+    if settings.VISUAL_BASE_URL:
+        return f"{settings.VISUAL_BASE_URL.rstrip('/')}/{clave}"
+    if almacenamiento.es_local:
+        return almacenamiento.ruta_local(clave)
+    return f"/media/visuals/{clave}" # S3 sin URLs directas: servido a través del propio servicio
+
+async def _descargar_y_guardar_archivo(client: httpx.AsyncClient, url_descarga: str, id_proyecto: str, nombre_archivo_base: str) -> Optional[str]:
     """
-    Descarga un archivo desde url_descarga y lo guarda en directorio_destino con un nombre de archivo
-    que incluye la extensión original. Devuelve la ruta completa del archivo guardado o None.
+    Descarga un archivo desde url_descarga y lo guarda en el almacenamiento (bajo <id_proyecto>/) con un nombre de archivo
+    que incluye la extensión original. El contenido pasa en streaming de la descarga al almacenamiento, sin cargarse
+    entero en memoria. Devuelve la ruta o URL del archivo guardado (ver _ubicacion_asset) o None.
     """
     try:
         print(f"      Descargando desde: {url_descarga}...")
@@ -44,15 +58,14 @@ async def _descargar_y_guardar_archivo(client: httpx.AsyncClient, url_descarga:
 
 
             nombre_archivo_con_extension = f"{nombre_archivo_base}{extension}"
-            ruta_destino_completa = os.path.join(directorio_destino, nombre_archivo_con_extension)
+            clave = f"{id_proyecto}/{nombre_archivo_con_extension}"
 
-            os.makedirs(directorio_destino, exist_ok=True)
-            
-            with open(ruta_destino_completa, 'wb') as f:
+            async with get_almacenamiento().escritor(clave) as destino:
                 async for chunk in response.aiter_bytes():
-                    f.write(chunk)
-            print(f"      Archivo guardado exitosamente en: {ruta_destino_completa}")
-            return ruta_destino_completa
+                    await destino.escribir(chunk)
+            ubicacion = await _ubicacion_asset(clave)
+            print(f"      Archivo guardado exitosamente en: {ubicacion}")
+            return ubicacion
     except httpx.HTTPStatusError as e:
         print(f"      Error HTTP al descargar {url_descarga}: {e.response.status_code} - {e.response.text[:200]}")
     except httpx.RequestError as e:
@@ -144,9 +157,6 @@ async def obtener_visuales_de_stock_para_escenas(
     orientacion_img_global = params_busqueda.orientacion_imagen
     orientacion_vid_global = params_busqueda.orientacion_video
 
-    directorio_base_proyecto_visuales = os.path.join(settings.VISUAL_STORAGE_PATH, id_proyecto)
-    os.makedirs(directorio_base_proyecto_visuales, exist_ok=True)
-
     async with httpx.AsyncClient() as client:
         for i, escena_input in enumerate(datos_solicitud.escenas):
             print(f"  Servicio Visuales: Procesando escena {i+1}/{len(datos_solicitud.escenas)}: {escena_input.id_escena}")
@@ -166,7 +176,7 @@ async def obtener_visuales_de_stock_para_escenas(
                 if pexels_img_hit and 'src' in pexels_img_hit:
                     url_descarga = pexels_img_hit['src'].get('large2x') or pexels_img_hit['src'].get('original')
                     if url_descarga:
-                        ruta_guardada = await _descargar_y_guardar_archivo(client, url_descarga, directorio_base_proyecto_visuales, f"{nombre_archivo_base}_img_pexels")
+                        ruta_guardada = await _descargar_y_guardar_archivo(client, url_descarga, id_proyecto, f"{nombre_archivo_base}_img_pexels")
                         if ruta_guardada:
                             asset_imagen = StockAssetInfo(
                                 tipo_asset="imagen_stock", ruta_asset_almacenado=ruta_guardada,
@@ -177,7 +187,7 @@ async def obtener_visuales_de_stock_para_escenas(
                     pixabay_img_hit = await _buscar_en_pixabay(client, query_completa, "photo", orientacion_img_global, per_page=settings.STOCK_MEDIA_DEFAULT_PER_PAGE)
                     if pixabay_img_hit and 'largeImageURL' in pixabay_img_hit:
                         url_descarga = pixabay_img_hit['largeImageURL']
-                        ruta_guardada = await _descargar_y_guardar_archivo(client, url_descarga, directorio_base_proyecto_visuales, f"{nombre_archivo_base}_img_pixabay")
+                        ruta_guardada = await _descargar_y_guardar_archivo(client, url_descarga, id_proyecto, f"{nombre_archivo_base}_img_pixabay")
                         if ruta_guardada:
                             asset_imagen = StockAssetInfo(
                                 tipo_asset="imagen_stock", ruta_asset_almacenado=ruta_guardada,
@@ -192,7 +202,7 @@ async def obtener_visuales_de_stock_para_escenas(
                     vid_file_info = next((vf for vf in pexels_vid_hit['video_files'] if vf.get('quality') == 'hd' and 'link' in vf), pexels_vid_hit['video_files'][0])
                     url_descarga = vid_file_info.get('link')
                     if url_descarga:
-                        ruta_guardada = await _descargar_y_guardar_archivo(client, url_descarga, directorio_base_proyecto_visuales, f"{nombre_archivo_base}_vid_pexels")
+                        ruta_guardada = await _descargar_y_guardar_archivo(client, url_descarga, id_proyecto, f"{nombre_archivo_base}_vid_pexels")
                         if ruta_guardada:
                             asset_video = StockAssetInfo(
                                 tipo_asset="video_stock", ruta_asset_almacenado=ruta_guardada,
@@ -207,7 +217,7 @@ async def obtener_visuales_de_stock_para_escenas(
                         vid_links = pixabay_vid_hit['videos']
                         url_descarga = vid_links.get('large', {}).get('url') or vid_links.get('medium', {}).get('url') or vid_links.get('small', {}).get('url')
                         if url_descarga:
-                            ruta_guardada = await _descargar_y_guardar_archivo(client, url_descarga, directorio_base_proyecto_visuales, f"{nombre_archivo_base}_vid_pixabay")
+                            ruta_guardada = await _descargar_y_guardar_archivo(client, url_descarga, id_proyecto, f"{nombre_archivo_base}_vid_pixabay")
                             if ruta_guardada:
                                 asset_video = StockAssetInfo(
                                     tipo_asset="video_stock", ruta_asset_almacenado=ruta_guardada,
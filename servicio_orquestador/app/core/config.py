@@ -21,7 +21,15 @@ class Settings(BaseSettings):
     TEXT_PROCESSOR_API_BASE_URL: str = "http://text_processor_api_service:8000/api/v1"
     AUDIO_API_BASE_URL: str = "http://audio_api_service:8000/api/v1"
     VISUAL_GENERATOR_API_BASE_URL: str = "http://visual_generator_api_service:8000/api/v1"
-    
+
+    # --- Trabajos asíncronos en los servicios (texto, audio, visuales) ---
+    # Las tareas envían el trabajo (202 Accepted) y consultan su estado con llamadas HTTP cortas; entre
+    # consultas la tarea se reprograma (self.retry con countdown), así no ocupa un greenlet del worker.
+    SERVICE_JOB_POLL_INTERVAL_SEG: int = 5 # Espera entre consultas de estado
+    SERVICE_JOB_MAX_WAIT_SEG: int = 3600 # Tiempo máximo esperando a un trabajo antes de darlo por fallido
+    # URL opcional que los servicios notificarán (POST con el estado final) al terminar cada trabajo.
+    SERVICE_JOB_CALLBACK_URL: Optional[str] = None
+
     
     # (Futuro) VIDEO_ASSEMBLER_API_BASE_URL: Optional[str] = None
 
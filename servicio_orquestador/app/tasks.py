@@ -1,7 +1,8 @@
 import httpx
-from celery.exceptions import Ignore 
+from celery.exceptions import Ignore, Retry
 import json
 import asyncio # Para asyncio.run()
+import time
 from typing import Dict, Any, List, Optional
 
 from .celery_app import celery_app
@@ -10,6 +11,65 @@ from .core.config import get_settings
 settings = get_settings()
 DEFAULT_HTTP_TIMEOUT = 60.0 
 
+# --- Protocolo de trabajos asíncronos de los servicios (texto, audio, visuales) ---
+# Cada servicio acepta el trabajo con 202 + id_trabajo y expone GET .../jobs/{id_trabajo}. La tarea envía el
+# trabajo y consulta su estado con llamadas cortas; mientras no termine, se reprograma con self.retry
+# (countdown), de modo que no ocupa un greenlet durante minutos ni depende de timeouts de proxies.
+# El id_trabajo, el instante de envío y las consultas hechas viajan en los kwargs de la propia tarea.
+
+def _avanzar_trabajo_remoto(task, url_envio: str, url_trabajos: str, payload: Dict[str, Any],
+                            id_trabajo: Optional[str], enviado_en: Optional[float], sondeos: int) -> Dict[str, Any]:
+    """
+    Envía el trabajo si aún no se envió (o si el servicio ya no lo conoce, p. ej. tras un reinicio) y consulta
+    su estado. Devuelve el resultado si está completado; si sigue en curso, reprograma la tarea (lanza Retry).
+    Un trabajo terminado en error se lanza como httpx.HTTPStatusError con el código y detalle que habría
+    devuelto el endpoint síncrono, para que cada tarea lo trate con su manejo de errores habitual.
+    """
+    async def _enviar_o_consultar():
+        async with httpx.AsyncClient(timeout=DEFAULT_HTTP_TIMEOUT) as client:
+            if id_trabajo is not None:
+                response = await client.get(f"{url_trabajos}/{id_trabajo}")
+                if response.status_code != 404:
+                    response.raise_for_status()
+                    return id_trabajo, response.json()
+                print(f"  TASK ASYNC CORE: el trabajo {id_trabajo} ya no existe en el servicio (¿reiniciado?). Se vuelve a enviar.")
+            params = {"url_callback": settings.SERVICE_JOB_CALLBACK_URL} if settings.SERVICE_JOB_CALLBACK_URL else None
+            response = await client.post(url_envio, json=payload, params=params)
+            response.raise_for_status()
+            trabajo_aceptado = response.json() # TrabajoAceptado: {"id_trabajo", "estado": "pendiente", "url_estado"}
+            return trabajo_aceptado["id_trabajo"], trabajo_aceptado
+
+    id_actual, estado_trabajo = asyncio.run(_enviar_o_consultar())
+    if id_actual != id_trabajo: enviado_en = time.time()
+
+    if estado_trabajo["estado"] == "completado":
+        return estado_trabajo["resultado"]
+    if estado_trabajo["estado"] == "error":
+        error = estado_trabajo.get("error") or {}
+        request = httpx.Request("GET", f"{url_trabajos}/{id_actual}")
+        response = httpx.Response(error.get("codigo_http", 500), json=error, request=request)
+        raise httpx.HTTPStatusError(f"El trabajo {id_actual} terminó con error", request=request, response=response)
+    if time.time() - enviado_en > settings.SERVICE_JOB_MAX_WAIT_SEG:
+        raise TimeoutError(f"El trabajo {id_actual} sigue en estado '{estado_trabajo['estado']}' tras {settings.SERVICE_JOB_MAX_WAIT_SEG} s.")
+
+    # Las consultas también cuentan como reintentos de Celery: se amplía el tope para que no consuman
+    # los reintentos reservados a errores (ver _reintentar_envio).
+    raise task.retry(
+        kwargs={**task.request.kwargs, "id_trabajo": id_actual, "enviado_en": enviado_en, "sondeos": sondeos + 1},
+        countdown=settings.SERVICE_JOB_POLL_INTERVAL_SEG,
+        max_retries=task.max_retries + sondeos + 1
+    )
+
+
+def _reintentar_envio(task, exc: Exception, countdown: int, conservar_trabajo: bool = False) -> Retry:
+    """
+    Reintento por error. Por defecto el trabajo se vuelve a enviar desde cero; con conservar_trabajo=True
+    (fallos de red al consultar) se sigue consultando el mismo trabajo. El tope descuenta las consultas ya hechas.
+    """
+    kwargs = dict(task.request.kwargs) if conservar_trabajo else {**task.request.kwargs, "id_trabajo": None, "enviado_en": None}
+    return task.retry(exc=exc, countdown=countdown, kwargs=kwargs, max_retries=task.max_retries + kwargs.get("sondeos", 0))
+
+
 @celery_app.task(bind=True, max_retries=3, default_retry_delay=60)
 def scrape_reddit_task(self, 
                        reddit_url: str, 
@@ -61,7 +121,7 @@ def scrape_reddit_task(self,
 
 
 @celery_app.task(bind=True, max_retries=3, default_retry_delay=120)
-def process_text_task(self, previous_result: Dict[str, Any]):
+def process_text_task(self, previous_result: Dict[str, Any], id_trabajo: Optional[str] = None, enviado_en: Optional[float] = None, sondeos: int = 0):
     scraped_data = previous_result.get("scraped_data")
     id_proyecto = previous_result.get("id_proyecto")
     id_voz_preferida = previous_result.get("id_voz_preferida") # <--- Recibir
@@ -69,42 +129,41 @@ def process_text_task(self, previous_result: Dict[str, Any]):
     if not scraped_data or not id_proyecto: # ... (manejo de error como estaba) ...
         raise ValueError("Datos de scraping insuficientes para procesar texto.")
 
-    print(f"TASK (SYNC WRAPPER): process_text_task iniciada para id_proyecto: {id_proyecto}")
-    # ... (lógica interna con _actual_process_text_logic y asyncio.run como estaba) ...
-    async def _actual_process_text_logic():
-        # ...
-        payload = scraped_data # El payload es el resultado del scraper
-        # ... (llamada httpx al servicio de procesamiento de texto)
-        async with httpx.AsyncClient(timeout=900.0) as client:
-            response = await client.post(f"{settings.TEXT_PROCESSOR_API_BASE_URL}/text_processing/process_reddit_content", json=payload)
-            response.raise_for_status()
-            return response.json()
+    if id_trabajo is None: print(f"TASK (SYNC WRAPPER): process_text_task iniciada para id_proyecto: {id_proyecto}")
+    else: print(f"TASK (SYNC WRAPPER): process_text_task consultando el trabajo {id_trabajo} para id_proyecto: {id_proyecto}")
     try:
-        resultado_text_processing = asyncio.run(_actual_process_text_logic())
+        resultado_text_processing = _avanzar_trabajo_remoto(
+            self,
+            f"{settings.TEXT_PROCESSOR_API_BASE_URL}/text_processing/jobs/process_reddit_content",
+            f"{settings.TEXT_PROCESSOR_API_BASE_URL}/text_processing/jobs",
+            scraped_data, # El payload es el resultado del scraper
+            id_trabajo, enviado_en, sondeos
+        )
         print(f"TASK (SYNC WRAPPER): process_text_task completada para id_proyecto: {id_proyecto}.")
         return { # Pasar id_voz_preferida a las siguientes tareas (audio y visuales)
             "processed_text_data": resultado_text_processing, 
             "id_proyecto": id_proyecto,
             "id_voz_preferida": id_voz_preferida # <--- Pasar
         }
-    # ... (manejo de errores como estaba) ...
+    except Retry: # Reprogramación para la siguiente consulta de estado (o reintento ya decidido)
+        raise
     except httpx.HTTPStatusError as exc:
         error_info = f"HTTPStatusError ({exc.response.status_code}) en process_text_task para id_proyecto {id_proyecto}: {exc.response.text[:200]}"
         print(f"TASK ERROR: {error_info}")
-        if exc.response.status_code >= 500 or exc.response.status_code == 429: raise self.retry(exc=Exception(error_info), countdown=120)
+        if exc.response.status_code >= 500 or exc.response.status_code == 429: raise _reintentar_envio(self, Exception(error_info), countdown=120)
         else: raise ValueError(error_info)
     except httpx.RequestError as exc:
         error_info = f"RequestError en process_text_task para id_proyecto {id_proyecto}: {str(exc)[:200]}"
         print(f"TASK ERROR: {error_info}")
-        raise self.retry(exc=Exception(error_info), countdown=120)
+        raise _reintentar_envio(self, Exception(error_info), countdown=120, conservar_trabajo=True)
     except Exception as exc:
         error_info = f"Error inesperado en process_text_task para id_proyecto {id_proyecto}: {type(exc).__name__} - {str(exc)[:200]}"
         print(f"TASK ERROR: {error_info}")
-        raise self.retry(exc=Exception(error_info), countdown=120)
+        raise _reintentar_envio(self, Exception(error_info), countdown=120)
 
 
 @celery_app.task(bind=True, max_retries=2, default_retry_delay=180)
-def generate_audios_task(self, previous_result: Dict[str, Any]):
+def generate_audios_task(self, previous_result: Dict[str, Any], id_trabajo: Optional[str] = None, enviado_en: Optional[float] = None, sondeos: int = 0):
     processed_text_data = previous_result.get("processed_text_data")
     id_proyecto = previous_result.get("id_proyecto")
     id_voz_preferida = previous_result.get("id_voz_preferida") # <--- Recibir y usar
@@ -112,54 +171,55 @@ def generate_audios_task(self, previous_result: Dict[str, Any]):
     if not processed_text_data or not id_proyecto: # ... (manejo de error como estaba) ...
         raise ValueError("Datos de procesamiento de texto insuficientes para generar audios.")
 
-    print(f"TASK (SYNC WRAPPER): generate_audios_task iniciada para id_proyecto: {id_proyecto}. Voz preferida: {id_voz_preferida}")
-
-    async def _actual_generate_audios_logic():
-        escenas_para_audio = []
-        # ... (lógica para construir escenas_para_audio como estaba) ...
-        for escena_proc in processed_text_data.get("escenas", []):
-            segmentos_narrativos_input = []
-            for seg_narr_proc in escena_proc.get("segmentos_narrativos", []):
-                segmentos_narrativos_input.append({
-                    "tipo_segmento": seg_narr_proc.get("tipo_segmento"), "autor": seg_narr_proc.get("autor"),
-                    "texto_es": seg_narr_proc.get("texto_es"), "id_original_segmento": seg_narr_proc.get("id_original_segmento")
-                })
-            escenas_para_audio.append({"id_escena": escena_proc.get("id_escena"), "segmentos_narrativos": segmentos_narrativos_input})
-
-        audio_payload = {
-            "id_proyecto": id_proyecto,
-            "guion_narrativo_completo_es": processed_text_data.get("guion_narrativo_completo_es"),
-            "escenas": escenas_para_audio,
-            "configuracion_voz_global": {"id_voz": id_voz_preferida} if id_voz_preferida else None # <--- Usar id_voz_preferida
-            # "proveedor_tts_global": se podría pasar también si fuera un parámetro del workflow
-        }
-        audio_service_endpoint = f"{settings.AUDIO_API_BASE_URL}/audio/tts/for_video_script"
-        async with httpx.AsyncClient(timeout=900.0) as client:
-            response = await client.post(audio_service_endpoint, json=audio_payload)
-            response.raise_for_status()
-            return response.json()
+    if id_trabajo is None: print(f"TASK (SYNC WRAPPER): generate_audios_task iniciada para id_proyecto: {id_proyecto}. Voz preferida: {id_voz_preferida}")
+    else: print(f"TASK (SYNC WRAPPER): generate_audios_task consultando el trabajo {id_trabajo} para id_proyecto: {id_proyecto}")
+
+    escenas_para_audio = []
+    for escena_proc in processed_text_data.get("escenas", []):
+        segmentos_narrativos_input = []
+        for seg_narr_proc in escena_proc.get("segmentos_narrativos", []):
+            segmentos_narrativos_input.append({
+                "tipo_segmento": seg_narr_proc.get("tipo_segmento"), "autor": seg_narr_proc.get("autor"),
+                "texto_es": seg_narr_proc.get("texto_es"), "id_original_segmento": seg_narr_proc.get("id_original_segmento")
+            })
+        escenas_para_audio.append({"id_escena": escena_proc.get("id_escena"), "segmentos_narrativos": segmentos_narrativos_input})
+
+    audio_payload = {
+        "id_proyecto": id_proyecto,
+        "guion_narrativo_completo_es": processed_text_data.get("guion_narrativo_completo_es"),
+        "escenas": escenas_para_audio,
+        "configuracion_voz_global": {"id_voz": id_voz_preferida} if id_voz_preferida else None # <--- Usar id_voz_preferida
+        # "proveedor_tts_global": se podría pasar también si fuera un parámetro del workflow
+    }
     try:
-        resultado_audio_generation = asyncio.run(_actual_generate_audios_logic())
+        resultado_audio_generation = _avanzar_trabajo_remoto(
+            self,
+            f"{settings.AUDIO_API_BASE_URL}/audio/tts/jobs/for_video_script",
+            f"{settings.AUDIO_API_BASE_URL}/audio/tts/jobs",
+            audio_payload,
+            id_trabajo, enviado_en, sondeos
+        )
         print(f"TASK (SYNC WRAPPER): generate_audios_task completada para id_proyecto: {id_proyecto}.")
         return {"audio_output": resultado_audio_generation, "id_proyecto": id_proyecto, "text_data_passthrough": processed_text_data, "id_voz_preferida": id_voz_preferida} # Pasar por si ensamblador lo necesita
-    # ... (manejo de errores como estaba) ...
+    except Retry: # Reprogramación para la siguiente consulta de estado (o reintento ya decidido)
+        raise
     except httpx.HTTPStatusError as exc:
         error_info = f"HTTPStatusError ({exc.response.status_code}) en generate_audios_task para id_proyecto {id_proyecto}: {exc.response.text[:200]}"
         print(f"TASK ERROR: {error_info}")
-        if exc.response.status_code >= 500 or exc.response.status_code == 429: raise self.retry(exc=Exception(error_info), countdown=180)
+        if exc.response.status_code >= 500 or exc.response.status_code == 429: raise _reintentar_envio(self, Exception(error_info), countdown=180)
         else: raise ValueError(error_info)
     except httpx.RequestError as exc:
         error_info = f"RequestError en generate_audios_task para id_proyecto {id_proyecto}: {str(exc)[:200]}"
         print(f"TASK ERROR: {error_info}")
-        raise self.retry(exc=Exception(error_info), countdown=180)
+        raise _reintentar_envio(self, Exception(error_info), countdown=180, conservar_trabajo=True)
     except Exception as exc:
         error_info = f"Error inesperado en generate_audios_task para id_proyecto {id_proyecto}: {type(exc).__name__} - {str(exc)[:200]}"
         print(f"TASK ERROR: {error_info}")
-        raise self.retry(exc=Exception(error_info), countdown=180)
+        raise _reintentar_envio(self, Exception(error_info), countdown=180)
 
 
 @celery_app.task(bind=True, max_retries=2, default_retry_delay=180)
-def generate_visuals_task(self, previous_result: Dict[str, Any]):
+def generate_visuals_task(self, previous_result: Dict[str, Any], id_trabajo: Optional[str] = None, enviado_en: Optional[float] = None, sondeos: int = 0):
     # Esta tarea no usa id_voz_preferida directamente, pero si la tarea de ensamblaje
     # lo necesitara, podríamos pasarlo también en el return de esta.
     # Por ahora, solo lo usamos si lo necesitara para construir su payload, que no es el caso.
@@ -170,40 +230,40 @@ def generate_visuals_task(self, previous_result: Dict[str, Any]):
     if not processed_text_data or not id_proyecto: # ... (manejo de error como estaba) ...
         raise ValueError("Datos de procesamiento de texto insuficientes para generar visuales.")
 
-    print(f"TASK (SYNC WRAPPER): generate_visuals_task iniciada para id_proyecto: {id_proyecto}")
-    # ... (lógica interna con _actual_generate_visuals_logic y asyncio.run como estaba) ...
-    async def _actual_generate_visuals_logic():
-        # ...
-        escenas_para_visuales = []
-        for escena_proc in processed_text_data.get("escenas", []):
-            escenas_para_visuales.append({
-                "id_escena": escena_proc.get("id_escena"),
-                "palabras_clave_stock_escena": escena_proc.get("palabras_clave_stock_escena", [])
-            })
-        visuals_payload = {"id_proyecto": id_proyecto, "escenas": escenas_para_visuales}
-        # ... (llamada httpx al servicio de generación de visuales)
-        async with httpx.AsyncClient(timeout=300.0) as client:
-            response = await client.post(f"{settings.VISUAL_GENERATOR_API_BASE_URL}/visuals/fetch_stock_media", json=visuals_payload)
-            response.raise_for_status()
-            return response.json()
+    if id_trabajo is None: print(f"TASK (SYNC WRAPPER): generate_visuals_task iniciada para id_proyecto: {id_proyecto}")
+    else: print(f"TASK (SYNC WRAPPER): generate_visuals_task consultando el trabajo {id_trabajo} para id_proyecto: {id_proyecto}")
+    escenas_para_visuales = []
+    for escena_proc in processed_text_data.get("escenas", []):
+        escenas_para_visuales.append({
+            "id_escena": escena_proc.get("id_escena"),
+            "palabras_clave_stock_escena": escena_proc.get("palabras_clave_stock_escena", [])
+        })
+    visuals_payload = {"id_proyecto": id_proyecto, "escenas": escenas_para_visuales}
     try:
-        resultado_visual_generation = asyncio.run(_actual_generate_visuals_logic())
+        resultado_visual_generation = _avanzar_trabajo_remoto(
+            self,
+            f"{settings.VISUAL_GENERATOR_API_BASE_URL}/visuals/jobs/fetch_stock_media",
+            f"{settings.VISUAL_GENERATOR_API_BASE_URL}/visuals/jobs",
+            visuals_payload,
+            id_trabajo, enviado_en, sondeos
+        )
         print(f"TASK (SYNC WRAPPER): generate_visuals_task completada para id_proyecto: {id_proyecto}.")
         return {"visual_output": resultado_visual_generation, "id_proyecto": id_proyecto, "text_data_passthrough": processed_text_data, "id_voz_preferida": id_voz_preferida} # Pasar por si ensamblador lo necesita
-    # ... (manejo de errores como estaba) ...
+    except Retry: # Reprogramación para la siguiente consulta de estado (o reintento ya decidido)
+        raise
     except httpx.HTTPStatusError as exc:
         error_info = f"HTTPStatusError ({exc.response.status_code}) en generate_visuals_task para id_proyecto {id_proyecto}: {exc.response.text[:200]}"
         print(f"TASK ERROR: {error_info}")
-        if exc.response.status_code >= 500 or exc.response.status_code == 429: raise self.retry(exc=Exception(error_info), countdown=180)
+        if exc.response.status_code >= 500 or exc.response.status_code == 429: raise _reintentar_envio(self, Exception(error_info), countdown=180)
         else: raise ValueError(error_info)
     except httpx.RequestError as exc:
         error_info = f"RequestError en generate_visuals_task para id_proyecto {id_proyecto}: {str(exc)[:200]}"
         print(f"TASK ERROR: {error_info}")
-        raise self.retry(exc=Exception(error_info), countdown=180)
+        raise _reintentar_envio(self, Exception(error_info), countdown=180, conservar_trabajo=True)
     except Exception as exc:
         error_info = f"Error inesperado en generate_visuals_task para id_proyecto {id_proyecto}: {type(exc).__name__} - {str(exc)[:200]}"
         print(f"TASK ERROR: {error_info}")
-        raise self.retry(exc=Exception(error_info), countdown=180)
+        raise _reintentar_envio(self, Exception(error_info), countdown=180)
 
 
 # (Futuro) Tarea de ensamblaje de video
@@ -1,6 +1,6 @@
 from pydantic_settings import BaseSettings, SettingsConfigDict
 from functools import lru_cache
-from typing import Optional # Lo mantenemos por si añades campos Optional en el futuro
+from typing import Optional, Literal # Lo mantenemos por si añades campos Optional en el futuro
 
 class Settings(BaseSettings):
     # Clave de API para OpenAI (Obligatoria)
@@ -13,6 +13,74 @@ class Settings(BaseSettings):
     # Pydantic buscará NARRATION_PPM; si no la encuentra, usará 140.
     NARRATION_PPM: int = 140
 
+    # --- Cliente OpenAI compartido (se crea una sola vez al arrancar la app) ---
+    # URL base alternativa (ej. un servidor OpenAI falso local para pruebas de carga). None = API oficial.
+    OPENAI_BASE_URL: Optional[str] = None
+    OPENAI_MODEL: str = "gpt-4o-mini"
+    # Timeouts en segundos para el cliente HTTP del SDK de OpenAI.
+    OPENAI_TIMEOUT_CONNECT_SEG: float = 10.0
+    OPENAI_TIMEOUT_READ_SEG: float = 120.0
+    # Límites del pool de conexiones (por proceso/worker de uvicorn).
+    OPENAI_MAX_CONNECTIONS: int = 50
+    OPENAI_MAX_KEEPALIVE_CONNECTIONS: int = 20
+    OPENAI_KEEPALIVE_EXPIRY_SEG: float = 30.0
+    OPENAI_MAX_RETRIES: int = 2
+
+    # Máximo de llamadas a OpenAI en vuelo a la vez dentro de una misma solicitud
+    # (Paso 3, Paso 4 y las llamadas por escena del Paso 5 se ejecutan en paralelo).
+    LLM_MAX_CONCURRENT_CALLS: int = 8
+
+    # Modo por lotes del Paso 5: varias escenas por llamada (keywords y prompts de imagen).
+    # Las escenas cuya parte de la respuesta falte o sea inválida se reintentan individualmente.
+    LLM_SCENE_BATCHING_ENABLED: bool = True
+    LLM_SCENE_BATCH_MAX_TOKENS: int = 6000 # Presupuesto aproximado de tokens de entrada (texto de escenas) por lote
+    LLM_SCENE_BATCH_MAX_SCENES: int = 10 # Tope de escenas por lote (limita también el tamaño de la respuesta)
+
+    # Presupuesto de tokens de entrada por llamada del Paso 1 (traducción/corrección). Los posts más largos
+    # se reparten en fragmentos (conservando los IDs) que se procesan en paralelo y se fusionan después.
+    # Como el modelo devuelve el texto completo, este valor acota también los tokens de salida por llamada.
+    LLM_TRANSLATION_CHUNK_MAX_TOKENS: int = 3000
+
+    # Codificación de los datos enviados en los prompts:
+    #   "legible"  -> prompts originales (JSON indentado, claves largas).
+    #   "compacto" -> JSON minificado con claves abreviadas (se expanden al parsear la respuesta) e instrucciones
+    #                 estáticas al principio y datos al final, para aprovechar la caché de prefijos del proveedor.
+    LLM_PROMPT_ENCODING: Literal["legible", "compacto"] = "legible"
+
+    # --- Detección local de idioma (n-gramas de caracteres, sin llamar a la IA) ---
+    # Política cuando el contenido es español con confianza suficiente:
+    #   "llm"        -> siempre el Paso 1 completo (detección + traducción/corrección por la IA).
+    #   "correccion" -> Paso 1 con un prompt reducido de solo corrección.
+    #   "omitir"     -> sin llamada: los textos se usan tal cual.
+    LANGUAGE_DETECTION_POLICY: Literal["llm", "correccion", "omitir"] = "correccion"
+    LANGUAGE_DETECTION_MIN_CONFIDENCE: float = 0.05 # Margen relativo mínimo frente al segundo idioma
+    LANGUAGE_DETECTION_MIN_CHARS: int = 40 # Por debajo de esta longitud la detección no se considera fiable
+
+    # --- Palabras clave para bancos de stock (Pasos 4 y 5) ---
+    #   "llm"     -> la IA genera palabras clave y prompts de imágenes (comportamiento original).
+    #   "hibrido" -> palabras clave con el extractor local (TF-IDF/RAKE); la IA solo genera los prompts de imágenes.
+    #   "local"   -> solo el extractor local: sin llamadas de los Pasos 4 y 5 (las listas de prompts quedan vacías).
+    KEYWORD_EXTRACTION_MODE: Literal["llm", "hibrido", "local"] = "llm"
+    KEYWORD_MAX_GLOBAL: int = 6 # Palabras clave globales que genera el extractor local
+    KEYWORD_MAX_PER_SCENE: int = 4 # Palabras clave por escena que genera el extractor local
+
+    # --- Caché de respuestas de OpenAI (SQLite en disco, direccionada por contenido) ---
+    LLM_CACHE_ENABLED: bool = True
+    LLM_CACHE_PATH: str = "/app/cache/llm_cache.sqlite3" # Ruta DENTRO del contenedor (montada como volumen en docker-compose.yml)
+    LLM_CACHE_MAX_MB: int = 256 # Al superarse, se expulsan las entradas de acceso más antiguo (LRU)
+    LLM_CACHE_TTL_SEG: int = 30 * 24 * 3600 # Caducidad de cada entrada (0 = sin caducidad)
+    # Memoria de traducción del Paso 1 por segmento (título, cuerpo, cada comentario/subcomentario), en la misma base.
+    # Requiere LLM_CACHE_ENABLED.
+    LLM_TRANSLATION_MEMORY_ENABLED: bool = True
+
+    # --- Trabajos asíncronos (POST .../jobs/... -> 202 Accepted + consulta de estado) ---
+    JOBS_MAX_CONCURRENT: int = 4 # Trabajos ejecutándose a la vez en este proceso; el resto espera en estado 'pendiente'
+    JOBS_RESULT_TTL_SEG: int = 3600 # Tiempo que se conserva el resultado de un trabajo terminado
+    JOBS_CALLBACK_TIMEOUT_SEG: float = 10.0 # Timeout del POST a la url_callback al terminar un trabajo
+    # Hosts a los que se permite enviar la url_callback, separados por comas (ej. "orquestador_api_service").
+    # Vacío = no se aceptan callbacks (la url_callback viene del cliente: evita peticiones a direcciones internas).
+    JOBS_CALLBACK_ALLOWED_HOSTS: str = ""
+
     # Configuración de Pydantic V2 para la carga de variables.
     # Reemplaza la 'class Config' interna.
     model_config = SettingsConfigDict(
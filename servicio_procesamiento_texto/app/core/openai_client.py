@@ -0,0 +1,60 @@
+import httpx
+from openai import AsyncOpenAI
+from typing import Optional
+
+from .config import get_settings
+
+# Cliente único por proceso. Se crea en el arranque de la app (lifespan en main.py)
+# y se reutiliza en todas las llamadas para aprovechar el pool de conexiones keep-alive.
+_cliente_openai: Optional[AsyncOpenAI] = None
+
+
+def _crear_cliente_openai() -> AsyncOpenAI:
+    settings = get_settings()
+    http_client = httpx.AsyncClient(
+        limits=httpx.Limits(
+            max_connections=settings.OPENAI_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.OPENAI_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=settings.OPENAI_KEEPALIVE_EXPIRY_SEG
+        ),
+        timeout=httpx.Timeout(
+            settings.OPENAI_TIMEOUT_READ_SEG,
+            connect=settings.OPENAI_TIMEOUT_CONNECT_SEG
+        )
+    )
+    return AsyncOpenAI(
+        api_key=settings.OPENAI_API_KEY,
+        base_url=settings.OPENAI_BASE_URL,
+        max_retries=settings.OPENAI_MAX_RETRIES,
+        http_client=http_client
+    )
+
+
+async def iniciar_cliente_openai() -> AsyncOpenAI:
+    """Crea el cliente AsyncOpenAI compartido. Se llama una vez al arrancar la app."""
+    global _cliente_openai
+    if _cliente_openai is None:
+        settings = get_settings()
+        _cliente_openai = _crear_cliente_openai()
+        print(f"Servicio Texto: Cliente AsyncOpenAI creado (max_connections={settings.OPENAI_MAX_CONNECTIONS}, keepalive={settings.OPENAI_MAX_KEEPALIVE_CONNECTIONS}, base_url={settings.OPENAI_BASE_URL or 'por defecto'}).")
+    return _cliente_openai
+
+
+async def cerrar_cliente_openai() -> None:
+    """Cierra el cliente compartido y su pool de conexiones. Se llama al apagar la app."""
+    global _cliente_openai
+    if _cliente_openai is not None:
+        await _cliente_openai.close()
+        _cliente_openai = None
+        print("Servicio Texto: Cliente AsyncOpenAI cerrado.")
+
+
+def get_cliente_openai() -> AsyncOpenAI:
+    """
+    Devuelve el cliente compartido. Si la app no pasó por el lifespan (ej. uso del
+    servicio desde un script), lo crea de forma perezosa en la primera llamada.
+    """
+    global _cliente_openai
+    if _cliente_openai is None:
+        _cliente_openai = _crear_cliente_openai()
+    return _cliente_openai
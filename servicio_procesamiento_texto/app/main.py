@@ -1,10 +1,15 @@
-from fastapi import FastAPI, HTTPException, status
-from typing import Dict  # List eliminado porque no se usa
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException, Query, Response, status
+from fastapi.responses import StreamingResponse
+from typing import Any, AsyncIterator, Dict, Optional, Tuple  # List eliminado porque no se usa
 
 # Importamos los modelos Pydantic de solicitud y respuesta
 from .models_schemas import (
     TextProcessingRequest, 
     TextProcessingResponse,
+    EventoProcesamientoStream,
+    TrabajoAceptado,
+    EstadoTrabajoProcesamiento,
     # Los submodelos no necesitan ser importados aquí directamente si solo se usan
     # dentro de TextProcessingResponse, pero no hace daño tenerlos si se usan en ejemplos.
     # GlobalImagePrompt,
@@ -14,9 +19,25 @@ from .models_schemas import (
 )
 
 # Importamos la función principal de nuestro servicio lógico
-from .services.text_processing_service import generar_contenido_procesado 
+from .services.text_processing_service import generar_contenido_procesado, generar_contenido_procesado_stream
+from .core.openai_client import iniciar_cliente_openai, cerrar_cliente_openai
+from .services.llm_cache import get_cache_llm, cerrar_cache_llm
+from .services.tokens import precargar_codificador
+from .services.trabajos import crear_trabajo, validar_url_callback, obtener_trabajo, cancelar_trabajos_en_vuelo
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Un único cliente AsyncOpenAI (con su pool de conexiones) por proceso/worker.
+    await iniciar_cliente_openai()
+    get_cache_llm() # Abre (o crea) la caché de respuestas LLM al arrancar
+    await precargar_codificador() # Codificación de tiktoken: su primera carga descarga el archivo BPE y bloquearía el event loop
+    yield
+    await cancelar_trabajos_en_vuelo()
+    await cerrar_cliente_openai()
+    cerrar_cache_llm()
 
 app = FastAPI(
+    lifespan=lifespan,
     title="Servicio de Procesamiento de Texto con IA",
     version="1.0.0",
     description="Microservicio para procesar contenido de Reddit y generar guiones, escenas, palabras clave y prompts para imágenes IA usando OpenAI.",
@@ -59,37 +80,129 @@ async def procesar_contenido_reddit_endpoint(datos_solicitud: TextProcessingRequ
         resultado = await generar_contenido_procesado(datos_solicitud)
         print(f"API ProcesamientoTexto: Contenido procesado exitosamente para id_proyecto: {datos_solicitud.id_proyecto}")
         return resultado
-        
-    except ValueError as ve: # Errores controlados desde la capa de servicio (lanzados por _llamar_openai_api o lógica de servicio)
-        mensaje_error = str(ve)
+    except Exception as e:
+        codigo_http, detalle_error = _mapear_error_procesamiento(e)
+        raise HTTPException(status_code=codigo_http, detail=detalle_error)
+
+def _mapear_error_procesamiento(error: Exception) -> Tuple[int, Dict[str, str]]:
+    """Traduce una excepción del servicio a (código HTTP, detalle {tipo_error, mensaje})."""
+    if isinstance(error, ValueError): # Errores controlados desde la capa de servicio (lanzados por _llamar_openai_api o lógica de servicio)
+        mensaje_error = str(error)
         print(f"API ProcesamientoTexto: Error de negocio/IA detectado - {mensaje_error}")
         
-        # Mapeo de mensajes de ValueError a HTTPExceptions específicas
+        # Mapeo de mensajes de ValueError a códigos HTTP específicos
         # (Estos mensajes deben coincidir con los que lanza text_processing_service.py)
         if "autenticación con la API de OpenAI" in mensaje_error or "API Key" in mensaje_error:
-            raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail={"tipo_error": "ERROR_CONFIGURACION_IA", "mensaje": "Problema de autenticación con el servicio de IA. Verifica la API Key."})
+            return status.HTTP_500_INTERNAL_SERVER_ERROR, {"tipo_error": "ERROR_CONFIGURACION_IA", "mensaje": "Problema de autenticación con el servicio de IA. Verifica la API Key."}
         elif "Límite de tasa excedido" in mensaje_error:
-            raise HTTPException(status_code=status.HTTP_429_TOO_MANY_REQUESTS, detail={"tipo_error": "LIMITE_TASA_IA_EXCEDIDO", "mensaje": mensaje_error})
+            return status.HTTP_429_TOO_MANY_REQUESTS, {"tipo_error": "LIMITE_TASA_IA_EXCEDIDO", "mensaje": mensaje_error}
         elif "contenido infringe las políticas de OpenAI" in mensaje_error:
-            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail={"tipo_error": "VIOLACION_POLITICA_CONTENIDO_IA", "mensaje": mensaje_error})
+            return status.HTTP_400_BAD_REQUEST, {"tipo_error": "VIOLACION_POLITICA_CONTENIDO_IA", "mensaje": mensaje_error}
         elif "respuesta de OpenAI no pudo ser interpretada como JSON válido" in mensaje_error:
-            raise HTTPException(status_code=status.HTTP_502_BAD_GATEWAY, detail={"tipo_error": "ERROR_RESPUESTA_IA_MALFORMADA", "mensaje": mensaje_error})
+            return status.HTTP_502_BAD_GATEWAY, {"tipo_error": "ERROR_RESPUESTA_IA_MALFORMADA", "mensaje": mensaje_error}
         elif "respuesta de OpenAI no contiene contenido" in mensaje_error:
-            raise HTTPException(status_code=status.HTTP_502_BAD_GATEWAY, detail={"tipo_error": "ERROR_RESPUESTA_IA_VACIA", "mensaje": mensaje_error})
+            return status.HTTP_502_BAD_GATEWAY, {"tipo_error": "ERROR_RESPUESTA_IA_VACIA", "mensaje": mensaje_error}
         elif "Error en la API de OpenAI" in mensaje_error: # Error más genérico de la API de OpenAI
-            raise HTTPException(status_code=status.HTTP_502_BAD_GATEWAY, detail={"tipo_error": "ERROR_SERVICIO_IA_EXTERNO", "mensaje": mensaje_error})
+            return status.HTTP_502_BAD_GATEWAY, {"tipo_error": "ERROR_SERVICIO_IA_EXTERNO", "mensaje": mensaje_error}
         elif "contenido insuficiente" in mensaje_error.lower(): # Si tuvieras esta validación en el servicio
-             raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail={"tipo_error": "CONTENIDO_INSUFICIENTE", "mensaje": mensaje_error})
+            return status.HTTP_422_UNPROCESSABLE_ENTITY, {"tipo_error": "CONTENIDO_INSUFICIENTE", "mensaje": mensaje_error}
         else: # Otros ValueErrors específicos de la lógica de negocio o errores de PRAW propagados
-             raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail={"tipo_error": "ERROR_PROCESAMIENTO_TEXTO", "mensaje": mensaje_error})
-             
-    except Exception as e: # Para cualquier otro error inesperado no capturado explícitamente
-        print(f"API ProcesamientoTexto: Error inesperado del servidor - {type(e).__name__}: {e}")
-        # En producción, aquí se debería loggear el traceback completo de 'e' para análisis.
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail={"tipo_error": "ERROR_INTERNO_SERVIDOR_INESPERADO", "mensaje": f"Ocurrió un error interno inesperado en el servidor: {type(e).__name__}"}
-        )
+            return status.HTTP_400_BAD_REQUEST, {"tipo_error": "ERROR_PROCESAMIENTO_TEXTO", "mensaje": mensaje_error}
+
+    # Para cualquier otro error inesperado no capturado explícitamente
+    print(f"API ProcesamientoTexto: Error inesperado del servidor - {type(error).__name__}: {error}")
+    # En producción, aquí se debería loggear el traceback completo de 'e' para análisis.
+    return status.HTTP_500_INTERNAL_SERVER_ERROR, {"tipo_error": "ERROR_INTERNO_SERVIDOR_INESPERADO", "mensaje": f"Ocurrió un error interno inesperado en el servidor: {type(error).__name__}"}
+
+# --- Variante en Streaming (NDJSON) del Endpoint Principal ---
+@app.post(
+    "/api/v1/text_processing/process_reddit_content/stream",
+    status_code=status.HTTP_200_OK,
+    summary="Igual que process_reddit_content, pero emite el resultado por partes (NDJSON) a medida que está listo",
+    tags=["Text Processing"],
+    response_class=StreamingResponse,
+    responses={200: {"content": {"application/x-ndjson": {}}, "description": "Una línea JSON (modelo `EventoProcesamientoStream`) por evento."}}
+)
+async def procesar_contenido_reddit_stream_endpoint(datos_solicitud: TextProcessingRequest):
+    """
+    Devuelve `application/x-ndjson`: una línea `{"evento": ..., "datos": {...}}` por evento, en este orden:
+    - `guion`: idioma detectado, título, guion completo y total de escenas (tras el Paso 2).
+    - `elementos_globales`: palabras clave y prompts globales (tras el Paso 4).
+    - `escena`: `{"indice_escena", "escena"}` con una `EscenaProcesada` completa, en cuanto sus palabras clave y prompts están listos (el orden de llegada puede no ser el del guion).
+    - `fin`: `{"resumen_general_es", "metadata_procesamiento"}`; o `error`: `{"codigo_http", "tipo_error", "mensaje"}` si el pipeline falla.
+    """
+    print(f"API ProcesamientoTexto: Recibida solicitud (streaming) para id_proyecto: {datos_solicitud.id_proyecto}")
+
+    def _error_como_evento(error: Exception) -> Dict[str, Any]:
+        codigo_http, detalle_error = _mapear_error_procesamiento(error)
+        return {"codigo_http": codigo_http, **detalle_error}
+
+    async def _lineas_ndjson() -> AsyncIterator[str]:
+        async for evento in generar_contenido_procesado_stream(datos_solicitud, _error_como_evento):
+            yield EventoProcesamientoStream(**evento).model_dump_json() + "\n"
+
+    return StreamingResponse(_lineas_ndjson(), media_type="application/x-ndjson")
+
+# --- Variante Asíncrona (Trabajos) del Endpoint Principal ---
+@app.post(
+    "/api/v1/text_processing/jobs/process_reddit_content",
+    response_model=TrabajoAceptado,
+    status_code=status.HTTP_202_ACCEPTED,
+    summary="Encola el procesamiento del contenido de Reddit y devuelve de inmediato un id de trabajo",
+    tags=["Text Processing"]
+)
+async def encolar_procesamiento_reddit_endpoint(
+    datos_solicitud: TextProcessingRequest,
+    response: Response,
+    url_callback: Optional[str] = Query(default=None, description="Si se indica, al terminar el trabajo se envía un POST con su estado final (modelo `EstadoTrabajoProcesamiento`) a esta URL.")
+):
+    """
+    Mismo procesamiento que `process_reddit_content`, sin mantener la conexión abierta: responde `202 Accepted`
+    con el `id_trabajo` (y la cabecera `Location`) y el resultado se consulta en `GET /api/v1/text_processing/jobs/{id_trabajo}`.
+    Si el trabajo falla, el estado final incluye el mismo código HTTP y detalle que devolvería el endpoint síncrono.
+    """
+    print(f"API ProcesamientoTexto: Recibida solicitud (trabajo asíncrono) para id_proyecto: {datos_solicitud.id_proyecto}")
+    try:
+        validar_url_callback(url_callback)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail={"tipo_error": "URL_CALLBACK_NO_PERMITIDA", "mensaje": str(e)})
+    trabajo = crear_trabajo(
+        "process_reddit_content",
+        lambda: generar_contenido_procesado(datos_solicitud),
+        _mapear_error_procesamiento,
+        url_callback
+    )
+    url_estado = f"/api/v1/text_processing/jobs/{trabajo['id_trabajo']}"
+    response.headers["Location"] = url_estado
+    return TrabajoAceptado(id_trabajo=trabajo["id_trabajo"], estado=trabajo["estado"], url_estado=url_estado)
+
+@app.get(
+    "/api/v1/text_processing/jobs/{id_trabajo}",
+    response_model=EstadoTrabajoProcesamiento,
+    status_code=status.HTTP_200_OK,
+    summary="Devuelve el estado de un trabajo de procesamiento y, si terminó, su resultado o su error",
+    tags=["Text Processing"]
+)
+async def estado_trabajo_endpoint(id_trabajo: str):
+    trabajo = obtener_trabajo(id_trabajo)
+    if trabajo is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail={"tipo_error": "TRABAJO_NO_ENCONTRADO", "mensaje": f"No existe el trabajo '{id_trabajo}' (o su resultado ya caducó)."})
+    return trabajo
+
+# --- Endpoint de Métricas de la Caché LLM ---
+@app.get(
+    "/api/v1/text_processing/llm_cache/stats",
+    status_code=status.HTTP_200_OK,
+    summary="Devuelve las métricas de aciertos/fallos y ocupación de la caché de respuestas de la IA.",
+    tags=["Utilities"],
+    response_model=Dict[str, Any]
+)
+async def llm_cache_stats():
+    """Métricas acumuladas por este proceso desde su arranque (aciertos, fallos, escrituras, expulsiones, tamaño)."""
+    cache = get_cache_llm()
+    if cache is None:
+        return {"habilitada": False}
+    return {"habilitada": True, **cache.resumen()}
 
 # --- Endpoint de Health Check (Buena Práctica) ---
 @app.get(
@@ -1,4 +1,5 @@
-from typing import List, Optional, Union, Dict # Añade Union y Dict si no estaban
+from datetime import datetime
+from typing import Any, List, Literal, Optional, Union, Dict # Añade Union y Dict si no estaban
 from pydantic import BaseModel, Field, HttpUrl # HttpUrl si la URL original se pasa como tal
 
 
@@ -27,6 +28,7 @@ class TextProcessingRequest(BaseModel):
     titulo: str # Este es un texto clave que procesaremos
     cuerpo_historia: str # Este es un texto clave que procesaremos
     comentarios: List[CommentInput] = [] # Lista de comentarios, cada uno con su texto a procesar
+    forzar_regeneracion: bool = Field(default=False, description="Si es True, se ignoran las respuestas en caché de la IA y se regenera todo (las nuevas respuestas sí se guardan en caché).")
 
     class Config:
         # Ejemplo de cómo se vería el JSON de entrada esperado por este servicio
@@ -99,6 +101,34 @@ class EscenaProcesada(BaseModel): # Modelo Actualizado
     prompts_imagenes_ia_escena: List[SceneImagePrompt] = Field(default_factory=list, description="Prompts de IA para imágenes de esta escena.")
     duracion_estimada_narracion_seg: Optional[float] = Field(default=None, ge=0, description="Estimación en segundos de la narración del texto_escena_es completo.")
 
+class UsoTokensLlamadaLLM(BaseModel):
+    """Tokens de una llamada a la IA, según el campo `usage` que devuelve la API."""
+    paso: str = Field(..., description="Descripción de la llamada (ej. 'Paso4_ElementosGlobales', 'Paso5_ElementosEscena_<id>').")
+    desde_cache: bool = Field(default=False, description="True si la respuesta salió de la caché local (sin consumo de tokens).")
+    tokens_prompt: int = Field(default=0, ge=0, description="Tokens de entrada (mensaje de sistema + prompt).")
+    tokens_prompt_cacheados: int = Field(default=0, ge=0, description="Parte de los tokens de entrada servida desde la caché de prefijos del proveedor.")
+    tokens_completion: int = Field(default=0, ge=0, description="Tokens generados en la respuesta.")
+
+class MetadataProcesamiento(BaseModel):
+    """Métricas de ejecución del pipeline de procesamiento (tiempos por paso, concurrencia)."""
+    tiempo_total_seg: float = Field(..., ge=0, description="Tiempo total de procesamiento de la solicitud, en segundos.")
+    tiempos_pasos_seg: Dict[str, float] = Field(default_factory=dict, description="Duración en segundos de cada paso del pipeline (ej. 'paso1_calidad_lenguaje', 'paso5_elementos_escena_<id>').")
+    max_concurrencia_llm: int = Field(..., ge=1, description="Límite de llamadas simultáneas a la IA usado en esta solicitud.")
+    llamadas_llm_realizadas: int = Field(default=0, ge=0, description="Llamadas reales a la API de OpenAI hechas en esta solicitud.")
+    cache_llm_aciertos: int = Field(default=0, ge=0, description="Respuestas de la IA servidas desde la caché.")
+    cache_llm_fallos: int = Field(default=0, ge=0, description="Consultas a la caché de la IA sin resultado.")
+    llamadas_llm_evitadas: int = Field(default=0, ge=0, description="Llamadas a la IA omitidas gracias a la detección local de idioma o a la extracción local de palabras clave.")
+    llamadas_llm_simplificadas: int = Field(default=0, ge=0, description="Llamadas del Paso 1 hechas con el prompt reducido de solo corrección.")
+    segmentos_memoria_traduccion: int = Field(default=0, ge=0, description="Textos del Paso 1 (título, cuerpo, comentarios, subcomentarios) tomados de la memoria de traducción.")
+    segmentos_enviados_llm: int = Field(default=0, ge=0, description="Textos del Paso 1 que no estaban en la memoria de traducción y se enviaron a la IA.")
+    idioma_detectado_local: Optional[str] = Field(default=None, description="Idioma detectado localmente (n-gramas de caracteres) antes de llamar a la IA.")
+    confianza_idioma_local: Optional[float] = Field(default=None, ge=0, le=1, description="Confianza de la detección local (margen relativo frente al segundo idioma).")
+    modo_palabras_clave: Optional[str] = Field(default=None, description="Origen de las palabras clave de stock: 'llm', 'hibrido' o 'local'.")
+    codificacion_prompts: Optional[str] = Field(default=None, description="Codificación de los prompts usada: 'legible' o 'compacto'.")
+    tokens_prompt_total: int = Field(default=0, ge=0, description="Suma de tokens de entrada de todas las llamadas a la IA de la solicitud.")
+    tokens_completion_total: int = Field(default=0, ge=0, description="Suma de tokens generados en todas las llamadas a la IA de la solicitud.")
+    uso_tokens_llm: List[UsoTokensLlamadaLLM] = Field(default_factory=list, description="Uso de tokens de cada llamada a la IA, en orden de finalización.")
+
 # --- Modelo Principal para el Response Body ---
 class TextProcessingResponse(BaseModel):
     """
@@ -112,6 +142,7 @@ class TextProcessingResponse(BaseModel):
     palabras_clave_globales_stock: List[str] = Field(default_factory=list, description="Palabras clave generales para buscar en bancos de imágenes/video.")
     prompts_globales_imagenes_ia: List[GlobalImagePrompt] = Field(default_factory=list, description="Prompts generales para imágenes IA (miniaturas, intros, etc.).")
     escenas: List[EscenaProcesada] = Field(..., description="Lista ordenada de las escenas que componen el guion.")
+    metadata_procesamiento: Optional[MetadataProcesamiento] = Field(default=None, description="Métricas de ejecución del pipeline (tiempos por paso).")
 
     class Config:
         json_schema_extra = { # Actualizado de schema_extra para Pydantic V2
@@ -172,4 +203,40 @@ class TextProcessingResponse(BaseModel):
                     }
                 ]
             }
-        }
\ No newline at end of file
+        }
+
+# --- Modelo para la variante en streaming (NDJSON) ---
+class EventoProcesamientoStream(BaseModel):
+    """
+    Una línea del flujo NDJSON de /process_reddit_content/stream. Orden de emisión:
+    'guion' (tras el Paso 2), 'elementos_globales' (tras el Paso 4), un 'escena' por cada escena en cuanto
+    tiene sus palabras clave y prompts (en orden de finalización, no de guion) y finalmente 'fin' o 'error'.
+    """
+    evento: Literal["guion", "elementos_globales", "escena", "fin", "error"] = Field(..., description="Tipo de evento.")
+    datos: Dict[str, Any] = Field(default_factory=dict, description="Contenido del evento (ver descripción del endpoint).")
+
+# --- Modelos del protocolo de trabajos asíncronos (202 Accepted + consulta de estado) ---
+EstadoTrabajo = Literal["pendiente", "en_curso", "completado", "error"]
+
+class TrabajoAceptado(BaseModel):
+    """Respuesta 202 al encolar un trabajo."""
+    id_trabajo: str = Field(..., description="Identificador del trabajo.")
+    estado: EstadoTrabajo = Field(..., description="Estado en el momento de aceptarlo (normalmente 'pendiente').")
+    url_estado: str = Field(..., description="Ruta para consultar el estado y, al terminar, el resultado.")
+
+class ErrorTrabajo(BaseModel):
+    """Error con el que terminó un trabajo: el mismo código y detalle que devolvería el endpoint síncrono."""
+    codigo_http: int
+    tipo_error: str
+    mensaje: str
+
+class EstadoTrabajoProcesamiento(BaseModel):
+    """Estado de un trabajo de procesamiento de texto. 'resultado' solo está presente si estado='completado'."""
+    id_trabajo: str
+    tipo: str
+    estado: EstadoTrabajo
+    creado_en: datetime
+    iniciado_en: Optional[datetime] = None
+    finalizado_en: Optional[datetime] = None
+    resultado: Optional[TextProcessingResponse] = None
+    error: Optional[ErrorTrabajo] = None
@@ -0,0 +1,61 @@
+import json
+import os
+import re
+from collections import Counter
+from functools import lru_cache
+from typing import Dict, List, Tuple
+
+# Identificador de idioma local basado en perfiles de n-gramas de caracteres (método de Cavnar y Trenkle):
+# se ordenan los n-gramas (1 a 3 caracteres, por palabra) del texto por frecuencia y se compara ese
+# ranking con el perfil de cada idioma (app/data/perfiles_idioma.json). El idioma con menor distancia
+# "fuera de lugar" gana; la confianza es el margen relativo frente al segundo candidato.
+# Sirve para decidir, sin llamar a la IA, si un post ya está en español.
+
+_RUTA_PERFILES = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "perfiles_idioma.json")
+_PATRON_PALABRAS = re.compile(r"[^\W\d_]+", re.UNICODE)
+_PATRON_URLS = re.compile(r"https?://\S+|www\.\S+")
+TAMANO_PERFIL = 300 # N-gramas más frecuentes que se conservan por perfil
+MAX_CARACTERES_ANALIZADOS = 20000 # Más texto no mejora la detección y solo añade coste
+
+
+def construir_perfil(texto: str, tamano: int = TAMANO_PERFIL) -> List[str]:
+    """Devuelve los n-gramas (1-3) más frecuentes del texto, ordenados de mayor a menor frecuencia."""
+    texto = _PATRON_URLS.sub(" ", texto.lower())
+    conteo: Counter = Counter()
+    for palabra in _PATRON_PALABRAS.findall(texto):
+        palabra_marcada = f"_{palabra}_"
+        for n in (1, 2, 3):
+            for i in range(len(palabra_marcada) - n + 1):
+                ngrama = palabra_marcada[i:i + n]
+                if ngrama != "_": conteo[ngrama] += 1
+    # Desempate estable por el propio n-grama para que el perfil sea reproducible.
+    return [ngrama for ngrama, _ in sorted(conteo.items(), key=lambda kv: (-kv[1], kv[0]))[:tamano]]
+
+
+@lru_cache()
+def _cargar_perfiles() -> Dict[str, Dict[str, int]]:
+    with open(_RUTA_PERFILES, encoding="utf-8") as f:
+        perfiles: Dict[str, List[str]] = json.load(f)
+    return {idioma: {ngrama: rango for rango, ngrama in enumerate(ngramas)} for idioma, ngramas in perfiles.items()}
+
+
+def detectar_idioma(texto: str) -> Tuple[str, float]:
+    """
+    Devuelve (codigo_iso_639_1, confianza entre 0 y 1). Para textos sin letras devuelve ("desconocido", 0.0).
+    """
+    perfil_texto = construir_perfil(texto[:MAX_CARACTERES_ANALIZADOS])
+    if not perfil_texto: return "desconocido", 0.0
+    perfiles = _cargar_perfiles()
+    distancias: List[Tuple[int, str]] = []
+    for idioma, rangos_idioma in perfiles.items():
+        penalizacion_max = len(rangos_idioma)
+        distancia = 0
+        for rango, ngrama in enumerate(perfil_texto):
+            rango_idioma = rangos_idioma.get(ngrama)
+            distancia += abs(rango - rango_idioma) if rango_idioma is not None else penalizacion_max
+        distancias.append((distancia, idioma))
+    distancias.sort()
+    mejor_distancia, mejor_idioma = distancias[0]
+    if len(distancias) == 1 or distancias[1][0] == 0: return mejor_idioma, 1.0
+    confianza = (distancias[1][0] - mejor_distancia) / distancias[1][0]
+    return mejor_idioma, round(confianza, 4)
@@ -0,0 +1,199 @@
+import asyncio
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from ..core.config import get_settings
+
+# Caché de respuestas de OpenAI direccionada por contenido, persistida en SQLite.
+# La clave es un hash de (modelo, temperatura, formato, mensaje de sistema, prompt), de modo que
+# reintentos, re-ejecuciones y textos repetidos entre proyectos reutilizan la misma respuesta.
+# Expulsión: las entradas caducan tras LLM_CACHE_TTL_SEG y, si se supera LLM_CACHE_MAX_MB,
+# se eliminan las de acceso más antiguo (LRU).
+# La misma base guarda la memoria de traducción del Paso 1: un texto procesado por cada segmento de origen
+# (título, cuerpo, comentario o subcomentario), para no volver a enviar a la IA segmentos ya vistos.
+# Ambas tablas comparten el TTL y el límite de tamaño.
+
+_TABLAS = ("respuestas", "segmentos_traducidos")
+_MAX_PARAMETROS_SQL = 500 # Por debajo del límite de variables por consulta de SQLite antiguos (999)
+
+
+class CacheRespuestasLLM:
+    def __init__(self, ruta_db: str, max_bytes: int, ttl_seg: int):
+        self.ruta_db = ruta_db
+        self.max_bytes = max_bytes
+        self.ttl_seg = ttl_seg
+        self._lock = threading.Lock()
+        self.estadisticas: Dict[str, int] = {
+            "aciertos": 0, "fallos": 0, "escrituras": 0, "expulsiones": 0,
+            "segmentos_aciertos": 0, "segmentos_fallos": 0, "segmentos_escrituras": 0
+        }
+        directorio = os.path.dirname(ruta_db)
+        if directorio: os.makedirs(directorio, exist_ok=True)
+        self._conexion = sqlite3.connect(ruta_db, check_same_thread=False, isolation_level=None)
+        self._conexion.execute("PRAGMA journal_mode=WAL")
+        self._conexion.execute("PRAGMA synchronous=NORMAL")
+        self._conexion.execute(
+            "CREATE TABLE IF NOT EXISTS respuestas ("
+            " clave TEXT PRIMARY KEY, respuesta TEXT NOT NULL, tamano_bytes INTEGER NOT NULL,"
+            " creado_en REAL NOT NULL, ultimo_acceso REAL NOT NULL)"
+        )
+        self._conexion.execute("CREATE INDEX IF NOT EXISTS idx_respuestas_ultimo_acceso ON respuestas (ultimo_acceso)")
+        self._conexion.execute(
+            "CREATE TABLE IF NOT EXISTS segmentos_traducidos ("
+            " clave TEXT PRIMARY KEY, texto TEXT NOT NULL, idioma TEXT NOT NULL, tamano_bytes INTEGER NOT NULL,"
+            " creado_en REAL NOT NULL, ultimo_acceso REAL NOT NULL)"
+        )
+        self._conexion.execute("CREATE INDEX IF NOT EXISTS idx_segmentos_ultimo_acceso ON segmentos_traducidos (ultimo_acceso)")
+
+    @staticmethod
+    def calcular_clave(modelo: str, temperatura: float, mensaje_sistema: str, prompt: str, formato_respuesta: str = "json_object") -> str:
+        material = json.dumps([modelo, temperatura, formato_respuesta, mensaje_sistema, prompt], ensure_ascii=False)
+        return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def calcular_clave_segmento(modelo: str, modo: str, codificacion_prompts: str, instrucciones: str, texto_origen: str) -> str:
+        # La codificación de prompts (legible/compacta) cambia la forma de la respuesta y las instrucciones (prompt sin
+        # el contenido), su resultado: ambas forman parte de la clave, así que editar un prompt invalida lo traducido con él
+        material = json.dumps(["segmento_v1", modelo, modo, codificacion_prompts, instrucciones, texto_origen], ensure_ascii=False)
+        return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+    def _obtener_sync(self, clave: str) -> Optional[str]:
+        ahora = time.time()
+        with self._lock:
+            fila = self._conexion.execute("SELECT respuesta, creado_en FROM respuestas WHERE clave = ?", (clave,)).fetchone()
+            if fila is None:
+                self.estadisticas["fallos"] += 1
+                return None
+            respuesta, creado_en = fila
+            if self.ttl_seg > 0 and ahora - creado_en > self.ttl_seg:
+                self._conexion.execute("DELETE FROM respuestas WHERE clave = ?", (clave,))
+                self.estadisticas["expulsiones"] += 1
+                self.estadisticas["fallos"] += 1
+                return None
+            self._conexion.execute("UPDATE respuestas SET ultimo_acceso = ? WHERE clave = ?", (ahora, clave))
+            self.estadisticas["aciertos"] += 1
+            return respuesta
+
+    def _guardar_sync(self, clave: str, respuesta: str) -> None:
+        ahora = time.time()
+        tamano = len(respuesta.encode("utf-8"))
+        with self._lock:
+            self._conexion.execute(
+                "INSERT OR REPLACE INTO respuestas (clave, respuesta, tamano_bytes, creado_en, ultimo_acceso) VALUES (?, ?, ?, ?, ?)",
+                (clave, respuesta, tamano, ahora, ahora)
+            )
+            self.estadisticas["escrituras"] += 1
+            self._expulsar_sync(ahora)
+
+    def _obtener_segmentos_sync(self, claves: List[str]) -> Dict[str, Tuple[str, str]]:
+        ahora = time.time()
+        encontrados: Dict[str, Tuple[str, str]] = {}
+        with self._lock:
+            for i in range(0, len(claves), _MAX_PARAMETROS_SQL):
+                bloque = claves[i:i + _MAX_PARAMETROS_SQL]
+                marcadores = ",".join("?" * len(bloque))
+                for clave, texto, idioma, creado_en in self._conexion.execute(
+                    f"SELECT clave, texto, idioma, creado_en FROM segmentos_traducidos WHERE clave IN ({marcadores})", bloque
+                ):
+                    if self.ttl_seg > 0 and ahora - creado_en > self.ttl_seg: continue # La expulsión por TTL la hace la próxima escritura
+                    encontrados[clave] = (texto, idioma)
+            self._conexion.executemany("UPDATE segmentos_traducidos SET ultimo_acceso = ? WHERE clave = ?", [(ahora, c) for c in encontrados])
+            self.estadisticas["segmentos_aciertos"] += len(encontrados)
+            self.estadisticas["segmentos_fallos"] += len(set(claves)) - len(encontrados)
+        return encontrados
+
+    def _guardar_segmentos_sync(self, segmentos: List[Tuple[str, str, str]]) -> None:
+        """segmentos: lista de (clave, texto_procesado, idioma)."""
+        if not segmentos: return
+        ahora = time.time()
+        with self._lock:
+            self._conexion.executemany(
+                "INSERT OR REPLACE INTO segmentos_traducidos (clave, texto, idioma, tamano_bytes, creado_en, ultimo_acceso) VALUES (?, ?, ?, ?, ?, ?)",
+                [(clave, texto, idioma, len(texto.encode("utf-8")), ahora, ahora) for clave, texto, idioma in segmentos]
+            )
+            self.estadisticas["segmentos_escrituras"] += len(segmentos)
+            self._expulsar_sync(ahora)
+
+    def _expulsar_sync(self, ahora: float) -> None:
+        # Llamar con self._lock adquirido. El límite de tamaño es conjunto para ambas tablas.
+        if self.ttl_seg > 0:
+            for tabla in _TABLAS:
+                cursor = self._conexion.execute(f"DELETE FROM {tabla} WHERE creado_en < ?", (ahora - self.ttl_seg,))
+                self.estadisticas["expulsiones"] += max(cursor.rowcount, 0)
+        total_bytes = sum(self._conexion.execute(f"SELECT COALESCE(SUM(tamano_bytes), 0) FROM {tabla}").fetchone()[0] for tabla in _TABLAS)
+        if total_bytes <= self.max_bytes: return
+        exceso = total_bytes - self.max_bytes
+        liberado = 0
+        claves_a_borrar: Dict[str, List[Tuple[str]]] = {tabla: [] for tabla in _TABLAS}
+        consulta_lru = " UNION ALL ".join(f"SELECT '{tabla}', clave, tamano_bytes, ultimo_acceso FROM {tabla}" for tabla in _TABLAS) + " ORDER BY ultimo_acceso ASC"
+        for tabla, clave, tamano, _ in self._conexion.execute(consulta_lru):
+            claves_a_borrar[tabla].append((clave,))
+            liberado += tamano
+            if liberado >= exceso: break
+        for tabla, claves in claves_a_borrar.items():
+            self._conexion.executemany(f"DELETE FROM {tabla} WHERE clave = ?", claves)
+            self.estadisticas["expulsiones"] += len(claves)
+
+    async def obtener(self, clave: str) -> Optional[str]:
+        return await asyncio.to_thread(self._obtener_sync, clave)
+
+    async def guardar(self, clave: str, respuesta: str) -> None:
+        await asyncio.to_thread(self._guardar_sync, clave, respuesta)
+
+    async def obtener_segmentos(self, claves: List[str]) -> Dict[str, Tuple[str, str]]:
+        return await asyncio.to_thread(self._obtener_segmentos_sync, claves)
+
+    async def guardar_segmentos(self, segmentos: List[Tuple[str, str, str]]) -> None:
+        await asyncio.to_thread(self._guardar_segmentos_sync, segmentos)
+
+    def resumen(self) -> Dict[str, Any]:
+        with self._lock:
+            entradas, total_bytes = self._conexion.execute("SELECT COUNT(*), COALESCE(SUM(tamano_bytes), 0) FROM respuestas").fetchone()
+            entradas_segmentos, bytes_segmentos = self._conexion.execute("SELECT COUNT(*), COALESCE(SUM(tamano_bytes), 0) FROM segmentos_traducidos").fetchone()
+        consultas = self.estadisticas["aciertos"] + self.estadisticas["fallos"]
+        return {
+            **self.estadisticas,
+            "tasa_aciertos": round(self.estadisticas["aciertos"] / consultas, 4) if consultas else 0.0,
+            "entradas": entradas,
+            "entradas_segmentos": entradas_segmentos,
+            "tamano_bytes": total_bytes + bytes_segmentos,
+            "max_bytes": self.max_bytes,
+            "ttl_seg": self.ttl_seg
+        }
+
+    def cerrar(self) -> None:
+        with self._lock:
+            self._conexion.close()
+
+
+_cache_llm: Optional[CacheRespuestasLLM] = None
+_cache_llm_no_disponible = False # Evita reintentar (y loguear) la apertura en cada llamada si falló una vez
+
+
+def get_cache_llm() -> Optional[CacheRespuestasLLM]:
+    """Devuelve la caché del proceso (creándola en la primera llamada), o None si está desactivada."""
+    global _cache_llm, _cache_llm_no_disponible
+    settings = get_settings()
+    if not settings.LLM_CACHE_ENABLED or _cache_llm_no_disponible: return None
+    if _cache_llm is None:
+        try:
+            _cache_llm = CacheRespuestasLLM(settings.LLM_CACHE_PATH, settings.LLM_CACHE_MAX_MB * 1024 * 1024, settings.LLM_CACHE_TTL_SEG)
+            print(f"Servicio Texto: Caché de respuestas LLM abierta en {settings.LLM_CACHE_PATH} (máx {settings.LLM_CACHE_MAX_MB} MB, TTL {settings.LLM_CACHE_TTL_SEG}s).")
+        except (sqlite3.Error, OSError) as e:
+            # Sin caché el servicio sigue funcionando; solo se pierde la reutilización de respuestas.
+            print(f"Servicio Texto: ADVERTENCIA - No se pudo abrir la caché LLM en {settings.LLM_CACHE_PATH}: {e}. Se continúa sin caché.")
+            _cache_llm_no_disponible = True
+            return None
+    return _cache_llm
+
+
+def cerrar_cache_llm() -> None:
+    global _cache_llm
+    if _cache_llm is not None:
+        _cache_llm.cerrar()
+        _cache_llm = None
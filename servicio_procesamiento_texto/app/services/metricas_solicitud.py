@@ -0,0 +1,44 @@
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional
+
+# Estado por solicitud compartido por todas las llamadas a OpenAI de una misma ejecución del pipeline.
+# Se guarda en un ContextVar: las tareas asyncio creadas por el DAG heredan el contexto, y como
+# el valor es un dict mutable, todos los pasos acumulan sobre los mismos contadores.
+_contexto_solicitud: ContextVar[Optional[Dict[str, Any]]] = ContextVar("contexto_solicitud_llm", default=None)
+
+
+def iniciar_contexto_solicitud(forzar_regeneracion: bool = False) -> Dict[str, Any]:
+    contexto: Dict[str, Any] = {"forzar_regeneracion": forzar_regeneracion, "contadores": {}, "llamadas_llm": []}
+    _contexto_solicitud.set(contexto)
+    return contexto
+
+
+def forzar_regeneracion_activa() -> bool:
+    contexto = _contexto_solicitud.get()
+    return bool(contexto and contexto.get("forzar_regeneracion"))
+
+
+def incrementar_contador(nombre: str, cantidad: int = 1) -> None:
+    contexto = _contexto_solicitud.get()
+    if contexto is None: return # Llamadas fuera de una solicitud (ej. scripts) no acumulan métricas
+    contadores = contexto["contadores"]
+    contadores[nombre] = contadores.get(nombre, 0) + cantidad
+
+
+def obtener_contador(nombre: str) -> int:
+    contexto = _contexto_solicitud.get()
+    if contexto is None: return 0
+    return contexto["contadores"].get(nombre, 0)
+
+
+def registrar_llamada_llm(registro: Dict[str, Any]) -> None:
+    """Guarda el uso de tokens de una llamada a la IA (o de una respuesta servida desde la caché)."""
+    contexto = _contexto_solicitud.get()
+    if contexto is None: return
+    contexto["llamadas_llm"].append(registro)
+
+
+def obtener_llamadas_llm() -> List[Dict[str, Any]]:
+    contexto = _contexto_solicitud.get()
+    if contexto is None: return []
+    return list(contexto["llamadas_llm"])
@@ -0,0 +1,104 @@
+import json
+import os
+import re
+from functools import lru_cache
+from typing import Dict, FrozenSet, List, Tuple
+
+import numpy as np
+
+# Extractor local de palabras clave en español para búsquedas en bancos de stock (sin llamar a la IA).
+# Estilo RAKE: las stopwords, la puntuación y los números cortan el texto en tramos de palabras de contenido;
+# los candidatos son los n-gramas (1 a 3 palabras) de cada tramo. Cada palabra pesa TF x IDF, donde el IDF
+# sale de una tabla incluida (app/data/idf_es.json: -log10 de la frecuencia de la palabra en español general,
+# derivada de wordfreq). La puntuación de una frase es la suma de los pesos de sus palabras, normalizada por
+# su longitud y reforzada por las veces que aparece; las frases que siguen a un determinante ("la cabaña",
+# "una linterna") se refuerzan porque casi siempre son sustantivos. Se eligen las mejores sin repetir palabras.
+
+_DIRECTORIO_DATOS = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data")
+_PATRON_URLS = re.compile(r"https?://\S+|www\.\S+")
+_PATRON_SEPARADORES = re.compile(r"[.,;:!?¡¿()\[\]{}\"'“”‘’«»…—–\-/\\|*_#\n\r\t]+")
+_PATRON_PALABRAS = re.compile(r"[^\W_]+", re.UNICODE)
+# Formas verbales conjugadas: raras en el corpus (IDF alto) pero malas consultas para bancos de imágenes.
+_TERMINACIONES_VERBALES = ("amos", "emos", "imos", "aron", "ieron", "aba", "aban", "abas", "ía", "ían", "íamos", "ábamos", "aste", "iste", "ando", "iendo", "arse", "erse", "irse", "é", "ó")
+_DETERMINANTES = frozenset((
+    "el", "la", "los", "las", "un", "una", "unos", "unas", "al", "del", "mi", "mis", "tu", "tus", "su", "sus",
+    "nuestro", "nuestra", "nuestros", "nuestras", "este", "esta", "estos", "estas", "ese", "esa", "esos", "esas",
+    "aquel", "aquella", "aquellos", "aquellas", "otro", "otra", "otros", "otras", "cada"
+))
+PENALIZACION_FORMA_VERBAL = 0.35
+REFUERZO_TRAS_DETERMINANTE = 2.0
+MAX_PALABRAS_POR_FRASE = 3
+LONGITUD_MINIMA_PALABRA = 3
+
+
+@lru_cache()
+def _cargar_recursos() -> Tuple[FrozenSet[str], Dict[str, int], int]:
+    with open(os.path.join(_DIRECTORIO_DATOS, "stopwords_es.txt"), encoding="utf-8") as f:
+        stopwords = frozenset(linea.strip() for linea in f if linea.strip())
+    with open(os.path.join(_DIRECTORIO_DATOS, "idf_es.json"), encoding="utf-8") as f:
+        tabla_idf = json.load(f)
+    return stopwords, tabla_idf["palabras"], tabla_idf["valor_por_defecto"]
+
+
+def _tramos_de_contenido(texto: str, stopwords: FrozenSet[str]) -> List[Tuple[List[str], bool]]:
+    """
+    Divide el texto en tramos consecutivos de palabras de contenido (sin stopwords, números ni palabras cortas).
+    Cada tramo va con un indicador de si la palabra que lo precede es un determinante.
+    """
+    tramos: List[Tuple[List[str], bool]] = []
+    for segmento in _PATRON_SEPARADORES.split(_PATRON_URLS.sub(" ", texto.lower())):
+        tramo_actual: List[str] = []
+        tras_determinante = False
+        for palabra in _PATRON_PALABRAS.findall(segmento):
+            if palabra in stopwords or len(palabra) < LONGITUD_MINIMA_PALABRA or any(c.isdigit() for c in palabra):
+                if tramo_actual: tramos.append((tramo_actual, tras_determinante))
+                tramo_actual = []
+                tras_determinante = palabra in _DETERMINANTES
+            else:
+                tramo_actual.append(palabra)
+        if tramo_actual: tramos.append((tramo_actual, tras_determinante))
+    return tramos
+
+
+def extraer_palabras_clave(texto: str, max_palabras_clave: int) -> List[str]:
+    """Devuelve hasta max_palabras_clave frases clave (en minúsculas), de la más a la menos relevante."""
+    if not texto or max_palabras_clave <= 0: return []
+    stopwords, tabla_idf, idf_por_defecto = _cargar_recursos()
+    tramos = _tramos_de_contenido(texto, stopwords)
+    if not tramos: return []
+
+    vocabulario: Dict[str, int] = {}
+    ids_tramos = [[vocabulario.setdefault(p, len(vocabulario)) for p in tramo] for tramo, _ in tramos]
+    palabras = list(vocabulario)
+    conteos = np.bincount(np.fromiter((i for ids in ids_tramos for i in ids), dtype=np.int64), minlength=len(palabras))
+    idf = np.fromiter((tabla_idf.get(p, idf_por_defecto) for p in palabras), dtype=np.float64, count=len(palabras)) / 100.0
+    penalizacion = np.where([p.endswith(_TERMINACIONES_VERBALES) for p in palabras], PENALIZACION_FORMA_VERBAL, 1.0)
+    # Peso por palabra; se añade un 0 al final para que el relleno (-1) de las frases cortas no sume.
+    pesos = np.append((1.0 + np.log(conteos)) * idf * penalizacion, 0.0)
+
+    frecuencia_frases: Dict[Tuple[int, ...], int] = {}
+    frases_tras_determinante: set = set()
+    for ids, (_, tras_determinante) in zip(ids_tramos, tramos):
+        for n in range(1, MAX_PALABRAS_POR_FRASE + 1):
+            for i in range(len(ids) - n + 1):
+                frase = tuple(ids[i:i + n])
+                if len(set(frase)) != n: continue
+                frecuencia_frases[frase] = frecuencia_frases.get(frase, 0) + 1
+                if i == 0 and tras_determinante: frases_tras_determinante.add(frase)
+    frases = list(frecuencia_frases)
+    matriz = np.full((len(frases), MAX_PALABRAS_POR_FRASE), -1, dtype=np.int64)
+    for fila, frase in enumerate(frases): matriz[fila, :len(frase)] = frase
+    longitudes = (matriz >= 0).sum(axis=1)
+    frecuencias = np.fromiter((frecuencia_frases[f] for f in frases), dtype=np.float64, count=len(frases))
+    refuerzos = np.where([f in frases_tras_determinante for f in frases], REFUERZO_TRAS_DETERMINANTE, 1.0)
+    puntuaciones = pesos[matriz].sum(axis=1) / np.sqrt(longitudes) * (1.0 + np.log(frecuencias)) * refuerzos
+
+    seleccionadas: List[str] = []
+    palabras_usadas: set = set()
+    for fila in np.argsort(-puntuaciones, kind="stable"):
+        frase = frases[fila]
+        if palabras_usadas.intersection(frase): continue # Diversidad: cada palabra aparece en una sola frase
+        seleccionadas.append(" ".join(palabras[i] for i in frase))
+        palabras_usadas.update(frase)
+        if len(seleccionadas) >= max_palabras_clave: break
+    return seleccionadas
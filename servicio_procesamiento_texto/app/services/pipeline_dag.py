@@ -0,0 +1,77 @@
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+# Ejecutor mínimo de un grafo de dependencias (DAG) para los pasos del pipeline de texto.
+# Cada paso es una corrutina sin argumentos (normalmente un closure sobre el estado del pipeline).
+# Un paso arranca en cuanto terminan todas sus dependencias; los pasos marcados con usa_llm=True
+# comparten un semáforo que limita cuántas llamadas a OpenAI hay en vuelo a la vez.
+
+
+class EjecutorDAG:
+    def __init__(self, max_concurrencia_llm: int):
+        self._pasos: Dict[str, Tuple[Callable[[], Awaitable[Any]], List[str], bool]] = {}
+        self._semaforo_llm = asyncio.Semaphore(max(1, max_concurrencia_llm))
+        self.resultados: Dict[str, Any] = {}
+        self.tiempos_seg: Dict[str, float] = {}
+
+    def agregar_paso(
+        self,
+        nombre: str,
+        funcion: Callable[[], Awaitable[Any]],
+        dependencias: Optional[List[str]] = None,
+        usa_llm: bool = True
+    ) -> None:
+        if nombre in self._pasos:
+            raise ValueError(f"El paso '{nombre}' ya está registrado en el pipeline.")
+        self._pasos[nombre] = (funcion, list(dependencias or []), usa_llm)
+
+    def _orden_topologico(self, pendientes: List[str]) -> List[str]:
+        orden: List[str] = []
+        visitados: Dict[str, bool] = {} # False = en curso, True = terminado
+        def _visitar(nombre: str) -> None:
+            if visitados.get(nombre) is True or nombre in self.resultados: return
+            if visitados.get(nombre) is False:
+                raise ValueError(f"Dependencia circular detectada en el pipeline en el paso '{nombre}'.")
+            if nombre not in self._pasos:
+                raise ValueError(f"Dependencia desconocida en el pipeline: '{nombre}'.")
+            visitados[nombre] = False
+            for dep in self._pasos[nombre][1]: _visitar(dep)
+            visitados[nombre] = True
+            orden.append(nombre)
+        for nombre in pendientes: _visitar(nombre)
+        return orden
+
+    async def _correr_paso(self, nombre: str, tareas: Dict[str, "asyncio.Task[Any]"]) -> Any:
+        funcion, dependencias, usa_llm = self._pasos[nombre]
+        for dep in dependencias:
+            if dep in tareas: await tareas[dep]
+        if usa_llm:
+            async with self._semaforo_llm:
+                inicio = time.perf_counter() # Sin contar la espera por el semáforo
+                resultado = await funcion()
+        else:
+            inicio = time.perf_counter()
+            resultado = await funcion()
+        self.tiempos_seg[nombre] = round(time.perf_counter() - inicio, 3)
+        self.resultados[nombre] = resultado
+        return resultado
+
+    async def ejecutar(self) -> Dict[str, Any]:
+        """
+        Ejecuta todos los pasos registrados que aún no se han ejecutado. Se puede llamar varias
+        veces: los pasos añadidos después (ej. uno por escena) pueden depender de pasos ya resueltos.
+        Si un paso lanza una excepción, se cancelan los pendientes y la excepción se propaga.
+        """
+        pendientes = [n for n in self._pasos if n not in self.resultados]
+        tareas: Dict[str, "asyncio.Task[Any]"] = {}
+        for nombre in self._orden_topologico(pendientes):
+            tareas[nombre] = asyncio.ensure_future(self._correr_paso(nombre, tareas))
+        try:
+            await asyncio.gather(*tareas.values())
+        except BaseException:
+            for tarea in tareas.values():
+                if not tarea.done(): tarea.cancel()
+            await asyncio.gather(*tareas.values(), return_exceptions=True)
+            raise
+        return self.resultados
@@ -1,33 +1,84 @@
+import asyncio
 import json
-from openai import OpenAI, APIError
-from typing import Dict, Any, List, Optional
+import re
+import sqlite3
+import time
+from openai import APIError
+from typing import Dict, Any, AsyncIterator, Callable, List, Optional, Tuple
 
 from ..core.config import get_settings
+from ..core.openai_client import get_cliente_openai
 from ..models_schemas import (
     TextProcessingRequest, TextProcessingResponse,
     GlobalImagePrompt, EscenaProcesada, OrigenContenidoEscena, SceneImagePrompt,
-    SegmentoNarrativo
+    SegmentoNarrativo, MetadataProcesamiento, UsoTokensLlamadaLLM
 )
+from .pipeline_dag import EjecutorDAG
+from .llm_cache import CacheRespuestasLLM, get_cache_llm
+from .tokens import contar_tokens
+from .deteccion_idioma import detectar_idioma
+from .palabras_clave_locales import extraer_palabras_clave
+from .metricas_solicitud import (
+    iniciar_contexto_solicitud, forzar_regeneracion_activa, incrementar_contador, obtener_contador,
+    registrar_llamada_llm, obtener_llamadas_llm
+)
+
+MENSAJE_SISTEMA_LLM = "Eres un asistente experto en procesamiento de lenguaje y generación de contenido. Responde EXCLUSIVAMENTE en formato JSON y sigue estrictamente la estructura de salida solicitada."
+TEMPERATURA_LLM = 0.3 # Un valor bajo para tareas que requieren precisión
 
-async def _llamar_openai_api(prompt_content: str, funcion_descripcion: str) -> Dict[str, Any]:
+async def _llamar_openai_api(prompt_content: str, funcion_descripcion: str, expandir_claves_cortas: bool = False) -> Dict[str, Any]:
+    """
+    Llama a la IA en modo JSON y devuelve la respuesta parseada. Con expandir_claves_cortas=True, las claves
+    abreviadas de un prompt compacto (ver _CLAVES_CORTAS) se devuelven con su nombre largo.
+    """
     settings = get_settings()
-    client = OpenAI(api_key=settings.OPENAI_API_KEY)
+    client = get_cliente_openai() # Cliente AsyncOpenAI compartido por todo el proceso
+
+    # Caché direccionada por contenido: misma entrada (modelo, temperatura, sistema, prompt) => misma respuesta.
+    cache = get_cache_llm()
+    clave_cache: Optional[str] = None
+    if cache is not None:
+        clave_cache = cache.calcular_clave(settings.OPENAI_MODEL, TEMPERATURA_LLM, MENSAJE_SISTEMA_LLM, prompt_content)
+        if not forzar_regeneracion_activa():
+            try:
+                respuesta_cacheada = await cache.obtener(clave_cache)
+            except sqlite3.Error as e:
+                print(f"Servicio Texto: ADVERTENCIA - Error leyendo la caché LLM ({funcion_descripcion}): {e}")
+                respuesta_cacheada = None
+            if respuesta_cacheada is not None:
+                incrementar_contador("cache_llm_aciertos")
+                registrar_llamada_llm({"paso": funcion_descripcion, "desde_cache": True})
+                print(f"Servicio Texto: Respuesta obtenida de la caché LLM para: {funcion_descripcion}")
+                respuesta_parseada = json.loads(respuesta_cacheada)
+                return _renombrar_claves(respuesta_parseada, _CLAVES_LARGAS) if expandir_claves_cortas else respuesta_parseada
+            incrementar_contador("cache_llm_fallos")
+
     print(f"Servicio Texto: Realizando llamada a OpenAI para: {funcion_descripcion}")
+    incrementar_contador("llamadas_llm_realizadas")
     # Descomenta la siguiente línea para ver el prompt que se envía (puede ser muy largo)
     # print(f"Servicio Texto: Enviando prompt para '{funcion_descripcion}' (primeros 1000 chars):\n{prompt_content[:1000]}...")
 
     response_content = None 
     try:
-        completion = client.chat.completions.create(
-            model="gpt-4o-mini", 
+        completion = await client.chat.completions.create(
+            model=settings.OPENAI_MODEL, 
             response_format={"type": "json_object"},
             messages=[
-                {"role": "system", "content": "Eres un asistente experto en procesamiento de lenguaje y generación de contenido. Responde EXCLUSIVAMENTE en formato JSON y sigue estrictamente la estructura de salida solicitada."},
+                {"role": "system", "content": MENSAJE_SISTEMA_LLM},
                 {"role": "user", "content": prompt_content}
             ],
-            temperature=0.3 # Un valor bajo para tareas que requieren precisión
+            temperature=TEMPERATURA_LLM
         )
         
+        uso = getattr(completion, "usage", None) # Puede faltar (ej. servidores compatibles con OpenAI)
+        if uso is not None:
+            detalles_prompt = getattr(uso, "prompt_tokens_details", None)
+            registrar_llamada_llm({
+                "paso": funcion_descripcion,
+                "tokens_prompt": uso.prompt_tokens or 0,
+                "tokens_prompt_cacheados": (getattr(detalles_prompt, "cached_tokens", None) or 0) if detalles_prompt is not None else 0,
+                "tokens_completion": uso.completion_tokens or 0
+            })
         response_content = completion.choices[0].message.content
         if not response_content: 
             raise ValueError(f"La respuesta de OpenAI para '{funcion_descripcion}' no contiene contenido.")
@@ -38,7 +89,10 @@ async def _llamar_openai_api(prompt_content: str, funcion_descripcion: str) -> D
         
         parsed_response = json.loads(response_content)
         print(f"Servicio Texto: Respuesta de OpenAI parseada para '{funcion_descripcion}'.")
-        return parsed_response
+        if cache is not None and clave_cache is not None: # Solo se cachean respuestas JSON válidas
+            try: await cache.guardar(clave_cache, response_content)
+            except sqlite3.Error as e: print(f"Servicio Texto: ADVERTENCIA - Error escribiendo en la caché LLM ({funcion_descripcion}): {e}")
+        return _renombrar_claves(parsed_response, _CLAVES_LARGAS) if expandir_claves_cortas else parsed_response
     except APIError as e:
         print(f"Servicio Texto: Error de API OpenAI ({funcion_descripcion}): {e}")
         status_code = getattr(e, "status_code", "N/A")
@@ -56,7 +110,78 @@ async def _llamar_openai_api(prompt_content: str, funcion_descripcion: str) -> D
         print(f"Servicio Texto: Error inesperado llamando a OpenAI ({funcion_descripcion}): {type(e).__name__} - {e}")
         raise ValueError(f"Error inesperado durante la comunicación con OpenAI ({funcion_descripcion}). Error: {type(e).__name__}")
 
-def _construir_input_json_para_llm1(datos_entrada: TextProcessingRequest) -> str:
+# --- Codificación compacta de prompts (LLM_PROMPT_ENCODING="compacto") ---
+# Los datos viajan como JSON minificado con claves abreviadas, y las instrucciones son constantes y van
+# al principio del prompt (los datos, al final) para que el proveedor pueda reutilizar el prefijo en caché.
+# Todas las abreviaturas son únicas, así que la misma tabla sirve para expandir cualquier respuesta.
+_CLAVES_CORTAS: Dict[str, str] = {
+    "idioma_detectado": "i", "titulo_original": "t", "cuerpo_post_original": "c", "comentarios_originales": "cs",
+    "id_original_comentario": "ic", "texto_original_comentario": "tc",
+    "subcomentarios_originales": "ss", "id_original_subcomentario": "is", "texto_original_subcomentario": "ts",
+    "titulo_escena_generado": "tg",
+    "escenas": "e", "id_escena": "ie", "titulo_escena": "te", "texto_escena": "x",
+    "palabras_clave_stock_escena": "k", "palabras_clave_globales_stock": "kg",
+    "prompts_imagenes_ia_escena": "p", "prompts_globales_imagenes_ia": "pg",
+    "id_prompt_escena": "ip", "id_prompt_global": "ig", "descripcion_visual": "d",
+    "personajes_clave": "pc", "emocion_principal": "em", "estilo_sugerido": "est"
+}
+_CLAVES_LARGAS: Dict[str, str] = {corta: larga for larga, corta in _CLAVES_CORTAS.items()}
+
+_LEYENDA_CLAVES_LLM1 = "t=título, c=cuerpo del post, cs=comentarios (ic=id, tc=texto, ss=subcomentarios con is=id y ts=texto)"
+_INSTRUCCIONES_PASO1_COMPACTO = f"""Eres un asistente experto en procesamiento de lenguaje multilingüe, con habilidades de edición y corrección de estilo. Recibirás textos de un post de Reddit en JSON con claves abreviadas: {_LEYENDA_CLAVES_LLM1}.
+1. Determina el idioma principal predominante de TODO el contenido.
+2. Si NO es español ('es'), traduce CADA texto (t, c, tc, ts) al español de forma precisa, natural y gramaticalmente correcta.
+   Si YA es español, corrige en CADA texto los errores gramaticales, de ortografía y de puntuación, y mejora la claridad y la fluidez sin alterar de forma significativa el significado ni el tono del autor.
+3. Devuelve EXCLUSIVAMENTE el mismo JSON, con las mismas claves abreviadas e IDs, sustituyendo cada texto por su versión procesada en español y añadiendo en el nivel superior "i" con el código ISO 639-1 del idioma detectado.
+Forma de la respuesta: {{"i":"en","t":"...","c":"...","cs":[{{"ic":"c1","tc":"...","ss":[{{"is":"c1_s1","ts":"..."}}]}}]}}
+Contenido a procesar:
+"""
+_INSTRUCCIONES_CORRECCION_COMPACTO = f"""Eres un corrector de estilo en español. Recibirás textos de un post de Reddit (ya en español) en JSON con claves abreviadas: {_LEYENDA_CLAVES_LLM1}.
+Corrige errores gramaticales, de ortografía y de puntuación en CADA texto, con cambios mínimos y sin alterar el significado ni el tono del autor. Si algún texto aislado no está en español, tradúcelo al español.
+Devuelve EXCLUSIVAMENTE el mismo JSON, con las mismas claves abreviadas e IDs, sustituyendo solo los valores de texto corregidos.
+Contenido a procesar:
+"""
+_INSTRUCCIONES_PASO3_COMPACTO = """Eres un experto en crear títulos llamativos y concisos para segmentos de historias.
+Genera un título corto, descriptivo y atractivo en español (máximo 5-8 palabras) que capture la esencia del texto de la sección principal de una historia de Reddit que aparece al final.
+Responde EXCLUSIVAMENTE en JSON: {"tg":"EL_TITULO_QUE_HAS_CREADO"}
+Texto:
+"""
+_TAREA_PROMPTS_ESCENA_COMPACTO = '"p": 1 a 2 prompts para imágenes IA de {0}; cada uno {{"ip":"<ie>_img_N","d":"descripción visual detallada","pc":["personaje clave (opcional)"],"em":"emoción principal (opcional)","est":"estilo sugerido"}}.'
+
+def _instrucciones_paso4_compacto(pide_palabras_clave: bool) -> str:
+    tareas = ['- "kg": 3 a 7 palabras clave globales (en español) con los temas principales, el ambiente o los elementos más destacados de toda la historia, concisas, para buscar imágenes/videos de stock.'] if pide_palabras_clave else []
+    tareas.append('- "pg": 1 a 3 prompts globales para imágenes IA (miniaturas, intros o imágenes conceptuales); cada uno {"ig":"global_img_prompt_N","d":"descripción visual detallada","est":"estilo sugerido, ej. cinemático"}.')
+    forma = '{"kg":[...],"pg":[...]}' if pide_palabras_clave else '{"pg":[...]}'
+    return "Eres un analista de contenido y director creativo experto en la producción de videos para YouTube. Analiza el guion narrativo completo (al final) de un video basado en una historia de Reddit y genera:\n" + "\n".join(tareas) + f"\nResponde EXCLUSIVAMENTE en JSON: {forma}\nGuion narrativo completo:\n"
+
+def _instrucciones_paso5_compacto(pide_palabras_clave: bool, por_lotes: bool) -> str:
+    if por_lotes:
+        cabecera = "Eres un analista de contenido y director de arte. Recibirás VARIAS escenas de una historia en JSON (ie=id de la escena, te=título o N/A, x=texto). Para CADA escena, de forma independiente, genera:\n"
+        objetivo = "esa escena"
+    else:
+        cabecera = "Eres un analista de contenido y director de arte. Para la escena que aparece al final en JSON (ie=id de la escena, te=título o N/A, x=texto) genera:\n"
+        objetivo = "esta escena"
+    tareas = [f'- "k": 2 a 5 palabras clave específicas de {objetivo} (en español), para bancos de stock.'] if pide_palabras_clave else []
+    tareas.append("- " + _TAREA_PROMPTS_ESCENA_COMPACTO.format(objetivo))
+    forma = '{"k":[...],"p":[...]}' if pide_palabras_clave else '{"p":[...]}'
+    if por_lotes:
+        forma = '{"e":[{"ie":"ID_DE_LA_ESCENA",' + forma[1:] + "]}"
+        return cabecera + "\n".join(tareas) + f"\nResponde EXCLUSIVAMENTE en JSON, con exactamente un elemento por escena recibida y el mismo \"ie\": {forma}\nEscenas a procesar:\n"
+    return cabecera + "\n".join(tareas) + f"\nResponde EXCLUSIVAMENTE en JSON: {forma}\nEscena a procesar:\n"
+
+def _prompts_compactos() -> bool:
+    return get_settings().LLM_PROMPT_ENCODING == "compacto"
+
+def _json_compacto(datos: Any) -> str:
+    return json.dumps(datos, ensure_ascii=False, separators=(",", ":"))
+
+def _renombrar_claves(datos: Any, mapa: Dict[str, str]) -> Any:
+    """Renombra recursivamente las claves de dicts (los valores de texto no se tocan); claves sin traducción se conservan."""
+    if isinstance(datos, dict): return {mapa.get(k, k): _renombrar_claves(v, mapa) for k, v in datos.items()}
+    if isinstance(datos, list): return [_renombrar_claves(v, mapa) for v in datos]
+    return datos
+
+def _construir_contenido_llm1(datos_entrada: TextProcessingRequest) -> Dict[str, Any]:
     comentarios_originales_struct = []
     for i, comentario in enumerate(datos_entrada.comentarios):
         com_struct = {
@@ -71,20 +196,242 @@ def _construir_input_json_para_llm1(datos_entrada: TextProcessingRequest) -> str
             }
             com_struct["subcomentarios_originales"].append(sub_struct)
         comentarios_originales_struct.append(com_struct)
-    contenido_a_procesar = {
+    return {
         "titulo_original": datos_entrada.titulo,
         "cuerpo_post_original": datos_entrada.cuerpo_historia,
         "comentarios_originales": comentarios_originales_struct
     }
+
+def _construir_input_json_para_llm1(contenido_a_procesar: Dict[str, Any]) -> str:
     return json.dumps(contenido_a_procesar, indent=2, ensure_ascii=False)
 
-async def generar_contenido_procesado(datos_entrada: TextProcessingRequest) -> TextProcessingResponse:
-    print(f"Servicio Texto: Iniciando generar_contenido_procesado para id_proyecto: {datos_entrada.id_proyecto}")
+# --- Fragmentación del Paso 1 por presupuesto de tokens (posts largos) ---
+# Cada fragmento conserva la misma estructura JSON (y los mismos IDs) que el contenido completo,
+# de modo que se usa el mismo prompt y las respuestas se fusionan por ID.
+
+_NIVELES_DIVISION_TEXTO: Tuple[Tuple[str, str], ...] = (
+    (r"\n\s*\n", "\n\n"),     # Párrafos
+    (r"(?<=[.!?])\s+", " "),   # Oraciones
+)
+
+def _dividir_texto_por_tokens(texto: str, max_tokens: int, niveles: Tuple[Tuple[str, str], ...] = _NIVELES_DIVISION_TEXTO) -> List[Tuple[str, str]]:
+    """
+    Divide un texto en partes de como máximo max_tokens, cortando por párrafos y, si no basta, por oraciones.
+    Devuelve pares (parte, separador_que_la_seguía) para poder reconstruir el texto tras traducir cada parte.
+    """
+    if not niveles or contar_tokens(texto) <= max_tokens: return [(texto, "")]
+    patron, union = niveles[0]
+    piezas = [p for p in re.split(patron, texto) if p.strip()]
+    if len(piezas) <= 1: return _dividir_texto_por_tokens(texto, max_tokens, niveles[1:])
+    partes: List[Tuple[str, str]] = []
+    actual: List[str] = []
+    tokens_actual = 0
+    for pieza in piezas:
+        tokens_pieza = contar_tokens(pieza)
+        if tokens_pieza > max_tokens: # Pieza demasiado grande por sí sola: se divide al siguiente nivel
+            if actual:
+                partes.append((union.join(actual), union))
+                actual, tokens_actual = [], 0
+            subpartes = _dividir_texto_por_tokens(pieza, max_tokens, niveles[1:])
+            partes.extend(subpartes[:-1])
+            partes.append((subpartes[-1][0], union))
+            continue
+        if actual and tokens_actual + tokens_pieza > max_tokens:
+            partes.append((union.join(actual), union))
+            actual, tokens_actual = [], 0
+        actual.append(pieza)
+        tokens_actual += tokens_pieza
+    if actual: partes.append((union.join(actual), union))
+    partes[-1] = (partes[-1][0], "")
+    return partes
+
+def _dividir_contenido_llm1(contenido: Dict[str, Any], max_tokens: int) -> List[Dict[str, Any]]:
+    """
+    Reparte el contenido del Paso 1 en fragmentos que no superen max_tokens. Un comentario con sus
+    subcomentarios viaja entero si cabe; si no, el comentario y cada subcomentario van por separado
+    (siempre con el id_original_comentario de su padre). Cada fragmento es
+    {"contenido": <misma estructura que el JSON original>, "tokens": int, "union_cuerpo": str}.
+    """
+    fragmentos: List[Dict[str, Any]] = []
+    actual: Dict[str, Any] = {"contenido": {"comentarios_originales": []}, "tokens": 0, "union_cuerpo": ""}
+
+    def _reservar(tokens: int, clave_exclusiva: Optional[str] = None) -> Dict[str, Any]:
+        nonlocal actual
+        hay_contenido = actual["tokens"] > 0
+        if hay_contenido and (actual["tokens"] + tokens > max_tokens or (clave_exclusiva and clave_exclusiva in actual["contenido"])):
+            fragmentos.append(actual)
+            actual = {"contenido": {"comentarios_originales": []}, "tokens": 0, "union_cuerpo": ""}
+        actual["tokens"] += tokens
+        return actual["contenido"]
+
+    if "titulo_original" in contenido: # Puede faltar si la memoria de traducción ya lo tenía
+        titulo = contenido["titulo_original"]
+        _reservar(contar_tokens(titulo) + 10)["titulo_original"] = titulo
+    if "cuerpo_post_original" in contenido:
+        for parte, union in _dividir_texto_por_tokens(contenido["cuerpo_post_original"], max_tokens):
+            _reservar(contar_tokens(parte) + 10, clave_exclusiva="cuerpo_post_original")["cuerpo_post_original"] = parte
+            actual["union_cuerpo"] = union
+
+    for com in contenido.get("comentarios_originales", []):
+        tokens_com = contar_tokens(json.dumps(com, ensure_ascii=False))
+        if tokens_com <= max_tokens:
+            _reservar(tokens_com)["comentarios_originales"].append(com)
+            continue
+        cabecera = {k: com[k] for k in ("id_original_comentario", "texto_original_comentario") if k in com}
+        cabecera["subcomentarios_originales"] = []
+        _reservar(contar_tokens(cabecera.get("texto_original_comentario", "")) + 20)["comentarios_originales"].append(cabecera)
+        for sub in com.get("subcomentarios_originales", []):
+            destino = _reservar(contar_tokens(sub["texto_original_subcomentario"]) + 20)["comentarios_originales"]
+            if not destino or destino[-1]["id_original_comentario"] != com["id_original_comentario"]:
+                destino.append({"id_original_comentario": com["id_original_comentario"], "subcomentarios_originales": []})
+            destino[-1]["subcomentarios_originales"].append(sub)
+    if actual["tokens"] > 0: fragmentos.append(actual)
+    for fragmento in fragmentos: # Mismo orden de claves que el JSON completo
+        fragmento["contenido"] = {k: fragmento["contenido"][k] for k in ("titulo_original", "cuerpo_post_original", "comentarios_originales") if k in fragmento["contenido"]}
+    return fragmentos
+
+def _fusionar_respuestas_llm1(contenido: Dict[str, Any], fragmentos: List[Dict[str, Any]], respuestas: List[Dict[str, Any]], conservar_originales: bool = True) -> Dict[str, Any]:
+    """
+    Reconstruye una respuesta con la misma forma que la llamada única del Paso 1. Cada texto se toma
+    del fragmento que lo llevaba en la entrada; si el modelo lo omitió, se conserva el texto original
+    (o queda vacío con conservar_originales=False, para no guardarlo como traducido en la memoria).
+    El idioma detectado es el mayoritario, ponderado por tokens de cada fragmento.
+    """
+    def _respaldo(original: str) -> str:
+        return original if conservar_originales else ""
+    titulo = _respaldo(contenido.get("titulo_original", ""))
+    partes_cuerpo: List[str] = []
+    textos_comentarios: Dict[str, str] = {}
+    textos_subcomentarios: Dict[str, str] = {}
+    votos_idioma: Dict[str, int] = {}
+    for fragmento, respuesta in zip(fragmentos, respuestas):
+        entrada = fragmento["contenido"]
+        idioma = respuesta.get("idioma_detectado")
+        if idioma: votos_idioma[idioma] = votos_idioma.get(idioma, 0) + fragmento["tokens"]
+        if "titulo_original" in entrada:
+            titulo = respuesta.get("titulo_original") or _respaldo(entrada["titulo_original"])
+        if "cuerpo_post_original" in entrada:
+            partes_cuerpo.append((respuesta.get("cuerpo_post_original") or _respaldo(entrada["cuerpo_post_original"])) + fragmento["union_cuerpo"])
+        comentarios_respuesta = {c.get("id_original_comentario"): c for c in respuesta.get("comentarios_originales", []) if isinstance(c, dict)}
+        for com in entrada["comentarios_originales"]:
+            com_respuesta = comentarios_respuesta.get(com["id_original_comentario"], {})
+            if "texto_original_comentario" in com:
+                textos_comentarios[com["id_original_comentario"]] = com_respuesta.get("texto_original_comentario") or _respaldo(com["texto_original_comentario"])
+            subs_respuesta = {s.get("id_original_subcomentario"): s for s in com_respuesta.get("subcomentarios_originales", []) if isinstance(s, dict)}
+            for sub in com.get("subcomentarios_originales", []):
+                textos_subcomentarios[sub["id_original_subcomentario"]] = subs_respuesta.get(sub["id_original_subcomentario"], {}).get("texto_original_subcomentario") or _respaldo(sub["texto_original_subcomentario"])
+
+    comentarios_fusionados = []
+    for com in contenido.get("comentarios_originales", []):
+        comentarios_fusionados.append({
+            "id_original_comentario": com["id_original_comentario"],
+            "texto_original_comentario": textos_comentarios.get(com["id_original_comentario"], _respaldo(com.get("texto_original_comentario", ""))),
+            "subcomentarios_originales": [
+                {"id_original_subcomentario": sub["id_original_subcomentario"], "texto_original_subcomentario": textos_subcomentarios.get(sub["id_original_subcomentario"], _respaldo(sub["texto_original_subcomentario"]))}
+                for sub in com.get("subcomentarios_originales", [])
+            ]
+        })
+    return {
+        "idioma_detectado": max(votos_idioma, key=votos_idioma.get) if votos_idioma else "desconocido",
+        "titulo_original": titulo,
+        "cuerpo_post_original": "".join(partes_cuerpo),
+        "comentarios_originales": comentarios_fusionados
+    }
+
+# --- Memoria de traducción del Paso 1 (por segmento) ---
+# Cada texto de origen (título, cuerpo, comentario, subcomentario) se indexa por el hash de (modelo, modo del
+# Paso 1, codificación de prompts, instrucciones, texto). Solo los segmentos que no están en la memoria se envían
+# a la IA; el resto se toma de la memoria y todo se vuelve a unir por ID. Al reprocesar un post con comentarios
+# nuevos, o un post casi duplicado, solo viajan los textos nuevos.
+
+def _segmentos_contenido_llm1(contenido: Dict[str, Any]) -> List[Tuple[Tuple[str, ...], str]]:
+    """Devuelve (ruta, texto) por cada texto no vacío: ("titulo",), ("cuerpo",), ("comentario", id) o ("subcomentario", id)."""
+    segmentos: List[Tuple[Tuple[str, ...], str]] = []
+    if contenido.get("titulo_original"): segmentos.append((("titulo",), contenido["titulo_original"]))
+    if contenido.get("cuerpo_post_original"): segmentos.append((("cuerpo",), contenido["cuerpo_post_original"]))
+    for com in contenido.get("comentarios_originales", []):
+        if not isinstance(com, dict): continue
+        if com.get("texto_original_comentario"): segmentos.append((("comentario", str(com.get("id_original_comentario"))), com["texto_original_comentario"]))
+        for sub in com.get("subcomentarios_originales", []):
+            if isinstance(sub, dict) and sub.get("texto_original_subcomentario"):
+                segmentos.append((("subcomentario", str(sub.get("id_original_subcomentario"))), sub["texto_original_subcomentario"]))
+    return segmentos
+
+def _claves_memoria_llm1(contenido: Dict[str, Any], modo: str) -> Dict[Tuple[str, ...], str]:
+    """Clave de la memoria de traducción de cada segmento, para el modelo, el modo y los prompts configurados."""
     settings = get_settings()
+    instrucciones = _instrucciones_paso1(modo)
+    return {
+        ruta: CacheRespuestasLLM.calcular_clave_segmento(settings.OPENAI_MODEL, modo, settings.LLM_PROMPT_ENCODING, instrucciones, texto)
+        for ruta, texto in _segmentos_contenido_llm1(contenido)
+    }
 
-    # == LLAMADA A OPENAI #1: Calidad del Lenguaje (Detección, Traducción, Corrección) ==
-    input_json_llm1 = _construir_input_json_para_llm1(datos_entrada)
-    prompt_llm1 = f"""Eres un asistente experto en procesamiento de lenguaje multilingüe, con habilidades de edición y corrección de estilo. Te voy a proporcionar un conjunto de textos extraídos de un post de Reddit en formato JSON.
+def _contenido_pendiente_llm1(contenido: Dict[str, Any], rutas_en_memoria: set) -> Optional[Dict[str, Any]]:
+    """Copia del contenido con solo los textos que faltan en la memoria (mismas claves e IDs), o None si no falta ninguno."""
+    pendiente: Dict[str, Any] = {}
+    if contenido.get("titulo_original") and ("titulo",) not in rutas_en_memoria: pendiente["titulo_original"] = contenido["titulo_original"]
+    if contenido.get("cuerpo_post_original") and ("cuerpo",) not in rutas_en_memoria: pendiente["cuerpo_post_original"] = contenido["cuerpo_post_original"]
+    comentarios_pendientes = []
+    for com in contenido.get("comentarios_originales", []):
+        com_pendiente: Dict[str, Any] = {"id_original_comentario": com["id_original_comentario"]}
+        if com.get("texto_original_comentario") and ("comentario", com["id_original_comentario"]) not in rutas_en_memoria:
+            com_pendiente["texto_original_comentario"] = com["texto_original_comentario"]
+        com_pendiente["subcomentarios_originales"] = [
+            sub for sub in com.get("subcomentarios_originales", [])
+            if sub.get("texto_original_subcomentario") and ("subcomentario", sub["id_original_subcomentario"]) not in rutas_en_memoria
+        ]
+        if "texto_original_comentario" in com_pendiente or com_pendiente["subcomentarios_originales"]:
+            comentarios_pendientes.append(com_pendiente)
+    if not pendiente and not comentarios_pendientes: return None
+    pendiente["comentarios_originales"] = comentarios_pendientes
+    return pendiente
+
+def _combinar_con_memoria_llm1(
+    contenido: Dict[str, Any],
+    textos_memoria: Dict[Tuple[str, ...], Tuple[str, str]],
+    respuesta_pendiente: Optional[Dict[str, Any]]
+) -> Tuple[Dict[str, Any], List[Tuple[Tuple[str, ...], str, str]]]:
+    """
+    Une los textos de la memoria con la respuesta de la IA para los pendientes, con la forma de la respuesta
+    del Paso 1. Devuelve también los segmentos nuevos (ruta, texto_procesado, idioma) para guardarlos.
+    El idioma detectado es el mayoritario, ponderado por la longitud de cada texto de origen.
+    """
+    textos_nuevos = dict(_segmentos_contenido_llm1(respuesta_pendiente)) if respuesta_pendiente else {}
+    idioma_respuesta = (respuesta_pendiente or {}).get("idioma_detectado")
+    votos_idioma: Dict[str, int] = {}
+    segmentos_nuevos: List[Tuple[Tuple[str, ...], str, str]] = []
+
+    def _texto(ruta: Tuple[str, ...], original: str) -> str:
+        if not original: return original
+        if ruta in textos_memoria:
+            texto, idioma = textos_memoria[ruta]
+        else:
+            texto, idioma = textos_nuevos.get(ruta) or original, idioma_respuesta
+            if ruta in textos_nuevos and idioma: segmentos_nuevos.append((ruta, texto, idioma))
+        if idioma: votos_idioma[idioma] = votos_idioma.get(idioma, 0) + len(original)
+        return texto
+
+    respuesta = {
+        "titulo_original": _texto(("titulo",), contenido.get("titulo_original", "")),
+        "cuerpo_post_original": _texto(("cuerpo",), contenido.get("cuerpo_post_original", "")),
+        "comentarios_originales": [
+            {
+                "id_original_comentario": com["id_original_comentario"],
+                "texto_original_comentario": _texto(("comentario", com["id_original_comentario"]), com.get("texto_original_comentario", "")),
+                "subcomentarios_originales": [
+                    {"id_original_subcomentario": sub["id_original_subcomentario"], "texto_original_subcomentario": _texto(("subcomentario", sub["id_original_subcomentario"]), sub.get("texto_original_subcomentario", ""))}
+                    for sub in com.get("subcomentarios_originales", [])
+                ]
+            }
+            for com in contenido.get("comentarios_originales", [])
+        ]
+    }
+    idioma = max(votos_idioma, key=votos_idioma.get) if votos_idioma else (idioma_respuesta or "desconocido")
+    return {"idioma_detectado": idioma, **respuesta}, segmentos_nuevos
+
+# --- Pasos del pipeline (cada uno se registra como nodo del DAG en generar_contenido_procesado) ---
+
+_PLANTILLA_PASO1_LEGIBLE = """Eres un asistente experto en procesamiento de lenguaje multilingüe, con habilidades de edición y corrección de estilo. Te voy a proporcionar un conjunto de textos extraídos de un post de Reddit en formato JSON.
 
 Tu tarea consta de los siguientes pasos:
 1.  Analiza TODO el contenido textual proporcionado para determinar su idioma principal predominante.
@@ -117,17 +464,88 @@ Tu tarea consta de los siguientes pasos:
 A continuación, te proporciono los textos dentro de una estructura JSON. Modifica los valores de los campos de texto según las instrucciones anteriores y añade el campo "idioma_detectado" al nivel superior del JSON de respuesta. Asegúrate de mantener los IDs originales en los comentarios y subcomentarios.
 
 Contenido a procesar:
-{input_json_llm1}
+{contenido}
+"""
+
+async def _paso1_calidad_lenguaje(contenido_a_procesar: Dict[str, Any], funcion_descripcion: str = "Paso1_CalidadLenguaje") -> Dict[str, Any]:
+    # == LLAMADA A OPENAI #1: Calidad del Lenguaje (Detección, Traducción, Corrección) ==
+    if _prompts_compactos():
+        prompt_compacto = _INSTRUCCIONES_PASO1_COMPACTO + _json_compacto(_renombrar_claves(contenido_a_procesar, _CLAVES_CORTAS))
+        respuesta_llm1 = await _llamar_openai_api(prompt_compacto, funcion_descripcion, expandir_claves_cortas=True)
+        print(f"Servicio Texto: RESPUESTA COMPLETA de LLM #1 ({funcion_descripcion}): {json.dumps(respuesta_llm1, indent=2, ensure_ascii=False)}")
+        return respuesta_llm1
+    prompt_llm1 = _PLANTILLA_PASO1_LEGIBLE.format(contenido=_construir_input_json_para_llm1(contenido_a_procesar))
+    respuesta_llm1 = await _llamar_openai_api(prompt_llm1, funcion_descripcion)
+    print(f"Servicio Texto: RESPUESTA COMPLETA de LLM #1 ({funcion_descripcion}): {json.dumps(respuesta_llm1, indent=2, ensure_ascii=False)}")
+    return respuesta_llm1
+
+# --- Detección local de idioma: evita o abarata el Paso 1 cuando el contenido ya está en español ---
+
+def _textos_de_contenido_llm1(contenido: Dict[str, Any]) -> List[str]:
+    textos = [contenido.get("titulo_original", ""), contenido.get("cuerpo_post_original", "")]
+    for com in contenido.get("comentarios_originales", []):
+        textos.append(com.get("texto_original_comentario", ""))
+        textos.extend(sub.get("texto_original_subcomentario", "") for sub in com.get("subcomentarios_originales", []))
+    return [t for t in textos if t and t.strip()]
+
+def _decidir_modo_paso1(contenido: Dict[str, Any]) -> Tuple[str, str, float]:
+    """
+    Devuelve (modo, idioma_local, confianza). modo es "completo" (prompt de detección/traducción),
+    "correccion" (prompt solo de corrección) u "omitir" (sin llamada), según LANGUAGE_DETECTION_POLICY.
+    Solo se abarata el paso si el conjunto es español con confianza suficiente Y ningún texto
+    individual de cierta longitud se detecta en otro idioma (ej. un comentario en inglés en un post en español).
+    """
+    settings = get_settings()
+    textos = _textos_de_contenido_llm1(contenido)
+    texto_completo = "\n".join(textos)
+    idioma_local, confianza = detectar_idioma(texto_completo)
+    if settings.LANGUAGE_DETECTION_POLICY == "llm": return "completo", idioma_local, confianza
+    if idioma_local != "es" or confianza < settings.LANGUAGE_DETECTION_MIN_CONFIDENCE or len(texto_completo) < settings.LANGUAGE_DETECTION_MIN_CHARS:
+        return "completo", idioma_local, confianza
+    for texto in textos:
+        if len(texto) >= settings.LANGUAGE_DETECTION_MIN_CHARS and detectar_idioma(texto)[0] != "es":
+            print(f"Servicio Texto: (Paso 1) Detección local: texto no español encontrado ('{texto[:40]}...'). Se usa el paso completo.")
+            return "completo", idioma_local, confianza
+    return ("omitir" if settings.LANGUAGE_DETECTION_POLICY == "omitir" else "correccion"), idioma_local, confianza
+
+_PLANTILLA_CORRECCION_LEGIBLE = """Eres un corrector de estilo en español. Te proporcionaré textos de un post de Reddit (ya en español) en formato JSON.
+Corrige errores gramaticales, de ortografía y de puntuación en CADA texto, con cambios mínimos y sin alterar el significado ni el tono del autor. Si algún texto aislado no está en español, tradúcelo al español.
+Devuelve EXCLUSIVAMENTE el mismo JSON, con la misma estructura, claves e IDs, sustituyendo solo los valores de texto corregidos.
+
+Contenido a procesar:
+{contenido}
 """
-    respuesta_llm1 = await _llamar_openai_api(prompt_llm1, "Paso1_CalidadLenguaje")
-    print(f"Servicio Texto: RESPUESTA COMPLETA de LLM #1 (Paso1_CalidadLenguaje): {json.dumps(respuesta_llm1, indent=2, ensure_ascii=False)}")
 
-    idioma_detectado = respuesta_llm1.get("idioma_detectado", "desconocido")
-    titulo_procesado_es = respuesta_llm1.get("titulo_original", datos_entrada.titulo) 
-    cuerpo_post_procesado_es = respuesta_llm1.get("cuerpo_post_original", datos_entrada.cuerpo_historia)
-    comentarios_con_texto_procesado_llm1 = respuesta_llm1.get("comentarios_originales", [])
-    print(f"Servicio Texto: (Paso 1) Idioma: {idioma_detectado}, Título: '{titulo_procesado_es[:30]}...'")
+async def _paso1_correccion_ligera(contenido_a_procesar: Dict[str, Any], funcion_descripcion: str = "Paso1_CorreccionLigera") -> Dict[str, Any]:
+    # Variante más barata del Paso 1 para contenido ya detectado localmente como español: sin instrucciones
+    # de detección ni traducción, solo corrección ligera devolviendo la misma estructura.
+    if _prompts_compactos():
+        prompt_compacto = _INSTRUCCIONES_CORRECCION_COMPACTO + _json_compacto(_renombrar_claves(contenido_a_procesar, _CLAVES_CORTAS))
+        respuesta = await _llamar_openai_api(prompt_compacto, funcion_descripcion, expandir_claves_cortas=True)
+        respuesta["idioma_detectado"] = "es"
+        return respuesta
+    prompt_correccion = _PLANTILLA_CORRECCION_LEGIBLE.format(contenido=_construir_input_json_para_llm1(contenido_a_procesar))
+    respuesta = await _llamar_openai_api(prompt_correccion, funcion_descripcion)
+    respuesta["idioma_detectado"] = "es"
+    return respuesta
+
+async def _paso1_segun_modo(contenido_a_procesar: Dict[str, Any], modo: str, funcion_descripcion: str = "Paso1_CalidadLenguaje") -> Dict[str, Any]:
+    if modo == "omitir":
+        incrementar_contador("llamadas_llm_evitadas")
+        print(f"Servicio Texto: ({funcion_descripcion}) Contenido detectado localmente como español. Se omite la llamada a la IA.")
+        return {**contenido_a_procesar, "idioma_detectado": "es"}
+    if modo == "correccion":
+        incrementar_contador("llamadas_llm_simplificadas")
+        return await _paso1_correccion_ligera(contenido_a_procesar, funcion_descripcion.replace("CalidadLenguaje", "CorreccionLigera"))
+    return await _paso1_calidad_lenguaje(contenido_a_procesar, funcion_descripcion)
+
+def _instrucciones_paso1(modo: str) -> str:
+    """Todo lo que el Paso 1 envía a la IA salvo el contenido: mensaje de sistema, temperatura y prompt del modo y la codificación configurados."""
+    if _prompts_compactos(): prompt = _INSTRUCCIONES_PASO1_COMPACTO if modo == "completo" else _INSTRUCCIONES_CORRECCION_COMPACTO
+    else: prompt = _PLANTILLA_PASO1_LEGIBLE if modo == "completo" else _PLANTILLA_CORRECCION_LEGIBLE
+    return json.dumps([MENSAJE_SISTEMA_LLM, TEMPERATURA_LLM, prompt], ensure_ascii=False)
 
+def _paso2_ensamblar_escenas(datos_entrada: TextProcessingRequest, titulo_procesado_es: str, cuerpo_post_procesado_es: str, comentarios_con_texto_procesado_llm1: List[Dict[str, Any]]) -> Tuple[str, List[Dict[str, Any]]]:
     # == LÓGICA PYTHON: Ensamblaje del Guion y Pre-estructura de Escenas (CON SEGMENTOS NARRATIVOS) ==
     print("Servicio Texto: Ensamblando guion y pre-estructurando escenas con segmentos...")
     partes_del_guion: List[str] = []
@@ -193,11 +611,11 @@ Contenido a procesar:
         id_escena_counter += 1
     guion_narrativo_completo_es = "\n\n".join(partes_del_guion).strip()
     print(f"Servicio Texto: (Paso 2) Guion ensamblado. {len(escenas_pre_estructuradas)} escenas pre-estructuradas.")
+    return guion_narrativo_completo_es, escenas_pre_estructuradas
 
+async def _paso3_titular_escena_post(escena_post_dict: Dict[str, Any]) -> Optional[str]:
     # == LLAMADA A OPENAI #2: Titulación de Escena Principal ==
-    if escenas_pre_estructuradas and escenas_pre_estructuradas[0]["referencia_contenido_original_id"] == "post_principal":
-        escena_post_dict = escenas_pre_estructuradas[0]
-        prompt_llm2 = f"""Eres un experto en crear títulos llamativos y concisos para segmentos de historias.
+    prompt_llm2 = f"""Eres un experto en crear títulos llamativos y concisos para segmentos de historias.
 Te proporcionaré el texto de la sección principal de una historia extraída de Reddit: "{escena_post_dict["texto_escena_es"]}"
 Tu tarea es generar un título corto, descriptivo y atractivo en español (máximo 5-8 palabras) para esta sección de la historia.
 El título debe capturar la esencia del texto proporcionado.
@@ -205,25 +623,37 @@ Devuelve tu respuesta EXCLUSIVAMENTE en formato JSON con la siguiente estructura
 {{
   "titulo_escena_generado": "EL_TITULO_QUE_HAS_CREADO"
 }}"""
-        try:
+    try:
+        if _prompts_compactos():
+            respuesta_llm2 = await _llamar_openai_api(_INSTRUCCIONES_PASO3_COMPACTO + escena_post_dict["texto_escena_es"], f"Paso3_TituloEscena_{escena_post_dict['id_escena']}", expandir_claves_cortas=True)
+        else:
             respuesta_llm2 = await _llamar_openai_api(prompt_llm2, f"Paso3_TituloEscena_{escena_post_dict['id_escena']}")
-            escena_post_dict["titulo_escena"] = respuesta_llm2.get("titulo_escena_generado")
-        except ValueError as e: 
-            print(f"Servicio Texto: Error titulando escena post: {e}. Título será None.")
-            escena_post_dict["titulo_escena"] = None # Asegurar que el campo exista
-    print(f"Servicio Texto: (Paso 3) Titulación escena principal completada. Título: {escenas_pre_estructuradas[0].get('titulo_escena') if escenas_pre_estructuradas else 'N/A'}")
-    
+        escena_post_dict["titulo_escena"] = respuesta_llm2.get("titulo_escena_generado")
+    except ValueError as e: 
+        print(f"Servicio Texto: Error titulando escena post: {e}. Título será None.")
+        escena_post_dict["titulo_escena"] = None # Asegurar que el campo exista
+    print(f"Servicio Texto: (Paso 3) Titulación escena principal completada. Título: {escena_post_dict.get('titulo_escena')}")
+    return escena_post_dict["titulo_escena"]
+
+async def _paso4_elementos_globales(guion_narrativo_completo_es: str, modo_palabras_clave: str = "llm") -> Tuple[List[str], List[GlobalImagePrompt]]:
     # == LLAMADA A OPENAI #3: Elementos Globales (Keywords y Prompts IA) ==
     palabras_clave_globales_generadas: List[str] = []
     prompts_globales_ia_obj_list: List[GlobalImagePrompt] = []
+    if modo_palabras_clave != "llm":
+        palabras_clave_globales_generadas = extraer_palabras_clave(guion_narrativo_completo_es, get_settings().KEYWORD_MAX_GLOBAL)
+        if modo_palabras_clave == "local":
+            incrementar_contador("llamadas_llm_evitadas")
+            print(f"Servicio Texto: (Paso 4) Palabras clave globales extraídas localmente: {palabras_clave_globales_generadas}. Sin prompts de imágenes (modo local).")
+            return palabras_clave_globales_generadas, prompts_globales_ia_obj_list
+    pide_palabras_clave = modo_palabras_clave == "llm"
+    tarea_palabras_clave = "1.  Una lista de 3 a 7 **palabras clave globales** (en español) que representen los temas principales, el ambiente o los elementos más destacados de toda la historia. Usar para buscar imágenes/videos de stock. Concisas y efectivas.\n" if pide_palabras_clave else ""
+    estructura_palabras_clave = '  "palabras_clave_globales_stock": ["palabra_clave_1", ...],\n' if pide_palabras_clave else ""
     prompt_llm3 = f"""Eres un analista de contenido y director creativo experto en la producción de videos para YouTube. Te proporcionaré el guion narrativo completo de un video basado en una historia de Reddit.
 Tu tarea es analizar este guion y generar:
-1.  Una lista de 3 a 7 **palabras clave globales** (en español) que representen los temas principales, el ambiente o los elementos más destacados de toda la historia. Usar para buscar imágenes/videos de stock. Concisas y efectivas.
-2.  Una lista de 1 a 3 **prompts globales para imágenes IA**. Para miniaturas, intros, o imágenes conceptuales. Cada prompt debe incluir: `id_prompt_global` (ej: "global_img_prompt_1"), `descripcion_visual` (detallada), `estilo_sugerido` (ej: "cinemático").
+{tarea_palabras_clave}{"2.  " if pide_palabras_clave else "- "}Una lista de 1 a 3 **prompts globales para imágenes IA**. Para miniaturas, intros, o imágenes conceptuales. Cada prompt debe incluir: `id_prompt_global` (ej: "global_img_prompt_1"), `descripcion_visual` (detallada), `estilo_sugerido` (ej: "cinemático").
 Devuelve tu respuesta EXCLUSIVAMENTE en formato JSON con la siguiente estructura:
 {{
-  "palabras_clave_globales_stock": ["palabra_clave_1", ...],
-  "prompts_globales_imagenes_ia": [ {{ "id_prompt_global": "ID_1", "descripcion_visual": "...", "estilo_sugerido": "..." }} ]
+{estructura_palabras_clave}  "prompts_globales_imagenes_ia": [ {{ "id_prompt_global": "ID_1", "descripcion_visual": "...", "estilo_sugerido": "..." }} ]
 }}
 Guion narrativo completo:
 ---
@@ -231,28 +661,53 @@ Guion narrativo completo:
 ---
 """
     try:
-        respuesta_llm3 = await _llamar_openai_api(prompt_llm3, "Paso4_ElementosGlobales")
-        palabras_clave_globales_generadas = respuesta_llm3.get("palabras_clave_globales_stock", [])
+        if _prompts_compactos():
+            respuesta_llm3 = await _llamar_openai_api(_instrucciones_paso4_compacto(pide_palabras_clave) + guion_narrativo_completo_es, "Paso4_ElementosGlobales", expandir_claves_cortas=True)
+        else:
+            respuesta_llm3 = await _llamar_openai_api(prompt_llm3, "Paso4_ElementosGlobales")
+        if pide_palabras_clave: palabras_clave_globales_generadas = respuesta_llm3.get("palabras_clave_globales_stock", [])
         for p_data in respuesta_llm3.get("prompts_globales_imagenes_ia", []):
             try: prompts_globales_ia_obj_list.append(GlobalImagePrompt(**p_data))
             except Exception as val_err: print(f"Servicio Texto: Error validando prompt global IA: {val_err}, Data: {p_data}")
     except ValueError as e: print(f"Servicio Texto: Error generando elementos globales: {e}.")
     print(f"Servicio Texto: (Paso 4) Elementos globales generados. Keywords: {len(palabras_clave_globales_generadas)}, Prompts: {len(prompts_globales_ia_obj_list)}")
+    return palabras_clave_globales_generadas, prompts_globales_ia_obj_list
+
+def _construir_prompts_escena(prompts_data: Any, id_escena_actual: str) -> List[SceneImagePrompt]:
+    prompts_escena_obj_list_temp: List[SceneImagePrompt] = []
+    if not isinstance(prompts_data, list): return prompts_escena_obj_list_temp
+    for p_data in prompts_data:
+        try:
+            if "id_prompt_escena" not in p_data or not p_data["id_prompt_escena"]:
+                p_data["id_prompt_escena"] = f"{id_escena_actual}_img_prompt_{len(prompts_escena_obj_list_temp)+1}"
+            prompts_escena_obj_list_temp.append(SceneImagePrompt(**p_data))
+        except Exception as val_err: print(f"Servicio Texto: Error validando prompt de escena {id_escena_actual}: {val_err}, Data: {p_data}")
+    return prompts_escena_obj_list_temp
 
+def _asignar_palabras_clave_locales(escena_dict: Dict[str, Any]) -> None:
+    escena_dict["palabras_clave_stock_escena"] = extraer_palabras_clave(escena_dict["texto_escena_es"], get_settings().KEYWORD_MAX_PER_SCENE)
+
+async def _paso5_elementos_escena(escena_dict: Dict[str, Any], modo_palabras_clave: str = "llm") -> None:
     # == LLAMADAS A OPENAI #4...N: Elementos por Escena (Keywords y Prompts IA) ==
-    print(f"Servicio Texto: (Paso 5) Iniciando generación de elementos para {len(escenas_pre_estructuradas)} escenas.")
-    for escena_dict in escenas_pre_estructuradas:
-        titulo_para_prompt_escena = escena_dict.get("titulo_escena", "")
-        texto_para_prompt_escena = escena_dict["texto_escena_es"]
-        id_escena_actual = escena_dict["id_escena"]
-        prompt_llm_escena = f"""Eres un analista de contenido y director de arte. Te proporcionaré el texto y título (si existe) de UNA escena.
+    titulo_para_prompt_escena = escena_dict.get("titulo_escena", "")
+    texto_para_prompt_escena = escena_dict["texto_escena_es"]
+    id_escena_actual = escena_dict["id_escena"]
+    if modo_palabras_clave != "llm":
+        _asignar_palabras_clave_locales(escena_dict)
+        if modo_palabras_clave == "local":
+            incrementar_contador("llamadas_llm_evitadas")
+            escena_dict["prompts_imagenes_ia_escena"] = []
+            escena_dict["duracion_estimada_narracion_seg"] = 0.0
+            return
+    pide_palabras_clave = modo_palabras_clave == "llm"
+    tarea_palabras_clave = "1.  Una lista de 2 a 5 **palabras clave específicas de la escena** (en español) relevantes para ESTA escena.\n" if pide_palabras_clave else ""
+    estructura_palabras_clave = '  "palabras_clave_stock_escena": ["palabra_1", ...],\n' if pide_palabras_clave else ""
+    prompt_llm_escena = f"""Eres un analista de contenido y director de arte. Te proporcionaré el texto y título (si existe) de UNA escena.
 Tu tarea es generar:
-1.  Una lista de 2 a 5 **palabras clave específicas de la escena** (en español) relevantes para ESTA escena.
-2.  Una lista de 1 a 2 **prompts específicos para imágenes IA para esta escena**. Cada prompt: `id_prompt_escena` (ej: "{id_escena_actual}_img_1"), `descripcion_visual` (detallada para la escena), `personajes_clave` (opcional), `emocion_principal` (opcional), `estilo_sugerido`.
+{tarea_palabras_clave}{"2.  " if pide_palabras_clave else "- "}Una lista de 1 a 2 **prompts específicos para imágenes IA para esta escena**. Cada prompt: `id_prompt_escena` (ej: "{id_escena_actual}_img_1"), `descripcion_visual` (detallada para la escena), `personajes_clave` (opcional), `emocion_principal` (opcional), `estilo_sugerido`.
 Devuelve tu respuesta EXCLUSIVAMENTE en formato JSON:
 {{
-  "palabras_clave_stock_escena": ["palabra_1", ...],
-  "prompts_imagenes_ia_escena": [ {{ "id_prompt_escena": "...", "descripcion_visual": "...", ... }} ]
+{estructura_palabras_clave}  "prompts_imagenes_ia_escena": [ {{ "id_prompt_escena": "...", "descripcion_visual": "...", ... }} ]
 }}
 Contenido de la escena a procesar:
 ---
@@ -261,63 +716,366 @@ TEXTO_DE_LA_ESCENA:
 {texto_para_prompt_escena}
 ---
 """
-        try:
+    try:
+        if _prompts_compactos():
+            datos_escena = {"ie": id_escena_actual, "te": titulo_para_prompt_escena or "N/A", "x": texto_para_prompt_escena}
+            respuesta_llm_escena = await _llamar_openai_api(_instrucciones_paso5_compacto(pide_palabras_clave, por_lotes=False) + _json_compacto(datos_escena), f"Paso5_ElementosEscena_{id_escena_actual}", expandir_claves_cortas=True)
+        else:
             respuesta_llm_escena = await _llamar_openai_api(prompt_llm_escena, f"Paso5_ElementosEscena_{id_escena_actual}")
-            escena_dict["palabras_clave_stock_escena"] = respuesta_llm_escena.get("palabras_clave_stock_escena", [])
-            prompts_escena_obj_list_temp: List[SceneImagePrompt] = []
-            for p_data in respuesta_llm_escena.get("prompts_imagenes_ia_escena", []):
-                try:
-                    if "id_prompt_escena" not in p_data or not p_data["id_prompt_escena"]:
-                        p_data["id_prompt_escena"] = f"{id_escena_actual}_img_prompt_{len(prompts_escena_obj_list_temp)+1}"
-                    prompts_escena_obj_list_temp.append(SceneImagePrompt(**p_data))
-                except Exception as val_err: print(f"Servicio Texto: Error validando prompt de escena {id_escena_actual}: {val_err}, Data: {p_data}")
-            escena_dict["prompts_imagenes_ia_escena"] = prompts_escena_obj_list_temp
-        except ValueError as e:
-            print(f"Servicio Texto: Error generando elementos para escena {id_escena_actual}: {e}.")
-            escena_dict["palabras_clave_stock_escena"] = []
-            escena_dict["prompts_imagenes_ia_escena"] = []
-        escena_dict["duracion_estimada_narracion_seg"] = 0.0 # Inicializar antes de calcular
-    print(f"Servicio Texto: (Paso 5) Elementos por escena generados.")
+        if pide_palabras_clave: escena_dict["palabras_clave_stock_escena"] = respuesta_llm_escena.get("palabras_clave_stock_escena", [])
+        escena_dict["prompts_imagenes_ia_escena"] = _construir_prompts_escena(respuesta_llm_escena.get("prompts_imagenes_ia_escena", []), id_escena_actual)
+    except ValueError as e:
+        print(f"Servicio Texto: Error generando elementos para escena {id_escena_actual}: {e}.")
+        if pide_palabras_clave: escena_dict["palabras_clave_stock_escena"] = []
+        escena_dict["prompts_imagenes_ia_escena"] = []
+    escena_dict["duracion_estimada_narracion_seg"] = 0.0 # Inicializar antes de calcular
+
+# --- Modo por lotes del Paso 5: varias escenas en una sola llamada ---
+
+def _agrupar_escenas_en_lotes(escenas: List[Dict[str, Any]], max_tokens_lote: int, max_escenas_lote: int) -> List[List[Dict[str, Any]]]:
+    """Empaqueta escenas consecutivas en lotes que no superen el presupuesto de tokens de entrada."""
+    lotes: List[List[Dict[str, Any]]] = []
+    lote_actual: List[Dict[str, Any]] = []
+    tokens_lote_actual = 0
+    for escena_dict in escenas:
+        tokens_escena = contar_tokens(escena_dict["texto_escena_es"]) + contar_tokens(escena_dict.get("titulo_escena") or "") + 20 # + envoltorio JSON e id
+        if lote_actual and (tokens_lote_actual + tokens_escena > max_tokens_lote or len(lote_actual) >= max_escenas_lote):
+            lotes.append(lote_actual)
+            lote_actual, tokens_lote_actual = [], 0
+        lote_actual.append(escena_dict)
+        tokens_lote_actual += tokens_escena
+    if lote_actual: lotes.append(lote_actual)
+    return lotes
+
+def _aplicar_elementos_escena_de_lote(escena_dict: Dict[str, Any], item: Any, incluye_palabras_clave: bool = True) -> bool:
+    """Valida la parte de la respuesta por lotes de una escena y la aplica. Devuelve False si es inválida."""
+    if not isinstance(item, dict): return False
+    palabras_clave = item.get("palabras_clave_stock_escena")
+    if incluye_palabras_clave and (not isinstance(palabras_clave, list) or not palabras_clave or not all(isinstance(p, str) and p.strip() for p in palabras_clave)):
+        return False
+    prompts_obj = _construir_prompts_escena(item.get("prompts_imagenes_ia_escena"), escena_dict["id_escena"])
+    if not prompts_obj: return False
+    if incluye_palabras_clave: escena_dict["palabras_clave_stock_escena"] = palabras_clave
+    escena_dict["prompts_imagenes_ia_escena"] = prompts_obj
+    escena_dict["duracion_estimada_narracion_seg"] = 0.0
+    return True
+
+async def _paso5_elementos_escenas_lote(escenas_lote: List[Dict[str, Any]], descripcion_lote: str, modo_palabras_clave: str = "llm") -> List[Dict[str, Any]]:
+    """
+    Genera keywords y prompts de varias escenas en una sola llamada (en modo "hibrido", solo prompts:
+    las keywords salen del extractor local). Devuelve las escenas cuya parte de la respuesta faltó
+    o no fue válida, para reintentarlas con llamadas individuales.
+    """
+    pide_palabras_clave = modo_palabras_clave == "llm"
+    if not pide_palabras_clave:
+        for escena_dict in escenas_lote: _asignar_palabras_clave_locales(escena_dict)
+    tarea_palabras_clave = "1.  Una lista de 2 a 5 **palabras clave específicas de la escena** (en español) relevantes para ESA escena.\n" if pide_palabras_clave else ""
+    estructura_palabras_clave = '      "palabras_clave_stock_escena": ["palabra_1", ...],\n' if pide_palabras_clave else ""
+    escenas_input = [
+        {"id_escena": e["id_escena"], "titulo_escena": e.get("titulo_escena") or "N/A", "texto_escena": e["texto_escena_es"]}
+        for e in escenas_lote
+    ]
+    prompt_llm_lote = f"""Eres un analista de contenido y director de arte. Te proporcionaré VARIAS escenas de una historia, cada una con su `id_escena`, título (si existe) y texto.
+Para CADA escena, de forma independiente, tu tarea es generar:
+{tarea_palabras_clave}{"2.  " if pide_palabras_clave else "- "}Una lista de 1 a 2 **prompts específicos para imágenes IA para esa escena**. Cada prompt: `id_prompt_escena` (ej: "<id_escena>_img_1"), `descripcion_visual` (detallada para la escena), `personajes_clave` (opcional), `emocion_principal` (opcional), `estilo_sugerido`.
+Devuelve tu respuesta EXCLUSIVAMENTE en formato JSON, con exactamente un elemento por escena recibida y el mismo `id_escena`:
+{{
+  "escenas": [
+    {{
+      "id_escena": "ID_DE_LA_ESCENA",
+{estructura_palabras_clave}      "prompts_imagenes_ia_escena": [ {{ "id_prompt_escena": "...", "descripcion_visual": "...", ... }} ]
+    }}
+  ]
+}}
+Escenas a procesar:
+{json.dumps(escenas_input, ensure_ascii=False)}
+"""
+    try:
+        if _prompts_compactos():
+            escenas_input_compacto = _json_compacto([{"ie": e["id_escena"], "te": e["titulo_escena"], "x": e["texto_escena"]} for e in escenas_input])
+            respuesta_lote = await _llamar_openai_api(_instrucciones_paso5_compacto(pide_palabras_clave, por_lotes=True) + escenas_input_compacto, f"Paso5_ElementosEscenasLote_{descripcion_lote}", expandir_claves_cortas=True)
+        else:
+            respuesta_lote = await _llamar_openai_api(prompt_llm_lote, f"Paso5_ElementosEscenasLote_{descripcion_lote}")
+    except ValueError as e:
+        print(f"Servicio Texto: Error en lote de escenas {descripcion_lote}: {e}. Se reintentarán individualmente.")
+        return list(escenas_lote)
+
+    items_por_id: Dict[str, Any] = {}
+    items_respuesta = respuesta_lote.get("escenas")
+    if isinstance(items_respuesta, list):
+        for item in items_respuesta:
+            if isinstance(item, dict) and item.get("id_escena"): items_por_id[str(item["id_escena"])] = item
+    escenas_pendientes = [e for e in escenas_lote if not _aplicar_elementos_escena_de_lote(e, items_por_id.get(e["id_escena"]), pide_palabras_clave)]
+    print(f"Servicio Texto: (Paso 5) Lote {descripcion_lote}: {len(escenas_lote) - len(escenas_pendientes)}/{len(escenas_lote)} escenas válidas.")
+    return escenas_pendientes
+
+def _construir_escena_procesada(esc_dict: Dict[str, Any], palabras_por_minuto: int) -> EscenaProcesada:
+    # == LÓGICA PYTHON: Cálculo de Duración Estimada de la Escena ==
+    texto_duracion = esc_dict.get("texto_escena_es", "")
+    num_palabras = len(texto_duracion.split()) if texto_duracion else 0
+    esc_dict["duracion_estimada_narracion_seg"] = round((num_palabras / palabras_por_minuto) * 60, 2) if num_palabras > 0 else 0.0
 
-    # == LÓGICA PYTHON: Cálculo de Duración Estimada por Escena ==
+    segmentos_narrativos_obj = [seg if isinstance(seg, SegmentoNarrativo) else SegmentoNarrativo(**seg) for seg in esc_dict.get("segmentos_narrativos", [])]
+    prompts_imgs_obj = [p if isinstance(p, SceneImagePrompt) else SceneImagePrompt(**p) for p in esc_dict.get("prompts_imagenes_ia_escena", [])]
+    return EscenaProcesada(
+        id_escena=esc_dict["id_escena"],
+        titulo_escena=esc_dict.get("titulo_escena"),
+        texto_escena_es=esc_dict["texto_escena_es"],
+        origen_contenido=esc_dict["origen_contenido"],
+        segmentos_narrativos=segmentos_narrativos_obj,
+        palabras_clave_stock_escena=esc_dict.get("palabras_clave_stock_escena", []),
+        prompts_imagenes_ia_escena=prompts_imgs_obj,
+        duracion_estimada_narracion_seg=esc_dict.get("duracion_estimada_narracion_seg")
+    )
+
+
+async def generar_contenido_procesado(
+    datos_entrada: TextProcessingRequest,
+    emitir_evento: Optional[Callable[[str, Dict[str, Any]], None]] = None
+) -> TextProcessingResponse:
+    """
+    Ejecuta el pipeline completo. Si se pasa emitir_evento, se invoca con ('guion', ...), ('elementos_globales', ...)
+    y ('escena', ...) a medida que cada parte queda lista, antes de devolver la respuesta completa.
+    """
+    print(f"Servicio Texto: Iniciando generar_contenido_procesado para id_proyecto: {datos_entrada.id_proyecto}")
+    settings = get_settings()
     palabras_por_minuto = settings.NARRATION_PPM
     if palabras_por_minuto <= 0: palabras_por_minuto = 140 
-    for escena_dict in escenas_pre_estructuradas:
-        texto_duracion = escena_dict.get("texto_escena_es", "")
-        num_palabras = len(texto_duracion.split()) if texto_duracion else 0
-        escena_dict["duracion_estimada_narracion_seg"] = round((num_palabras / palabras_por_minuto) * 60, 2) if num_palabras > 0 else 0.0
-    print(f"Servicio Texto: (Paso 6) Cálculo de duración completado.")
+    modo_palabras_clave = settings.KEYWORD_EXTRACTION_MODE
+    inicio_total = time.perf_counter()
+    iniciar_contexto_solicitud(forzar_regeneracion=datos_entrada.forzar_regeneracion)
+    ejecutor = EjecutorDAG(max_concurrencia_llm=settings.LLM_MAX_CONCURRENT_CALLS)
+    estado: Dict[str, Any] = {}
 
-    # == LÓGICA PYTHON: Ensamblaje Final de la Respuesta TextProcessingResponse ==
-    escenas_final_obj_list: List[EscenaProcesada] = []
-    for esc_dict in escenas_pre_estructuradas:
-        segmentos_narrativos_obj = [seg if isinstance(seg, SegmentoNarrativo) else SegmentoNarrativo(**seg) for seg in esc_dict.get("segmentos_narrativos", [])]
-        prompts_imgs_obj = [p if isinstance(p, SceneImagePrompt) else SceneImagePrompt(**p) for p in esc_dict.get("prompts_imagenes_ia_escena", [])]
-        
-        escenas_final_obj_list.append(
-            EscenaProcesada(
-                id_escena=esc_dict["id_escena"],
-                titulo_escena=esc_dict.get("titulo_escena"),
-                texto_escena_es=esc_dict["texto_escena_es"],
-                origen_contenido=esc_dict["origen_contenido"],
-                segmentos_narrativos=segmentos_narrativos_obj,
-                palabras_clave_stock_escena=esc_dict.get("palabras_clave_stock_escena", []),
-                prompts_imagenes_ia_escena=prompts_imgs_obj,
-                duracion_estimada_narracion_seg=esc_dict.get("duracion_estimada_narracion_seg")
+    # Paso 1 -> Paso 2: la forma del resto del grafo (una llamada por escena) depende de su salida.
+    # Si el contenido supera el presupuesto de tokens, el Paso 1 se reparte en fragmentos que se
+    # traducen/corrigen en paralelo y se fusionan por ID antes del Paso 2.
+    contenido_llm1 = _construir_contenido_llm1(datos_entrada)
+    modo_paso1, idioma_local, confianza_idioma_local = _decidir_modo_paso1(contenido_llm1)
+    print(f"Servicio Texto: (Paso 1) Detección local de idioma: {idioma_local} (confianza {confianza_idioma_local}). Modo: {modo_paso1}.")
+
+    # Memoria de traducción: solo se envían a la IA los segmentos que no se han procesado antes.
+    cache_segmentos = get_cache_llm() if settings.LLM_TRANSLATION_MEMORY_ENABLED and modo_paso1 != "omitir" else None
+    textos_memoria: Dict[Tuple[str, ...], Tuple[str, str]] = {}
+    claves_segmentos: Dict[Tuple[str, ...], str] = {}
+    contenido_a_enviar: Optional[Dict[str, Any]] = contenido_llm1
+    if cache_segmentos is not None:
+        claves_segmentos = _claves_memoria_llm1(contenido_llm1, modo_paso1)
+        if not datos_entrada.forzar_regeneracion:
+            try:
+                encontrados = await cache_segmentos.obtener_segmentos(list(set(claves_segmentos.values())))
+            except sqlite3.Error as e:
+                print(f"Servicio Texto: ADVERTENCIA - Error leyendo la memoria de traducción: {e}")
+                encontrados = {}
+            textos_memoria = {ruta: encontrados[clave] for ruta, clave in claves_segmentos.items() if clave in encontrados}
+        contenido_a_enviar = _contenido_pendiente_llm1(contenido_llm1, set(textos_memoria))
+        incrementar_contador("segmentos_memoria_traduccion", len(textos_memoria))
+        incrementar_contador("segmentos_enviados_llm", len(claves_segmentos) - len(textos_memoria))
+        print(f"Servicio Texto: (Paso 1) Memoria de traducción: {len(textos_memoria)}/{len(claves_segmentos)} segmentos reutilizados.")
+        if contenido_a_enviar is None: incrementar_contador("llamadas_llm_evitadas")
+
+    fragmentos_llm1 = _dividir_contenido_llm1(contenido_a_enviar, settings.LLM_TRANSLATION_CHUNK_MAX_TOKENS) if contenido_a_enviar is not None else []
+    nodos_fragmentos_llm1: List[str] = []
+    if len(fragmentos_llm1) > 1:
+        print(f"Servicio Texto: (Paso 1) Contenido largo dividido en {len(fragmentos_llm1)} fragmentos (máx {settings.LLM_TRANSLATION_CHUNK_MAX_TOKENS} tokens c/u).")
+        for n, fragmento in enumerate(fragmentos_llm1, start=1):
+            nombre_nodo = f"paso1_calidad_lenguaje_parte_{n:02d}"
+            ejecutor.agregar_paso(nombre_nodo, (lambda f=fragmento, d=f"Paso1_CalidadLenguaje_Parte{n:02d}": _paso1_segun_modo(f["contenido"], modo_paso1, d)))
+            nodos_fragmentos_llm1.append(nombre_nodo)
+
+    async def _nodo_paso1() -> Dict[str, Any]:
+        respuesta_pendiente: Optional[Dict[str, Any]] = None
+        if contenido_a_enviar is not None and not nodos_fragmentos_llm1:
+            respuesta_pendiente = await _paso1_segun_modo(contenido_a_enviar, modo_paso1)
+        elif contenido_a_enviar is not None:
+            respuesta_pendiente = _fusionar_respuestas_llm1(
+                contenido_a_enviar, fragmentos_llm1, [ejecutor.resultados[n] for n in nodos_fragmentos_llm1],
+                conservar_originales=cache_segmentos is None # Con memoria, los textos omitidos se resuelven (sin guardarse) al combinar
             )
+        if cache_segmentos is None: return respuesta_pendiente
+        respuesta_completa, segmentos_nuevos = _combinar_con_memoria_llm1(contenido_llm1, textos_memoria, respuesta_pendiente)
+        try:
+            await cache_segmentos.guardar_segmentos([(claves_segmentos[ruta], texto, idioma) for ruta, texto, idioma in segmentos_nuevos])
+        except sqlite3.Error as e:
+            print(f"Servicio Texto: ADVERTENCIA - Error escribiendo en la memoria de traducción: {e}")
+        return respuesta_completa
+
+    async def _nodo_paso2() -> None:
+        respuesta_llm1 = ejecutor.resultados["paso1_calidad_lenguaje"]
+        estado["idioma_detectado"] = respuesta_llm1.get("idioma_detectado", "desconocido")
+        estado["titulo_procesado_es"] = respuesta_llm1.get("titulo_original", datos_entrada.titulo) 
+        cuerpo_post_procesado_es = respuesta_llm1.get("cuerpo_post_original", datos_entrada.cuerpo_historia)
+        comentarios_con_texto_procesado_llm1 = respuesta_llm1.get("comentarios_originales", [])
+        print(f"Servicio Texto: (Paso 1) Idioma: {estado['idioma_detectado']}, Título: '{estado['titulo_procesado_es'][:30]}...'")
+        estado["guion_narrativo_completo_es"], estado["escenas_pre_estructuradas"] = _paso2_ensamblar_escenas(
+            datos_entrada, estado["titulo_procesado_es"], cuerpo_post_procesado_es, comentarios_con_texto_procesado_llm1
         )
+
+    ejecutor.agregar_paso("paso1_calidad_lenguaje", _nodo_paso1, dependencias=nodos_fragmentos_llm1, usa_llm=contenido_a_enviar is not None and not nodos_fragmentos_llm1)
+    ejecutor.agregar_paso("paso2_ensamblaje_escenas", _nodo_paso2, dependencias=["paso1_calidad_lenguaje"], usa_llm=False)
+    await ejecutor.ejecutar()
+    if emitir_evento is not None:
+        emitir_evento("guion", {
+            "id_proyecto": datos_entrada.id_proyecto,
+            "idioma_original_detectado": estado["idioma_detectado"],
+            "titulo_procesado_es": estado["titulo_procesado_es"],
+            "guion_narrativo_completo_es": estado["guion_narrativo_completo_es"],
+            "total_escenas": len(estado["escenas_pre_estructuradas"])
+        })
+
+    # Paso 3, Paso 4 y cada Paso 5 son independientes entre sí salvo la escena del post,
+    # cuyo prompt de elementos usa el título generado en el Paso 3.
+    escenas_pre_estructuradas: List[Dict[str, Any]] = estado["escenas_pre_estructuradas"]
+    guion_narrativo_completo_es: str = estado["guion_narrativo_completo_es"]
+    hay_escena_post = bool(escenas_pre_estructuradas) and escenas_pre_estructuradas[0]["referencia_contenido_original_id"] == "post_principal"
+    if hay_escena_post:
+        escena_post_dict = escenas_pre_estructuradas[0]
+        ejecutor.agregar_paso("paso3_titulo_escena_post", lambda: _paso3_titular_escena_post(escena_post_dict))
+    indices_escenas = {id(e): i for i, e in enumerate(escenas_pre_estructuradas)}
+
+    def _emitir_escena(escena_dict: Dict[str, Any]) -> None:
+        if emitir_evento is None: return
+        emitir_evento("escena", {
+            "indice_escena": indices_escenas[id(escena_dict)],
+            "escena": _construir_escena_procesada(escena_dict, palabras_por_minuto).model_dump(mode="json")
+        })
+
+    async def _nodo_paso4() -> Tuple[List[str], List[GlobalImagePrompt]]:
+        palabras_clave, prompts = await _paso4_elementos_globales(guion_narrativo_completo_es, modo_palabras_clave)
+        if emitir_evento is not None:
+            emitir_evento("elementos_globales", {
+                "palabras_clave_globales_stock": palabras_clave,
+                "prompts_globales_imagenes_ia": [p.model_dump(mode="json") for p in prompts]
+            })
+        return palabras_clave, prompts
+
+    async def _nodo_escena(escena_dict: Dict[str, Any]) -> None:
+        await _paso5_elementos_escena(escena_dict, modo_palabras_clave)
+        _emitir_escena(escena_dict)
+
+    async def _nodo_lote(lote: List[Dict[str, Any]], descripcion: str) -> List[Dict[str, Any]]:
+        pendientes = await _paso5_elementos_escenas_lote(lote, descripcion, modo_palabras_clave)
+        for escena_dict in lote:
+            if not any(e is escena_dict for e in pendientes): _emitir_escena(escena_dict)
+        return pendientes
+
+    # En modo "local" los Pasos 4 y 5 no llaman a la IA: no ocupan el semáforo ni tiene sentido agrupar escenas.
+    usa_llm_pasos_4_5 = modo_palabras_clave != "local"
+    ejecutor.agregar_paso("paso4_elementos_globales", _nodo_paso4, usa_llm=usa_llm_pasos_4_5)
+    print(f"Servicio Texto: (Paso 5) Iniciando generación de elementos para {len(escenas_pre_estructuradas)} escenas.")
+    def _dependencias_de(escenas: List[Dict[str, Any]]) -> List[str]:
+        return ["paso3_titulo_escena_post"] if (hay_escena_post and any(e is escenas_pre_estructuradas[0] for e in escenas)) else []
+
+    escenas_individuales: List[Dict[str, Any]] = list(escenas_pre_estructuradas)
+    nodos_lote: List[str] = []
+    if settings.LLM_SCENE_BATCHING_ENABLED and usa_llm_pasos_4_5 and len(escenas_pre_estructuradas) > 1:
+        escenas_individuales = []
+        lotes = _agrupar_escenas_en_lotes(escenas_pre_estructuradas, settings.LLM_SCENE_BATCH_MAX_TOKENS, settings.LLM_SCENE_BATCH_MAX_SCENES)
+        print(f"Servicio Texto: (Paso 5) Modo por lotes: {len(escenas_pre_estructuradas)} escenas en {len(lotes)} lote(s).")
+        for n, lote in enumerate(lotes, start=1):
+            if len(lote) == 1: # Un lote de una sola escena es simplemente la llamada individual
+                escenas_individuales.extend(lote)
+                continue
+            nombre_nodo = f"paso5_elementos_escenas_lote_{n:02d}"
+            ejecutor.agregar_paso(nombre_nodo, (lambda l=lote, d=f"{n:02d}": _nodo_lote(l, d)), dependencias=_dependencias_de(lote))
+            nodos_lote.append(nombre_nodo)
+    for escena_dict in escenas_individuales:
+        ejecutor.agregar_paso(
+            f"paso5_elementos_escena_{escena_dict['id_escena']}",
+            (lambda e=escena_dict: _nodo_escena(e)),
+            dependencias=_dependencias_de([escena_dict]),
+            usa_llm=usa_llm_pasos_4_5
+        )
+    await ejecutor.ejecutar()
+
+    # Fallback: solo las escenas cuya parte del lote faltó o fue inválida se piden individualmente.
+    escenas_fallback = [e for nodo in nodos_lote for e in ejecutor.resultados[nodo]]
+    if escenas_fallback:
+        print(f"Servicio Texto: (Paso 5) Reintentando {len(escenas_fallback)} escena(s) con llamadas individuales.")
+        for escena_dict in escenas_fallback:
+            ejecutor.agregar_paso(f"paso5_elementos_escena_{escena_dict['id_escena']}", (lambda e=escena_dict: _nodo_escena(e)))
+        await ejecutor.ejecutar()
+    palabras_clave_globales_generadas, prompts_globales_ia_obj_list = ejecutor.resultados["paso4_elementos_globales"]
+    print(f"Servicio Texto: (Paso 5) Elementos por escena generados.")
+
+    # == LÓGICA PYTHON: Duración estimada (Paso 6) y Ensamblaje Final de la Respuesta TextProcessingResponse ==
+    escenas_final_obj_list: List[EscenaProcesada] = [_construir_escena_procesada(esc_dict, palabras_por_minuto) for esc_dict in escenas_pre_estructuradas]
+    print(f"Servicio Texto: (Paso 6) Cálculo de duración completado.")
     
     resumen_general_es_final = "Resumen general del contenido (aún no implementada su generación)."
 
+    uso_tokens_llm = [UsoTokensLlamadaLLM(**registro) for registro in obtener_llamadas_llm()]
+    metadata_procesamiento = MetadataProcesamiento(
+        tiempo_total_seg=round(time.perf_counter() - inicio_total, 3),
+        tiempos_pasos_seg=dict(ejecutor.tiempos_seg),
+        max_concurrencia_llm=settings.LLM_MAX_CONCURRENT_CALLS,
+        llamadas_llm_realizadas=obtener_contador("llamadas_llm_realizadas"),
+        cache_llm_aciertos=obtener_contador("cache_llm_aciertos"),
+        cache_llm_fallos=obtener_contador("cache_llm_fallos"),
+        llamadas_llm_evitadas=obtener_contador("llamadas_llm_evitadas"),
+        llamadas_llm_simplificadas=obtener_contador("llamadas_llm_simplificadas"),
+        segmentos_memoria_traduccion=obtener_contador("segmentos_memoria_traduccion"),
+        segmentos_enviados_llm=obtener_contador("segmentos_enviados_llm"),
+        idioma_detectado_local=idioma_local,
+        confianza_idioma_local=confianza_idioma_local,
+        modo_palabras_clave=modo_palabras_clave,
+        codificacion_prompts=settings.LLM_PROMPT_ENCODING,
+        tokens_prompt_total=sum(u.tokens_prompt for u in uso_tokens_llm),
+        tokens_completion_total=sum(u.tokens_completion for u in uso_tokens_llm),
+        uso_tokens_llm=uso_tokens_llm
+    )
+
     final_response = TextProcessingResponse(
         id_proyecto=datos_entrada.id_proyecto,
-        idioma_original_detectado=idioma_detectado,
-        titulo_procesado_es=titulo_procesado_es,
+        idioma_original_detectado=estado["idioma_detectado"],
+        titulo_procesado_es=estado["titulo_procesado_es"],
         guion_narrativo_completo_es=guion_narrativo_completo_es,
         resumen_general_es=resumen_general_es_final,
         palabras_clave_globales_stock=palabras_clave_globales_generadas,
         prompts_globales_imagenes_ia=prompts_globales_ia_obj_list,
-        escenas=escenas_final_obj_list
+        escenas=escenas_final_obj_list,
+        metadata_procesamiento=metadata_procesamiento
     )
-    print("Servicio Texto: (Paso 7) Ensamblaje final de TextProcessingResponse completado.")
-    return final_response
\ No newline at end of file
+    print(f"Servicio Texto: (Paso 7) Ensamblaje final de TextProcessingResponse completado en {metadata_procesamiento.tiempo_total_seg}s.")
+    return final_response
+
+
+_FIN_STREAM = object()
+
+
+async def generar_contenido_procesado_stream(
+    datos_entrada: TextProcessingRequest,
+    mapear_error: Callable[[Exception], Dict[str, Any]]
+) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Variante en streaming de generar_contenido_procesado: produce dicts {"evento", "datos"} a medida que
+    el pipeline avanza y termina con 'fin' (resumen y metadata) o 'error' (mapear_error(excepción)).
+    Si el consumidor deja de leer (cliente desconectado), el pipeline en curso se cancela.
+    """
+    cola: "asyncio.Queue[Any]" = asyncio.Queue()
+
+    async def _productor() -> None:
+        try:
+            respuesta = await generar_contenido_procesado(
+                datos_entrada, lambda evento, datos: cola.put_nowait({"evento": evento, "datos": datos})
+            )
+            cola.put_nowait({"evento": "fin", "datos": {
+                "resumen_general_es": respuesta.resumen_general_es,
+                "metadata_procesamiento": respuesta.metadata_procesamiento.model_dump(mode="json") if respuesta.metadata_procesamiento else None
+            }})
+        except Exception as e:
+            cola.put_nowait({"evento": "error", "datos": mapear_error(e)})
+        finally:
+            cola.put_nowait(_FIN_STREAM)
+
+    # La tarea copia el contexto actual, así que las métricas por solicitud funcionan igual que sin streaming.
+    tarea = asyncio.ensure_future(_productor())
+    try:
+        while True:
+            evento = await cola.get()
+            if evento is _FIN_STREAM: break
+            yield evento
+    finally:
+        if not tarea.done():
+            tarea.cancel()
+            await asyncio.gather(tarea, return_exceptions=True)
@@ -0,0 +1,37 @@
+import asyncio
+from functools import lru_cache
+from typing import Any, Optional
+
+# Contador de tokens para repartir el contenido en llamadas que quepan en el presupuesto del modelo.
+# Usa tiktoken si está instalado y su codificación está disponible (la descarga la primera vez);
+# si no, cae a una aproximación por caracteres que sobreestima ligeramente para texto en español/inglés.
+# La carga (descarga y lectura del archivo BPE) es bloqueante: se hace al arrancar, en un hilo, con precargar_codificador.
+try:
+    import tiktoken
+except ImportError: # Dependencia opcional
+    tiktoken = None
+
+CARACTERES_POR_TOKEN_APROX = 3.5
+
+
+@lru_cache()
+def _obtener_codificador() -> Optional[Any]:
+    if tiktoken is None: return None
+    try:
+        return tiktoken.get_encoding("o200k_base") # Codificación de la familia gpt-4o
+    except Exception as e:
+        print(f"Servicio Texto: ADVERTENCIA - No se pudo cargar la codificación de tiktoken ({type(e).__name__}: {e}). Se usará una estimación por caracteres.")
+        return None
+
+
+async def precargar_codificador() -> None:
+    # Carga la codificación fuera del event loop; después _obtener_codificador la devuelve desde la caché
+    await asyncio.to_thread(_obtener_codificador)
+
+
+def contar_tokens(texto: str) -> int:
+    if not texto: return 0
+    codificador = _obtener_codificador()
+    if codificador is not None:
+        return len(codificador.encode(texto, disallowed_special=()))
+    return int(len(texto) / CARACTERES_POR_TOKEN_APROX) + 1
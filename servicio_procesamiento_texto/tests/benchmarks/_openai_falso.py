@@ -0,0 +1,76 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Optional
+
+from app.core.config import get_settings
+
+# Servidor HTTP local compatible con la API de chat completions de OpenAI, para medir el servicio sin red ni API key.
+# Responde tras una latencia fija con el mismo contenido JSON a todas las peticiones y cuenta las peticiones
+# recibidas, las que tiene en vuelo a la vez y las conexiones TCP abiertas. apuntar_servicio() dirige el cliente
+# compartido del servicio (app.core.openai_client) a este servidor.
+
+
+class ServidorOpenAIFalso(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 128 # Cola de conexiones pendientes de aceptar (5 por defecto)
+
+    def __init__(self, latencia_seg: float, contenido_respuesta: Dict[str, Any]):
+        super().__init__(("127.0.0.1", 0), _ManejadorOpenAIFalso)
+        self.latencia_seg = latencia_seg
+        self.contenido_respuesta = json.dumps(contenido_respuesta, ensure_ascii=False)
+        self._lock = threading.Lock()
+        self._hilo: Optional[threading.Thread] = None
+        self.peticiones = self.en_vuelo = self.max_en_vuelo = self.conexiones = 0
+
+    def reiniciar_contadores(self) -> None:
+        with self._lock:
+            self.peticiones = self.max_en_vuelo = self.conexiones = 0
+
+    def __enter__(self) -> "ServidorOpenAIFalso":
+        self._hilo = threading.Thread(target=self.serve_forever, daemon=True)
+        self._hilo.start()
+        return self
+
+    def __exit__(self, *excepcion: Any) -> None:
+        self.shutdown()
+        self.server_close()
+
+
+class _ManejadorOpenAIFalso(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1" # Keep-alive: el cliente puede reutilizar la conexión
+
+    def setup(self) -> None:
+        super().setup()
+        with self.server._lock: self.server.conexiones += 1
+
+    def log_message(self, *argumentos: Any) -> None:
+        pass
+
+    def do_POST(self) -> None:
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        with self.server._lock:
+            self.server.peticiones += 1
+            self.server.en_vuelo += 1
+            self.server.max_en_vuelo = max(self.server.max_en_vuelo, self.server.en_vuelo)
+        time.sleep(self.server.latencia_seg)
+        with self.server._lock: self.server.en_vuelo -= 1
+        cuerpo = json.dumps({
+            "id": "chatcmpl-bench", "object": "chat.completion", "created": 0, "model": get_settings().OPENAI_MODEL,
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": self.server.contenido_respuesta}, "finish_reason": "stop"}],
+            "usage": {"prompt_tokens": 100, "completion_tokens": 20, "total_tokens": 120},
+        }).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(cuerpo)))
+        self.end_headers()
+        self.wfile.write(cuerpo)
+
+
+def apuntar_servicio(servidor: ServidorOpenAIFalso) -> None:
+    """Cliente OpenAI del servicio contra el servidor falso y sin caché de respuestas: cada llamada llega al servidor."""
+    settings = get_settings()
+    settings.OPENAI_BASE_URL = f"http://127.0.0.1:{servidor.server_address[1]}/v1"
+    settings.OPENAI_API_KEY = "bench"
+    settings.LLM_CACHE_ENABLED = False
@@ -0,0 +1,79 @@
+import asyncio
+import contextlib
+import io
+import json
+import sys
+import time
+from typing import Any, Awaitable, Callable, Dict
+
+from openai import OpenAI
+
+from app.core.config import get_settings
+from app.core.openai_client import cerrar_cliente_openai
+from app.services.text_processing_service import MENSAJE_SISTEMA_LLM, TEMPERATURA_LLM, _llamar_openai_api
+from tests.benchmarks._openai_falso import ServidorOpenAIFalso, apuntar_servicio
+
+# Llamadas concurrentes a la IA contra un servidor local compatible con OpenAI que responde tras una latencia fija.
+# Se compara el cliente compartido (AsyncOpenAI con pool de conexiones, _llamar_openai_api) con el camino anterior:
+# un cliente síncrono OpenAI() nuevo en cada llamada, dentro de una corrutina, que bloqueaba el event loop.
+# El servidor cuenta las peticiones en vuelo a la vez y las conexiones TCP abiertas; mientras tanto, una tarea mide
+# cuánto tarda el event loop en atenderla (lo que esperaría cualquier otra solicitud del mismo worker).
+# Ejecutar desde servicio_procesamiento_texto: python -m tests.benchmarks.bench_cliente_openai
+
+LLAMADAS = 32
+LATENCIA_SEG = 0.25 # Por petición, en el servidor falso
+
+
+async def _cliente_por_llamada_anterior(prompt: str, funcion_descripcion: str) -> Dict[str, Any]:
+    """El camino anterior: un cliente síncrono nuevo por llamada, que bloquea el event loop mientras espera."""
+    settings = get_settings()
+    client = OpenAI(api_key=settings.OPENAI_API_KEY, base_url=settings.OPENAI_BASE_URL)
+    completion = client.chat.completions.create(
+        model=settings.OPENAI_MODEL, response_format={"type": "json_object"}, temperature=TEMPERATURA_LLM,
+        messages=[{"role": "system", "content": MENSAJE_SISTEMA_LLM}, {"role": "user", "content": prompt}]
+    )
+    return json.loads(completion.choices[0].message.content)
+
+
+async def _medir(nombre: str, llamar: Callable[[str, str], Awaitable[Dict[str, Any]]], servidor: ServidorOpenAIFalso) -> None:
+    servidor.reiniciar_contadores()
+    bloqueo_maximo = 0.0
+    terminado = asyncio.Event()
+
+    async def _latido() -> None: # Retraso del event loop al atender una tarea que pide despertar cada 10 ms
+        nonlocal bloqueo_maximo
+        while not terminado.is_set():
+            esperado = time.perf_counter() + 0.01
+            await asyncio.sleep(0.01)
+            bloqueo_maximo = max(bloqueo_maximo, time.perf_counter() - esperado)
+
+    latido = asyncio.create_task(_latido())
+    await asyncio.sleep(0) # Que el latido empiece antes que las llamadas
+    inicio = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()): # _llamar_openai_api registra cada llamada
+        await asyncio.gather(*(llamar(f"Prompt de prueba número {i}", f"Bench_{i}") for i in range(LLAMADAS)))
+    segundos = time.perf_counter() - inicio
+    terminado.set()
+    await latido
+    print(
+        f"  {nombre:<48} {segundos:6.2f} s   máx. en vuelo {servidor.max_en_vuelo:>2}   "
+        f"conexiones TCP {servidor.conexiones:>2}   event loop bloqueado hasta {1000 * bloqueo_maximo:7.0f} ms"
+    )
+
+
+async def _principal(servidor: ServidorOpenAIFalso) -> None:
+    print(f"{LLAMADAS} llamadas concurrentes, {LATENCIA_SEG * 1000:.0f} ms por petición en el servidor")
+    await _medir("anterior (OpenAI() síncrono por llamada)", _cliente_por_llamada_anterior, servidor)
+    await _medir("AsyncOpenAI compartido", _llamar_openai_api, servidor)
+    await _medir("AsyncOpenAI compartido (conexiones ya abiertas)", _llamar_openai_api, servidor)
+    await cerrar_cliente_openai()
+
+
+def main() -> None:
+    with ServidorOpenAIFalso(LATENCIA_SEG, {"idioma_detectado": "es", "titulo_original": "Título"}) as servidor:
+        apuntar_servicio(servidor)
+        asyncio.run(_principal(servidor))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,122 @@
+import asyncio
+import contextlib
+import io
+import statistics
+import sys
+import time
+from typing import Callable, Dict, List
+
+from app.core.config import get_settings
+from app.core.openai_client import cerrar_cliente_openai
+from app.services.palabras_clave_locales import extraer_palabras_clave
+from app.services.text_processing_service import _paso4_elementos_globales, _paso5_elementos_escena
+from tests.benchmarks._openai_falso import ServidorOpenAIFalso, apuntar_servicio
+
+# Palabras clave de stock (Paso 4 y Paso 5) según KEYWORD_EXTRACTION_MODE, sin red ni API key.
+# 1) Latencia del extractor local por escena y para el guion completo.
+# 2) Tiempo de los Pasos 4 y 5 de un guion de ESCENAS escenas en cada modo, contra un servidor local compatible con
+#    OpenAI que responde tras una latencia fija (llm: la IA genera palabras clave y prompts; hibrido: palabras clave
+#    locales y la IA solo para los prompts; local: sin llamadas).
+# 3) Coincidencia de las palabras clave locales con una referencia escrita a mano (lo que buscaría un editor en un
+#    banco de stock para cada escena). Es una aproximación: la tasa de acierto real en las búsquedas (resultados
+#    útiles en Pexels) necesita la API y red, y no se mide aquí.
+# Ejecutar desde servicio_procesamiento_texto: python -m tests.benchmarks.bench_palabras_clave
+
+ESCENAS = 12
+LATENCIA_LLM_SEG = 1.0 # Por petición, en el servidor falso
+_RESPUESTA_LLM = {
+    "palabras_clave_globales_stock": ["familia", "cocina", "discusión"],
+    "prompts_globales_imagenes_ia": [{"id_prompt_global": "global_img_prompt_1", "descripcion_visual": "Cocina al anochecer", "estilo_sugerido": "cinemático"}],
+    "palabras_clave_stock_escena": ["cocina", "suegra"],
+    "prompts_imagenes_ia_escena": [{"id_prompt_escena": "", "descripcion_visual": "Una mujer mira una cocina desordenada", "estilo_sugerido": "realista"}],
+}
+
+# Escenas de ejemplo con las palabras que un editor usaría para buscar material de stock.
+_ESCENAS_REFERENCIA = [
+    ("Mi suegra llegó a las diez de la noche sin avisar. Entró directamente en la cocina, abrió la nevera y empezó a "
+     "tirar a la basura la comida que yo había preparado para toda la semana. Mi marido miraba el móvil en el sofá.",
+     {"suegra", "cocina", "nevera", "comida", "sofá", "móvil"}),
+    ("El verano pasado alquilamos una cabaña en el bosque con unos amigos. La primera noche se fue la luz y tuvimos que "
+     "buscar una linterna en el coche. Fuera solo se oía la lluvia contra el tejado y el ladrido de un perro.",
+     {"cabaña", "bosque", "linterna", "coche", "lluvia", "perro"}),
+    ("En la boda de mi hermana, el padrino se levantó a dar un discurso y acabó confesando delante de todos los "
+     "invitados que había perdido los anillos. La novia se echó a llorar y el fotógrafo siguió disparando la cámara.",
+     {"boda", "padrino", "discurso", "anillos", "novia", "cámara"}),
+    ("Mi jefe me llamó a su despacho un viernes por la tarde. Sobre la mesa había una carta de despido y una caja de "
+     "cartón para recoger mis cosas. Salí de la oficina con la caja en los brazos y cogí el autobús a casa.",
+     {"jefe", "despacho", "carta", "despido", "caja", "oficina", "autobús"}),
+]
+
+
+def _medir_ms(funcion: Callable[[], object], repeticiones: int = 50) -> float:
+    funcion() # Calentamiento: carga de stopwords y tabla IDF
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        funcion()
+        tiempos.append(1000 * (time.perf_counter() - inicio))
+    return statistics.median(tiempos)
+
+
+def _escenas_guion() -> List[Dict[str, str]]:
+    return [{"id_escena": f"escena_{i:02d}", "titulo_escena": "", "texto_escena_es": _ESCENAS_REFERENCIA[i % len(_ESCENAS_REFERENCIA)][0]} for i in range(ESCENAS)]
+
+
+def _latencia_local() -> None:
+    settings = get_settings()
+    guion = " ".join(escena["texto_escena_es"] for escena in _escenas_guion())
+    texto_escena = _ESCENAS_REFERENCIA[0][0]
+    print("Extractor local (mediana):")
+    print(f"  escena ({len(texto_escena)} caracteres):{'':<9} {_medir_ms(lambda: extraer_palabras_clave(texto_escena, settings.KEYWORD_MAX_PER_SCENE)):7.3f} ms")
+    print(f"  guion completo ({len(guion)} caracteres): {_medir_ms(lambda: extraer_palabras_clave(guion, settings.KEYWORD_MAX_GLOBAL)):7.3f} ms")
+
+
+async def _pasos_4_y_5(servidor: ServidorOpenAIFalso, modo: str) -> None:
+    escenas = _escenas_guion()
+    guion = " ".join(escena["texto_escena_es"] for escena in escenas)
+    servidor.reiniciar_contadores()
+    inicio = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()): # El servicio registra cada paso
+        (palabras_globales, prompts_globales), *_ = await asyncio.gather(
+            _paso4_elementos_globales(guion, modo), *(_paso5_elementos_escena(escena, modo) for escena in escenas)
+        )
+    segundos = time.perf_counter() - inicio
+    prompts_escena = sum(len(escena["prompts_imagenes_ia_escena"]) for escena in escenas)
+    print(
+        f"  {modo:<8} {segundos:6.2f} s   llamadas a la IA {servidor.peticiones:>2}   "
+        f"palabras clave {len(palabras_globales)} globales / {sum(len(e['palabras_clave_stock_escena']) for e in escenas):>2} de escena   "
+        f"prompts de imagen {len(prompts_globales)} globales / {prompts_escena:>2} de escena"
+    )
+
+
+def _coincidencia_con_referencia() -> None:
+    print(f"Coincidencia con la referencia ({get_settings().KEYWORD_MAX_PER_SCENE} palabras clave locales por escena):")
+    total_aciertos = total_extraidas = total_referencia = 0
+    for texto, referencia in _ESCENAS_REFERENCIA:
+        extraidas = extraer_palabras_clave(texto, get_settings().KEYWORD_MAX_PER_SCENE)
+        aciertos = sum(1 for frase in extraidas if referencia.intersection(frase.split()))
+        cubiertas = len({palabra for frase in extraidas for palabra in frase.split()} & referencia)
+        total_aciertos += aciertos
+        total_extraidas += len(extraidas)
+        total_referencia += cubiertas
+        print(f"  {aciertos}/{len(extraidas)} útiles, {cubiertas}/{len(referencia)} de la referencia: {extraidas}")
+    print(f"  precisión {total_aciertos / total_extraidas:.0%}   palabras de la referencia cubiertas {total_referencia / sum(len(r) for _, r in _ESCENAS_REFERENCIA):.0%}")
+
+
+async def _principal(servidor: ServidorOpenAIFalso) -> None:
+    _latencia_local()
+    print(f"Pasos 4 y 5, guion de {ESCENAS} escenas, {LATENCIA_LLM_SEG * 1000:.0f} ms por llamada a la IA:")
+    for modo in ("llm", "hibrido", "local"):
+        await _pasos_4_y_5(servidor, modo)
+    await cerrar_cliente_openai()
+    _coincidencia_con_referencia()
+
+
+def main() -> None:
+    with ServidorOpenAIFalso(LATENCIA_LLM_SEG, _RESPUESTA_LLM) as servidor:
+        apuntar_servicio(servidor)
+        asyncio.run(_principal(servidor))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
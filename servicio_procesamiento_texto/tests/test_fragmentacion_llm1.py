@@ -0,0 +1,121 @@
+import pytest
+
+pytest.importorskip("openai")
+pytest.importorskip("pydantic_settings")
+
+from app.services import text_processing_service as servicio
+
+
+@pytest.fixture(autouse=True)
+def _tokens_por_palabra(monkeypatch):
+    # Conteo determinista (una palabra = un token) para no depender de tiktoken ni de su descarga
+    monkeypatch.setattr(servicio, "contar_tokens", lambda texto: len(texto.split()) if texto else 0)
+
+
+def _palabras(prefijo: str, numero: int) -> str:
+    return " ".join(f"{prefijo}{i}" for i in range(numero)) + "."
+
+
+def _contenido(cuerpo: str, comentarios: list) -> dict:
+    return {"titulo_original": "Un título corto", "cuerpo_post_original": cuerpo, "comentarios_originales": comentarios}
+
+
+def _comentario(i: int, palabras: int, subcomentarios: int = 0, palabras_sub: int = 5) -> dict:
+    return {
+        "id_original_comentario": f"c{i}",
+        "texto_original_comentario": _palabras(f"c{i}w", palabras),
+        "subcomentarios_originales": [
+            {"id_original_subcomentario": f"c{i}_s{j}", "texto_original_subcomentario": _palabras(f"c{i}s{j}w", palabras_sub)}
+            for j in range(1, subcomentarios + 1)
+        ],
+    }
+
+
+def _respuesta_en_mayusculas(fragmento: dict, idioma: str = "en") -> dict:
+    """Lo que devolvería el modelo: misma estructura, textos "traducidos"."""
+    def _traducir(datos):
+        if isinstance(datos, dict): return {k: (v.upper() if k.startswith(("titulo", "cuerpo", "texto")) else _traducir(v)) for k, v in datos.items()}
+        if isinstance(datos, list): return [_traducir(v) for v in datos]
+        return datos
+    return {"idioma_detectado": idioma, **_traducir(fragmento["contenido"])}
+
+
+def test_contenido_que_cabe_va_en_un_solo_fragmento():
+    contenido = _contenido(_palabras("b", 20), [_comentario(1, 10, 2)])
+    fragmentos = servicio._dividir_contenido_llm1(contenido, max_tokens=500)
+    assert len(fragmentos) == 1
+    assert fragmentos[0]["contenido"] == contenido
+    assert list(fragmentos[0]["contenido"]) == ["titulo_original", "cuerpo_post_original", "comentarios_originales"]
+
+
+def test_ningun_fragmento_supera_el_presupuesto():
+    cuerpo = "\n\n".join(_palabras(f"p{i}w", 30) for i in range(8))
+    contenido = _contenido(cuerpo, [_comentario(i, 25, 3) for i in range(1, 9)])
+    fragmentos = servicio._dividir_contenido_llm1(contenido, max_tokens=80)
+    assert len(fragmentos) > 1
+    assert all(0 < f["tokens"] <= 80 for f in fragmentos)
+    # El cuerpo se parte por párrafos, como mucho una parte por fragmento, y se reconstruye con sus uniones
+    partes = [f for f in fragmentos if "cuerpo_post_original" in f["contenido"]]
+    assert len(partes) > 1
+    assert "".join(f["contenido"]["cuerpo_post_original"] + f["union_cuerpo"] for f in partes) == cuerpo
+    # Cada comentario viaja entero (cabe) y aparece exactamente una vez
+    ids = [c["id_original_comentario"] for f in fragmentos for c in f["contenido"]["comentarios_originales"]]
+    assert ids == [f"c{i}" for i in range(1, 9)]
+
+
+def test_comentario_que_no_cabe_se_reparte_con_el_id_de_su_padre():
+    contenido = _contenido("Cuerpo breve.", [_comentario(1, 30, subcomentarios=6, palabras_sub=25)])
+    fragmentos = servicio._dividir_contenido_llm1(contenido, max_tokens=60)
+    trozos = [c for f in fragmentos for c in f["contenido"]["comentarios_originales"]]
+    assert len(trozos) > 1
+    assert all(c["id_original_comentario"] == "c1" for c in trozos)
+    # El texto del comentario viaja una sola vez, en la cabecera; los subcomentarios, en orden y sin repetirse
+    assert sum("texto_original_comentario" in c for c in trozos) == 1
+    assert "texto_original_comentario" in trozos[0]
+    subs = [s["id_original_subcomentario"] for c in trozos for s in c["subcomentarios_originales"]]
+    assert subs == [f"c1_s{j}" for j in range(1, 7)]
+
+
+def test_fusion_respeta_el_orden_original():
+    cuerpo = "\n\n".join(_palabras(f"p{i}w", 30) for i in range(5))
+    contenido = _contenido(cuerpo, [_comentario(1, 10, 1), _comentario(2, 30, subcomentarios=5, palabras_sub=25), _comentario(3, 10)])
+    fragmentos = servicio._dividir_contenido_llm1(contenido, max_tokens=60)
+    # Las respuestas llegan en el orden de los fragmentos, pero el modelo puede devolver los comentarios desordenados
+    respuestas = []
+    for fragmento in fragmentos:
+        respuesta = _respuesta_en_mayusculas(fragmento)
+        respuesta["comentarios_originales"].reverse()
+        respuestas.append(respuesta)
+    fusionada = servicio._fusionar_respuestas_llm1(contenido, fragmentos, respuestas)
+    assert fusionada["titulo_original"] == contenido["titulo_original"].upper()
+    assert fusionada["cuerpo_post_original"] == cuerpo.upper()
+    assert [c["id_original_comentario"] for c in fusionada["comentarios_originales"]] == ["c1", "c2", "c3"]
+    for original, traducido in zip(contenido["comentarios_originales"], fusionada["comentarios_originales"]):
+        assert traducido["texto_original_comentario"] == original["texto_original_comentario"].upper()
+        assert [s["texto_original_subcomentario"] for s in traducido["subcomentarios_originales"]] == [
+            s["texto_original_subcomentario"].upper() for s in original["subcomentarios_originales"]
+        ]
+    assert fusionada["idioma_detectado"] == "en"
+
+
+def test_fusion_con_textos_omitidos_por_el_modelo():
+    contenido = _contenido("Cuerpo breve.", [_comentario(1, 5, 1), _comentario(2, 5)])
+    fragmentos = servicio._dividir_contenido_llm1(contenido, max_tokens=500)
+    respuesta = _respuesta_en_mayusculas(fragmentos[0])
+    del respuesta["comentarios_originales"][1] # El modelo se saltó c2
+    respuesta["comentarios_originales"][0]["subcomentarios_originales"] = []
+    conservando = servicio._fusionar_respuestas_llm1(contenido, fragmentos, [respuesta])
+    assert conservando["comentarios_originales"][1]["texto_original_comentario"] == contenido["comentarios_originales"][1]["texto_original_comentario"]
+    assert conservando["comentarios_originales"][0]["subcomentarios_originales"][0]["texto_original_subcomentario"] == contenido["comentarios_originales"][0]["subcomentarios_originales"][0]["texto_original_subcomentario"]
+    # Para la memoria de traducción, lo omitido queda vacío en lugar de guardarse como traducido
+    sin_originales = servicio._fusionar_respuestas_llm1(contenido, fragmentos, [respuesta], conservar_originales=False)
+    assert sin_originales["comentarios_originales"][1]["texto_original_comentario"] == ""
+    assert sin_originales["comentarios_originales"][0]["subcomentarios_originales"][0]["texto_original_subcomentario"] == ""
+
+
+def test_idioma_mayoritario_ponderado_por_tokens():
+    contenido = _contenido("\n\n".join(_palabras(f"p{i}w", 40) for i in range(3)), [])
+    fragmentos = servicio._dividir_contenido_llm1(contenido, max_tokens=50)
+    idiomas = ["en"] + ["de"] * (len(fragmentos) - 1) # El primero lleva solo el título y poco más
+    respuestas = [_respuesta_en_mayusculas(f, idioma) for f, idioma in zip(fragmentos, idiomas)]
+    assert servicio._fusionar_respuestas_llm1(contenido, fragmentos, respuestas)["idioma_detectado"] == "de"
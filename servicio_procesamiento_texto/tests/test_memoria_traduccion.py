@@ -0,0 +1,79 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip("openai")
+pytest.importorskip("pydantic_settings")
+
+from app.core.config import get_settings
+from app.services import text_processing_service as servicio
+from app.services.llm_cache import CacheRespuestasLLM
+
+_CONTENIDO = {
+    "titulo_original": "My mother-in-law showed up unannounced",
+    "cuerpo_post_original": "She arrived at ten. I opened the door and offered her coffee.",
+    "comentarios_originales": [
+        {"id_original_comentario": "c1", "texto_original_comentario": "NTA, set boundaries.", "subcomentarios_originales": [
+            {"id_original_subcomentario": "c1_s1", "texto_original_subcomentario": "Agreed."}
+        ]},
+        {"id_original_comentario": "c2", "texto_original_comentario": "Did your partner say anything?", "subcomentarios_originales": []},
+    ],
+}
+
+
+@pytest.fixture
+def memoria(tmp_path, monkeypatch):
+    """Memoria con las traducciones del contenido ya guardadas para la configuración por defecto."""
+    settings = get_settings()
+    monkeypatch.setattr(settings, "OPENAI_MODEL", "modelo-a")
+    monkeypatch.setattr(settings, "LLM_PROMPT_ENCODING", "legible")
+    cache = CacheRespuestasLLM(str(tmp_path / "cache.db"), 10 * 1024 * 1024, 0)
+    claves = servicio._claves_memoria_llm1(_CONTENIDO, "completo")
+    asyncio.run(cache.guardar_segmentos([(clave, f"traducido {n}", "en") for n, clave in enumerate(claves.values())]))
+    yield cache
+    cache.cerrar()
+
+
+def _reutilizados(cache: CacheRespuestasLLM, contenido: dict, modo: str = "completo") -> int:
+    claves = servicio._claves_memoria_llm1(contenido, modo)
+    encontrados = asyncio.run(cache.obtener_segmentos(list(claves.values())))
+    return sum(clave in encontrados for clave in claves.values())
+
+
+def test_segmentos_identicos_aciertan(memoria):
+    assert _reutilizados(memoria, _CONTENIDO) == 5
+    # Un comentario nuevo solo deja pendiente ese comentario
+    con_comentario_nuevo = {**_CONTENIDO, "comentarios_originales": _CONTENIDO["comentarios_originales"] + [
+        {"id_original_comentario": "c3", "texto_original_comentario": "Update us!", "subcomentarios_originales": []}
+    ]}
+    assert _reutilizados(memoria, con_comentario_nuevo) == 5
+    assert len(servicio._claves_memoria_llm1(con_comentario_nuevo, "completo")) == 6
+
+
+def test_otro_modelo_falla(memoria, monkeypatch):
+    monkeypatch.setattr(get_settings(), "OPENAI_MODEL", "modelo-b")
+    assert _reutilizados(memoria, _CONTENIDO) == 0
+
+
+def test_otra_codificacion_de_prompts_falla(memoria, monkeypatch):
+    monkeypatch.setattr(get_settings(), "LLM_PROMPT_ENCODING", "compacto")
+    assert _reutilizados(memoria, _CONTENIDO) == 0
+
+
+def test_otro_modo_del_paso1_falla(memoria):
+    assert _reutilizados(memoria, _CONTENIDO, modo="correccion") == 0
+
+
+def test_prompt_editado_falla(memoria, monkeypatch):
+    monkeypatch.setattr(servicio, "_PLANTILLA_PASO1_LEGIBLE", servicio._PLANTILLA_PASO1_LEGIBLE.replace("bien redactada", "fiel al registro del autor"))
+    assert _reutilizados(memoria, _CONTENIDO) == 0
+
+
+def test_prompt_de_otro_modo_no_invalida(memoria, monkeypatch):
+    monkeypatch.setattr(servicio, "_PLANTILLA_CORRECCION_LEGIBLE", servicio._PLANTILLA_CORRECCION_LEGIBLE + "Sé breve.\n")
+    assert _reutilizados(memoria, _CONTENIDO) == 5
+
+
+def test_mensaje_de_sistema_editado_falla(memoria, monkeypatch):
+    monkeypatch.setattr(servicio, "MENSAJE_SISTEMA_LLM", servicio.MENSAJE_SISTEMA_LLM + " Sé conciso.")
+    assert _reutilizados(memoria, _CONTENIDO) == 0